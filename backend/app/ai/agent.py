@@ -44,6 +44,7 @@ from ..services.collective_intelligence_engine import CollectiveIntelligenceEngi
 from app.services.user_learning_service import UserLearningService
 from ..services.activity_logger import ActivityLogger
 from ..utils.chat_parser import parse_chat_export, extract_lead_name, analyze_conversation
+from ..core.local_cache import LocalCache
 import asyncio
 
 logger = logging.getLogger(__name__)
@@ -97,17 +98,16 @@ def get_optimal_model(intent: str, needs_tools: bool, message: str) -> str:
     # Default → Mini
     return "gpt-4o-mini"
 
-# Simple Cache für User Profile (5 Minuten TTL)
-_user_cache = {}
+# Cache für User Profile (5 Minuten TTL, begrenzt)
+_user_cache = LocalCache(name="ai_user_profiles", max_entries=5_000, default_ttl=300)
 
 async def get_user_profile_cached(user_id: str, db):
     """Cached User Profile für 5 Minuten"""
-    cache_key = f"profile_{user_id}"
-    if cache_key in _user_cache:
-        data, timestamp = _user_cache[cache_key]
-        if datetime.now() - timestamp < timedelta(minutes=5):
-            logger.debug(f"Using cached profile for user {user_id}")
-            return data
+    cache_key = f"profile:{user_id}"
+    data = _user_cache.get(cache_key)
+    if data is not None:
+        logger.debug(f"Using cached profile for user {user_id}")
+        return data
     
     # Fetch from DB
     profile_result = await asyncio.to_thread(
@@ -128,7 +128,7 @@ async def get_user_profile_cached(user_id: str, db):
         }
     )
     
-    _user_cache[cache_key] = (data, datetime.now())
+    _user_cache.set(cache_key, data)
     return data
 
 
@@ -18,6 +18,12 @@ client = AsyncOpenAI(api_key=get_settings().openai_api_key)
 ChatMessage = Dict[str, str]  # {"role": "system|user|assistant", "content": "..."}
 
 
+def _count_llm_call() -> None:
+    """LLM-Call dem laufenden Background-Job zurechnen (Job-Telemetrie)."""
+    from app.services.job_telemetry import record_llm_call
+    record_llm_call()
+
+
 class AIClient:
     """
     Wrapper-Klasse für OpenAI API Calls.
@@ -41,6 +47,7 @@ class AIClient:
         Nutzt intern asyncio.run für async OpenAI Calls.
         Funktioniert auch in async Kontexten durch Nutzung eines neuen Event Loops in einem Thread.
         """
+        _count_llm_call()
         try:
             # Prüfe ob bereits ein Event Loop läuft
             try:
@@ -77,6 +84,7 @@ class AIClient:
         """
         Asynchrone generate Methode für async Kontexte (z.B. FastAPI).
         """
+        _count_llm_call()
         return await self._generate_async(system_prompt, messages, max_tokens, temperature)
     
     async def _generate_async(
@@ -169,6 +177,7 @@ async def chat_completion(
     """
     Einmaliger Chat-Call ohne Streaming.
     """
+    _count_llm_call()
     optimized_messages = optimize_context_window(messages)
     resp = await client.chat.completions.create(
         model=model,
@@ -188,6 +197,7 @@ async def stream_chat_response(
     Stream GPT-Antwort in Echtzeit.
     Wird in FastAPI über StreamingResponse ausgespielt.
     """
+    _count_llm_call()
     optimized_messages = optimize_context_window(messages)
     stream = await client.chat.completions.create(
         model=model,
@@ -210,6 +220,7 @@ async def get_embedding(text: str, model: Optional[str] = None) -> List[float]:
     from app.core.config import get_settings
     settings = get_settings()
     model_name = model or settings.openai_embedding_model or "text-embedding-3-small"
+    _count_llm_call()
     resp = await client.embeddings.create(
         model=model_name,
         input=text,
@@ -975,6 +975,15 @@ class SalesFlowAlertRules:
         cooldown_minutes=10
     )
     
+    JOB_OVERRUN = AlertRule(
+        name="job_overrun",
+        description="Background job ran longer than its schedule interval",
+        category=AlertCategory.INFRASTRUCTURE,
+        severity=AlertSeverity.MEDIUM,
+        channels=[AlertChannel.SLACK],
+        cooldown_minutes=60
+    )
+    
     # Security alerts
     SECURITY_VIOLATION = AlertRule(
         name="security_violation",
@@ -1027,6 +1036,7 @@ class SalesFlowAlertRules:
             cls.HIGH_ERROR_RATE,
             cls.DATABASE_LATENCY,
             cls.QUEUE_BACKLOG,
+            cls.JOB_OVERRUN,
             cls.SECURITY_VIOLATION,
             cls.RATE_LIMIT_ABUSE,
             cls.GDPR_REQUEST_OVERDUE,
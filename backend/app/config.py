@@ -61,6 +61,11 @@ class Settings(BaseSettings):
     db_pool_recycle: int = Field(default=3600, ge=300, le=7200)
     db_echo: bool = False
 
+    # Read replicas (GET traffic and analytics jobs; empty = use primary)
+    database_replica_url: Optional[str] = None
+    supabase_read_replica_url: Optional[str] = None
+    db_replica_sticky_seconds: float = Field(default=5.0, ge=0, le=60)
+
     @model_validator(mode="after")
     def build_database_url(self):
         """Build database URL from Supabase if not provided."""
@@ -90,6 +95,34 @@ class Settings(BaseSettings):
     # Enable/disable caching
     cache_enabled: bool = True
 
+    # In-process L1 cache in front of Redis (per worker)
+    cache_l1_enabled: bool = True
+    cache_l1_max_entries: int = Field(default=10_000, ge=100, le=1_000_000)
+    cache_l1_max_mb: int = Field(default=64, ge=1, le=2048)
+    cache_l1_ttl: int = Field(default=30, ge=1, le=600)  # caps L1 staleness
+
+    # Also SCAN key patterns on invalidation (untagged keys from older workers)
+    cache_pattern_fallback: bool = False
+
+    # Cache payload codec (see app/core/cache_codec.py)
+    cache_codec: str = "auto"           # auto | orjson | msgpack | json
+    cache_compression: str = "auto"     # auto | zstd | lz4 | zlib | none
+    cache_compress_min_bytes: int = Field(default=4096, ge=0)
+
+    # Pre-peak cache warming (see app/services/cache_warming.py)
+    cache_warm_enabled: bool = True
+    cache_warm_active_days: int = Field(default=14, ge=1, le=90)
+    cache_warm_window_minutes: int = Field(default=45, ge=5, le=240)
+    cache_warm_concurrency: int = Field(default=8, ge=1, le=64)
+
+    # Scheduler jobs across replicas (see app/services/job_coordinator.py)
+    job_coordination_enabled: bool = True
+    # Autopilot job: users in parallel, per-user timeout (see app/services/user_fanout.py)
+    autopilot_concurrency: int = Field(default=8, ge=1, le=64)
+    autopilot_user_timeout_seconds: int = Field(default=120, ge=5, le=900)
+    # Watermark-based incremental jobs (see app/services/incremental_jobs.py); False = full scans
+    incremental_jobs_enabled: bool = True
+
     # ==================== RATE LIMITING ====================
 
     rate_limit_enabled: bool = True
@@ -97,6 +130,9 @@ class Settings(BaseSettings):
     rate_limit_auth_rpm: int = Field(default=5, ge=1, le=20)
     rate_limit_api_read_rpm: int = Field(default=200, ge=50, le=1000)
     rate_limit_api_write_rpm: int = Field(default=50, ge=10, le=200)
+    # Webhook limits: shared via Redis when available, bounded in-process state otherwise
+    webhook_rate_limit_shared: bool = True
+    webhook_rate_limit_max_keys: int = Field(default=100_000, ge=1_000, le=10_000_000)
 
     # ==================== SECURITY ====================
 
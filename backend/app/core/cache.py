@@ -1,15 +1,24 @@
 """
 Einfacher In-Memory-Cache mit TTL.
 Reduziert API- und Datenbank-Calls.
+
+Läuft auf dem gemeinsamen LocalCache (begrenzt nach Einträgen/Bytes,
+LRU, Hintergrund-Aufräumen abgelaufener Keys, Prefix-Index).
 """
 
 import hashlib
 import json
-from datetime import datetime, timedelta
 from typing import Any, Optional
 
-# Globaler Cache-Speicher
-_CACHE: dict = {}
+from app.core.local_cache import LocalCache
+
+# Globaler Cache-Speicher (pro Prozess, begrenzt)
+_CACHE = LocalCache(
+    name="legacy",
+    max_entries=5_000,
+    max_bytes=32 * 1024 * 1024,
+    default_ttl=300,
+)
 
 
 def cache_key(prefix: str, *args, **kwargs) -> str:
@@ -21,46 +30,30 @@ def cache_key(prefix: str, *args, **kwargs) -> str:
 
 def get_cached(key: str) -> Optional[Any]:
     """Wert aus Cache holen, falls nicht abgelaufen."""
-    if key in _CACHE:
-        entry = _CACHE[key]
-        if datetime.now() < entry["expires"]:
-            return entry["data"]
-        # Abgelaufen – entfernen
-        del _CACHE[key]
-    return None
+    return _CACHE.get(key)
 
 
 def set_cached(key: str, data: Any, ttl_seconds: int = 300) -> None:
     """Wert mit TTL (Standard 5 Minuten) cachen."""
-    _CACHE[key] = {
-        "data": data,
-        "expires": datetime.now() + timedelta(seconds=ttl_seconds),
-    }
+    _CACHE.set(key, data, ttl=ttl_seconds)
 
 
 def clear_cache(prefix: Optional[str] = None) -> int:
     """Cache leeren. Optional nur Keys mit Prefix entfernen."""
-    global _CACHE
     if prefix is None:
-        count = len(_CACHE)
-        _CACHE = {}
-        return count
-
-    keys_to_delete = [k for k in _CACHE if k.startswith(prefix)]
-    for key in keys_to_delete:
-        del _CACHE[key]
-    return len(keys_to_delete)
+        return _CACHE.clear()
+    return _CACHE.delete_prefix(prefix)
 
 
 def cache_stats() -> dict:
     """Cache-Statistiken abrufen."""
-    now = datetime.now()
-    valid = sum(1 for v in _CACHE.values() if v["expires"] > now)
-    expired = len(_CACHE) - valid
+    expired = _CACHE.sweep()
+    stats = _CACHE.stats()
     return {
-        "total_entries": len(_CACHE),
-        "valid": valid,
+        "total_entries": stats["entries"] + expired,
+        "valid": stats["entries"],
         "expired": expired,
+        **stats,
     }
 """
 ============================================
@@ -73,18 +66,31 @@ High-performance caching layer with Redis
 - Dashboard stats caching
 - Session management
 - Cache invalidation patterns
+- Two tiers: in-process LRU (L1) in front of Redis (L2), kept
+  consistent across workers via Redis pub/sub invalidations
+- Stale-while-revalidate with jittered TTLs for expensive aggregates
+- Tag-based invalidation (user/lead/team) without keyspace scans
+- Pluggable binary codec (orjson/msgpack + compression, see cache_codec)
 """
 
 import json
 import hashlib
+import math
+import random
+import time
+import uuid
 from datetime import datetime, timedelta
-from typing import Any, Optional, TypeVar, Generic, Callable
+from typing import Any, Optional, TypeVar, Generic, Callable, Iterable
 from functools import wraps
 import asyncio
 from redis.asyncio import Redis, ConnectionPool
 from redis.exceptions import RedisError
 import structlog
 
+from app.core.cache_codec import CacheCodec, CodecError
+from app.core.local_cache import LocalCache, LocalCacheConfig
+from app.core.rate_limit import RateLimiter
+
 logger = structlog.get_logger()
 
 T = TypeVar('T')
@@ -108,8 +114,71 @@ class CacheConfig:
     # Very long-lived cache
     STATIC_DATA_TTL = 86400    # 24 hours
 
+    # L1 (in-process) tier
+    L1_TTL = LocalCacheConfig.DEFAULT_TTL  # Upper bound for L1 staleness
+    INVALIDATION_CHANNEL = "salesflow:cache:invalidate"
+
+    # Stale-while-revalidate
+    SWR_GRACE_SECONDS = 900    # Serve stale values up to 15 min past TTL
+    TTL_JITTER = 0.15          # ±15% so keys written together expire apart
+    REFRESH_LOCK_TTL = 30      # One background refresh per key across workers
+
+    # Stampede protection (get_or_set)
+    LOCK_WAIT_TIMEOUT = 5.0    # Max time a worker waits for another's compute
+    LOCK_BACKOFF_START = 0.05
+    LOCK_BACKOFF_MAX = 0.5
+    XFETCH_BETA = 1.0          # >1 refreshes earlier, 0 disables early refresh
+
+    # Tag sets outlive every member key (longest TTL above); members are
+    # scored by their key's expiry and pruned on every write to the tag
+    TAG_SET_TTL = STATIC_DATA_TTL
+
+
+def jittered_ttl(ttl: int, jitter: float = CacheConfig.TTL_JITTER) -> int:
+    """Spread TTL by ±jitter so bulk-written keys don't expire together."""
+    if jitter <= 0:
+        return ttl
+    return max(1, int(round(ttl * random.uniform(1 - jitter, 1 + jitter))))
+
+
+_SWR_MARKER = "__swr__"
+_XFETCH_MARKER = "__xf__"
+
+# Read and drop one tag set atomically, so a key tagged concurrently is
+# never orphaned. Touches only KEYS[1] (cluster-safe); the caller deletes
+# the returned member keys and broadcasts them for L1 invalidation.
+_POP_TAG_SCRIPT = """
+local members = redis.call('ZRANGE', KEYS[1], 0, -1)
+redis.call('DEL', KEYS[1])
+return members
+"""
+
+# Compare-and-delete: only the lock owner releases the lock
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def unwrap_swr(data: Any) -> Any:
+    """Return the payload of a stale-while-revalidate envelope (or data as-is)."""
+    if isinstance(data, dict) and data.get(_SWR_MARKER):
+        return data.get("value")
+    return data
+
 class CacheKeyBuilder:
-    """Build consistent cache keys."""
+    """
+    Build consistent cache keys.
+
+    Invalidation works through tags (see CacheTags), not key patterns:
+    keys are written with `set(..., tags=[...])` and dropped with
+    `invalidate(tags=[...])`. Keys written by older workers without tags
+    are still covered by the SCAN fallback while `pattern_fallback` is on
+    (settings.cache_pattern_fallback), which can be switched off once all
+    workers run the tag-aware code and the longest TTL has passed.
+    """
 
     PREFIX = "salesflow"
 
@@ -129,6 +198,10 @@ class CacheKeyBuilder:
     def dashboard_stats(user_id: str) -> str:
         return f"{CacheKeyBuilder.PREFIX}:dashboard:{user_id}"
 
+    @staticmethod
+    def command_queue(user_id: str) -> str:
+        return f"{CacheKeyBuilder.PREFIX}:command_queue:{user_id}"
+
     @staticmethod
     def user_profile(user_id: str) -> str:
         return f"{CacheKeyBuilder.PREFIX}:user:{user_id}"
@@ -175,6 +248,36 @@ class CacheKeyBuilder:
         sorted_filters = json.dumps(filters, sort_keys=True)
         return hashlib.md5(sorted_filters.encode()).hexdigest()[:8]
 
+class CacheTags:
+    """
+    Tag names for tag-based invalidation (Redis sorted sets of member keys,
+    scored by expiry).
+
+    Sorted sets replaced the plain sets under `:tag`; keys tagged by older
+    workers are still dropped by the SCAN fallback (pattern_fallback).
+    """
+
+    PREFIX = f"{CacheKeyBuilder.PREFIX}:ztag"
+
+    @staticmethod
+    def user(user_id: str) -> str:
+        """Everything cached for a user (profile, lists, dashboard, ...)."""
+        return f"{CacheTags.PREFIX}:user:{user_id}"
+
+    @staticmethod
+    def user_leads(user_id: str) -> str:
+        """A user's lead lists (all filter combinations)."""
+        return f"{CacheTags.PREFIX}:user_leads:{user_id}"
+
+    @staticmethod
+    def lead(lead_id: str) -> str:
+        return f"{CacheTags.PREFIX}:lead:{lead_id}"
+
+    @staticmethod
+    def team(team_id: str) -> str:
+        return f"{CacheTags.PREFIX}:team:{team_id}"
+
+
 class CacheService:
     """
     Redis-based caching service for SalesFlow AI.
@@ -183,20 +286,50 @@ class CacheService:
     - Async operations
     - Automatic serialization
     - TTL management
-    - Pattern-based invalidation
+    - Tag-based invalidation (SCAN patterns only as migration fallback)
     - Cache stampede protection
+    - Optional in-process L1 tier with cross-worker invalidation
     """
 
-    def __init__(self, redis_url: str, max_connections: int = 50):
+    def __init__(
+        self,
+        redis_url: str,
+        max_connections: int = 50,
+        l1: Optional[LocalCache] = None,
+        l1_enabled: bool = True,
+        pattern_fallback: bool = False,
+        codec: Optional[CacheCodec] = None,
+    ):
+        # Payloads are binary (codec header, compression): no decoding here
         self.pool = ConnectionPool.from_url(
             redis_url,
             max_connections=max_connections,
-            decode_responses=True,
+            decode_responses=False,
             socket_timeout=5,
             socket_connect_timeout=5,
         )
         self.redis: Optional[Redis] = None
         self._lock_ttl = 10  # Lock timeout in seconds
+        self.pattern_fallback = pattern_fallback
+        self.codec = codec or CacheCodec()
+
+        # L1 holds serialized payloads, so callers never share mutable objects
+        self.l1: Optional[LocalCache] = (l1 or LocalCache(name="l1")) if l1_enabled else None
+        self.instance_id = uuid.uuid4().hex
+        self._invalidation_task: Optional[asyncio.Task] = None
+        self._l2_stats = {"hits": 0, "misses": 0, "sets": 0, "errors": 0}
+        self._pubsub_stats = {"published": 0, "received": 0, "applied": 0}
+        self._refresh_tasks: dict[str, asyncio.Task] = {}
+        self._inflight: dict[str, asyncio.Future] = {}  # Compute tasks per key
+        self._flight_stats = {
+            "hits": 0,
+            "computed": 0,
+            "coalesced": 0,
+            "waited": 0,
+            "wait_timeouts": 0,
+            "early_refreshes": 0,
+        }
+        self._rate_limiter: Optional[RateLimiter] = None
 
     async def connect(self):
         """Initialize Redis connection."""
@@ -208,77 +341,184 @@ class CacheService:
             logger.error("Redis connection failed", error=str(e))
             raise
 
+        if self.l1 is not None and self._invalidation_task is None:
+            self._invalidation_task = asyncio.create_task(self._listen_invalidations())
+
     async def disconnect(self):
         """Close Redis connection."""
+        if self._invalidation_task:
+            self._invalidation_task.cancel()
+            try:
+                await self._invalidation_task
+            except asyncio.CancelledError:
+                pass
+            self._invalidation_task = None
+        if self.l1 is not None:
+            self.l1.clear()
         if self.redis:
             await self.redis.close()
             logger.info("Redis disconnected")
 
-    async def _serialize(self, value: Any) -> str:
-        """Serialize value to JSON string."""
+    async def _serialize(self, value: Any) -> bytes:
+        """Serialize value with the configured codec."""
         if isinstance(value, datetime):
-            return json.dumps(value.isoformat())
-        return json.dumps(value, default=str)
+            value = value.isoformat()
+        return self.codec.encode(value)
 
-    async def _deserialize(self, value: str) -> Any:
-        """Deserialize JSON string to Python object."""
-        try:
-            return json.loads(value)
-        except json.JSONDecodeError:
-            return value
+    async def _deserialize(self, value: bytes) -> Any:
+        """Deserialize any codec format (header-less values are legacy JSON)."""
+        return self.codec.decode(value)
+
+    def _l1_ttl(self, ttl: float) -> float:
+        """L1 entries never outlive the L2 TTL nor the L1 staleness bound."""
+        return min(ttl, self.l1.default_ttl)
 
     # ==================== BASIC OPERATIONS ====================
 
     async def get(self, key: str) -> Optional[Any]:
-        """Get value from cache."""
+        """Get value from cache (L1 first, then Redis)."""
+        if self.l1 is not None:
+            local = self.l1.get(key)
+            if local is not None:
+                return await self._deserialize(local)
+
         try:
-            value = await self.redis.get(key)
-            if value:
-                return await self._deserialize(value)
-            return None
+            if self.l1 is not None:
+                # PTTL in the same round trip, so the L1 copy expires with the L2 entry
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.get(key)
+                    pipe.pttl(key)
+                    value, remaining_ms = await pipe.execute()
+            else:
+                value, remaining_ms = await self.redis.get(key), None
         except RedisError as e:
+            self._l2_stats["errors"] += 1
             logger.warning("Cache get failed", key=key, error=str(e))
             return None
 
+        if not value:
+            self._l2_stats["misses"] += 1
+            return None
+
+        try:
+            decoded = await self._deserialize(value)
+        except CodecError as e:
+            # Written by a codec this worker can't read: treat as a miss
+            self._l2_stats["misses"] += 1
+            logger.warning("Cache decode failed", key=key, error=str(e))
+            return None
+
+        self._l2_stats["hits"] += 1
+        if self.l1 is not None and remaining_ms is not None and remaining_ms != -2:
+            # -1: no expiry in Redis, -2: expired since the GET
+            remaining = self.l1.default_ttl if remaining_ms == -1 else remaining_ms / 1000
+            self.l1.set(key, value, ttl=self._l1_ttl(remaining))
+        return decoded
+
     async def set(
         self,
         key: str,
         value: Any,
-        ttl: int = CacheConfig.LEAD_DATA_TTL
+        ttl: int = CacheConfig.LEAD_DATA_TTL,
+        tags: Optional[Iterable[str]] = None,
     ) -> bool:
-        """Set value in cache with TTL."""
+        """
+        Set value in cache with TTL (write-through to both tiers).
+
+        Tags register the key in Redis sorted sets so `invalidate(tags=...)`
+        can drop it without scanning the keyspace; members whose key has
+        expired are pruned on each write, so tag sets stay bounded.
+        """
         try:
             serialized = await self._serialize(value)
-            await self.redis.setex(key, ttl, serialized)
-            return True
+            if tags:
+                now = time.time()
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.setex(key, ttl, serialized)
+                    for tag in tags:
+                        pipe.zadd(tag, {key: now + ttl})
+                        pipe.zremrangebyscore(tag, "-inf", now)
+                        pipe.expire(tag, max(ttl, CacheConfig.TAG_SET_TTL))
+                    await pipe.execute()
+            else:
+                await self.redis.setex(key, ttl, serialized)
+            self._l2_stats["sets"] += 1
         except RedisError as e:
+            self._l2_stats["errors"] += 1
             logger.warning("Cache set failed", key=key, error=str(e))
+            if self.l1 is not None:
+                self.l1.delete(key)
             return False
 
+        if self.l1 is not None:
+            self.l1.set(key, serialized, ttl=self._l1_ttl(ttl))
+        return True
+
     async def delete(self, key: str) -> bool:
-        """Delete key from cache."""
-        try:
-            await self.redis.delete(key)
-            return True
-        except RedisError as e:
-            logger.warning("Cache delete failed", key=key, error=str(e))
-            return False
+        """Delete key from cache (all tiers, all workers); True if Redis had it."""
+        return await self.invalidate(keys=[key]) > 0
 
     async def delete_pattern(self, pattern: str) -> int:
-        """Delete all keys matching pattern."""
+        """
+        Delete all keys matching pattern (all tiers, all workers).
+
+        Walks the whole keyspace with SCAN; prefer tags.
+        """
+        return await self.invalidate(patterns=[pattern])
+
+    async def invalidate(
+        self,
+        keys: Optional[list[str]] = None,
+        patterns: Optional[list[str]] = None,
+        tags: Optional[list[str]] = None,
+    ) -> int:
+        """
+        Remove keys, tag members and glob patterns from L1, Redis and the
+        L1 of every other worker (one pub/sub message per call).
+
+        Tags cost O(keys in tag); patterns scan the keyspace.
+
+        Returns number of Redis keys deleted, or -1 if Redis failed.
+        """
+        keys = list(keys or [])
+        patterns = list(patterns or [])
+        tags = list(tags or [])
+
+        deleted = 0
         try:
-            keys = []
-            async for key in self.redis.scan_iter(match=pattern):
-                keys.append(key)
-
-            if keys:
-                deleted = await self.redis.delete(*keys)
-                logger.info("Cache pattern deleted", pattern=pattern, count=deleted)
-                return deleted
-            return 0
+            for tag in tags:
+                members = await self.redis.eval(_POP_TAG_SCRIPT, 1, tag)
+                for member in members or []:
+                    member = member.decode() if isinstance(member, bytes) else member
+                    if member not in keys:
+                        keys.append(member)
+            to_delete = list(keys)
+            for pattern in patterns:
+                async for key in self.redis.scan_iter(match=pattern):
+                    to_delete.append(key)
+            if to_delete:
+                deleted = await self.redis.delete(*to_delete)
+            if patterns:
+                logger.info("Cache pattern deleted", patterns=patterns, count=deleted)
         except RedisError as e:
-            logger.warning("Cache pattern delete failed", pattern=pattern, error=str(e))
-            return 0
+            self._l2_stats["errors"] += 1
+            logger.warning(
+                "Cache invalidation failed",
+                keys=keys, patterns=patterns, tags=tags, error=str(e),
+            )
+            deleted = -1
+
+        self._apply_local_invalidation(keys, patterns)
+        await self._publish_invalidation(keys, patterns)
+        return deleted
+
+    async def invalidate_tags(self, *tags: str) -> int:
+        """Drop every key registered under the given tags."""
+        return await self.invalidate(tags=list(tags))
+
+    def _legacy_patterns(self, *patterns: str) -> list[str]:
+        """SCAN patterns for untagged keys, only while migrating."""
+        return list(patterns) if self.pattern_fallback else []
 
     async def exists(self, key: str) -> bool:
         """Check if key exists."""
@@ -292,7 +532,10 @@ class CacheService:
     async def cache_lead(self, lead_id: str, lead_data: dict) -> bool:
         """Cache lead data."""
         key = CacheKeyBuilder.lead(lead_id)
-        return await self.set(key, lead_data, CacheConfig.LEAD_DATA_TTL)
+        tags = [CacheTags.lead(lead_id)]
+        if isinstance(lead_data, dict) and lead_data.get("user_id"):
+            tags.append(CacheTags.user(str(lead_data["user_id"])))
+        return await self.set(key, lead_data, CacheConfig.LEAD_DATA_TTL, tags=tags)
 
     async def get_cached_lead(self, lead_id: str) -> Optional[dict]:
         """Get cached lead data."""
@@ -308,7 +551,10 @@ class CacheService:
         """Cache lead list for user."""
         filters_hash = CacheKeyBuilder.hash_filters(filters or {})
         key = CacheKeyBuilder.lead_list(user_id, filters_hash)
-        return await self.set(key, leads, CacheConfig.LEAD_LIST_TTL)
+        return await self.set(
+            key, leads, CacheConfig.LEAD_LIST_TTL,
+            tags=[CacheTags.user(user_id), CacheTags.user_leads(user_id)],
+        )
 
     async def get_cached_lead_list(
         self,
@@ -323,19 +569,25 @@ class CacheService:
     async def cache_hot_leads(self, user_id: str, leads: list) -> bool:
         """Cache hot leads for dashboard."""
         key = CacheKeyBuilder.hot_leads(user_id)
-        return await self.set(key, leads, CacheConfig.LEAD_LIST_TTL)
+        return await self.set(key, leads, CacheConfig.LEAD_LIST_TTL, tags=[CacheTags.user(user_id)])
 
     async def get_cached_hot_leads(self, user_id: str) -> Optional[list]:
         """Get cached hot leads."""
         key = CacheKeyBuilder.hot_leads(user_id)
-        return await self.get(key)
+        return unwrap_swr(await self.get(key))
 
     async def invalidate_lead(self, lead_id: str, user_id: str):
         """Invalidate lead and related caches."""
-        await self.delete(CacheKeyBuilder.lead(lead_id))
-        await self.delete_pattern(f"{CacheKeyBuilder.PREFIX}:leads:{user_id}:*")
-        await self.delete(CacheKeyBuilder.hot_leads(user_id))
-        await self.delete(CacheKeyBuilder.dashboard_stats(user_id))
+        await self.invalidate(
+            keys=[
+                CacheKeyBuilder.lead(lead_id),
+                CacheKeyBuilder.hot_leads(user_id),
+                CacheKeyBuilder.dashboard_stats(user_id),
+                CacheKeyBuilder.command_queue(user_id),
+            ],
+            tags=[CacheTags.lead(lead_id), CacheTags.user_leads(user_id)],
+            patterns=self._legacy_patterns(f"{CacheKeyBuilder.PREFIX}:leads:{user_id}:*"),
+        )
         logger.debug("Lead cache invalidated", lead_id=lead_id)
 
     # ==================== DASHBOARD CACHING ====================
@@ -343,12 +595,12 @@ class CacheService:
     async def cache_dashboard_stats(self, user_id: str, stats: dict) -> bool:
         """Cache dashboard statistics."""
         key = CacheKeyBuilder.dashboard_stats(user_id)
-        return await self.set(key, stats, CacheConfig.DASHBOARD_STATS_TTL)
+        return await self.set(key, stats, CacheConfig.DASHBOARD_STATS_TTL, tags=[CacheTags.user(user_id)])
 
     async def get_cached_dashboard_stats(self, user_id: str) -> Optional[dict]:
         """Get cached dashboard statistics."""
         key = CacheKeyBuilder.dashboard_stats(user_id)
-        return await self.get(key)
+        return unwrap_swr(await self.get(key))
 
     async def invalidate_dashboard(self, user_id: str):
         """Invalidate dashboard cache."""
@@ -363,7 +615,7 @@ class CacheService:
     ) -> bool:
         """Cache scheduled follow-ups."""
         key = CacheKeyBuilder.followups_scheduled(user_id)
-        return await self.set(key, followups, CacheConfig.LEAD_LIST_TTL)
+        return await self.set(key, followups, CacheConfig.LEAD_LIST_TTL, tags=[CacheTags.user(user_id)])
 
     async def get_cached_scheduled_followups(
         self,
@@ -371,20 +623,22 @@ class CacheService:
     ) -> Optional[list]:
         """Get cached scheduled follow-ups."""
         key = CacheKeyBuilder.followups_scheduled(user_id)
-        return await self.get(key)
+        return unwrap_swr(await self.get(key))
 
     async def invalidate_followups(self, user_id: str):
         """Invalidate follow-up caches."""
-        await self.delete(CacheKeyBuilder.followups_scheduled(user_id))
-        await self.delete(CacheKeyBuilder.followups_overdue(user_id))
-        await self.delete(CacheKeyBuilder.dashboard_stats(user_id))
+        await self.invalidate(keys=[
+            CacheKeyBuilder.followups_scheduled(user_id),
+            CacheKeyBuilder.followups_overdue(user_id),
+            CacheKeyBuilder.dashboard_stats(user_id),
+        ])
 
     # ==================== USER CACHING ====================
 
     async def cache_user_profile(self, user_id: str, profile: dict) -> bool:
         """Cache user profile."""
         key = CacheKeyBuilder.user_profile(user_id)
-        return await self.set(key, profile, CacheConfig.USER_PROFILE_TTL)
+        return await self.set(key, profile, CacheConfig.USER_PROFILE_TTL, tags=[CacheTags.user(user_id)])
 
     async def get_cached_user_profile(self, user_id: str) -> Optional[dict]:
         """Get cached user profile."""
@@ -393,16 +647,42 @@ class CacheService:
 
     async def invalidate_user(self, user_id: str):
         """Invalidate all user-related caches."""
-        pattern = f"{CacheKeyBuilder.PREFIX}:*{user_id}*"
-        await self.delete_pattern(pattern)
+        await self.invalidate(
+            keys=[
+                CacheKeyBuilder.user_profile(user_id),
+                CacheKeyBuilder.dashboard_stats(user_id),
+                CacheKeyBuilder.command_queue(user_id),
+                CacheKeyBuilder.hot_leads(user_id),
+                CacheKeyBuilder.followups_scheduled(user_id),
+                CacheKeyBuilder.followups_overdue(user_id),
+                CacheKeyBuilder.notifications_unread(user_id),
+            ],
+            tags=[CacheTags.user(user_id), CacheTags.user_leads(user_id)],
+            patterns=self._legacy_patterns(f"{CacheKeyBuilder.PREFIX}:*{user_id}*"),
+        )
         logger.info("User cache invalidated", user_id=user_id)
 
+    # ==================== TEAM CACHING ====================
+
+    async def cache_team(self, team_id: str, team_data: dict) -> bool:
+        """Cache team data."""
+        key = CacheKeyBuilder.team(team_id)
+        return await self.set(key, team_data, CacheConfig.TEAM_DATA_TTL, tags=[CacheTags.team(team_id)])
+
+    async def get_cached_team(self, team_id: str) -> Optional[dict]:
+        """Get cached team data."""
+        return await self.get(CacheKeyBuilder.team(team_id))
+
+    async def invalidate_team(self, team_id: str):
+        """Invalidate everything tagged with the team."""
+        await self.invalidate(keys=[CacheKeyBuilder.team(team_id)], tags=[CacheTags.team(team_id)])
+
     # ==================== NOTIFICATIONS CACHING ====================
 
     async def cache_unread_count(self, user_id: str, count: int) -> bool:
         """Cache unread notification count."""
         key = CacheKeyBuilder.notifications_unread(user_id)
-        return await self.set(key, {"count": count}, CacheConfig.LEAD_LIST_TTL)
+        return await self.set(key, {"count": count}, CacheConfig.LEAD_LIST_TTL, tags=[CacheTags.user(user_id)])
 
     async def get_cached_unread_count(self, user_id: str) -> Optional[int]:
         """Get cached unread count."""
@@ -424,30 +704,15 @@ class CacheService:
         window_seconds: int
     ) -> tuple[bool, int]:
         """
-        Check rate limit using sliding window.
+        Check rate limit (GCRA script, one round-trip; see app/core/rate_limit).
         Returns: (is_allowed, remaining_requests)
         """
-        key = CacheKeyBuilder.rate_limit(identifier, endpoint)
-        try:
-            current = await self.redis.get(key)
-
-            if current is None:
-                # First request
-                await self.redis.setex(key, window_seconds, 1)
-                return True, max_requests - 1
-
-            count = int(current)
-            if count >= max_requests:
-                # Rate limit exceeded
-                return False, 0
-
-            # Increment counter
-            await self.redis.incr(key)
-            return True, max_requests - count - 1
-
-        except RedisError as e:
-            logger.warning("Rate limit check failed", error=str(e))
-            return True, max_requests  # Fail open
+        if self._rate_limiter is None or self._rate_limiter.redis is not self.redis:
+            self._rate_limiter = RateLimiter(self.redis)
+        result = await self._rate_limiter.hit(
+            CacheKeyBuilder.rate_limit(identifier, endpoint), max_requests, window_seconds
+        )
+        return result.allowed, result.remaining
 
     async def get_rate_limit_reset(
         self,
@@ -468,54 +733,358 @@ class CacheService:
         self,
         key: str,
         factory: Callable,
-        ttl: int = CacheConfig.LEAD_DATA_TTL
+        ttl: int = CacheConfig.LEAD_DATA_TTL,
+        beta: float = CacheConfig.XFETCH_BETA,
+        tags: Optional[list[str]] = None,
     ) -> Any:
         """
-        Get from cache or compute and cache.
-        Includes lock to prevent cache stampede.
+        Get from cache or compute and cache, with single-flight semantics.
+
+        - In-process: one computation per key; concurrent callers await
+          the same future (coalesced)
+        - Across workers: a Redis lock elects one computing worker; the
+          others poll with bounded backoff until the value appears
+        - Hot keys: probabilistic early refresh (XFetch) recomputes shortly
+          before expiry, weighted by how long the computation takes, so
+          the key rarely expires under load
         """
-        # Try cache first
-        cached = await self.get(key)
-        if cached is not None:
-            return cached
-
-        # Acquire lock
-        lock_key = f"{key}:lock"
-        lock_acquired = await self.redis.set(
-            lock_key,
-            "1",
-            nx=True,
-            ex=self._lock_ttl
+        envelope = await self.get(key)
+        if isinstance(envelope, dict) and envelope.get(_XFETCH_MARKER):
+            value = envelope.get("value")
+            if not self._xfetch_due(envelope, beta):
+                self._flight_stats["hits"] += 1
+                return value
+            # Early refresh: one caller recomputes, everybody else keeps
+            # getting the (still valid) cached value
+            if key in self._inflight or not await self._acquire_lock(key):
+                self._flight_stats["hits"] += 1
+                return value
+            if key in self._inflight:  # Started while we took the lock
+                await self._release_lock(key)
+                self._flight_stats["hits"] += 1
+                return value
+            self._flight_stats["early_refreshes"] += 1
+            return await self._single_flight(
+                key, lambda: self._compute(key, factory, ttl, lock_held=True, tags=tags)
+            )
+
+        return await self._single_flight(
+            key, lambda: self._compute(key, factory, ttl, lock_held=False, tags=tags)
         )
 
-        if not lock_acquired:
-            # Another process is computing, wait and retry
-            await asyncio.sleep(0.1)
-            cached = await self.get(key)
-            if cached is not None:
-                return cached
+    @staticmethod
+    def _xfetch_due(envelope: dict, beta: float) -> bool:
+        """XFetch: refresh if now - delta * beta * ln(rand) >= expiry."""
+        if beta <= 0:
+            return False
+        delta = envelope.get("delta", 0.0)
+        expiry = envelope.get("expiry", 0.0)
+        return time.time() - delta * beta * math.log(random.random() or 1e-12) >= expiry
 
-        try:
-            # Compute value
-            if asyncio.iscoroutinefunction(factory):
-                value = await factory()
-            else:
-                value = factory()
+    async def _single_flight(self, key: str, compute: Callable) -> Any:
+        """
+        Run compute once per key per process; others share the result.
 
-            # Cache result
-            await self.set(key, value, ttl)
+        The computation runs as its own task: a cancelled caller (e.g. a
+        client disconnect) only stops waiting, the coalesced callers
+        still get the value.
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self._flight_stats["coalesced"] += 1
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(compute())
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._flight_done(key, done))
+        return await asyncio.shield(task)
+
+    def _flight_done(self, key: str, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Mark retrieved when nobody else is waiting
+
+    async def _compute(
+        self,
+        key: str,
+        factory: Callable,
+        ttl: int,
+        lock_held: bool,
+        tags: Optional[list[str]] = None,
+    ) -> Any:
+        """Compute under the cross-worker lock (or wait for its holder)."""
+        if not lock_held:
+            lock_held = await self._acquire_lock(key)
+            if not lock_held:
+                envelope = await self._wait_for_value(key)
+                if envelope is not None:
+                    self._flight_stats["waited"] += 1
+                    return envelope.get("value")
+                # Holder is slow or died; compute ourselves
+                self._flight_stats["wait_timeouts"] += 1
+
+        try:
+            started = time.monotonic()
+            value = await self._call_factory(factory)
+            delta = time.monotonic() - started
+            self._flight_stats["computed"] += 1
+            if value is not None:
+                await self.set(key, {
+                    _XFETCH_MARKER: 1,
+                    "value": value,
+                    "delta": round(delta, 4),
+                    "expiry": time.time() + ttl,
+                }, ttl, tags=tags)
             return value
         finally:
-            # Release lock
-            await self.redis.delete(lock_key)
+            if lock_held:
+                await self._release_lock(key)
+
+    async def _acquire_lock(self, key: str) -> bool:
+        try:
+            return bool(await self.redis.set(
+                f"{key}:lock", self.instance_id, nx=True, ex=self._lock_ttl
+            ))
+        except RedisError as e:
+            # Without Redis we still coalesce in-process
+            logger.warning("Cache lock failed", key=key, error=str(e))
+            return False
+
+    async def _release_lock(self, key: str) -> None:
+        try:
+            await self.redis.eval(_RELEASE_LOCK_SCRIPT, 1, f"{key}:lock", self.instance_id)
+        except RedisError as e:
+            logger.warning("Cache lock release failed", key=key, error=str(e))
+
+    async def _wait_for_value(self, key: str) -> Optional[dict]:
+        """Poll for a value computed by another worker (bounded backoff)."""
+        deadline = time.monotonic() + CacheConfig.LOCK_WAIT_TIMEOUT
+        delay = CacheConfig.LOCK_BACKOFF_START
+        while time.monotonic() < deadline:
+            await asyncio.sleep(delay)
+            envelope = await self.get(key)
+            if isinstance(envelope, dict) and envelope.get(_XFETCH_MARKER):
+                return envelope
+            try:
+                if not await self.redis.exists(f"{key}:lock"):
+                    # Holder finished without caching (None or error)
+                    return None
+            except RedisError:
+                return None
+            delay = min(delay * 2, CacheConfig.LOCK_BACKOFF_MAX)
+        return None
+
+    # ==================== STALE-WHILE-REVALIDATE ====================
+
+    async def set_swr(
+        self,
+        key: str,
+        value: Any,
+        ttl: int,
+        grace: int = CacheConfig.SWR_GRACE_SECONDS,
+        jitter: float = CacheConfig.TTL_JITTER,
+        tags: Optional[list[str]] = None,
+    ) -> bool:
+        """
+        Store value in an envelope that records when it was computed.
+
+        The value is fresh for a jittered TTL and kept in Redis for an
+        additional grace window in which it may be served stale.
+        """
+        fresh_for = jittered_ttl(ttl, jitter)
+        envelope = {
+            _SWR_MARKER: 1,
+            "value": value,
+            "stored_at": time.time(),
+            "ttl": fresh_for,
+        }
+        stored = await self.set(key, envelope, fresh_for + grace, tags=tags)
+        # Peers may hold the previous envelope in L1
+        await self._publish_invalidation([key], [])
+        return stored
+
+    async def get_with_swr(
+        self,
+        key: str,
+        factory: Callable,
+        ttl: int,
+        grace: int = CacheConfig.SWR_GRACE_SECONDS,
+        jitter: float = CacheConfig.TTL_JITTER,
+        tags: Optional[list[str]] = None,
+    ) -> tuple[Any, dict]:
+        """
+        Get with stale-while-revalidate semantics.
+
+        - Fresh hit: return cached value
+        - Stale hit (within grace): return cached value immediately and
+          start one background refresh (per process and across workers)
+        - Miss: compute, cache and return
+
+        Returns:
+            (value, meta) where meta has status ("fresh"/"stale"/"miss"),
+            age_seconds, stale_seconds and refreshing.
+        """
+        envelope = await self.get(key)
+        if isinstance(envelope, dict) and envelope.get(_SWR_MARKER):
+            age = max(0.0, time.time() - envelope.get("stored_at", 0))
+            fresh_for = envelope.get("ttl", ttl)
+            if age <= fresh_for:
+                return unwrap_swr(envelope), self._swr_meta("fresh", age, fresh_for)
+            refreshing = await self._schedule_refresh(key, factory, ttl, grace, jitter, tags)
+            return unwrap_swr(envelope), self._swr_meta("stale", age, fresh_for, refreshing)
+
+        value = await self._call_factory(factory)
+        if value is not None:
+            await self.set_swr(key, value, ttl, grace, jitter, tags)
+        return value, self._swr_meta("miss", 0.0, ttl)
+
+    @staticmethod
+    def _swr_meta(status: str, age: float, fresh_for: float, refreshing: bool = False) -> dict:
+        return {
+            "status": status,
+            "age_seconds": round(age, 1),
+            "stale_seconds": round(max(0.0, age - fresh_for), 1),
+            "refreshing": refreshing,
+        }
+
+    @staticmethod
+    async def _call_factory(factory: Callable) -> Any:
+        if asyncio.iscoroutinefunction(factory):
+            return await factory()
+        result = factory()
+        if asyncio.iscoroutine(result):
+            return await result
+        return result
+
+    async def _schedule_refresh(
+        self,
+        key: str,
+        factory: Callable,
+        ttl: int,
+        grace: int,
+        jitter: float,
+        tags: Optional[list[str]] = None,
+    ) -> bool:
+        """Start a background refresh unless one is already running."""
+        task = self._refresh_tasks.get(key)
+        if task is not None and not task.done():
+            return True
+
+        # Lock expires on its own; it also throttles refreshes that fail
+        try:
+            acquired = await self.redis.set(
+                f"{key}:refresh", self.instance_id, nx=True, ex=CacheConfig.REFRESH_LOCK_TTL
+            )
+        except RedisError as e:
+            logger.warning("Refresh lock failed", key=key, error=str(e))
+            return False
+        if not acquired:
+            return True
+
+        async def refresh():
+            try:
+                value = await self._call_factory(factory)
+                if value is not None:
+                    await self.set_swr(key, value, ttl, grace, jitter, tags)
+            except Exception as e:
+                logger.warning("Background cache refresh failed", key=key, error=str(e))
+
+        task = asyncio.create_task(refresh())
+        self._refresh_tasks[key] = task
+        task.add_done_callback(lambda _t: self._refresh_tasks.pop(key, None))
+        return True
+
+    # ==================== CROSS-WORKER INVALIDATION ====================
+
+    def _apply_local_invalidation(self, keys: list[str], patterns: list[str]) -> int:
+        """Drop keys/patterns from this worker's L1."""
+        if self.l1 is None:
+            return 0
+        removed = sum(1 for key in keys if self.l1.delete(key))
+        for pattern in patterns:
+            removed += self.l1.delete_pattern(pattern)
+        return removed
+
+    async def _publish_invalidation(self, keys: list[str], patterns: list[str]) -> None:
+        """Tell other workers to drop the same keys from their L1."""
+        if self.l1 is None or not (keys or patterns):
+            return
+        message = json.dumps({
+            "origin": self.instance_id,
+            "keys": keys,
+            "patterns": patterns,
+        })
+        try:
+            await self.redis.publish(CacheConfig.INVALIDATION_CHANNEL, message)
+            self._pubsub_stats["published"] += 1
+        except RedisError as e:
+            # Peers fall back to the L1 TTL bound
+            logger.warning("Cache invalidation publish failed", error=str(e))
+
+    def handle_invalidation_message(self, data: str) -> int:
+        """Apply an invalidation message from another worker."""
+        try:
+            payload = json.loads(data)
+        except (TypeError, json.JSONDecodeError):
+            return 0
+        self._pubsub_stats["received"] += 1
+        if payload.get("origin") == self.instance_id:
+            return 0
+        removed = self._apply_local_invalidation(
+            payload.get("keys") or [],
+            payload.get("patterns") or [],
+        )
+        self._pubsub_stats["applied"] += 1
+        return removed
+
+    async def _listen_invalidations(self) -> None:
+        """Background task: consume invalidations; resubscribe on errors."""
+        backoff = 1
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(CacheConfig.INVALIDATION_CHANNEL)
+                backoff = 1
+                async for message in pubsub.listen():
+                    if message and message.get("type") == "message":
+                        self.handle_invalidation_message(message.get("data"))
+            except asyncio.CancelledError:
+                raise
+            except (RedisError, OSError) as e:
+                # Missed messages while disconnected: drop L1 to stay safe
+                logger.warning("Cache invalidation listener failed", error=str(e))
+                if self.l1 is not None:
+                    self.l1.clear()
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
 
     # ==================== METRICS ====================
 
+    def tier_stats(self) -> dict:
+        """Per-tier hit/miss/eviction counters for this worker."""
+        l2_lookups = self._l2_stats["hits"] + self._l2_stats["misses"]
+        return {
+            "l1": self.l1.stats() if self.l1 is not None else {"enabled": False},
+            "l2": {
+                **self._l2_stats,
+                "hit_rate": round(self._l2_stats["hits"] / l2_lookups * 100, 2) if l2_lookups else 0.0,
+            },
+            "invalidation": dict(self._pubsub_stats),
+            "single_flight": dict(self._flight_stats),
+        }
+
     async def get_stats(self) -> dict:
         """Get cache statistics."""
         try:
             info = await self.redis.info()
             return {
+                "tiers": self.tier_stats(),
                 "connected_clients": info.get("connected_clients", 0),
                 "used_memory_human": info.get("used_memory_human", "0B"),
                 "total_keys": await self.redis.dbsize(),
@@ -529,7 +1098,7 @@ class CacheService:
             }
         except RedisError as e:
             logger.error("Failed to get cache stats", error=str(e))
-            return {}
+            return {"tiers": self.tier_stats()}
 
 # ==================== DECORATOR ====================
 
@@ -579,7 +1148,25 @@ async def get_cache_service() -> CacheService:
     global _cache_service
     if _cache_service is None:
         from app.core.config import get_settings
-        _cache_service = CacheService(get_settings().redis_url)
+        settings = get_settings()
+        l1 = LocalCache(
+            max_entries=settings.cache_l1_max_entries,
+            max_bytes=settings.cache_l1_max_mb * 1024 * 1024,
+            default_ttl=settings.cache_l1_ttl,
+            name="l1",
+        )
+        _cache_service = CacheService(
+            settings.redis_url,
+            max_connections=settings.redis_max_connections,
+            l1=l1,
+            l1_enabled=settings.cache_l1_enabled,
+            pattern_fallback=settings.cache_pattern_fallback,
+            codec=CacheCodec(
+                serializer=settings.cache_codec,
+                compression=settings.cache_compression,
+                compress_min_bytes=settings.cache_compress_min_bytes,
+            ),
+        )
         await _cache_service.connect()
     return _cache_service
 
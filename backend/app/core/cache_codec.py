@@ -0,0 +1,204 @@
+"""
+============================================
+📦 SALESFLOW AI - CACHE CODEC
+============================================
+
+Pluggable (de)serialization for cached payloads:
+
+- Serializers: orjson, msgpack, json (stdlib fallback)
+- Optional compression above a size threshold: zstd, lz4, zlib
+- 4-byte format header, so entries written with another codec (or
+  plain JSON from before the header existed) can still be read
+
+Header layout:
+    b"\\xfe" MAGIC | b"\\x01" VERSION | serializer id | compression id
+"""
+
+import json
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None  # type: ignore
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None  # type: ignore
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None  # type: ignore
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover - optional dependency
+    lz4_frame = None  # type: ignore
+
+
+class CodecConfig:
+    """Codec defaults."""
+
+    MAGIC = b"\xfe"
+    VERSION = b"\x01"
+    HEADER_SIZE = 4
+
+    SERIALIZER = "auto"           # orjson > json
+    COMPRESSION = "auto"          # zstd > lz4 > zlib
+    COMPRESS_MIN_BYTES = 4096     # Small payloads aren't worth compressing
+    ZLIB_LEVEL = 1
+    ZSTD_LEVEL = 3
+
+
+class CodecError(ValueError):
+    """Payload can't be decoded (unknown format or missing library)."""
+
+
+def _json_dumps(value: Any) -> bytes:
+    return json.dumps(value, default=str, separators=(",", ":")).encode("utf-8")
+
+
+def _json_loads(data: bytes) -> Any:
+    return json.loads(data)
+
+
+def _orjson_dumps(value: Any) -> bytes:
+    return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _msgpack_dumps(value: Any) -> bytes:
+    return msgpack.packb(value, default=str, use_bin_type=True)
+
+
+def _msgpack_loads(data: bytes) -> Any:
+    return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+# id -> (name, dumps, loads, available)
+_SERIALIZERS: Dict[bytes, Tuple[str, Callable, Callable, bool]] = {
+    b"j": ("json", _json_dumps, _json_loads, True),
+    b"o": ("orjson", _orjson_dumps, lambda d: orjson.loads(d), orjson is not None),
+    b"m": ("msgpack", _msgpack_dumps, _msgpack_loads, msgpack is not None),
+}
+
+# id -> (name, compress, decompress, available)
+_COMPRESSORS: Dict[bytes, Tuple[str, Optional[Callable], Optional[Callable], bool]] = {
+    b"-": ("none", None, None, True),
+    b"z": (
+        "zstd",
+        lambda d: zstandard.ZstdCompressor(level=CodecConfig.ZSTD_LEVEL).compress(d),
+        lambda d: zstandard.ZstdDecompressor().decompress(d),
+        zstandard is not None,
+    ),
+    b"l": (
+        "lz4",
+        lambda d: lz4_frame.compress(d),
+        lambda d: lz4_frame.decompress(d),
+        lz4_frame is not None,
+    ),
+    b"g": (
+        "zlib",
+        lambda d: zlib.compress(d, CodecConfig.ZLIB_LEVEL),
+        zlib.decompress,
+        True,
+    ),
+}
+
+
+def _resolve(table: dict, name: str, preference: Tuple[str, ...]) -> bytes:
+    """Map a configured name (or "auto") to an available format id."""
+    by_name = {entry[0]: (fid, entry[3]) for fid, entry in table.items()}
+    candidates = preference if name == "auto" else (name,)
+    for candidate in candidates:
+        if candidate not in by_name:
+            raise ValueError(f"Unknown cache codec component: {candidate}")
+        fid, available = by_name[candidate]
+        if available:
+            return fid
+    if name != "auto":
+        raise ValueError(f"Cache codec component not installed: {name}")
+    return next(iter(table))
+
+
+def available_codecs() -> dict:
+    """Installed serializers and compressors (for diagnostics/benchmarks)."""
+    return {
+        "serializers": [e[0] for e in _SERIALIZERS.values() if e[3]],
+        "compressors": [e[0] for e in _COMPRESSORS.values() if e[3]],
+    }
+
+
+class CacheCodec:
+    """
+    Encode/decode cache payloads with a self-describing header.
+
+    Usage:
+        codec = CacheCodec(serializer="orjson", compression="zstd")
+        blob = codec.encode({"leads": [...]})
+        codec.decode(blob)
+
+    Args:
+        serializer: "auto", "orjson", "msgpack" or "json".
+        compression: "auto", "zstd", "lz4", "zlib" or "none".
+        compress_min_bytes: Only compress serialized payloads at least
+            this large (0 compresses everything).
+    """
+
+    def __init__(
+        self,
+        serializer: str = CodecConfig.SERIALIZER,
+        compression: str = CodecConfig.COMPRESSION,
+        compress_min_bytes: int = CodecConfig.COMPRESS_MIN_BYTES,
+    ):
+        self.serializer_id = _resolve(_SERIALIZERS, serializer, ("orjson", "json"))
+        self.compression_id = _resolve(_COMPRESSORS, compression, ("zstd", "lz4", "zlib"))
+        self.compress_min_bytes = compress_min_bytes
+
+    @property
+    def name(self) -> str:
+        return f"{_SERIALIZERS[self.serializer_id][0]}+{_COMPRESSORS[self.compression_id][0]}"
+
+    def encode(self, value: Any) -> bytes:
+        """Serialize (and maybe compress) value, prefixed with the header."""
+        body = _SERIALIZERS[self.serializer_id][1](value)
+        compression_id = b"-"
+        if self.compression_id != b"-" and len(body) >= self.compress_min_bytes:
+            compressed = _COMPRESSORS[self.compression_id][1](body)
+            if len(compressed) < len(body):
+                body, compression_id = compressed, self.compression_id
+        return CodecConfig.MAGIC + CodecConfig.VERSION + self.serializer_id + compression_id + body
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        """Decode any supported format; header-less data is legacy JSON."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if not data.startswith(CodecConfig.MAGIC):
+            try:
+                return json.loads(data)
+            except json.JSONDecodeError:
+                return data.decode("utf-8", errors="replace")
+
+        if len(data) < CodecConfig.HEADER_SIZE or data[1:2] != CodecConfig.VERSION:
+            raise CodecError("Unsupported cache payload header")
+        serializer = _SERIALIZERS.get(data[2:3])
+        compressor = _COMPRESSORS.get(data[3:4])
+        if serializer is None or compressor is None:
+            raise CodecError("Unknown cache payload format")
+        if not (serializer[3] and compressor[3]):
+            raise CodecError(f"Codec not installed: {serializer[0]}+{compressor[0]}")
+
+        body = data[CodecConfig.HEADER_SIZE:]
+        if compressor[2] is not None:
+            body = compressor[2](body)
+        return serializer[2](body)
+
+
+__all__ = [
+    "CacheCodec",
+    "CodecConfig",
+    "CodecError",
+    "available_codecs",
+]
@@ -12,6 +12,8 @@ from dotenv import load_dotenv
 from fastapi import Header, HTTPException
 from supabase import Client, create_client
 
+from app.db.routing import DbRole, current_role, replica_router
+
 
 # Lade .env Datei aus dem backend/ Verzeichnis
 backend_dir = Path(__file__).parent.parent.parent
@@ -69,7 +71,8 @@ async def get_supabase() -> Client:
         # Die Supabase-Bibliothek verwendet intern httpx, das automatisch Proxy-Umgebungsvariablen
         # lesen könnte. Falls das ein Problem ist, müssen die Proxy-Umgebungsvariablen
         # deaktiviert werden (NO_PROXY=* oder explizite Proxy-Deaktivierung).
-        _supabase_client = create_client(url, key)
+        from app.services.job_telemetry import instrument_supabase_client  # Job telemetry: DB query count
+        _supabase_client = instrument_supabase_client(create_client(url, key))
         return _supabase_client
     except TypeError as exc:
         # Spezifischer Fehler für falsche Parameter
@@ -99,6 +102,28 @@ async def get_supabase() -> Client:
         ) from exc
 
 
+async def get_supabase_read() -> Client:
+    """
+    Supabase-Client für lesende Endpoints (Dashboards, Listen, Reports).
+
+    Folgt dem Replica-Routing (siehe app/db/routing.py): GET-Requests ohne
+    kürzlichen eigenen Write und Replica-Jobs lesen über den Replica-Client
+    aus app.supabase_client.get_supabase_read_client, alles andere über den
+    Primary. Ohne konfigurierte Replica identisch mit `get_supabase`.
+    """
+    if current_role() != DbRole.REPLICA:
+        replica_router.record(DbRole.PRIMARY, "sessions")
+        return await get_supabase()
+
+    from app.supabase_client import SupabaseNotConfiguredError, get_supabase_read_client
+
+    replica_router.record(DbRole.REPLICA, "sessions")
+    try:
+        return get_supabase_read_client()
+    except SupabaseNotConfiguredError as exc:
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+
 async def get_current_user(
     x_org_id: Optional[str] = Header(default=None, alias="X-Org-Id"),
     x_user_id: Optional[str] = Header(default=None, alias="X-User-Id"),
@@ -134,6 +159,6 @@ async def get_current_user(
     }
 
 
-__all__ = ["get_supabase", "get_current_user"]
+__all__ = ["get_supabase", "get_supabase_read", "get_current_user"]
 
 
@@ -0,0 +1,416 @@
+"""
+============================================
+🧠 SALESFLOW AI - IN-PROCESS CACHE
+============================================
+
+Shared in-process cache primitive for everything that caches inside a
+worker (legacy helpers, AI profile cache, webhook rate limits, Redis L1):
+
+- Per-key TTL
+- Bounded by entry count AND approximate bytes
+- LRU or LFU eviction
+- Background expiry sweeping (expired keys don't wait for a read)
+- Prefix-indexed invalidation ("salesflow:leads:u1:" without a full scan)
+- Hit/miss/eviction/expiration counters
+
+When used as L1 in front of the Redis CacheService (L2), values are the
+serialized payloads so callers can never mutate a cached object in place.
+"""
+
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from threading import RLock
+from typing import Any, Dict, Optional, Set
+
+import structlog
+
+logger = structlog.get_logger()
+
+
+class LocalCacheConfig:
+    """Defaults for in-process caches."""
+
+    MAX_ENTRIES = 10_000
+    MAX_BYTES = 64 * 1024 * 1024      # 64 MB per worker
+    DEFAULT_TTL = 30                  # seconds; keeps cross-worker staleness short
+    SWEEP_INTERVAL = 60               # seconds between background expiry sweeps
+    INDEX_SEPARATOR = ":"
+    INDEX_MAX_DEPTH = 4               # prefix levels kept in the index per key
+
+    POLICY_LRU = "lru"
+    POLICY_LFU = "lfu"
+
+
+@dataclass
+class _Entry:
+    value: Any
+    expires_at: float
+    size: int
+    freq: int = 1
+
+
+def estimate_size(value: Any, _depth: int = 0) -> int:
+    """
+    Cheap size estimate in bytes.
+
+    Exact for str/bytes payloads; for containers, walks up to three levels
+    deep so a cached list of dicts is not counted as a 56-byte list.
+    """
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    size = sys.getsizeof(value)
+    if _depth >= 3:
+        return size
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += estimate_size(item, _depth + 1)
+    return size
+
+
+class LocalCache:
+    """
+    Thread-safe bounded cache with per-key TTL and memory accounting.
+
+    Usage:
+        cache = LocalCache(max_entries=5000, max_bytes=32 * 1024 * 1024)
+        cache.set("lead:123", payload, ttl=30)
+        cache.get("lead:123")
+        cache.delete_prefix("lead:")
+
+    Args:
+        policy: "lru" (default) or "lfu". LFU keeps frequently read keys
+            under scan-like traffic; ties are broken by recency.
+        sweep_interval: Seconds between background expiry sweeps
+            (None disables the sweeper, expired keys are then dropped on
+            read or eviction only).
+        index_separator: Separator used for the prefix index
+            (None disables the index; prefix deletes then scan).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = LocalCacheConfig.MAX_ENTRIES,
+        max_bytes: int = LocalCacheConfig.MAX_BYTES,
+        default_ttl: float = LocalCacheConfig.DEFAULT_TTL,
+        name: str = "l1",
+        policy: str = LocalCacheConfig.POLICY_LRU,
+        sweep_interval: Optional[float] = LocalCacheConfig.SWEEP_INTERVAL,
+        index_separator: Optional[str] = LocalCacheConfig.INDEX_SEPARATOR,
+    ):
+        if policy not in (LocalCacheConfig.POLICY_LRU, LocalCacheConfig.POLICY_LFU):
+            raise ValueError(f"Unknown eviction policy: {policy}")
+
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.policy = policy
+        self.sweep_interval = sweep_interval
+        self.index_separator = index_separator
+
+        self._data: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = RLock()
+
+        # LFU bookkeeping: freq -> keys in recency order
+        self._freq_buckets: Dict[int, "OrderedDict[str, None]"] = {}
+        self._min_freq = 0
+
+        # Prefix index: "salesflow:leads:" -> {keys}
+        self._prefix_index: Dict[str, Set[str]] = {}
+
+        self._stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+            "sweeps": 0,
+        }
+
+        if sweep_interval:
+            _sweeper.register(self)
+
+    # ==================== BASIC OPERATIONS ====================
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get value if present and not expired (counts as a use)."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return default
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return default
+            self._touch(key, entry)
+            self._stats["hits"] += 1
+            return entry.value
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[float] = None,
+        size: Optional[int] = None,
+    ) -> bool:
+        """
+        Store value with TTL. Returns False if the value alone exceeds
+        the byte budget (it is then not cached).
+        """
+        size = estimate_size(value) if size is None else size
+        if size > self.max_bytes:
+            return False
+
+        ttl = self.default_ttl if ttl is None else ttl
+        with self._lock:
+            freq = 1
+            if key in self._data:
+                # Overwrite keeps the key's popularity under LFU
+                freq = self._data[key].freq
+                self._remove(key)
+            self._data[key] = _Entry(value, time.monotonic() + ttl, size, freq)
+            self._bytes += size
+            self._index_add(key)
+            if self.policy == LocalCacheConfig.POLICY_LFU:
+                self._freq_buckets.setdefault(freq, OrderedDict())[key] = None
+                if freq < self._min_freq or len(self._data) == 1:
+                    self._min_freq = freq
+            self._stats["sets"] += 1
+            self._evict()
+        return True
+
+    def delete(self, key: str) -> bool:
+        """Remove a key; True if it was present."""
+        with self._lock:
+            if key not in self._data:
+                return False
+            self._remove(key)
+            self._stats["invalidations"] += 1
+            return True
+
+    def delete_prefix(self, prefix: str) -> int:
+        """
+        Remove all keys starting with prefix.
+
+        Prefixes ending on the index separator (e.g. "salesflow:leads:u1:")
+        are resolved through the prefix index; others fall back to a scan.
+        """
+        with self._lock:
+            if self._is_indexed_prefix(prefix):
+                keys = list(self._prefix_index.get(prefix, ()))
+            else:
+                keys = [k for k in self._data if k.startswith(prefix)]
+            for key in keys:
+                self._remove(key)
+            self._stats["invalidations"] += len(keys)
+            return len(keys)
+
+    def delete_pattern(self, pattern: str) -> int:
+        """Remove all keys matching a Redis-style glob pattern."""
+        if pattern.endswith("*") and not any(c in pattern[:-1] for c in "*?["):
+            return self.delete_prefix(pattern[:-1])
+        with self._lock:
+            keys = [k for k in self._data if fnmatchcase(k, pattern)]
+            for key in keys:
+                self._remove(key)
+            self._stats["invalidations"] += len(keys)
+            return len(keys)
+
+    def clear(self) -> int:
+        """Remove everything; returns number of removed entries."""
+        with self._lock:
+            count = len(self._data)
+            self._data.clear()
+            self._freq_buckets.clear()
+            self._prefix_index.clear()
+            self._min_freq = 0
+            self._bytes = 0
+            return count
+
+    def sweep(self) -> int:
+        """Drop all expired entries; returns number removed."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [k for k, e in self._data.items() if e.expires_at <= now]
+            for key in expired:
+                self._remove(key)
+            self._stats["expirations"] += len(expired)
+            self._stats["sweeps"] += 1
+            return len(expired)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry.expires_at > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    # ==================== INTERNALS ====================
+
+    def _touch(self, key: str, entry: _Entry) -> None:
+        """Record a use for the eviction policy."""
+        self._data.move_to_end(key)
+        if self.policy != LocalCacheConfig.POLICY_LFU:
+            return
+        bucket = self._freq_buckets[entry.freq]
+        del bucket[key]
+        if not bucket:
+            del self._freq_buckets[entry.freq]
+            if self._min_freq == entry.freq:
+                self._min_freq = entry.freq + 1
+        entry.freq += 1
+        self._freq_buckets.setdefault(entry.freq, OrderedDict())[key] = None
+
+    def _remove(self, key: str) -> None:
+        entry = self._data.pop(key)
+        self._bytes -= entry.size
+        self._index_remove(key)
+        if self.policy == LocalCacheConfig.POLICY_LFU:
+            bucket = self._freq_buckets.get(entry.freq)
+            if bucket is not None:
+                bucket.pop(key, None)
+                if not bucket:
+                    del self._freq_buckets[entry.freq]
+
+    def _victim(self) -> str:
+        """Key to evict next under the configured policy."""
+        if self.policy == LocalCacheConfig.POLICY_LFU and self._freq_buckets:
+            if self._min_freq not in self._freq_buckets:
+                self._min_freq = min(self._freq_buckets)
+            return next(iter(self._freq_buckets[self._min_freq]))
+        return next(iter(self._data))
+
+    def _evict(self) -> None:
+        """Drop entries until within budget (expired ones first)."""
+        if len(self._data) <= self.max_entries and self._bytes <= self.max_bytes:
+            return
+        self.sweep()
+        while self._data and (
+            len(self._data) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            self._remove(self._victim())
+            self._stats["evictions"] += 1
+
+    # ==================== PREFIX INDEX ====================
+
+    def _prefixes(self, key: str):
+        sep = self.index_separator
+        start = 0
+        for _ in range(LocalCacheConfig.INDEX_MAX_DEPTH):
+            pos = key.find(sep, start)
+            if pos < 0:
+                return
+            yield key[:pos + len(sep)]
+            start = pos + len(sep)
+
+    def _is_indexed_prefix(self, prefix: str) -> bool:
+        sep = self.index_separator
+        return bool(sep) and prefix.endswith(sep) and (
+            prefix.count(sep) <= LocalCacheConfig.INDEX_MAX_DEPTH
+        )
+
+    def _index_add(self, key: str) -> None:
+        if not self.index_separator:
+            return
+        for prefix in self._prefixes(key):
+            self._prefix_index.setdefault(prefix, set()).add(key)
+
+    def _index_remove(self, key: str) -> None:
+        if not self.index_separator:
+            return
+        for prefix in self._prefixes(key):
+            keys = self._prefix_index.get(prefix)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._prefix_index[prefix]
+
+    # ==================== METRICS ====================
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def stats(self) -> dict:
+        """Counters plus current size."""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "name": self.name,
+                "policy": self.policy,
+                **self._stats,
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hit_rate": round(self._stats["hits"] / lookups * 100, 2) if lookups else 0.0,
+            }
+
+
+# ==================== BACKGROUND SWEEPER ====================
+
+class _Sweeper:
+    """
+    One daemon thread per process that sweeps expired entries from all
+    registered caches. Caches are held weakly, so short-lived caches
+    (tests, per-request helpers) are not kept alive by the sweeper.
+    """
+
+    TICK_SECONDS = 5.0
+
+    def __init__(self):
+        self._next_run: "weakref.WeakKeyDictionary[LocalCache, float]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, cache: LocalCache) -> None:
+        with self._lock:
+            self._next_run[cache] = time.monotonic() + cache.sweep_interval
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="local-cache-sweeper", daemon=True
+                )
+                self._thread.start()
+
+    def run_once(self) -> int:
+        """Sweep all caches that are due; returns removed entries."""
+        now = time.monotonic()
+        with self._lock:
+            due = [c for c, next_run in self._next_run.items() if next_run <= now]
+            for cache in due:
+                self._next_run[cache] = now + cache.sweep_interval
+        removed = 0
+        for cache in due:
+            try:
+                removed += cache.sweep()
+            except Exception as e:  # Never let the sweeper thread die
+                logger.warning("Local cache sweep failed", cache=cache.name, error=str(e))
+        return removed
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.TICK_SECONDS)
+            self.run_once()
+
+
+_sweeper = _Sweeper()
+
+
+__all__ = [
+    "LocalCache",
+    "LocalCacheConfig",
+    "estimate_size",
+]
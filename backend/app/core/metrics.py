@@ -6,7 +6,8 @@ Custom metrics for application monitoring:
 - HTTP request metrics
 - Business metrics (leads, followups)
 - Cache metrics
-- Database metrics
+- Database metrics (per pool: primary/replica)
+- Scheduler job telemetry (duration/throughput percentiles, error rate)
 """
 
 import time
@@ -154,6 +155,30 @@ cache_misses_total = Counter(
     ['cache_type']
 )
 
+cache_tier_events = Gauge(
+    'cache_tier_events',
+    'Cache events per tier since startup (per worker)',
+    ['tier', 'event']  # l1/l2 x hits, misses, evictions, expirations, ...
+)
+
+cache_tier_size = Gauge(
+    'cache_tier_size',
+    'In-process cache size (per worker)',
+    ['tier', 'unit']  # entries, bytes
+)
+
+cache_single_flight = Gauge(
+    'cache_single_flight',
+    'get_or_set outcomes since startup (per worker)',
+    ['event']  # hits, computed, coalesced, waited, wait_timeouts, early_refreshes
+)
+
+cache_warm_events = Gauge(
+    'cache_warm_events',
+    'Cache warming outcomes since startup (per worker)',
+    ['view', 'event']  # dashboard/command_queue/... x warmed, failed, used
+)
+
 cache_operations_duration_seconds = Histogram(
     'cache_operations_duration_seconds',
     'Cache operation duration',
@@ -173,6 +198,18 @@ db_connections_active = Gauge(
     'Active database connections'
 )
 
+db_pool_connections = Gauge(
+    'db_pool_connections',
+    'Database pool connections by pool (primary/replica)',
+    ['pool', 'state']  # size, checked_in, checked_out, overflow
+)
+
+db_routed_sessions = Gauge(
+    'db_routed_sessions',
+    'Sessions/clients handed out per pool since startup',
+    ['pool', 'event']  # sessions, errors, sticky_redirects, fallbacks
+)
+
 db_query_duration_seconds = Histogram(
     'db_query_duration_seconds',
     'Database query duration',
@@ -201,6 +238,50 @@ ai_tokens_used_total = Counter(
     ['model', 'type']  # prompt, completion
 )
 
+# ==================== JOB METRICS ====================
+
+job_runs = Gauge(
+    'job_runs',
+    'Scheduler job runs in the telemetry window',
+    ['job', 'status']  # succeeded, failed
+)
+
+job_duration_seconds = Gauge(
+    'job_duration_seconds',
+    'Scheduler job run duration percentiles',
+    ['job', 'quantile']
+)
+
+job_items_per_second = Gauge(
+    'job_items_per_second',
+    'Scheduler job throughput percentiles',
+    ['job', 'quantile']
+)
+
+job_error_rate = Gauge(
+    'job_error_rate',
+    'Share of failed runs in the telemetry window',
+    ['job']
+)
+
+job_resource_usage = Gauge(
+    'job_resource_usage',
+    'Average DB queries / LLM calls per run',
+    ['job', 'resource']  # db_queries, llm_calls
+)
+
+job_overruns = Gauge(
+    'job_overruns',
+    'Runs longer than the job interval in the telemetry window',
+    ['job']
+)
+
+job_last_success_timestamp = Gauge(
+    'job_last_success_timestamp',
+    'Unix time of the last successful run',
+    ['job']
+)
+
 # ==================== MIDDLEWARE ====================
 
 class PrometheusMiddleware(BaseHTTPMiddleware):
@@ -371,6 +452,12 @@ def count_calls(metric: Counter, labels: dict = None):
 
 async def metrics_endpoint():
     """Generate Prometheus metrics."""
+    from app.core import cache
+
+    if cache._cache_service is not None:
+        collect_cache_metrics(cache._cache_service)
+    from app.services.job_telemetry import get_job_telemetry
+    collect_job_metrics(await get_job_telemetry().snapshot())
     return Response(
         content=generate_latest(REGISTRY),
         media_type=CONTENT_TYPE_LATEST
@@ -380,7 +467,7 @@ async def metrics_endpoint():
 # ==================== BUSINESS METRICS COLLECTOR ====================
 
 class BusinessMetricsCollector:
-    """Collect business metrics from database."""
+    """Collect business metrics from database (read replica if configured)."""
     
     def __init__(self, db_session):
         self.db = db_session
@@ -405,7 +492,7 @@ class BusinessMetricsCollector:
             GROUP BY status, priority
         """)
         
-        async with self.db.session() as session:
+        async with self.db.readonly_session() as session:
             result = await session.execute(query)
             for row in result:
                 leads_total.labels(
@@ -417,7 +504,7 @@ class BusinessMetricsCollector:
         """Collect follow-up metrics."""
         from sqlalchemy import text
         
-        async with self.db.session() as session:
+        async with self.db.readonly_session() as session:
             # Scheduled count
             scheduled = await session.execute(
                 text("SELECT COUNT(*) FROM followups WHERE status = 'scheduled'")
@@ -434,7 +521,7 @@ class BusinessMetricsCollector:
         """Collect user activity metrics."""
         from sqlalchemy import text
         
-        async with self.db.session() as session:
+        async with self.db.readonly_session() as session:
             # Daily active users
             daily = await session.execute(
                 text("""
@@ -454,6 +541,59 @@ class BusinessMetricsCollector:
             active_users.labels(period='weekly').set(weekly.scalar())
 
 
+def collect_db_pool_metrics(db_manager) -> None:
+    """Export per-pool connection stats and replica routing counters."""
+    stats = db_manager.pool_metrics()
+    for pool, values in stats["pools"].items():
+        for state in ("size", "checked_in", "checked_out", "overflow"):
+            if state in values:
+                db_pool_connections.labels(pool=pool, state=state).set(values[state])
+        for event in ("sessions", "errors", "sticky_redirects", "fallbacks"):
+            db_routed_sessions.labels(pool=pool, event=event).set(values.get(event, 0))
+
+
+def collect_cache_metrics(cache_service) -> None:
+    """Export per-tier cache counters (L1 in-process, L2 Redis) and warming outcomes."""
+    tiers = cache_service.tier_stats()
+    l1 = tiers["l1"]
+    if l1.get("enabled", True):
+        for event in ("hits", "misses", "evictions", "expirations", "invalidations"):
+            cache_tier_events.labels(tier="l1", event=event).set(l1.get(event, 0))
+        cache_tier_size.labels(tier="l1", unit="entries").set(l1.get("entries", 0))
+        cache_tier_size.labels(tier="l1", unit="bytes").set(l1.get("bytes", 0))
+    for event in ("hits", "misses", "errors"):
+        cache_tier_events.labels(tier="l2", event=event).set(tiers["l2"].get(event, 0))
+    for event, value in tiers.get("single_flight", {}).items():
+        cache_single_flight.labels(event=event).set(value)
+
+    from app.services.cache_warming import warm_counters
+    for view, counts in warm_counters().items():
+        for event, value in counts.items():
+            cache_warm_events.labels(view=view, event=event).set(value)
+
+
+def collect_job_metrics(snapshot: dict) -> None:
+    """Export scheduler job telemetry (JobTelemetry.snapshot())."""
+    for job, summary in snapshot["jobs"].items():
+        failed = round((summary["error_rate"] or 0) * summary["runs"])
+        job_runs.labels(job=job, status="succeeded").set(summary["runs"] - failed)
+        job_runs.labels(job=job, status="failed").set(failed)
+        job_error_rate.labels(job=job).set(summary["error_rate"] or 0)
+        job_overruns.labels(job=job).set(summary["overruns"])
+        for quantile, value in summary["duration_seconds"].items():
+            if value is not None:
+                job_duration_seconds.labels(job=job, quantile=quantile).set(value)
+        for quantile, value in summary["items_per_second"].items():
+            if value is not None:
+                job_items_per_second.labels(job=job, quantile=quantile).set(value)
+        for resource in ("db_queries", "llm_calls"):
+            value = summary[f"avg_{resource}"]
+            if value is not None:
+                job_resource_usage.labels(job=job, resource=resource).set(value)
+        if summary["last_success_at"]:
+            job_last_success_timestamp.labels(job=job).set(summary["last_success_at"])
+
+
 # ==================== INITIALIZATION ====================
 
 def init_metrics(app_version: str, environment: str):
@@ -1,16 +1,54 @@
 """
 Quota Manager
 Handles plan limits and usage tracking for SalesFlow.
+
+Hot path (check_quota / check_feature / check_and_consume) reads plan,
+limits and monthly usage from process-local caches. Counters are only
+written through Postgres functions (see 20251219_quota_atomic_rpc.sql):
+one round-trip per consume, atomic across workers, no lost updates.
+Billing changes call invalidate_user_plan(); other workers pick the new
+plan up after QuotaConfig.PLAN_TTL.
 """
 
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+from app.core.local_cache import LocalCache
 from app.supabase_client import get_supabase_client
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+class QuotaConfig:
+    """Quota cache settings"""
+
+    PLAN_TTL = 60           # users.plan_tier per user
+    LIMITS_TTL = 600        # plan_limits rows (change with deploys only)
+    USAGE_TTL = 30          # Monthly counters; authoritative check is the RPC
+    MAX_USERS = 50_000
+
+
+# Counters in user_quotas -> limit column in plan_limits (None = not capped)
+QUOTA_LIMIT_FIELDS: Dict[str, Optional[str]] = {
+    "vision_credits_used": "vision_credits_limit",
+    "voice_minutes_used": "voice_minutes_limit",
+    "message_improvements_used": "message_improvements_limit",
+    "ai_requests_count": None,
+    "ai_tokens_used": None,
+}
+
+_plan_cache = LocalCache(
+    name="quota_plans",
+    max_entries=QuotaConfig.MAX_USERS,
+    default_ttl=QuotaConfig.PLAN_TTL,
+)
+_usage_cache = LocalCache(
+    name="quota_usage",
+    max_entries=QuotaConfig.MAX_USERS,
+    default_ttl=QuotaConfig.USAGE_TTL,
+)
+
+
 # Plan configurations (fallback if DB not available)
 PLAN_CONFIGS = {
     "free": {
@@ -78,23 +116,33 @@ def get_current_month() -> str:
 
 
 def get_user_plan(user_id: str) -> str:
-    """Get user's current plan tier"""
+    """Get user's current plan tier (cached for QuotaConfig.PLAN_TTL)"""
+    cache_key = f"plan:{user_id}"
+    plan = _plan_cache.get(cache_key)
+    if plan is not None:
+        return plan
     try:
         supabase = get_supabase_client()
         result = supabase.table("users").select("plan_tier").eq("id", user_id).execute()
-        if result.data:
-            return result.data[0].get("plan_tier", "free")
+        plan = (result.data[0].get("plan_tier") if result.data else None) or "free"
+        _plan_cache.set(cache_key, plan)
+        return plan
     except Exception as e:
         logger.error(f"Error getting user plan: {e}")
     return "free"
 
 
 def get_plan_limits(plan_name: str) -> Dict[str, Any]:
-    """Get limits for a plan from DB or fallback config"""
+    """Get limits for a plan from DB (cached) or fallback config"""
+    cache_key = f"limits:{plan_name}"
+    limits = _plan_cache.get(cache_key)
+    if limits is not None:
+        return limits
     try:
         supabase = get_supabase_client()
         result = supabase.table("plan_limits").select("*").eq("plan_name", plan_name).execute()
         if result.data:
+            _plan_cache.set(cache_key, result.data[0], ttl=QuotaConfig.LIMITS_TTL)
             return result.data[0]
     except Exception as e:
         logger.error(f"Error getting plan limits from DB: {e}")
@@ -103,58 +151,86 @@ def get_plan_limits(plan_name: str) -> Dict[str, Any]:
     return PLAN_CONFIGS.get(plan_name, PLAN_CONFIGS["free"])
 
 
+def invalidate_user_plan(user_id: Optional[str] = None) -> None:
+    """
+    Drop cached plan (and usage) after a billing change.
+    Without user_id all cached plans are dropped.
+    """
+    if user_id:
+        _plan_cache.delete(f"plan:{user_id}")
+        _usage_cache.delete_prefix(f"usage:{user_id}:")
+    else:
+        _plan_cache.delete_prefix("plan:")
+
+
+def invalidate_plan_limits() -> None:
+    """Drop cached plan_limits rows (after editing plans)"""
+    _plan_cache.delete_prefix("limits:")
+
+
+def _empty_quota(user_id: str, month_year: str) -> Dict[str, Any]:
+    return {
+        "user_id": user_id,
+        "month_year": month_year,
+        **{field: 0 for field in QUOTA_LIMIT_FIELDS},
+    }
+
+
 def get_user_quota(user_id: str) -> Dict[str, int]:
-    """Get user's current month usage"""
+    """
+    Get user's current month usage (cached for QuotaConfig.USAGE_TTL).
+    The row itself is created by the first increment.
+    """
     month_year = get_current_month()
+    cache_key = f"usage:{user_id}:{month_year}"
+    quota = _usage_cache.get(cache_key)
+    if quota is not None:
+        return quota
     
     try:
         supabase = get_supabase_client()
         result = supabase.table("user_quotas").select("*").eq("user_id", user_id).eq("month_year", month_year).execute()
-        
-        if result.data:
-            return result.data[0]
-        
-        # Create new quota record for this month
-        new_quota = {
-            "user_id": user_id,
-            "month_year": month_year,
-            "vision_credits_used": 0,
-            "voice_minutes_used": 0,
-            "message_improvements_used": 0,
-            "ai_requests_count": 0,
-            "ai_tokens_used": 0,
-        }
-        supabase.table("user_quotas").insert(new_quota).execute()
-        return new_quota
+        quota = result.data[0] if result.data else _empty_quota(user_id, month_year)
+        _usage_cache.set(cache_key, quota)
+        return quota
         
     except Exception as e:
         logger.error(f"Error getting user quota: {e}")
-        return {
-            "vision_credits_used": 0,
-            "voice_minutes_used": 0,
-            "message_improvements_used": 0,
-        }
+        return _empty_quota(user_id, month_year)
+
+
+def _limit_for(limits: Dict[str, Any], quota_type: str) -> int:
+    """Plan limit for a counter (-1 = unlimited, uncapped counters are unlimited)"""
+    if quota_type in QUOTA_LIMIT_FIELDS:
+        limit_field = QUOTA_LIMIT_FIELDS[quota_type]
+        if limit_field is None:
+            return -1
+    else:
+        limit_field = quota_type.replace("_used", "_limit")
+    return limits.get(limit_field, 0)
+
+
+def _validate_amounts(amounts: Dict[str, int]) -> None:
+    unknown = [quota_type for quota_type in amounts if quota_type not in QUOTA_LIMIT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown quota type(s): {', '.join(unknown)}")
 
 
 def increment_quota(user_id: str, quota_type: str, amount: int = 1) -> bool:
-    """Increment a quota counter"""
+    """Increment a quota counter (single atomic upsert, no limit check)"""
+    _validate_amounts({quota_type: amount})
     month_year = get_current_month()
     
     try:
         supabase = get_supabase_client()
-        
-        # Ensure quota record exists
-        get_user_quota(user_id)
-        
-        # Get current value
-        result = supabase.table("user_quotas").select(quota_type).eq("user_id", user_id).eq("month_year", month_year).execute()
-        
+        result = supabase.rpc("increment_user_quota", {
+            "p_user_id": user_id,
+            "p_month_year": month_year,
+            "p_deltas": {quota_type: amount},
+        }).execute()
         if result.data:
-            current = result.data[0].get(quota_type, 0)
-            supabase.table("user_quotas").update({
-                quota_type: current + amount,
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            }).eq("user_id", user_id).eq("month_year", month_year).execute()
+            row = result.data[0] if isinstance(result.data, list) else result.data
+            _usage_cache.set(f"usage:{user_id}:{month_year}", row)
             return True
             
     except Exception as e:
@@ -163,9 +239,22 @@ def increment_quota(user_id: str, quota_type: str, amount: int = 1) -> bool:
     return False
 
 
+def _quota_status(current: int, limit: int, amount: int) -> Dict[str, Any]:
+    # -1 means unlimited
+    if limit == -1:
+        return {"allowed": True, "current": current, "limit": -1, "remaining": -1}
+    remaining = limit - current
+    return {
+        "allowed": remaining >= amount,
+        "current": current,
+        "limit": limit,
+        "remaining": max(0, remaining),
+    }
+
+
 def check_quota(user_id: str, quota_type: str, amount: int = 1) -> Dict[str, Any]:
     """
-    Check if user has enough quota for an action.
+    Check if user has enough quota for an action (does not consume).
     
     Returns:
         {
@@ -176,40 +265,82 @@ def check_quota(user_id: str, quota_type: str, amount: int = 1) -> Dict[str, Any
             "upgrade_required": False
         }
     """
-    plan = get_user_plan(user_id)
-    limits = get_plan_limits(plan)
+    limits = get_plan_limits(get_user_plan(user_id))
     quota = get_user_quota(user_id)
-    
-    # Map quota_type to limit field
-    limit_map = {
-        "vision_credits_used": "vision_credits_limit",
-        "voice_minutes_used": "voice_minutes_limit",
-        "message_improvements_used": "message_improvements_limit",
-    }
-    
-    limit_field = limit_map.get(quota_type, quota_type.replace("_used", "_limit"))
-    limit = limits.get(limit_field, 0)
-    current = quota.get(quota_type, 0)
-    
-    # -1 means unlimited
-    if limit == -1:
-        return {
-            "allowed": True,
-            "current": current,
-            "limit": -1,
-            "remaining": -1,
+    status = _quota_status(quota.get(quota_type, 0), _limit_for(limits, quota_type), amount)
+    status["upgrade_required"] = not status["allowed"]
+    return status
+
+
+def check_and_consume(user_id: str, amounts: Dict[str, int]) -> Dict[str, Any]:
+    """
+    Check and consume several counters at once, all-or-nothing.
+
+    Usage:
+        result = check_and_consume(user_id, {"vision_credits_used": len(files)})
+        if not result["allowed"]:
+            raise HTTPException(402, detail=result)
+
+    Denials visible in the cached usage return without a round-trip
+    (counters only grow within a month); everything else is decided by
+    consume_user_quota under a row lock.
+
+    Returns:
+        {
+            "allowed": True/False,
+            "denied": ["vision_credits_used"],
+            "quotas": {"vision_credits_used": {"allowed", "current", "limit", "remaining"}},
             "upgrade_required": False
         }
-    
-    remaining = limit - current
-    allowed = remaining >= amount
-    
+    """
+    _validate_amounts(amounts)
+    limits = get_plan_limits(get_user_plan(user_id))
+    caps = {quota_type: _limit_for(limits, quota_type) for quota_type in amounts}
+    month_year = get_current_month()
+    cache_key = f"usage:{user_id}:{month_year}"
+
+    cached = _usage_cache.get(cache_key)
+    if cached is not None:
+        quotas = {
+            quota_type: _quota_status(cached.get(quota_type, 0), caps[quota_type], amount)
+            for quota_type, amount in amounts.items()
+        }
+        if not all(status["allowed"] for status in quotas.values()):
+            return _consume_result(quotas)
+
+    try:
+        supabase = get_supabase_client()
+        result = supabase.rpc("consume_user_quota", {
+            "p_user_id": user_id,
+            "p_month_year": month_year,
+            "p_deltas": amounts,
+            "p_limits": caps,
+        }).execute()
+        outcome = result.data[0] if isinstance(result.data, list) else result.data
+        usage = outcome["usage"]
+        _usage_cache.set(cache_key, usage)
+    except Exception as e:
+        # Same policy as the lead/freebie checks: don't block users on infra errors
+        logger.error(f"Error consuming quota: {e}")
+        return {"allowed": True, "denied": [], "quotas": {}, "upgrade_required": False}
+
+    # On success usage already includes this request: report what is left
+    quotas = {
+        quota_type: _quota_status(
+            usage.get(quota_type, 0), caps[quota_type], 0 if outcome["allowed"] else amount
+        )
+        for quota_type, amount in amounts.items()
+    }
+    return _consume_result(quotas)
+
+
+def _consume_result(quotas: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    denied: List[str] = [quota_type for quota_type, status in quotas.items() if not status["allowed"]]
     return {
-        "allowed": allowed,
-        "current": current,
-        "limit": limit,
-        "remaining": max(0, remaining),
-        "upgrade_required": not allowed
+        "allowed": not denied,
+        "denied": denied,
+        "quotas": quotas,
+        "upgrade_required": bool(denied),
     }
 
 
@@ -0,0 +1,291 @@
+"""
+============================================
+🚦 SALESFLOW AI - RATE LIMIT ENGINE
+============================================
+
+One rate-limit engine for the middleware, the `rate_limit` decorators
+and CacheService.check_rate_limit:
+
+- GCRA (generic cell rate algorithm): one Redis key per client holding
+  the "theoretical arrival time", checked and updated by a server-side
+  Lua script -> one round-trip, atomic across workers
+- Local lease: while a client is clearly below its limit, a hit reserves
+  a small batch of requests in Redis and the following requests are
+  admitted in-process without a round-trip
+- In-process GCRA fallback (bounded LRU) when Redis is unavailable,
+  with a short back-off before Redis is tried again
+
+GCRA with burst == limit behaves like a sliding window of `limit`
+requests per `period`, and exactly like a token bucket of size `burst`
+refilled at `limit / period` tokens per second.
+"""
+
+import math
+import time
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import structlog
+from redis.exceptions import RedisError
+
+from app.core.local_cache import LocalCache
+
+logger = structlog.get_logger()
+
+
+class RateLimitEngineConfig:
+    """Rate limit engine defaults."""
+
+    LEASE_FRACTION = 0.05         # Reserve up to 5% of the limit per round-trip
+    LEASE_MIN_HEADROOM = 0.5      # ...only while at least half the limit is left
+    LEASE_TTL = 1.0               # Unused reserved requests expire after this
+    REDIS_RETRY_SECONDS = 5.0     # Back-off before using Redis again after an error
+    FALLBACK_MAX_KEYS = 100_000   # Bound for the in-process fallback state
+    LOCAL_MAX_KEYS = 50_000       # Bound for the lease table
+
+
+class RateLimitResult(NamedTuple):
+    """Outcome of one rate-limit check."""
+    allowed: bool
+    remaining: int
+    retry_after: float   # Seconds until the next request would be allowed (0 if allowed)
+    reset_after: float   # Seconds until the limit is fully restored
+
+
+# KEYS[1] = key
+# ARGV = emission interval, burst offset, cost, lease, lease min remaining
+# Returns {allowed, reserved, remaining, retry_after, reset_after}
+_GCRA_SCRIPT = """
+redis.replicate_commands()
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local emission = tonumber(ARGV[1])
+local burst_offset = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local lease = tonumber(ARGV[4])
+local lease_min = tonumber(ARGV[5])
+
+local tat = tonumber(redis.call('GET', KEYS[1]) or '0')
+if tat < now then tat = now end
+
+if lease > cost and (now - (tat + lease * emission - burst_offset)) / emission >= lease_min then
+    cost = lease
+end
+
+local new_tat = tat + cost * emission
+local diff = now - (new_tat - burst_offset)
+if diff < 0 then
+    return {0, 0, '0', string.format('%.6f', -diff), string.format('%.6f', tat - now)}
+end
+
+local reset_after = new_tat - now
+if cost > 0 and reset_after > 0 then
+    redis.call('SET', KEYS[1], string.format('%.6f', new_tat), 'PX', math.ceil(reset_after * 1000))
+end
+return {1, cost, string.format('%.6f', diff / emission), '0', string.format('%.6f', reset_after)}
+"""
+
+
+def gcra(
+    tat: float,
+    now: float,
+    emission: float,
+    burst_offset: float,
+    cost: int = 1,
+    lease: int = 0,
+    lease_min: float = 0.0,
+) -> Tuple[bool, int, float, float, float, float]:
+    """
+    One GCRA step (same math as the Lua script).
+
+    Returns:
+        (allowed, reserved, remaining, retry_after, reset_after, new_tat)
+    """
+    tat = max(tat, now)
+    if lease > cost and (now - (tat + lease * emission - burst_offset)) / emission >= lease_min:
+        cost = lease
+
+    new_tat = tat + cost * emission
+    diff = now - (new_tat - burst_offset)
+    if diff < 0:
+        return False, 0, 0.0, -diff, tat - now, tat
+    return True, cost, diff / emission, 0.0, new_tat - now, new_tat
+
+
+@dataclass
+class _Lease:
+    tokens: int
+    remaining: int
+    reset_after: float
+    expires_at: float
+
+
+class RateLimiter:
+    """
+    GCRA rate limiter: Redis script with local lease and in-process fallback.
+
+    Usage:
+        limiter = RateLimiter(redis)
+        result = await limiter.hit("ratelimit:login:1.2.3.4", limit=5, period=60)
+        if not result.allowed:
+            raise RateLimitExceeded(retry_after=math.ceil(result.retry_after))
+
+    Args:
+        redis: Async Redis client (None = in-process only)
+        local_lease: Admit clients far below their limit without a round-trip
+        fallback_max_keys: Bound for the in-process state (LRU beyond that)
+    """
+
+    def __init__(
+        self,
+        redis=None,
+        local_lease: bool = True,
+        fallback_max_keys: int = RateLimitEngineConfig.FALLBACK_MAX_KEYS,
+    ):
+        self.redis = redis
+        self.local_lease = local_lease
+        self._script = redis.register_script(_GCRA_SCRIPT) if redis is not None else None
+        self._redis_down_until = 0.0
+        self._leases: Dict[str, _Lease] = {}
+        self._lock = Lock()
+        self._fallback = LocalCache(
+            name="rate_limit_fallback",
+            max_entries=fallback_max_keys,
+            default_ttl=3600,
+            index_separator=None,  # Never prefix-deleted; keeps memory per key flat
+        )
+        self._stats = {"local": 0, "redis": 0, "fallback": 0, "denied": 0, "redis_errors": 0}
+        self._redis_seconds = 0.0
+
+    async def hit(
+        self,
+        key: str,
+        limit: float,
+        period: float,
+        burst: Optional[int] = None,
+        cost: int = 1,
+    ) -> RateLimitResult:
+        """
+        Count a request against `limit` requests per `period` seconds.
+
+        Args:
+            key: Full rate-limit key (client + endpoint)
+            limit: Requests per period (sustained rate)
+            period: Period in seconds
+            burst: Requests allowed at once (default: limit)
+            cost: Units this request consumes (0 = peek without counting)
+        """
+        burst = burst if burst is not None else max(1, int(limit))
+        emission = period / limit
+        burst_offset = emission * burst
+
+        if cost == 1 and self.local_lease:
+            leased = self._take_lease(key)
+            if leased is not None:
+                self._stats["local"] += 1
+                return leased
+
+        lease = self._lease_size(burst) if cost == 1 and self.local_lease else 0
+        result, reserved = None, 0
+        if self._script is not None and time.monotonic() >= self._redis_down_until:
+            try:
+                started = time.perf_counter()
+                raw = await self._script(
+                    keys=[key],
+                    args=[emission, burst_offset, cost, lease, burst * RateLimitEngineConfig.LEASE_MIN_HEADROOM],
+                )
+                self._redis_seconds += time.perf_counter() - started
+                self._stats["redis"] += 1
+                allowed, reserved = bool(int(raw[0])), int(raw[1])
+                result = RateLimitResult(
+                    allowed, int(float(raw[2])), float(raw[3]), float(raw[4])
+                )
+            except RedisError as e:
+                self._stats["redis_errors"] += 1
+                self._redis_down_until = time.monotonic() + RateLimitEngineConfig.REDIS_RETRY_SECONDS
+                logger.warning("Rate limiter falling back to in-process", error=str(e))
+
+        if result is None:
+            self._stats["fallback"] += 1
+            result, reserved = self._hit_local(key, emission, burst_offset, cost, lease, burst)
+
+        if not result.allowed:
+            self._stats["denied"] += 1
+        elif reserved > cost:
+            self._store_lease(key, reserved - cost, result)
+        return result
+
+    # ==================== LOCAL LEASE ====================
+
+    @staticmethod
+    def _lease_size(burst: int) -> int:
+        return int(burst * RateLimitEngineConfig.LEASE_FRACTION)
+
+    def _take_lease(self, key: str) -> Optional[RateLimitResult]:
+        with self._lock:
+            lease = self._leases.get(key)
+            if lease is None:
+                return None
+            if lease.tokens <= 0 or lease.expires_at <= time.monotonic():
+                del self._leases[key]
+                return None
+            lease.tokens -= 1
+            return RateLimitResult(True, lease.remaining + lease.tokens, 0.0, lease.reset_after)
+
+    def _store_lease(self, key: str, tokens: int, result: RateLimitResult) -> None:
+        with self._lock:
+            if len(self._leases) >= RateLimitEngineConfig.LOCAL_MAX_KEYS:
+                now = time.monotonic()
+                for stale in [k for k, v in self._leases.items() if v.expires_at <= now]:
+                    del self._leases[stale]
+                if len(self._leases) >= RateLimitEngineConfig.LOCAL_MAX_KEYS:
+                    return  # Full: just take the round-trip for new clients
+            self._leases[key] = _Lease(
+                tokens=tokens,
+                remaining=result.remaining,
+                reset_after=result.reset_after,
+                expires_at=time.monotonic() + RateLimitEngineConfig.LEASE_TTL,
+            )
+
+    # ==================== IN-PROCESS FALLBACK ====================
+
+    def _hit_local(
+        self,
+        key: str,
+        emission: float,
+        burst_offset: float,
+        cost: int,
+        lease: int,
+        burst: int,
+    ) -> Tuple[RateLimitResult, int]:
+        now = time.time()
+        with self._lock:
+            tat = self._fallback.get(key) or 0.0
+            allowed, reserved, remaining, retry_after, reset_after, new_tat = gcra(
+                tat, now, emission, burst_offset, cost, lease,
+                burst * RateLimitEngineConfig.LEASE_MIN_HEADROOM,
+            )
+            if allowed and cost > 0 and reset_after > 0:
+                self._fallback.set(key, new_tat, ttl=math.ceil(reset_after), size=64)
+        return RateLimitResult(allowed, int(remaining), retry_after, reset_after), reserved
+
+    # ==================== METRICS ====================
+
+    def stats(self) -> dict:
+        """Decision counters and mean Redis round-trip for this worker."""
+        redis_calls = self._stats["redis"]
+        return {
+            **self._stats,
+            "leases": len(self._leases),
+            "fallback_keys": len(self._fallback),
+            "redis_avg_ms": round(self._redis_seconds / redis_calls * 1000, 3) if redis_calls else 0.0,
+        }
+
+
+__all__ = [
+    "RateLimitEngineConfig",
+    "RateLimitResult",
+    "RateLimiter",
+    "gcra",
+]
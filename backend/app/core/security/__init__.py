@@ -18,6 +18,10 @@ from .main import (
     verify_refresh_token,
     get_user_id_from_token,
     create_token_pair,
+    principal_claims,
+    invalidate_principal,
+    PrincipalCacheConfig,
+    PRINCIPAL_CLAIMS,
     SecurityError,
     InvalidTokenError,
     InvalidCredentialsError,
@@ -116,6 +120,10 @@ __all__ = [
     "verify_refresh_token",
     "get_user_id_from_token",
     "create_token_pair",
+    "principal_claims",
+    "invalidate_principal",
+    "PrincipalCacheConfig",
+    "PRINCIPAL_CLAIMS",
     "SecurityError",
     "InvalidTokenError",
     "InvalidCredentialsError",
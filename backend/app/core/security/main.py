@@ -7,6 +7,8 @@ Content mirrors the previous `app/core/security.py` helpers for hashing and JWT.
 
 from __future__ import annotations
 
+import asyncio
+import logging
 from datetime import datetime, timedelta
 from typing import Any, Dict, Optional
 
@@ -15,12 +17,18 @@ import jwt
 from jwt import PyJWTError
 
 from app.core.config import settings
+from app.core.local_cache import LocalCache
+
+logger = logging.getLogger(__name__)
 
 # JWT Configuration
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 REFRESH_TOKEN_EXPIRE_DAYS = 30
 
+# Common user fields embedded in access tokens ("ver" = users.token_version)
+PRINCIPAL_CLAIMS = ("email", "first_name", "last_name", "role", "is_verified", "company")
+
 
 class SecurityError(Exception):
     """Base exception for security-related errors."""
@@ -91,63 +99,34 @@ def create_refresh_token(
 def decode_token(token: str) -> Dict[str, Any]:
     """
     Decode a JWT token.
-    
-    Debug logging added to trace decode issues.
     """
-    import logging
-    logger = logging.getLogger(__name__)
-    
     secret_key = getattr(settings, "jwt_secret_key", settings.secret_key)
     
-    logger.debug(f"decode_token: Secret key length: {len(secret_key) if secret_key else 0}")
-    logger.debug(f"decode_token: Algorithm: {ALGORITHM}")
-    logger.debug(f"decode_token: Token length: {len(token) if token else 0}")
-    
     try:
-        payload = jwt.decode(token, secret_key, algorithms=[ALGORITHM])
-        logger.debug(f"decode_token: Token decoded successfully. Payload keys: {list(payload.keys())}")
-        return payload
+        return jwt.decode(token, secret_key, algorithms=[ALGORITHM])
     except jwt.ExpiredSignatureError as e:
-        logger.warning(f"decode_token: Token expired: {str(e)}")
+        logger.warning("decode_token: Token expired: %s", e)
         raise InvalidTokenError("Token has expired")
     except jwt.InvalidSignatureError as e:
-        logger.warning(f"decode_token: Invalid signature. Secret key mismatch? Error: {str(e)}")
-        logger.debug(f"decode_token: Using secret key (first 20 chars): {secret_key[:20] if secret_key else 'None'}...")
+        logger.warning("decode_token: Invalid signature. Secret key mismatch? Error: %s", e)
         raise InvalidTokenError(f"Invalid token signature: {str(e)}")
     except PyJWTError as e:
-        logger.warning(f"decode_token: JWT decode error: {str(e)}")
+        logger.warning("decode_token: JWT decode error: %s", e)
         raise InvalidTokenError(f"Invalid token: {str(e)}")
     except Exception as e:
-        logger.error(f"decode_token: Unexpected error: {str(e)}", exc_info=True)
+        logger.error("decode_token: Unexpected error: %s", e, exc_info=True)
         raise InvalidTokenError(f"Token decode failed: {str(e)}")
 
 
 def verify_access_token(token: str) -> Dict[str, Any]:
     """
     Verify and decode an access token.
-    
-    Debug logging added to trace validation issues.
     """
-    import logging
-    logger = logging.getLogger(__name__)
-    
-    logger.debug(f"verify_access_token: Starting token validation")
-    
-    try:
-        payload = decode_token(token)
-        logger.debug(f"verify_access_token: Token decoded. Type: {payload.get('type')}")
-        
-        if payload.get("type") != "access":
-            logger.warning(f"verify_access_token: Invalid token type. Expected 'access', got '{payload.get('type')}'")
-            raise InvalidTokenError("Invalid token type")
-        
-        logger.debug(f"verify_access_token: Token validated successfully")
-        return payload
-    except InvalidTokenError:
-        raise
-    except Exception as e:
-        logger.error(f"verify_access_token: Unexpected error: {str(e)}", exc_info=True)
-        raise InvalidTokenError(f"Token validation failed: {str(e)}")
+    payload = decode_token(token)
+    if payload.get("type") != "access":
+        logger.warning("verify_access_token: Invalid token type. Expected 'access', got '%s'", payload.get("type"))
+        raise InvalidTokenError("Invalid token type")
+    return payload
 
 
 def verify_refresh_token(token: str) -> Dict[str, Any]:
@@ -165,9 +144,24 @@ def get_user_id_from_token(token: str) -> str:
     return user_id
 
 
-def create_token_pair(user_id: str, email: Optional[str] = None) -> Dict[str, str]:
-    access_token = create_access_token({"sub": user_id, "email": email})
-    refresh_token = create_refresh_token({"sub": user_id, "email": email})
+def principal_claims(user: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Access-token claims for a users row: the common profile fields plus
+    the token version ("ver") the principal cache is keyed on.
+    """
+    claims = {key: user[key] for key in PRINCIPAL_CLAIMS if user.get(key) is not None}
+    claims["ver"] = user.get("token_version") or 0
+    return claims
+
+
+def create_token_pair(
+    user_id: str,
+    email: Optional[str] = None,
+    claims: Optional[Dict[str, Any]] = None,
+) -> Dict[str, str]:
+    access_claims = {"email": email, **(claims or {})}
+    access_token = create_access_token({"sub": user_id, **access_claims})
+    refresh_token = create_refresh_token({"sub": user_id, "email": access_claims["email"]})
     return {"access_token": access_token, "refresh_token": refresh_token}
 
 
@@ -180,45 +174,94 @@ from fastapi.security import OAuth2PasswordBearer
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 
+class PrincipalCacheConfig:
+    """Principal cache settings"""
+
+    TTL = 60                # Max. delay until a deactivation/role change is enforced
+    ERROR_TTL = 10          # Lookup failed: trust the token this long before retrying
+    MAX_ENTRIES = 50_000
+
+
+# "{sub}:{ver}" -> users state {"is_active", "role", "token_version"}
+# ({} for users that only exist in Supabase Auth)
+_principal_cache = LocalCache(
+    name="auth_principals",
+    max_entries=PrincipalCacheConfig.MAX_ENTRIES,
+    default_ttl=PrincipalCacheConfig.TTL,
+)
+
+
+def _load_user_state(user_id: str) -> Dict[str, Any]:
+    from app.supabase_client import get_supabase_client
+
+    result = (
+        get_supabase_client()
+        .table("users")
+        .select("is_active, role, token_version")
+        .eq("id", user_id)
+        .limit(1)
+        .execute()
+    )
+    return result.data[0] if result.data else {}
+
+
+def invalidate_principal(user_id: str) -> int:
+    """
+    Drop this worker's cached state for a user. Other workers enforce a
+    deactivation/role change after PrincipalCacheConfig.TTL at the latest.
+    """
+    return _principal_cache.delete_prefix(f"{user_id}:")
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> Dict[str, Any]:
     """
     Get current user from JWT token.
-    
-    Debug logging added to trace token validation issues.
+
+    Identity and profile fields come from the token claims. Whether the
+    token is still valid (user active, token version not bumped by a
+    deactivation/role change) is cached per sub + ver, so the users row
+    is read at most once per TTL per worker.
     """
-    import logging
-    logger = logging.getLogger(__name__)
-    
-    logger.debug(f"get_current_user: Token received (first 50 chars): {token[:50] if token else 'None'}...")
-    
     try:
-        # Debug: Log settings
-        from app.config import get_settings
-        settings = get_settings()
-        secret_key = getattr(settings, "jwt_secret_key", settings.secret_key)
-        logger.debug(f"get_current_user: Using secret key (first 20 chars): {secret_key[:20] if secret_key else 'None'}...")
-        logger.debug(f"get_current_user: Algorithm: {ALGORITHM}")
-        
         payload = verify_access_token(token)
-        logger.debug(f"get_current_user: Token decoded successfully. Payload keys: {list(payload.keys())}")
-        logger.debug(f"get_current_user: Payload 'sub': {payload.get('sub')}")
-        logger.debug(f"get_current_user: Payload 'type': {payload.get('type')}")
-        return payload
     except InvalidTokenError as e:
-        logger.warning(f"get_current_user: Token validation failed: {str(e)}")
-        logger.debug(f"get_current_user: Token (first 50 chars): {token[:50] if token else 'None'}...")
+        logger.warning("get_current_user: Token validation failed: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=str(e),
             headers={"WWW-Authenticate": "Bearer"},
         )
-    except Exception as e:
-        logger.error(f"get_current_user: Unexpected error during token validation: {str(e)}", exc_info=True)
+
+    user_id = payload.get("sub")
+    if not user_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User ID not found in token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    token_version = payload.get("ver") or 0
+    cache_key = f"{user_id}:{token_version}"
+    state = _principal_cache.get(cache_key)
+    if state is None:
+        try:
+            state = await asyncio.to_thread(_load_user_state, user_id)
+        except Exception as e:
+            # Don't lock everybody out while the users table is unreachable
+            logger.warning("get_current_user: User state lookup failed: %s", e)
+            _principal_cache.set(cache_key, {}, ttl=PrincipalCacheConfig.ERROR_TTL)
+            return payload
+        _principal_cache.set(cache_key, state)
+
+    if state.get("is_active") is False or (state.get("token_version") or 0) > token_version:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token validation failed",
+            detail="Token revoked",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if state.get("role") and payload.get("role") is None:
+        payload["role"] = state["role"]  # Tokens issued before role claims
+    return payload
 
 
 async def get_current_active_user(token: str = Depends(oauth2_scheme)) -> Dict[str, Any]:
@@ -239,6 +282,10 @@ __all__ = [
     "verify_refresh_token",
     "get_user_id_from_token",
     "create_token_pair",
+    "principal_claims",
+    "PRINCIPAL_CLAIMS",
+    "PrincipalCacheConfig",
+    "invalidate_principal",
     "SecurityError",
     "InvalidTokenError",
     "InvalidCredentialsError",
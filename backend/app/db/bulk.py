@@ -0,0 +1,561 @@
+"""
+SalesFlow AI - Bulk Write Engine
+Chunked inserts/upserts with parallel submission and per-row error reporting.
+
+Two writers share the same chunking and error-isolation logic:
+
+    - SupabaseBulkWriter:   PostgREST insert/upsert (sync client, run in threads)
+    - SqlAlchemyBulkWriter: INSERT ... ON CONFLICT via asyncpg, with a
+                            PostgreSQL COPY path for very large batches
+
+When a chunk fails with a row-level data error (SQLSTATE class 22/23 or a
+PostgREST payload error), it is split in halves and retried until the
+offending rows are isolated, so a single bad row no longer rejects the whole
+import. Any other failure (auth, network, 5xx, timeout) marks the chunk as
+failed without bisecting, and the chunks not yet submitted are skipped.
+
+Usage:
+    writer = SupabaseBulkWriter(supabase, "leads", on_conflict=["user_id", "email"])
+    result = await writer.write(rows)        # or writer.write_sync(rows)
+    if not result.ok:
+        for err in result.errors:
+            logger.warning(f"Row {err.index} failed: {err.error}")
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from postgrest.exceptions import APIError
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+DEFAULT_CHUNK_SIZE = 500          # Rows per request/statement
+DEFAULT_CONCURRENCY = 4           # Chunks in flight at once
+DEFAULT_COPY_THRESHOLD = 10_000   # Use COPY at or above this many rows (SQL path)
+ROW_ERROR_SQLSTATE_CLASSES = ("22", "23")   # Data exception, integrity constraint violation
+ROW_ERROR_POSTGREST_PREFIX = "PGRST1"       # PostgREST request/payload errors (4xx)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Results
+# ─────────────────────────────────────────────────────────────────────────────
+
+@dataclass
+class BulkRowError:
+    """A single row that could not be written."""
+    index: int                    # Position in the input sequence
+    row: Dict[str, Any]
+    error: str
+    exception: Optional[BaseException] = field(default=None, repr=False, compare=False)
+
+
+@dataclass
+class BulkWriteResult:
+    """Outcome of a bulk write."""
+    total: int = 0
+    written: int = 0
+    chunks: int = 0
+    used_copy: bool = False
+    duration_ms: float = 0.0
+    errors: List[BulkRowError] = field(default_factory=list)
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def failed(self) -> int:
+        return len(self.errors)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def merge(self, other: "BulkWriteResult") -> None:
+        """Fold a per-chunk result into this one."""
+        self.written += other.written
+        self.chunks += other.chunks
+        self.errors.extend(other.errors)
+        self.rows.extend(other.rows)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "written": self.written,
+            "failed": self.failed,
+            "chunks": self.chunks,
+            "used_copy": self.used_copy,
+            "duration_ms": round(self.duration_ms, 2),
+            "errors": [
+                {"index": e.index, "error": e.error} for e in self.errors
+            ],
+        }
+
+
+def chunked(rows: Sequence[Any], size: int) -> List[tuple[int, Sequence[Any]]]:
+    """Split rows into (offset, chunk) pairs."""
+    size = max(1, size)
+    return [(i, rows[i:i + size]) for i in range(0, len(rows), size)]
+
+
+def _error_code(error: BaseException) -> Optional[str]:
+    """SQLSTATE / PostgREST code of a write error, if it carries one."""
+    if isinstance(error, APIError):
+        return error.code
+    # asyncpg errors carry `sqlstate`; SQLAlchemy wraps them in `orig`
+    for candidate in (error, getattr(error, "orig", None)):
+        code = getattr(candidate, "sqlstate", None) or getattr(candidate, "pgcode", None)
+        if code:
+            return str(code)
+    return None
+
+
+def is_row_error(error: BaseException) -> bool:
+    """
+    True if the error is caused by the rows themselves (bad value, constraint
+    violation, invalid payload), so bisecting the chunk can isolate them.
+    """
+    code = _error_code(error) or ""
+    return (
+        code[:2] in ROW_ERROR_SQLSTATE_CLASSES
+        or code.startswith(ROW_ERROR_POSTGREST_PREFIX)
+    )
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Shared Logic
+# ─────────────────────────────────────────────────────────────────────────────
+
+class _BulkWriterBase:
+    """Chunking, bisection and result bookkeeping shared by all writers."""
+
+    def __init__(
+        self,
+        *,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        on_conflict: Optional[Sequence[str]] = None,
+        update_columns: Optional[Sequence[str]] = None,
+        ignore_duplicates: bool = False,
+        returning: bool = False,
+        isolate_errors: bool = True,
+    ):
+        """
+        Args:
+            chunk_size: Rows per request/statement.
+            concurrency: Maximum chunks submitted in parallel.
+            on_conflict: Conflict target columns. Enables upsert.
+            update_columns: Columns to overwrite on conflict (default: all
+                written columns except the conflict target and primary key).
+            ignore_duplicates: Skip conflicting rows instead of updating them.
+            returning: Collect written rows in the result.
+            isolate_errors: Bisect chunks failing with row-level data errors
+                to report per-row errors. If False, every row of a failing
+                chunk is reported.
+        """
+        self.chunk_size = chunk_size
+        self.concurrency = max(1, concurrency)
+        self.on_conflict = list(on_conflict) if on_conflict else None
+        self.update_columns = list(update_columns) if update_columns else None
+        self.ignore_duplicates = ignore_duplicates
+        self.returning = returning
+        self.isolate_errors = isolate_errors
+
+    @property
+    def is_upsert(self) -> bool:
+        return bool(self.on_conflict) or self.ignore_duplicates
+
+    def _should_bisect(self, chunk: Sequence[Dict[str, Any]], error: Exception) -> bool:
+        return self.isolate_errors and len(chunk) > 1 and is_row_error(error)
+
+    @staticmethod
+    def _systemic_error(result: BulkWriteResult) -> Optional[BaseException]:
+        """First failure of a chunk result that is not a row-level data error."""
+        for row_error in result.errors:
+            if row_error.exception is not None and not is_row_error(row_error.exception):
+                return row_error.exception
+        return None
+
+    def _record_failure(
+        self,
+        offset: int,
+        chunk: Sequence[Dict[str, Any]],
+        error: Exception,
+        result: BulkWriteResult,
+    ) -> None:
+        for i, row in enumerate(chunk):
+            result.errors.append(
+                BulkRowError(
+                    index=offset + i, row=dict(row), error=str(error), exception=error
+                )
+            )
+
+    async def _write_chunks(
+        self,
+        rows: Sequence[Dict[str, Any]],
+        write_chunk: Callable[[int, Sequence[Dict[str, Any]]], Awaitable[BulkWriteResult]],
+    ) -> List[BulkWriteResult]:
+        """
+        Submit up to `concurrency` chunks at once. After a systemic failure
+        the chunks still waiting are recorded as failed without a request.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        systemic: List[BaseException] = []
+
+        async def run(offset: int, chunk: Sequence[Dict[str, Any]]) -> BulkWriteResult:
+            async with semaphore:
+                if systemic:
+                    partial = BulkWriteResult()
+                    self._record_failure(offset, chunk, systemic[0], partial)
+                    return partial
+                partial = await write_chunk(offset, chunk)
+                error = self._systemic_error(partial)
+                if error is not None:
+                    systemic.append(error)
+                return partial
+
+        return await asyncio.gather(
+            *(run(offset, chunk) for offset, chunk in chunked(rows, self.chunk_size))
+        )
+
+    def _log_summary(self, target: str, result: BulkWriteResult) -> None:
+        log = logger.warning if result.errors else logger.info
+        log(
+            f"Bulk write {target}: {result.written}/{result.total} rows "
+            f"in {result.chunks} chunks ({result.duration_ms:.0f}ms)",
+            extra={"target": target, **{k: v for k, v in result.to_dict().items() if k != "errors"}},
+        )
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Supabase / PostgREST
+# ─────────────────────────────────────────────────────────────────────────────
+
+class SupabaseBulkWriter(_BulkWriterBase):
+    """
+    Bulk writer for the Supabase client.
+
+    The Supabase client is synchronous, so `write()` runs chunks in worker
+    threads (bounded by `concurrency`); `write_sync()` runs them in order for
+    callers that are not async.
+
+    PostgREST upserts overwrite every column sent in the payload, so
+    `update_columns` is not supported here; send only the columns to write.
+    """
+
+    def __init__(self, client: Any, table: str, **options: Any):
+        super().__init__(**options)
+        if self.update_columns:
+            raise ValueError(
+                "SupabaseBulkWriter does not support update_columns: PostgREST "
+                "upserts overwrite every column in the payload"
+            )
+        self.client = client
+        self.table = table
+
+    def _submit(self, chunk: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Send a single insert/upsert request."""
+        rows = list(chunk)
+        builder = self.client.table(self.table)
+        if self.is_upsert:
+            query = builder.upsert(
+                rows,
+                on_conflict=",".join(self.on_conflict or []),
+                ignore_duplicates=self.ignore_duplicates,
+            )
+        else:
+            query = builder.insert(rows)
+
+        response = query.execute()
+        error = getattr(response, "error", None)
+        if error:
+            raise APIError(error if isinstance(error, dict) else {"message": str(error)})
+        return getattr(response, "data", None) or []
+
+    def _write_chunk(
+        self, offset: int, chunk: Sequence[Dict[str, Any]]
+    ) -> BulkWriteResult:
+        result = BulkWriteResult(chunks=1)
+        try:
+            data = self._submit(chunk)
+            result.written = len(chunk)
+            if self.returning:
+                result.rows.extend(data)
+            return result
+        except Exception as e:
+            if not self._should_bisect(chunk, e):
+                self._record_failure(offset, chunk, e, result)
+                return result
+
+        mid = len(chunk) // 2
+        result.merge(self._write_chunk(offset, chunk[:mid]))
+        result.merge(self._write_chunk(offset + mid, chunk[mid:]))
+        return result
+
+    def write_sync(self, rows: Sequence[Dict[str, Any]]) -> BulkWriteResult:
+        """Write all rows sequentially, chunk by chunk."""
+        start = time.perf_counter()
+        result = BulkWriteResult(total=len(rows))
+        systemic: Optional[BaseException] = None
+        for offset, chunk in chunked(rows, self.chunk_size):
+            if systemic is not None:
+                self._record_failure(offset, chunk, systemic, result)
+                continue
+            partial = self._write_chunk(offset, chunk)
+            result.merge(partial)
+            systemic = self._systemic_error(partial)
+        result.duration_ms = (time.perf_counter() - start) * 1000
+        self._log_summary(self.table, result)
+        return result
+
+    async def write(self, rows: Sequence[Dict[str, Any]]) -> BulkWriteResult:
+        """Write all rows, submitting up to `concurrency` chunks in parallel."""
+        start = time.perf_counter()
+        result = BulkWriteResult(total=len(rows))
+        partials = await self._write_chunks(
+            rows, lambda offset, chunk: asyncio.to_thread(self._write_chunk, offset, chunk)
+        )
+        for partial in partials:
+            result.merge(partial)
+        result.errors.sort(key=lambda e: e.index)
+
+        result.duration_ms = (time.perf_counter() - start) * 1000
+        self._log_summary(self.table, result)
+        return result
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# SQLAlchemy / asyncpg
+# ─────────────────────────────────────────────────────────────────────────────
+
+def build_insert_statement(
+    table: Any,
+    columns: Sequence[str],
+    on_conflict: Optional[Sequence[str]] = None,
+    update_columns: Optional[Sequence[str]] = None,
+    ignore_duplicates: bool = False,
+):
+    """
+    Build a PostgreSQL INSERT with optional ON CONFLICT clause.
+
+    Args:
+        table: SQLAlchemy Table.
+        columns: Columns present in the rows being written.
+        on_conflict: Conflict target columns.
+        update_columns: Columns to overwrite on conflict.
+        ignore_duplicates: Use DO NOTHING instead of DO UPDATE.
+    """
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+    stmt = pg_insert(table)
+    if ignore_duplicates:
+        return stmt.on_conflict_do_nothing(
+            index_elements=list(on_conflict) if on_conflict else None
+        )
+    if on_conflict:
+        keys = set(on_conflict) | {c.name for c in table.primary_key.columns}
+        targets = update_columns or [c for c in columns if c not in keys]
+        if not targets:
+            return stmt.on_conflict_do_nothing(index_elements=list(on_conflict))
+        return stmt.on_conflict_do_update(
+            index_elements=list(on_conflict),
+            set_={c: stmt.excluded[c] for c in targets},
+        )
+    return stmt
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+class SqlAlchemyBulkWriter(_BulkWriterBase):
+    """
+    Bulk writer for the async SQLAlchemy engine.
+
+    Each chunk runs in its own session (and transaction), so chunks can be
+    submitted in parallel and a failing chunk does not roll back the others.
+    Batches of `copy_threshold` rows or more are streamed with PostgreSQL
+    COPY into a temporary staging table and merged with a single
+    INSERT ... SELECT (ON CONFLICT applied there). If COPY fails, the writer
+    falls back to the chunked path to report per-row errors.
+
+    COPY uses asyncpg's binary protocol, so row values must be native Python
+    types for their columns (datetime for timestamps, UUID or str for uuid).
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        session_factory: Optional[Callable[[], Any]] = None,
+        copy_threshold: Optional[int] = DEFAULT_COPY_THRESHOLD,
+        **options: Any,
+    ):
+        """
+        Args:
+            model: ORM model class or SQLAlchemy Table.
+            session_factory: Async context manager factory yielding a
+                committing session. Defaults to `db.session`.
+            copy_threshold: Minimum batch size for COPY (None disables COPY).
+        """
+        super().__init__(**options)
+        self.table = getattr(model, "__table__", model)
+        self.copy_threshold = copy_threshold
+        self._session_factory = session_factory
+
+    @property
+    def session_factory(self) -> Callable[[], Any]:
+        if self._session_factory is None:
+            from app.db.session import db
+            return db.session
+        return self._session_factory
+
+    @property
+    def _qualified_name(self) -> str:
+        if self.table.schema:
+            return f"{_quote(self.table.schema)}.{_quote(self.table.name)}"
+        return _quote(self.table.name)
+
+    async def _submit(self, chunk: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        columns = list(chunk[0].keys())
+        stmt = build_insert_statement(
+            self.table,
+            columns,
+            on_conflict=self.on_conflict,
+            update_columns=self.update_columns,
+            ignore_duplicates=self.ignore_duplicates,
+        )
+        async with self.session_factory() as session:
+            if self.returning:
+                result = await session.execute(
+                    stmt.returning(*self.table.columns), list(chunk)
+                )
+                return [dict(row._mapping) for row in result]
+            await session.execute(stmt, list(chunk))
+        return []
+
+    async def _write_chunk(
+        self, offset: int, chunk: Sequence[Dict[str, Any]]
+    ) -> BulkWriteResult:
+        result = BulkWriteResult(chunks=1)
+        try:
+            data = await self._submit(chunk)
+            result.written = len(chunk)
+            result.rows.extend(data)
+            return result
+        except Exception as e:
+            if not self._should_bisect(chunk, e):
+                self._record_failure(offset, chunk, e, result)
+                return result
+
+        mid = len(chunk) // 2
+        result.merge(await self._write_chunk(offset, chunk[:mid]))
+        result.merge(await self._write_chunk(offset + mid, chunk[mid:]))
+        return result
+
+    async def _copy(self, rows: Sequence[Dict[str, Any]]) -> None:
+        """Stream rows with COPY, merging through a staging table for upserts."""
+        from sqlalchemy import text
+
+        columns = list(rows[0].keys())
+        records = [tuple(row.get(c) for c in columns) for row in rows]
+        column_list = ", ".join(_quote(c) for c in columns)
+
+        async with self.session_factory() as session:
+            conn = await session.connection()
+
+            if not self.is_upsert:
+                # Issue a statement first so the transaction is open on the driver
+                await conn.execute(text("SELECT 1"))
+                raw = await conn.get_raw_connection()
+                await raw.driver_connection.copy_records_to_table(
+                    self.table.name,
+                    records=records,
+                    columns=columns,
+                    schema_name=self.table.schema,
+                )
+                return
+
+            staging = f"_bulk_{self.table.name}_{uuid.uuid4().hex[:8]}"
+            await conn.execute(text(
+                f"CREATE TEMP TABLE {_quote(staging)} "
+                f"(LIKE {self._qualified_name} INCLUDING DEFAULTS) ON COMMIT DROP"
+            ))
+            raw = await conn.get_raw_connection()
+            await raw.driver_connection.copy_records_to_table(
+                staging, records=records, columns=columns
+            )
+
+            conflict = ""
+            if self.on_conflict:
+                target = ", ".join(_quote(c) for c in self.on_conflict)
+                keys = set(self.on_conflict) | {
+                    c.name for c in self.table.primary_key.columns
+                }
+                updates = self.update_columns or [c for c in columns if c not in keys]
+                if self.ignore_duplicates or not updates:
+                    conflict = f" ON CONFLICT ({target}) DO NOTHING"
+                else:
+                    assignments = ", ".join(
+                        f"{_quote(c)} = EXCLUDED.{_quote(c)}" for c in updates
+                    )
+                    conflict = f" ON CONFLICT ({target}) DO UPDATE SET {assignments}"
+            elif self.ignore_duplicates:
+                conflict = " ON CONFLICT DO NOTHING"
+
+            await conn.execute(text(
+                f"INSERT INTO {self._qualified_name} ({column_list}) "
+                f"SELECT {column_list} FROM {_quote(staging)}{conflict}"
+            ))
+
+    async def write(self, rows: Sequence[Dict[str, Any]]) -> BulkWriteResult:
+        """Write all rows via COPY (large batches) or parallel chunked inserts."""
+        start = time.perf_counter()
+        result = BulkWriteResult(total=len(rows))
+        if not rows:
+            return result
+
+        use_copy = (
+            self.copy_threshold is not None
+            and len(rows) >= self.copy_threshold
+            and not self.returning
+        )
+        if use_copy:
+            try:
+                await self._copy(rows)
+                result.written = len(rows)
+                result.chunks = 1
+                result.used_copy = True
+                result.duration_ms = (time.perf_counter() - start) * 1000
+                self._log_summary(self.table.name, result)
+                return result
+            except Exception as e:
+                logger.warning(
+                    f"COPY into {self.table.name} failed, falling back to chunked insert: {e}"
+                )
+
+        partials = await self._write_chunks(rows, self._write_chunk)
+        for partial in partials:
+            result.merge(partial)
+        result.errors.sort(key=lambda e: e.index)
+
+        result.duration_ms = (time.perf_counter() - start) * 1000
+        self._log_summary(self.table.name, result)
+        return result
+
+
+__all__ = [
+    "BulkRowError",
+    "BulkWriteResult",
+    "SupabaseBulkWriter",
+    "SqlAlchemyBulkWriter",
+    "build_insert_statement",
+    "chunked",
+    "is_row_error",
+    "DEFAULT_CHUNK_SIZE",
+    "DEFAULT_CONCURRENCY",
+    "DEFAULT_COPY_THRESHOLD",
+]
@@ -11,6 +11,7 @@ from .session import (
     get_supabase_client,
     get_session,
     get_readonly_session,
+    get_routed_session,
 )
 
 # Alias für Kompatibilität
@@ -23,6 +24,7 @@ __all__ = [
     "get_supabase_client",
     "get_session",
     "get_readonly_session",
+    "get_routed_session",
     "get_async_db",  # Alias für get_session
 ]
 
@@ -0,0 +1,48 @@
+"""
+Keyset paging and timestamp parsing for the sync PostgREST batch
+pipelines (incremental jobs, daily briefing).
+
+Usage:
+    for page in keyset_pages(lambda: supabase.table("leads").select("id, user_id")):
+        ...
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+PAGE_SIZE = 1000                            # Rows per keyset page
+
+
+def keyset_pages(
+    make_query: Callable[[], Any],
+    page_size: int = PAGE_SIZE,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Keyset paging by id over `make_query()` (a fresh filtered query per page)."""
+    last_id: Optional[str] = None
+    while True:
+        query = make_query()
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = query.order("id").limit(page_size).execute().data or []
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        last_id = page[-1]["id"]
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """ISO timestamp from PostgREST as an aware datetime (naive values are UTC)."""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+__all__ = [
+    "PAGE_SIZE",
+    "keyset_pages",
+    "parse_timestamp",
+]
@@ -21,6 +21,12 @@ from app.core.exceptions import (
     ValidationError,
     ConflictError,
 )
+from app.db.bulk import (
+    BulkWriteResult,
+    SupabaseBulkWriter,
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_CONCURRENCY,
+)
 
 
 # Type variable for Pydantic models
@@ -280,30 +286,30 @@ class BaseRepository(ABC, Generic[T]):
                 if len(parts) >= 2:
                     field = parts[1].replace(f"{self.table_name}_", "").replace("_key", "")
             
-            raise ConflictError(
+            exc = ConflictError(
                 message=f"Duplicate value for {field or 'field'}",
-                field=field
+                conflicting_field=field
             )
         
         # Check for foreign key violation
-        if "foreign key" in error_msg.lower():
-            raise ValidationError(
-                message="Referenced record does not exist",
-                field=None
-            )
+        elif "foreign key" in error_msg.lower():
+            exc = ValidationError(message="Referenced record does not exist")
         
         # Check for check constraint violation
-        if "check constraint" in error_msg.lower():
-            raise ValidationError(
-                message="Value violates check constraint",
-                field=None
-            )
+        elif "check constraint" in error_msg.lower():
+            exc = ValidationError(message="Value violates check constraint")
         
         # Generic database error
-        raise DatabaseError(
-            message=f"Database operation '{operation}' failed",
-            original_error=error
-        )
+        else:
+            exc = DatabaseError(message=f"Database operation '{operation}' failed")
+        
+        # Keep the PostgREST error code/details for callers and logs
+        exc.details.update({
+            "db_code": error_code,
+            "db_details": getattr(error, 'details', None),
+            "db_hint": getattr(error, 'hint', None),
+        })
+        raise exc from error
     
     def _base_query(self, include_deleted: bool = False):
         """
@@ -531,12 +537,17 @@ class BaseRepository(ABC, Generic[T]):
             self._handle_api_error(e, "create")
     
     @log_query("create_many")
-    async def create_many(self, items: List[Dict[str, Any]]) -> List[T]:
+    async def create_many(
+        self,
+        items: List[Dict[str, Any]],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> List[T]:
         """
-        Create multiple records in a single operation.
+        Create multiple records in chunked insert requests.
         
         Args:
             items: List of dictionaries with field values.
+            chunk_size: Rows per insert request.
             
         Returns:
             List of created records.
@@ -545,20 +556,75 @@ class BaseRepository(ABC, Generic[T]):
             ValidationError: If any data is invalid.
             ConflictError: If unique constraint is violated.
             DatabaseError: If insert fails.
+        
+        Note:
+            Chunks that succeeded before a failure stay written. Use
+            `bulk_write` to get per-row errors instead of an exception.
         """
-        try:
-            # Add timestamps to all items
-            items = [
-                self._add_timestamps(item.copy(), is_create=True)
-                for item in items
-            ]
-            
-            result = self.db.table(self.table_name).insert(items).execute()
-            
-            return self._to_model_list(result.data or [])
+        result = await self.bulk_write(
+            items,
+            chunk_size=chunk_size,
+            concurrency=1,
+            returning=True,
+            isolate_errors=False,
+        )
+        
+        if result.errors:
+            first = result.errors[0]
+            error = first.exception
+            if not isinstance(error, APIError):
+                error = APIError({"message": first.error})
+            self._handle_api_error(error, "create_many")
+        
+        return self._to_model_list(result.rows)
+    
+    @log_query("bulk_write")
+    async def bulk_write(
+        self,
+        items: List[Dict[str, Any]],
+        on_conflict: Optional[List[str]] = None,
+        ignore_duplicates: bool = False,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        returning: bool = False,
+        isolate_errors: bool = True,
+    ) -> BulkWriteResult:
+        """
+        Insert or upsert many records with partial-failure reporting.
+        
+        Chunks are submitted in parallel; failing chunks are bisected so
+        that only the offending rows are reported in `result.errors`.
+        
+        Args:
+            items: List of dictionaries with field values.
+            on_conflict: Conflict target columns (enables upsert).
+            ignore_duplicates: Skip conflicting rows instead of updating.
+            chunk_size: Rows per request.
+            concurrency: Chunks in flight at once.
+            returning: Collect written rows in `result.rows`.
+            isolate_errors: Bisect failing chunks to find bad rows.
             
-        except APIError as e:
-            self._handle_api_error(e, "create_many")
+        Returns:
+            BulkWriteResult with written/failed counts and row errors.
+        """
+        # On upsert, leave created_at to the DB default so existing rows keep it
+        is_create = not (on_conflict or ignore_duplicates)
+        rows = [
+            self._add_timestamps(item.copy(), is_create=is_create)
+            for item in items
+        ]
+        
+        writer = SupabaseBulkWriter(
+            self.db,
+            self.table_name,
+            chunk_size=chunk_size,
+            concurrency=concurrency,
+            on_conflict=on_conflict,
+            ignore_duplicates=ignore_duplicates,
+            returning=returning,
+            isolate_errors=isolate_errors,
+        )
+        return await writer.write(rows)
     
     @log_query("update")
     async def update(
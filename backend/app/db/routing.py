@@ -0,0 +1,234 @@
+"""
+============================================
+🔀 SALESFLOW AI - READ REPLICA ROUTING
+============================================
+
+Decides per request / per job whether database reads go to the primary
+or to a read replica:
+
+- GET/HEAD requests are routed to the replica by default
+- Analytics/report jobs opt in with `@replica_job` or `use_replica()`
+- Read-your-writes: after a client writes, its reads stay on the
+  primary for a short sticky window
+- Per-pool counters (sessions, errors, sticky redirects, fallbacks)
+
+The route lives in a ContextVar, so it follows the request through
+dependencies and service calls without being passed around.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import Enum
+from functools import wraps
+from threading import Lock
+from typing import Callable, Dict, Iterator, Optional
+
+import structlog
+
+logger = structlog.get_logger()
+
+
+class DbRole(str, Enum):
+    """Target pool for a database operation."""
+    PRIMARY = "primary"
+    REPLICA = "replica"
+
+
+class ReplicaRoutingConfig:
+    """Replica routing configuration."""
+
+    STICKY_WINDOW_SECONDS = 5.0        # Reads stay on primary after a write
+    MAX_TRACKED_CLIENTS = 50_000       # Bound for the recent-writes map
+    READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+    STICKY_COOKIE = "sf_db_primary_until"
+
+
+# Current route; outside of requests/jobs everything goes to the primary
+_role_ctx: ContextVar[DbRole] = ContextVar("db_role", default=DbRole.PRIMARY)
+
+
+def current_role() -> DbRole:
+    """Get the database role for the current context."""
+    return _role_ctx.get()
+
+
+@contextmanager
+def use_role(role: DbRole) -> Iterator[None]:
+    """Route all sessions/clients in this block to the given role."""
+    token = _role_ctx.set(role)
+    try:
+        yield
+    finally:
+        _role_ctx.reset(token)
+
+
+def use_replica():
+    """Route reads in this block to the replica (analytics, reports)."""
+    return use_role(DbRole.REPLICA)
+
+
+def use_primary():
+    """Force the primary in this block (e.g. read-modify-write in a GET)."""
+    return use_role(DbRole.PRIMARY)
+
+
+def replica_job(func: Callable) -> Callable:
+    """
+    Decorator for background jobs that only read (analytics, reports).
+
+    Usage:
+        @replica_job
+        async def build_weekly_report():
+            ...
+    """
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        with use_replica():
+            return await func(*args, **kwargs)
+    return wrapper
+
+
+def client_fingerprint(
+    authorization: Optional[str] = None,
+    user_id: Optional[str] = None,
+    client_ip: Optional[str] = None,
+) -> Optional[str]:
+    """
+    Stable key identifying a client for read-your-writes stickiness.
+
+    Prefers the bearer token (one per login session) over the user id
+    header and the client IP. Tokens are hashed, never stored.
+    """
+    raw = authorization or (f"user:{user_id}" if user_id else None) or (
+        f"ip:{client_ip}" if client_ip else None
+    )
+    if not raw:
+        return None
+    return hashlib.sha256(raw.encode()).hexdigest()[:24]
+
+
+class ReplicaRouter:
+    """
+    Tracks recent writes per client and collects per-pool metrics.
+
+    Stickiness is kept in-process (bounded LRU); the routing middleware
+    additionally sets a short-lived cookie so it survives a hop to another
+    worker.
+    """
+
+    def __init__(
+        self,
+        sticky_window_seconds: float = ReplicaRoutingConfig.STICKY_WINDOW_SECONDS,
+        max_tracked_clients: int = ReplicaRoutingConfig.MAX_TRACKED_CLIENTS,
+    ):
+        self.sticky_window_seconds = sticky_window_seconds
+        self.max_tracked_clients = max_tracked_clients
+        self._recent_writes: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = Lock()
+        self._metrics: Dict[str, Dict[str, int]] = {
+            role.value: {
+                "sessions": 0,
+                "errors": 0,
+                "sticky_redirects": 0,
+                "fallbacks": 0,
+            }
+            for role in DbRole
+        }
+
+    # ==================== STICKINESS ====================
+
+    def mark_write(self, client: Optional[str]) -> float:
+        """Record a write; returns the epoch until which reads stay on primary."""
+        until = time.time() + self.sticky_window_seconds
+        if not client:
+            return until
+        with self._lock:
+            self._recent_writes[client] = until
+            self._recent_writes.move_to_end(client)
+            while len(self._recent_writes) > self.max_tracked_clients:
+                self._recent_writes.popitem(last=False)
+        return until
+
+    def is_sticky(self, client: Optional[str], cookie_until: Optional[float] = None) -> bool:
+        """True if the client wrote within the sticky window."""
+        now = time.time()
+        if cookie_until and cookie_until > now:
+            return True
+        if not client:
+            return False
+        with self._lock:
+            until = self._recent_writes.get(client)
+            if until is None:
+                return False
+            if until <= now:
+                del self._recent_writes[client]
+                return False
+            return True
+
+    def route_for(
+        self,
+        method: str,
+        client: Optional[str] = None,
+        cookie_until: Optional[float] = None,
+    ) -> DbRole:
+        """Pick the role for an HTTP request."""
+        if method.upper() not in ReplicaRoutingConfig.READ_METHODS:
+            return DbRole.PRIMARY
+        if self.is_sticky(client, cookie_until):
+            self.record(DbRole.PRIMARY, "sticky_redirects")
+            return DbRole.PRIMARY
+        return DbRole.REPLICA
+
+    # ==================== METRICS ====================
+
+    def record(self, role: DbRole, event: str, count: int = 1) -> None:
+        """Increment a per-pool counter."""
+        bucket = self._metrics[DbRole(role).value]
+        bucket[event] = bucket.get(event, 0) + count
+
+    def stats(self) -> dict:
+        """Per-pool counters plus stickiness state."""
+        with self._lock:
+            tracked = len(self._recent_writes)
+        return {
+            "pools": {role: dict(counters) for role, counters in self._metrics.items()},
+            "sticky_window_seconds": self.sticky_window_seconds,
+            "tracked_clients": tracked,
+        }
+
+    def reset(self) -> None:
+        """Clear stickiness and counters (tests)."""
+        with self._lock:
+            self._recent_writes.clear()
+        for counters in self._metrics.values():
+            for key in counters:
+                counters[key] = 0
+
+
+# ==================== SINGLETON ====================
+
+replica_router = ReplicaRouter()
+
+
+def configure_replica_router(sticky_window_seconds: float) -> ReplicaRouter:
+    """Apply settings to the router singleton."""
+    replica_router.sticky_window_seconds = sticky_window_seconds
+    return replica_router
+
+
+__all__ = [
+    "DbRole",
+    "ReplicaRoutingConfig",
+    "ReplicaRouter",
+    "replica_router",
+    "configure_replica_router",
+    "current_role",
+    "use_role",
+    "use_replica",
+    "use_primary",
+    "replica_job",
+    "client_fingerprint",
+]
@@ -10,6 +10,7 @@ Optimized connection pooling for high concurrency:
 - Health checks
 - Retry logic
 - Query timeout handling
+- Read replica routing (see app/db/routing.py)
 """
 
 import asyncio
@@ -33,6 +34,9 @@ from sqlalchemy import event, text
 from sqlalchemy.exc import SQLAlchemyError, DBAPIError
 import structlog
 
+from app.db.bulk import build_insert_statement
+from app.db.routing import DbRole, current_role, replica_router
+
 logger = structlog.get_logger()
 
 class DatabaseConfig:
@@ -67,29 +71,28 @@ class DatabaseSessionManager:
     def __init__(self):
         self._engine: Optional[AsyncEngine] = None
         self._sessionmaker: Optional[async_sessionmaker] = None
+        self._replica_engine: Optional[AsyncEngine] = None
+        self._replica_sessionmaker: Optional[async_sessionmaker] = None
         self._initialized = False
 
-    def init(
-        self,
-        database_url: str,
-        echo: bool = False,
-        pool_size: int = DatabaseConfig.POOL_SIZE,
-        max_overflow: int = DatabaseConfig.MAX_OVERFLOW,
-    ):
-        """Initialize database engine and session maker."""
-
-        # Convert postgres:// to postgresql+asyncpg://
+    @staticmethod
+    def _normalize_url(database_url: str) -> str:
+        """Convert postgres:// URLs to postgresql+asyncpg://."""
         if database_url.startswith("postgres://"):
-            database_url = database_url.replace(
-                "postgres://", "postgresql+asyncpg://", 1
-            )
-        elif database_url.startswith("postgresql://"):
-            database_url = database_url.replace(
-                "postgresql://", "postgresql+asyncpg://", 1
-            )
+            return database_url.replace("postgres://", "postgresql+asyncpg://", 1)
+        if database_url.startswith("postgresql://"):
+            return database_url.replace("postgresql://", "postgresql+asyncpg://", 1)
+        return database_url
 
-        # Create engine with optimized pool settings
-        self._engine = create_async_engine(
+    @staticmethod
+    def _create_engine(
+        database_url: str,
+        echo: bool,
+        pool_size: int,
+        max_overflow: int,
+    ) -> AsyncEngine:
+        """Create engine with optimized pool settings."""
+        return create_async_engine(
             database_url,
             echo=echo,
             poolclass=AsyncAdaptedQueuePool,
@@ -109,15 +112,41 @@ class DatabaseSessionManager:
             },
         )
 
-        # Create session maker
-        self._sessionmaker = async_sessionmaker(
-            bind=self._engine,
+    @staticmethod
+    def _create_sessionmaker(engine: AsyncEngine) -> async_sessionmaker:
+        return async_sessionmaker(
+            bind=engine,
             class_=AsyncSession,
             expire_on_commit=False,
             autocommit=False,
             autoflush=False,
         )
 
+    def init(
+        self,
+        database_url: str,
+        echo: bool = False,
+        pool_size: int = DatabaseConfig.POOL_SIZE,
+        max_overflow: int = DatabaseConfig.MAX_OVERFLOW,
+        replica_url: Optional[str] = None,
+    ):
+        """
+        Initialize database engine and session maker.
+
+        If `replica_url` is given, a second pool is created for read-only
+        sessions (see `readonly_session` / `routed_session`).
+        """
+        self._engine = self._create_engine(
+            self._normalize_url(database_url), echo, pool_size, max_overflow
+        )
+        self._sessionmaker = self._create_sessionmaker(self._engine)
+
+        if replica_url:
+            self._replica_engine = self._create_engine(
+                self._normalize_url(replica_url), echo, pool_size, max_overflow
+            )
+            self._replica_sessionmaker = self._create_sessionmaker(self._replica_engine)
+
         # Register event listeners
         self._register_events()
 
@@ -126,29 +155,41 @@ class DatabaseSessionManager:
         logger.info(
             "Database initialized",
             pool_size=pool_size,
-            max_overflow=max_overflow
+            max_overflow=max_overflow,
+            replica=bool(replica_url),
         )
 
+    @property
+    def has_replica(self) -> bool:
+        return self._replica_sessionmaker is not None
+
     def _register_events(self):
         """Register SQLAlchemy event listeners."""
+        for engine in filter(None, (self._engine, self._replica_engine)):
+            self._register_engine_events(engine)
+
+    def _register_engine_events(self, engine: AsyncEngine):
+        """Register pool event listeners on one engine."""
 
-        @event.listens_for(self._engine.sync_engine, "connect")
+        @event.listens_for(engine.sync_engine, "connect")
         def on_connect(dbapi_conn, connection_record):
             """Log new connections."""
             logger.debug("New database connection established")
 
-        @event.listens_for(self._engine.sync_engine, "checkout")
+        @event.listens_for(engine.sync_engine, "checkout")
         def on_checkout(dbapi_conn, connection_record, connection_proxy):
             """Log connection checkout from pool."""
             logger.debug("Connection checked out from pool")
 
-        @event.listens_for(self._engine.sync_engine, "checkin")
+        @event.listens_for(engine.sync_engine, "checkin")
         def on_checkin(dbapi_conn, connection_record):
             """Log connection return to pool."""
             logger.debug("Connection returned to pool")
 
     async def close(self):
         """Close all connections and dispose engine."""
+        if self._replica_engine:
+            await self._replica_engine.dispose()
         if self._engine:
             await self._engine.dispose()
             logger.info("Database connections closed")
@@ -167,11 +208,13 @@ class DatabaseSessionManager:
             raise RuntimeError("Database not initialized")
 
         session = self._sessionmaker()
+        replica_router.record(DbRole.PRIMARY, "sessions")
         try:
             yield session
             await session.commit()
         except SQLAlchemyError as e:
             await session.rollback()
+            replica_router.record(DbRole.PRIMARY, "errors")
             logger.error("Database error", error=str(e))
             raise
         finally:
@@ -187,14 +230,69 @@ class DatabaseSessionManager:
         if not self._initialized:
             raise RuntimeError("Database not initialized")
 
-        session = self._sessionmaker()
+        if self._replica_sessionmaker is not None:
+            role = DbRole.REPLICA
+            session = self._replica_sessionmaker()
+        else:
+            role = DbRole.PRIMARY
+            replica_router.record(DbRole.REPLICA, "fallbacks")
+            session = self._sessionmaker()
+
+        replica_router.record(role, "sessions")
         try:
             # Set session to read-only mode
             await session.execute(text("SET TRANSACTION READ ONLY"))
             yield session
+        except SQLAlchemyError:
+            replica_router.record(role, "errors")
+            raise
         finally:
             await session.close()
 
+    @asynccontextmanager
+    async def routed_session(self) -> AsyncGenerator[AsyncSession, None]:
+        """
+        Get a session for the current route (see app/db/routing.py).
+
+        Replica-routed contexts (GET requests, replica jobs) get a read-only
+        replica session; everything else gets a primary session.
+        """
+        if current_role() == DbRole.REPLICA:
+            async with self.readonly_session() as session:
+                yield session
+        else:
+            async with self.session() as session:
+                yield session
+
+    @staticmethod
+    def _pool_stats(engine: AsyncEngine) -> dict:
+        pool = engine.pool
+        return {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        }
+
+    def pool_metrics(self) -> dict:
+        """Per-pool connection stats and routing counters."""
+        routing = replica_router.stats()
+        pools = {}
+        for role, engine in (
+            (DbRole.PRIMARY, self._engine),
+            (DbRole.REPLICA, self._replica_engine),
+        ):
+            pools[role.value] = {
+                **routing["pools"][role.value],
+                "configured": engine is not None,
+                **(self._pool_stats(engine) if engine is not None else {}),
+            }
+        return {
+            "pools": pools,
+            "sticky_window_seconds": routing["sticky_window_seconds"],
+            "tracked_clients": routing["tracked_clients"],
+        }
+
     async def health_check(self) -> dict:
         """
         Check database health.
@@ -214,7 +312,7 @@ class DatabaseSessionManager:
 
             pool = self._engine.pool
 
-            return {
+            health = {
                 "status": "healthy",
                 "latency_ms": round(latency, 2),
                 "pool": {
@@ -225,6 +323,18 @@ class DatabaseSessionManager:
                     "invalid": pool.invalidated(),
                 }
             }
+
+            if self._replica_engine is not None:
+                start = time.perf_counter()
+                async with self.readonly_session() as session:
+                    result = await session.execute(text("SELECT 1"))
+                    result.scalar()
+                health["replica"] = {
+                    "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+                    "pool": self._pool_stats(self._replica_engine),
+                }
+
+            return health
         except Exception as e:
             logger.error("Database health check failed", error=str(e))
             return {
@@ -301,6 +411,16 @@ async def get_readonly_session() -> AsyncGenerator[AsyncSession, None]:
     async with db.readonly_session() as session:
         yield session
 
+async def get_routed_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    FastAPI dependency that follows replica routing.
+
+    GET requests get a replica session unless the client wrote within the
+    sticky window; all other requests get a primary session.
+    """
+    async with db.routed_session() as session:
+        yield session
+
 # ==================== TRANSACTION HELPERS ====================
 
 @asynccontextmanager
@@ -324,19 +444,34 @@ async def bulk_insert(
     session: AsyncSession,
     model,
     items: list[dict],
-    batch_size: int = 1000
+    batch_size: int = 1000,
+    on_conflict: Optional[list[str]] = None,
+    update_columns: Optional[list[str]] = None,
+    ignore_duplicates: bool = False,
 ):
     """
     Efficiently insert large number of records.
 
-    Uses bulk insert with batching.
+    Uses multi-row INSERT with batching. Pass `on_conflict` to upsert
+    (ON CONFLICT ... DO UPDATE) or `ignore_duplicates` to skip conflicts.
+
+    Runs in the caller's transaction (all-or-nothing). For chunked parallel
+    writes with per-row error reporting and COPY, use
+    `app.db.bulk.SqlAlchemyBulkWriter`.
     """
+    if not items:
+        return
+
+    stmt = build_insert_statement(
+        model.__table__,
+        list(items[0].keys()),
+        on_conflict=on_conflict,
+        update_columns=update_columns,
+        ignore_duplicates=ignore_duplicates,
+    )
     for i in range(0, len(items), batch_size):
         batch = items[i:i + batch_size]
-        await session.execute(
-            model.__table__.insert(),
-            batch
-        )
+        await session.execute(stmt, batch)
     await session.commit()
 
 # ==================== QUERY HELPERS ====================
@@ -360,9 +495,13 @@ class QueryOptimizer:
 
 # ==================== LIFECYCLE HOOKS ====================
 
-async def init_database(database_url: str, echo: bool = False):
-    """Initialize database connection."""
-    db.init(database_url, echo=echo)
+async def init_database(
+    database_url: str,
+    echo: bool = False,
+    replica_url: Optional[str] = None,
+):
+    """Initialize database connection (optionally with a read replica)."""
+    db.init(database_url, echo=echo, replica_url=replica_url)
 
     # Verify connection
     health = await db.health_check()
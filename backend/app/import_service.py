@@ -24,6 +24,7 @@ try:
     from .ai_client import AIClient
 except ModuleNotFoundError:  # pragma: no cover - optional dependency for tests
     AIClient = Any  # type: ignore
+from .db.bulk import BulkWriteResult, SupabaseBulkWriter
 from .schemas import ChatMessage, ImportSummary
 
 logger = logging.getLogger(__name__)
@@ -822,7 +823,13 @@ class LeadImportService:
 
             prepared_rows.append({k: v for k, v in row.items() if v is not None})
 
-        self._insert_rows(prepared_rows)
+        write_result = self._insert_rows(prepared_rows)
+        for row_error in write_result.errors:
+            stats.imported_count -= 1
+            lead = contacts[row_error.index]
+            stats.errors.append(
+                f"Zeile {lead.row_number}: Speichern fehlgeschlagen ({row_error.error})."
+            )
         return ImportSummary(
             total_rows=stats.total_rows,
             imported_count=stats.imported_count,
@@ -871,19 +878,11 @@ class LeadImportService:
 
         return status, next_action, next_action_at, needs_action
 
-    def _insert_rows(self, rows: Sequence[Dict[str, Any]]) -> None:
-        """Schreibt die Daten in Supabase in Batches."""
-
-        if not rows:
-            return
+    def _insert_rows(self, rows: Sequence[Dict[str, Any]]) -> BulkWriteResult:
+        """Schreibt die Daten in Supabase in Batches (fehlerhafte Zeilen werden isoliert)."""
 
-        batch_size = 50
-        for start in range(0, len(rows), batch_size):
-            chunk = rows[start : start + batch_size]
-            response = self._supabase.table("leads").insert(chunk).execute()
-            error = getattr(response, "error", None)
-            if error:
-                raise RuntimeError(f"Supabase-Insert fehlgeschlagen: {error}")
+        writer = SupabaseBulkWriter(self._supabase, "leads", chunk_size=50)
+        return writer.write_sync(rows)
 
 
 __all__ = [
@@ -47,100 +47,23 @@ scheduler = AsyncIOScheduler()
 
 async def scheduled_followup_generation():
     """Background task to generate follow-up suggestions for all users."""
-    from app.supabase_client import get_supabase_client
-    from datetime import datetime, timezone
-    import uuid
+    import asyncio
+    from app.services.followup_generation import run_followup_generation
+    from app.services.job_telemetry import record_failure, record_items
 
     try:
-        supabase = get_supabase_client()
-        print(f"[Scheduler] Starting follow-up generation at {datetime.now()}")
-
-        # Get all unique user_ids with active flows
-        result = supabase.table("leads").select("user_id").not_.is_("flow", "null").execute()
-        user_ids = list(set([lead["user_id"] for lead in result.data if lead.get("user_id")]))
-
-        suggestions_created = 0
-
-        for user_id in user_ids:
-            try:
-                # Find leads with due follow-ups for this user
-                leads_result = supabase.table("leads").select("*").eq(
-                    "user_id", user_id
-                ).not_.is_("flow", "null").lte(
-                    "next_follow_up_at", datetime.now(timezone.utc).isoformat()
-                ).or_("do_not_contact.is.null,do_not_contact.eq.false").execute()
-
-                for lead in leads_result.data:
-                    # Check if suggestion already exists
-                    existing = supabase.table("followup_suggestions").select("id").eq(
-                        "lead_id", lead["id"]
-                    ).eq("status", "pending").execute()
-
-                    if existing.data:
-                        continue  # Skip, already has pending suggestion
-
-                    # Get rule for current stage
-                    rule_result = supabase.table("followup_rules").select("*").eq(
-                        "flow", lead["flow"]
-                    ).eq("stage", lead.get("follow_up_stage", 0)).execute()
-
-                    if not rule_result.data:
-                        continue
-
-                    rule = rule_result.data[0]
-
-                    if not rule.get("template_key"):
-                        continue
-
-                    # Get template
-                    template_result = supabase.table("message_templates").select("*").eq(
-                        "step_key", rule["template_key"]
-                    ).execute()
-
-                    if not template_result.data:
-                        continue
-
-                    template = template_result.data[0]
-
-                    # Personalize message
-                    lead_name = lead.get("name", "").split()[0] if lead.get("name") else ""
-                    message = template["template_text"].replace("{name}", lead_name)
-                    if "{company}" in message:
-                        message = message.replace("{company}", lead.get("company", ""))
-
-                    # Calculate days since last contact
-                    days_waiting = 0
-                    if lead.get("last_outreach_at"):
-                        try:
-                            last_outreach = datetime.fromisoformat(lead["last_outreach_at"].replace("Z", "+00:00"))
-                            days_waiting = (datetime.now(timezone.utc) - last_outreach).days
-                        except Exception:
-                            pass
-
-                    # Create suggestion
-                    supabase.table("followup_suggestions").insert({
-                        "id": str(uuid.uuid4()),
-                        "user_id": user_id,
-                        "lead_id": lead["id"],
-                        "flow": lead["flow"],
-                        "stage": lead.get("follow_up_stage", 0),
-                        "template_key": rule["template_key"],
-                        "channel": lead.get("preferred_channel", "WHATSAPP"),
-                        "suggested_message": message,
-                        "reason": f"Keine Antwort seit {days_waiting} Tagen" if days_waiting > 0 else "Follow-up fällig",
-                        "due_at": datetime.now(timezone.utc).isoformat(),
-                        "status": "pending"
-                    }).execute()
-
-                    suggestions_created += 1
-
-            except Exception as e:
-                print(f"[Scheduler] Error for user {user_id}: {e}")
-
-        print(f"[Scheduler] Generated {suggestions_created} suggestions for {len(user_ids)} users")
-
+        # Sync Supabase client: run the batch pipeline off the event loop
+        # Incremental: only leads due/changed since the last run (daily full scan)
+        report = await asyncio.to_thread(run_followup_generation)
+        record_items(report.created)
+        print(
+            f"[Scheduler] Generated {report.created} suggestions for {report.users} users "
+            f"({report.leads_scanned} due leads, {report.duration_ms:.0f}ms, "
+            f"{report.rows_per_second} rows/s)"
+        )
     except Exception as e:
         print(f"[Scheduler] Error in scheduled_followup_generation: {e}")
+        record_failure(str(e))
 
 
 @asynccontextmanager
@@ -153,9 +76,15 @@ async def lifespan(app: FastAPI):
     setup_scheduler()
     logging.info("📅 Background scheduler started")
 
-    # Follow-up Generator Scheduler starten
+    # Follow-up Generator Scheduler starten (einmal über alle Replicas)
+    from .services.job_coordinator import coordinated
+    from .services.job_telemetry import instrumented
     scheduler.add_job(
-        scheduled_followup_generation,
+        coordinated(
+            "followup_generation",
+            instrumented("followup_generation", scheduled_followup_generation, 15 * 60),
+            interval=15 * 60,
+        ),
         trigger=IntervalTrigger(minutes=15),
         id="followup_generation",
         name="Generate follow-up suggestions",
@@ -397,10 +326,13 @@ from .middleware import (
     RequestIdMiddleware,
     get_development_config,
     RequestContextFilter,
+    DbRoutingMiddleware,
 )
 from .config import get_settings
+from .db.routing import configure_replica_router
 
 settings = get_settings()
+configure_replica_router(settings.db_replica_sticky_seconds)
 
 # 1. Request ID Middleware (zuerst, damit alle Logs die ID haben)
 app.add_middleware(
@@ -417,6 +349,9 @@ app.add_middleware(
     exclude_paths=["/docs", "/openapi.json", "/redoc"]
 )
 
+# 2b. DB Routing Middleware (GET -> Read-Replica, Read-your-writes nach Writes)
+app.add_middleware(DbRoutingMiddleware)
+
 # 3. Rate Limiting Middleware (deaktiviert / fehlerhaftes Argument entfernt)
 # app.add_middleware(
 #     RateLimitMiddleware,
@@ -520,6 +455,7 @@ from .domain.leads.api import router as domain_leads_router  # 🆕 Domain Archi
 from .routers.events import router as events_router  # 🆕 Event Management API
 from .routers.lead_suggestions import router as lead_suggestions_router  # 🆕 Smart Suggestions
 from .routers.ops_deployments import router as ops_deployments_router  # 🆕 AI Ops Deployment Management
+from .routers.ops_jobs import router as ops_jobs_router  # Background Job Telemetry
 from .routers.consent import router as consent_router  # 🛡️ GDPR Consent Management
 from .routers.privacy import router as privacy_router  # 🛡️ GDPR Privacy Operations
 from .routers.user_learning import router as user_learning_router  # 🧠 User Learning & Personalization
@@ -608,6 +544,7 @@ app.include_router(command_center_router, prefix="/api")  # 🆕 Command Center
 app.include_router(events_router, prefix="/api")  # 🆕 Event Management API
 app.include_router(lead_suggestions_router, prefix="/api")  # 🆕 Smart Suggestions
 app.include_router(ops_deployments_router, prefix="/api")  # 🆕 AI Ops Deployment Management
+app.include_router(ops_jobs_router, prefix="/api")  # Background Job Telemetry
 app.include_router(consent_router, prefix="/api")  # 🛡️ GDPR Consent Management
 app.include_router(privacy_router, prefix="/api")  # 🛡️ GDPR Privacy Operations
 app.include_router(user_learning_router, prefix="/api")  # 🧠 User Learning & Personalization
@@ -5,6 +5,7 @@ Enthält:
 - RateLimitMiddleware: Tiered Rate Limiting
 - SecurityHeadersMiddleware: Security Headers (CSP, HSTS, etc.)
 - RequestIdMiddleware: Request Tracking & Logging
+- DbRoutingMiddleware: Read-Replica Routing für GET-Traffic
 """
 
 from .rate_limiter import (
@@ -36,6 +37,8 @@ from .request_id import (
     configure_logging_with_request_id,
 )
 
+from .db_routing import DbRoutingMiddleware
+
 __all__ = [
     # Rate Limiting
     "RateLimitMiddleware",
@@ -62,5 +65,8 @@ __all__ = [
     "get_request_id",
     "get_correlation_id",
     "configure_logging_with_request_id",
+    
+    # Database Routing
+    "DbRoutingMiddleware",
 ]
 
@@ -0,0 +1,117 @@
+"""
+Database Routing Middleware for SalesFlow AI.
+
+Routes read-only requests to the read replica:
+- GET/HEAD/OPTIONS run with the replica role (see app/db/routing.py)
+- Writes run on the primary and make the client "sticky" to the primary
+  for a short window (read-your-writes)
+- Stickiness is tracked per worker and mirrored in a short-lived cookie,
+  so the next read on another worker also sees the write
+"""
+import time
+from typing import Callable, Optional
+
+from fastapi import Request, Response
+from starlette.middleware.base import BaseHTTPMiddleware
+import logging
+
+from app.db.routing import (
+    DbRole,
+    ReplicaRouter,
+    ReplicaRoutingConfig,
+    client_fingerprint,
+    replica_router,
+    use_role,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class DbRoutingMiddleware(BaseHTTPMiddleware):
+    """
+    Middleware that sets the database role for each request.
+
+    Features:
+    - Replica for read methods, primary for writes
+    - Read-your-writes stickiness after successful writes
+    - Optional X-DB-Route response header for debugging
+
+    Usage:
+        app.add_middleware(DbRoutingMiddleware)
+    """
+
+    def __init__(
+        self,
+        app,
+        router: Optional[ReplicaRouter] = None,
+        primary_paths: Optional[list[str]] = None,
+        cookie_name: str = ReplicaRoutingConfig.STICKY_COOKIE,
+        expose_header: bool = True,
+    ):
+        """
+        Args:
+            router: ReplicaRouter instance (default: singleton).
+            primary_paths: Path prefixes that always use the primary,
+                even for GET (e.g. auth callbacks that write).
+            cookie_name: Cookie used to carry stickiness across workers.
+            expose_header: Add X-DB-Route to responses.
+        """
+        super().__init__(app)
+        self.router = router or replica_router
+        self.primary_paths = primary_paths or ["/api/auth", "/health"]
+        self.cookie_name = cookie_name
+        self.expose_header = expose_header
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        """Run the request with the chosen database role."""
+        client = client_fingerprint(
+            authorization=request.headers.get("authorization"),
+            user_id=request.headers.get("x-user-id"),
+            client_ip=request.client.host if request.client else None,
+        )
+
+        if self._is_primary_path(request.url.path):
+            role = DbRole.PRIMARY
+        else:
+            role = self.router.route_for(
+                request.method,
+                client=client,
+                cookie_until=self._cookie_until(request),
+            )
+
+        request.state.db_role = role.value
+
+        with use_role(role):
+            response = await call_next(request)
+
+        is_write = request.method.upper() not in ReplicaRoutingConfig.READ_METHODS
+        if is_write and response.status_code < 400:
+            until = self.router.mark_write(client)
+            response.set_cookie(
+                self.cookie_name,
+                f"{until:.3f}",
+                max_age=max(1, int(self.router.sticky_window_seconds) + 1),
+                httponly=True,
+                samesite="lax",
+            )
+
+        if self.expose_header:
+            response.headers["X-DB-Route"] = role.value
+
+        return response
+
+    def _is_primary_path(self, path: str) -> bool:
+        return any(path.startswith(prefix) for prefix in self.primary_paths)
+
+    def _cookie_until(self, request: Request) -> Optional[float]:
+        raw = request.cookies.get(self.cookie_name)
+        if not raw:
+            return None
+        try:
+            until = float(raw)
+        except ValueError:
+            return None
+        # Ignore forged values beyond the configured window
+        if until > time.time() + self.router.sticky_window_seconds:
+            return None
+        return until
@@ -9,11 +9,12 @@ Multi-layer rate limiting with:
 - User-based limits
 - Endpoint-specific limits
 - Burst protection
-- Redis backend
+- Redis backend (one atomic script call per check, see app/core/rate_limit.py)
+- In-process fallback when Redis is unavailable
 """
 
-import time
 import hashlib
+import math
 from typing import Callable, Optional, Tuple
 from functools import wraps
 
@@ -23,6 +24,8 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from redis.asyncio import Redis
 import structlog
 
+from app.core.rate_limit import RateLimiter
+
 logger = structlog.get_logger()
 
 class RateLimitConfig:
@@ -66,22 +69,31 @@ class RateLimitExceeded(HTTPException):
         )
         self.retry_after = retry_after
 
+def rate_limit_key(prefix: str, identifier: str, endpoint: str) -> str:
+    """Generate rate limit key."""
+    # Hash endpoint to avoid special characters
+    endpoint_hash = hashlib.md5(endpoint.encode()).hexdigest()[:8]
+    return f"{prefix}:{endpoint_hash}:{identifier}"
+
 class SlidingWindowRateLimiter:
     """
-    Sliding window rate limiter using Redis.
+    Sliding window rate limiter (GCRA engine, one Redis round-trip).
 
     More accurate than fixed window, prevents burst at window boundaries.
     """
 
-    def __init__(self, redis: Redis, prefix: str = "ratelimit"):
-        self.redis = redis
+    def __init__(
+        self,
+        redis: Optional[Redis] = None,
+        prefix: str = "ratelimit",
+        engine: Optional[RateLimiter] = None
+    ):
+        self.engine = engine or RateLimiter(redis)
         self.prefix = prefix
 
     def _get_key(self, identifier: str, endpoint: str) -> str:
         """Generate rate limit key."""
-        # Hash endpoint to avoid special characters
-        endpoint_hash = hashlib.md5(endpoint.encode()).hexdigest()[:8]
-        return f"{self.prefix}:{endpoint_hash}:{identifier}"
+        return rate_limit_key(self.prefix, identifier, endpoint)
 
     async def is_allowed(
         self,
@@ -95,72 +107,51 @@ class SlidingWindowRateLimiter:
 
         Returns: (is_allowed, remaining_requests, reset_time)
         """
-        key = self._get_key(identifier, endpoint)
-        now = time.time()
-        window_start = now - window_seconds
-
-        pipe = self.redis.pipeline()
-
-        # Remove old entries
-        pipe.zremrangebyscore(key, 0, window_start)
-
-        # Count current requests
-        pipe.zcard(key)
-
-        # Add current request (will be rolled back if not allowed)
-        pipe.zadd(key, {str(now): now})
-
-        # Set expiry
-        pipe.expire(key, window_seconds)
-
-        results = await pipe.execute()
-        current_count = results[1]
-
-        if current_count >= max_requests:
-            # Remove the request we just added
-            await self.redis.zrem(key, str(now))
-
-            # Get oldest entry time for reset calculation
-            oldest = await self.redis.zrange(key, 0, 0, withscores=True)
-            reset_time = int(oldest[0][1] + window_seconds - now) if oldest else window_seconds
-
-            return False, 0, reset_time
-
-        remaining = max_requests - current_count - 1
-        reset_time = window_seconds
-
-        return True, remaining, reset_time
+        result = await self.engine.hit(
+            self._get_key(identifier, endpoint), max_requests, window_seconds
+        )
+        if not result.allowed:
+            return False, 0, max(1, math.ceil(result.retry_after))
+        return True, result.remaining, math.ceil(result.reset_after)
 
     async def get_usage(
         self,
         identifier: str,
         endpoint: str,
-        window_seconds: int
+        window_seconds: int,
+        max_requests: int = RateLimitConfig.DEFAULT_REQUESTS_PER_MINUTE
     ) -> int:
-        """Get current request count in window."""
-        key = self._get_key(identifier, endpoint)
-        now = time.time()
-        window_start = now - window_seconds
+        """
+        Get current request count in window (without counting a request).
 
-        # Clean old entries and count
-        await self.redis.zremrangebyscore(key, 0, window_start)
-        return await self.redis.zcard(key)
+        `max_requests` must be the limit the key is checked with in
+        `is_allowed`; usage is derived from the GCRA state under that limit.
+        """
+        result = await self.engine.hit(
+            self._get_key(identifier, endpoint), max_requests, window_seconds, cost=0
+        )
+        return max(0, max_requests - result.remaining)
 
 class TokenBucketRateLimiter:
     """
     Token bucket rate limiter for burst protection.
 
-    Allows short bursts while maintaining long-term rate limits.
+    Allows short bursts while maintaining long-term rate limits
+    (GCRA with burst = bucket size, same engine as the sliding window).
     """
 
-    def __init__(self, redis: Redis, prefix: str = "tokenbucket"):
-        self.redis = redis
+    def __init__(
+        self,
+        redis: Optional[Redis] = None,
+        prefix: str = "tokenbucket",
+        engine: Optional[RateLimiter] = None
+    ):
+        self.engine = engine or RateLimiter(redis)
         self.prefix = prefix
 
     def _get_key(self, identifier: str, endpoint: str) -> str:
         """Generate bucket key."""
-        endpoint_hash = hashlib.md5(endpoint.encode()).hexdigest()[:8]
-        return f"{self.prefix}:{endpoint_hash}:{identifier}"
+        return rate_limit_key(self.prefix, identifier, endpoint)
 
     async def is_allowed(
         self,
@@ -175,42 +166,14 @@ class TokenBucketRateLimiter:
 
         Returns: (is_allowed, remaining_tokens)
         """
-        key = self._get_key(identifier, endpoint)
-        now = time.time()
-
-        # Get current state
-        data = await self.redis.hgetall(key)
-
-        if not data:
-            # Initialize bucket
-            tokens = bucket_size - tokens_required
-            await self.redis.hset(key, mapping={
-                "tokens": tokens,
-                "last_refill": now
-            })
-            await self.redis.expire(key, 3600)  # 1 hour expiry
-            return True, tokens
-
-        tokens = float(data.get("tokens", bucket_size))
-        last_refill = float(data.get("last_refill", now))
-
-        # Calculate refilled tokens
-        time_passed = now - last_refill
-        tokens = min(bucket_size, tokens + (time_passed * refill_rate))
-
-        if tokens < tokens_required:
-            # Not enough tokens
-            return False, int(tokens)
-
-        # Consume tokens
-        tokens -= tokens_required
-
-        await self.redis.hset(key, mapping={
-            "tokens": tokens,
-            "last_refill": now
-        })
-
-        return True, int(tokens)
+        result = await self.engine.hit(
+            self._get_key(identifier, endpoint),
+            limit=refill_rate,
+            period=1.0,
+            burst=bucket_size,
+            cost=tokens_required,
+        )
+        return result.allowed, result.remaining
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
     """
@@ -225,14 +188,16 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
     def __init__(
         self,
         app,
-        redis: Redis,
+        redis: Optional[Redis] = None,
         enabled: bool = True,
         exclude_paths: list[str] = None
     ):
         super().__init__(app)
         self.enabled = enabled
-        self.sliding_limiter = SlidingWindowRateLimiter(redis)
-        self.burst_limiter = TokenBucketRateLimiter(redis)
+        # One engine (and one lease table) for both checks
+        self.engine = RateLimiter(redis)
+        self.sliding_limiter = SlidingWindowRateLimiter(engine=self.engine)
+        self.burst_limiter = TokenBucketRateLimiter(engine=self.engine)
         self.exclude_paths = exclude_paths or ["/health", "/docs", "/openapi.json"]
 
     def _get_client_ip(self, request: Request) -> str:
@@ -340,7 +305,7 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
                     "window": window
                 },
                 headers={
-                    "Retry-After": str(retry_after),
+                    "Retry-After": str(reset_time),
                     "X-RateLimit-Limit": str(max_requests),
                     "X-RateLimit-Remaining": "0",
                     "X-RateLimit-Reset": str(reset_time)
@@ -378,6 +343,19 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
 
 # ==================== DECORATORS ====================
 
+def _get_app_engine(request: Request) -> RateLimiter:
+    """
+    Shared engine per app (Redis from app state, in-process without it).
+
+    Reused across requests so leases and the fallback state persist.
+    """
+    state = request.app.state
+    engine = getattr(state, "rate_limiter", None)
+    if engine is None:
+        engine = RateLimiter(getattr(state, "redis", None))
+        state.rate_limiter = engine
+    return engine
+
 def rate_limit(
     max_requests: int = 100,
     window_seconds: int = 60,
@@ -395,10 +373,7 @@ def rate_limit(
     def decorator(func: Callable):
         @wraps(func)
         async def wrapper(request: Request, *args, **kwargs):
-            # Get Redis from app state
-            redis = getattr(request.app.state, "redis", None)
-            if not redis:
-                return await func(request, *args, **kwargs)
+            limiter = SlidingWindowRateLimiter(engine=_get_app_engine(request))
 
             # Get identifier
             if key_func:
@@ -406,7 +381,6 @@ def rate_limit(
             else:
                 identifier = request.client.host if request.client else "unknown"
 
-            limiter = SlidingWindowRateLimiter(redis)
             allowed, remaining, reset = await limiter.is_allowed(
                 identifier=identifier,
                 endpoint=f"{func.__module__}.{func.__name__}",
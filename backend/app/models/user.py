@@ -7,7 +7,7 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import Boolean, Column, DateTime, String, Text
+from sqlalchemy import Boolean, Column, DateTime, Integer, String, Text
 from sqlalchemy.orm import Mapped
 from sqlalchemy.sql import func
 
@@ -27,6 +27,8 @@ class User(Base):
     is_active: Mapped[bool] = Column(Boolean, default=True, nullable=False)
     is_verified: Mapped[bool] = Column(Boolean, default=False, nullable=False)
     role: Mapped[str] = Column(String(50), default="user", nullable=False)
+    # Bumped on deactivation/role change; older access tokens are rejected
+    token_version: Mapped[int] = Column(Integer, default=0, server_default="0", nullable=False)
     created_at: Mapped[datetime] = Column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -264,6 +264,25 @@ class InMemoryFollowUpRepository(FollowUpRepository):
     async def list_all_leads(self) -> List[LeadContext]:
         return list(self._leads.values())
 
+    async def get_lead_contexts(self, lead_ids: List[UUID]) -> Dict[UUID, LeadContext]:
+        return {lead_id: self._leads[lead_id] for lead_id in lead_ids if lead_id in self._leads}
+
+    async def get_active_sequence_states(self, lead_ids: List[UUID]) -> Dict[UUID, FollowUpSequenceState]:
+        return {lead_id: self._states[lead_id] for lead_id in lead_ids if lead_id in self._states}
+
+    async def get_recent_interactions_bulk(
+        self, lead_ids: List[UUID], limit: int = 20
+    ) -> Dict[UUID, List[Dict[str, Any]]]:
+        return {lead_id: self._interactions.get(lead_id, [])[:limit] for lead_id in lead_ids}
+
+    async def upsert_sequence_states(self, states: List[FollowUpSequenceState]) -> List[FollowUpSequenceState]:
+        for state in states:
+            self._states[state.lead_id] = state
+        return states
+
+    async def log_followup_suggestions(self, suggestions: List[FollowUpSuggestion]) -> None:
+        self._suggestions_log.extend(suggestions)
+
     # ─────────────────────────────────
     # Debug Helpers
     # ─────────────────────────────────
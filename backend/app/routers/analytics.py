@@ -20,12 +20,17 @@ from datetime import datetime
 from fastapi import APIRouter, HTTPException, Header, Query
 from pydantic import BaseModel, Field
 
-from app.supabase_client import get_supabase_client, SupabaseNotConfiguredError
+from app.supabase_client import (
+    get_supabase_client,
+    get_routed_supabase_client,
+    SupabaseNotConfiguredError,
+)
 from app.services.predictive_scoring import (
     recalc_p_scores_for_user,
     get_hot_leads,
     calculate_p_score_for_lead,
 )
+from app.services.cache_warming import CacheWarmingConfig, read_view
 from app.services.next_best_action import (
     compute_next_best_action_for_lead,
     get_nba_batch_for_user,
@@ -206,8 +211,8 @@ async def calculate_single_p_score(
 
 @router.get("/hot-leads", response_model=HotLeadsResponse)
 async def get_hot_leads_endpoint(
-    min_score: float = Query(default=75, ge=0, le=100),
-    limit: int = Query(default=20, ge=1, le=100),
+    min_score: float = Query(default=CacheWarmingConfig.HOT_LEADS_MIN_SCORE, ge=0, le=100),
+    limit: int = Query(default=CacheWarmingConfig.HOT_LEADS_LIMIT, ge=1, le=100),
     x_user_id: Optional[str] = Header(default=None, alias="X-User-Id"),
 ):
     """
@@ -221,14 +226,18 @@ async def get_hot_leads_endpoint(
     logger.info(f"Hot leads request: min_score={min_score}, limit={limit}")
     
     try:
-        db = get_supabase_client()
+        db = get_routed_supabase_client()
         
-        leads = await get_hot_leads(
-            db=db,
-            user_id=user_id,
-            min_score=min_score,
-            limit=limit,
-        )
+        if (min_score, limit) == (CacheWarmingConfig.HOT_LEADS_MIN_SCORE, CacheWarmingConfig.HOT_LEADS_LIMIT):
+            # Default-Filter: vorberechnet vom Cache-Warming
+            leads, _meta = await read_view("hot_leads", user_id, db)
+        else:
+            leads = await get_hot_leads(
+                db=db,
+                user_id=user_id,
+                min_score=min_score,
+                limit=limit,
+            )
         
         return HotLeadsResponse(
             success=True,
@@ -323,7 +332,7 @@ async def get_nba_batch(
     logger.info(f"NBA batch request: user={user_id}, limit={limit}")
     
     try:
-        db = get_supabase_client()
+        db = get_routed_supabase_client()
         
         recommendations = await get_nba_batch_for_user(
             db=db,
@@ -20,6 +20,8 @@ from ..core.security import (
     create_token_pair,
     get_current_active_user,
     hash_password,
+    invalidate_principal,
+    principal_claims,
     verify_password,
     verify_refresh_token,
 )
@@ -146,7 +148,7 @@ async def signup(
             logger.warning(f"Could not create profile for user {user_id}: {e}")
 
         # Create tokens
-        tokens = create_token_pair(user_id, user_email)
+        tokens = create_token_pair(user_id, user_email, claims=principal_claims(user))
         
         logger.debug(f"Signup: Token pair created. Type: {type(tokens)}")
 
@@ -240,7 +242,9 @@ async def login(
                 )
 
         # Create tokens mit unseren JWT Claims
-        tokens = create_token_pair(user_id, user_data.get("email", email_lower))
+        tokens = create_token_pair(
+            user_id, user_data.get("email", email_lower), claims=principal_claims(user_data)
+        )
         
         # Debug: Log token creation
         logger.debug(f"Login: Token pair created. Type: {type(tokens)}")
@@ -312,7 +316,7 @@ async def refresh_token(
             )
 
         # Create new tokens
-        tokens = create_token_pair(user["id"], user["email"])
+        tokens = create_token_pair(user["id"], user["email"], claims=principal_claims(user))
         
         # Debug: Log token creation
         logger.debug(f"Refresh: Token pair created. Type: {type(tokens)}")
@@ -342,11 +346,18 @@ async def refresh_token(
 
 
 @router.post("/logout")
-async def logout() -> Dict[str, str]:
+async def logout(
+    current_user: Dict[str, Any] = Depends(get_current_active_user),
+) -> Dict[str, str]:
     """
     Logout endpoint (client-side token removal).
+    Drops this worker's cached principal for the user; the next request
+    with any of the user's tokens re-reads the users row.
     In a real implementation, you might want to blacklist tokens.
     """
+    user_id = current_user.get("sub")
+    if user_id:
+        invalidate_principal(user_id)
     return {"message": "Successfully logged out"}
 
 
@@ -4,8 +4,8 @@ Endpunkte für CHIEF (AI Assistant) Funktionalitäten
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Body
-from typing import Dict, Any, Optional
-from pydantic import BaseModel
+from typing import Dict, Any, List, Optional
+from pydantic import BaseModel, Field
 from datetime import datetime, timedelta
 import logging
 import json
@@ -16,6 +16,7 @@ from ..core.security import get_current_active_user, get_current_user_dict
 # Note: supabase client is obtained via get_supabase() dependency in endpoints
 from app.ai_client import AIClient
 from app.config import get_settings
+from app.services.queue_message_generator import generate_queue_messages
 
 settings = get_settings()
 
@@ -447,6 +448,41 @@ Nachricht:"""
         )
 
 
+class GenerateQueueMessagesRequest(BaseModel):
+    queue_ids: List[str] = Field(..., min_length=1, max_length=100)
+
+
+@router.post("/generate-queue-messages")
+async def generate_queue_messages_batch(
+    request: GenerateQueueMessagesRequest,
+    current_user=Depends(get_current_active_user),
+    db=Depends(get_supabase),
+) -> Dict[str, Any]:
+    """
+    Generiert Nachrichten für mehrere Queue-Items auf einmal (z.B. beim Öffnen der Queue).
+    Items mit gleichem Template/State/Sprache teilen sich einen AI-Call.
+    """
+    user_id = _extract_user_id(current_user)
+    
+    if not settings.openai_api_key:
+        raise HTTPException(
+            status_code=503,
+            detail="OpenAI API Key nicht konfiguriert"
+        )
+    
+    ai_client = AIClient(
+        api_key=settings.openai_api_key,
+        model="gpt-4o-mini",  # Wie der Einzel-Endpoint
+    )
+    result = await generate_queue_messages(db, request.queue_ids, user_id, ai_client)
+    if not result.get("success"):
+        raise HTTPException(
+            status_code=500,
+            detail=f"Fehler beim Generieren der Nachrichten: {result.get('error')}"
+        )
+    return result
+
+
 # ============================================================================
 # REPLY FLOW ENDPOINTS
 # ============================================================================
@@ -9,13 +9,13 @@ from typing import Optional, List, Dict, Any
 import json
 import logging
 
-from app.core.deps import get_supabase
+from app.core.deps import get_supabase, get_supabase_read
 from app.core.security import get_current_user_dict
 from app.ai_client import AIClient
 from app.core.config import get_settings
 from app.ai.chief_identity import get_chief_system_prompt, is_ceo_user, get_vertical_context
 from app.services.workflow_engine import detect_workflow_status
-from app.services.chief_brain import ChiefBrain
+from app.services.cache_warming import invalidate_views, read_view
 
 router = APIRouter(
     prefix="/command-center", 
@@ -24,6 +24,14 @@ router = APIRouter(
 )
 logger = logging.getLogger(__name__)
 
+async def invalidate_queue_after_write(current_user: dict = Depends(get_current_user_dict)):
+    """Nach erfolgreichen Writes gecachte Queue/Dashboard des Users verwerfen."""
+    yield
+    user_id = current_user.get("user_id") or current_user.get("sub") or current_user.get("id")
+    if user_id:
+        await invalidate_views(user_id)
+
+
 # ============================================================================
 # AGGREGATION ENDPOINT - Alles für einen Lead in einem Request
 # ============================================================================
@@ -35,7 +43,7 @@ logger = logging.getLogger(__name__)
 @router.get("/queue")
 async def get_smart_queue(
     current_user: dict = Depends(get_current_user_dict),
-    supabase = Depends(get_supabase)
+    supabase = Depends(get_supabase_read)
 ):
     """
     Get prioritized queue using CHIEF Brain.
@@ -48,53 +56,9 @@ async def get_smart_queue(
         raise HTTPException(status_code=401, detail="User not authenticated")
     
     try:
-        # Nutze CHIEF Brain für priorisierte Queue
-        brain = ChiefBrain(supabase, user_id)
-        queue_items = await brain.get_prioritized_queue(limit=20)
-        
-        # Transformiere in das erwartete Format
-        queue = {
-            "action_required": [],   # Lead wartet auf Antwort
-            "followups_today": [],   # Follow-ups fällig
-            "hot_leads": [],         # Hot ohne Aktivität 24h
-            "new_leads": [],         # Noch nie kontaktiert
-            "nurture": [],           # >7 Tage kein Kontakt
-            "appointments_today": [] # Termine heute
-        }
-        
-        for item in queue_items:
-            lead = item['lead']
-            workflow = item['workflow']
-            
-            # Füge workflow als suggested_action hinzu (für Kompatibilität)
-            lead["suggested_action"] = workflow
-            lead["priority"] = workflow.get('priority', 'medium')
-            lead["workflow"] = workflow
-            
-            # Kategorisiere basierend auf Workflow Case
-            case = workflow.get('case', '').upper()
-            
-            if case == 'RESPONSE_RECEIVED':
-                queue["action_required"].append(lead)
-            elif case == 'FOLLOWUP_DUE':
-                queue["followups_today"].append(lead)
-            elif case == 'HOT_LEAD':
-                queue["hot_leads"].append(lead)
-            elif case == 'NEW_LEAD':
-                queue["new_leads"].append(lead)
-            elif case == 'GONE_COLD':
-                queue["nurture"].append(lead)
-            elif case == 'QUALIFIED':
-                queue["action_required"].append(lead)
-            else:
-                # Default: in new_leads
-                queue["new_leads"].append(lead)
-        
-        return {
-            "queue": queue,
-            "total_actionable": sum(len(v) for v in queue.values()),
-            "generated_at": datetime.now().isoformat()
-        }
+        # CHIEF Brain Queue, vorberechnet vom Cache-Warming (siehe cache_warming)
+        queue, _meta = await read_view("command_queue", user_id, supabase)
+        return queue
         
     except Exception as e:
         logger.error(f"Error generating smart queue: {e}")
@@ -385,7 +349,8 @@ async def update_lead(
     lead_id: str,
     request: dict,
     current_user: dict = Depends(get_current_user_dict),
-    supabase = Depends(get_supabase)
+    supabase = Depends(get_supabase),
+    _invalidate=Depends(invalidate_queue_after_write),
 ):
     """
     Update Lead Status/Temperature oder andere Felder.
@@ -819,7 +784,8 @@ def format_followups_for_prompt(followups: list) -> str:
 async def process_lead_reply(
     request: dict,
     current_user: dict = Depends(get_current_user_dict),
-    supabase = Depends(get_supabase)
+    supabase = Depends(get_supabase),
+    _invalidate=Depends(invalidate_queue_after_write),
 ):
     """
     Analysiert eine Lead-Antwort und:
@@ -1213,7 +1179,8 @@ async def bulk_extract_leads(
 async def bulk_import_leads(
     request: dict,
     current_user: dict = Depends(get_current_user_dict),
-    supabase = Depends(get_supabase)
+    supabase = Depends(get_supabase),
+    _invalidate=Depends(invalidate_queue_after_write),
 ):
     """
     Importiert mehrere Leads auf einmal.
@@ -1378,7 +1345,8 @@ async def mark_lead_processed(
     lead_id: str,
     body: dict = Body(default={}),
     current_user: dict = Depends(get_current_user_dict),
-    supabase = Depends(get_supabase)
+    supabase = Depends(get_supabase),
+    _invalidate=Depends(invalidate_queue_after_write),
 ):
     """
     Markiert einen Lead als bearbeitet.
@@ -1561,7 +1529,8 @@ async def create_interaction(
     lead_id: str,
     interaction: dict = Body(...),
     current_user: dict = Depends(get_current_user_dict),
-    supabase = Depends(get_supabase)
+    supabase = Depends(get_supabase),
+    _invalidate=Depends(invalidate_queue_after_write),
 ):
     """
     Erstellt eine neue Interaction für einen Lead.
@@ -1630,7 +1599,7 @@ async def create_interaction(
 async def get_interactions(
     lead_id: str,
     current_user: dict = Depends(get_current_user_dict),
-    supabase = Depends(get_supabase)
+    supabase = Depends(get_supabase_read)
 ):
     """Holt alle Interactions für einen Lead."""
     user_id = current_user.get("user_id") or current_user.get("sub") or current_user.get("id")
@@ -1656,7 +1625,7 @@ async def get_interactions(
 @router.get("/team/downline")
 async def get_downline_partners(
     current_user: dict = Depends(get_current_user_dict),
-    supabase = Depends(get_supabase)
+    supabase = Depends(get_supabase_read)
 ):
     """
     Holt alle Downline-Partner des Users für Lead Cascade.
@@ -7,8 +7,10 @@ from pydantic import BaseModel
 from typing import Optional, List
 import logging
 
+from ..core.deps import get_supabase_read
 from ..core.security import get_current_active_user
 from ..db.session import get_db
+from ..services.cache_warming import invalidate_views, read_view
 from ..services.daily_briefing import DailyBriefingService
 
 router = APIRouter(
@@ -25,7 +27,7 @@ class MarkContactedRequest(BaseModel):
 @router.get("/today")
 async def get_today_briefing(
     current_user = Depends(get_current_active_user),
-    db = Depends(get_db)
+    db = Depends(get_supabase_read)
 ):
     """
     Get today's most important tasks for the user.
@@ -37,36 +39,9 @@ async def get_today_briefing(
         if not user_id:
             raise HTTPException(status_code=401, detail="User not authenticated")
 
-        # Get daily briefing
-        service = DailyBriefingService(db)
-        briefing = await service.get_daily_briefing(user_id)
-
-        return {
-            "leads": [
-                {
-                    "id": lead.id,
-                    "name": lead.name,
-                    "company": lead.company,
-                    "phone": lead.phone,
-                    "email": lead.email,
-                    "status": lead.status,
-                    "score": lead.score,
-                    "last_contact": lead.last_contact,
-                    "next_follow_up": lead.next_follow_up,
-                    "reason": lead.reason,
-                    "reason_text": lead.reason_text,
-                    "priority": lead.priority
-                }
-                for lead in briefing.leads
-            ],
-            "stats": {
-                "overdue": briefing.stats.overdue,
-                "today": briefing.stats.today,
-                "hot": briefing.stats.hot,
-                "total": briefing.stats.total
-            },
-            "last_updated": briefing.last_updated
-        }
+        # Daily briefing, vorberechnet vom Cache-Warming
+        briefing, _meta = await read_view("dashboard", user_id, db)
+        return briefing
 
     except Exception as e:
         logger.exception(f"Error getting today briefing: {e}")
@@ -95,6 +70,8 @@ async def mark_lead_contacted(
         if not success:
             raise HTTPException(status_code=500, detail="Failed to mark lead as contacted")
 
+        await invalidate_views(user_id)
+
         return {"success": True, "message": "Lead marked as contacted"}
 
     except HTTPException:
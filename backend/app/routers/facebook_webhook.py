@@ -57,7 +57,7 @@ async def handle_facebook_webhook(
 ):
     raw_body = await request.body()
     client_ip = request.client.host if request.client else "0.0.0.0"
-    enforce_rate_limit(client_ip, key_prefix="facebook_webhook")
+    await enforce_rate_limit(client_ip, key_prefix="facebook_webhook")
     enforce_ip_whitelist(client_ip, allowed_cidrs=settings.facebook_webhook_ip_whitelist)
 
     verify_facebook_signature(raw_body, request, settings.facebook_app_secret)
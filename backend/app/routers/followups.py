@@ -26,6 +26,7 @@ from app.models.followup import (
 )
 from app.repositories.followup_repository_mock import InMemoryFollowUpRepository
 from app.services.followup_engine import FollowUpEngine
+from app.services.followup_due_index import InMemoryDueIndex
 from app.services.timezone_service import DefaultTimezoneService
 from app.services.ai_router_dummy import DummyAIRouter
 from app.core.security import get_current_active_user
@@ -33,6 +34,8 @@ from app.core.deps import get_supabase
 from app.core.security.main import get_current_user
 from app.core.deps import get_supabase as get_db
 from app.services.activity_logger import ActivityLogger
+from app.services.cache_warming import CacheWarmingConfig, invalidate_views, read_view
+from app.services.daily_briefing import get_pending_suggestions
 import uuid
 import time
 import logging
@@ -58,18 +61,21 @@ def get_repository() -> InMemoryFollowUpRepository:
     return _repo_singleton
 
 
-def get_engine() -> FollowUpEngine:
-    """Gibt die Follow-Up Engine zurück (Singleton)."""
+async def get_engine() -> FollowUpEngine:
+    """Gibt die Follow-Up Engine zurück (Singleton, Due-Index beim ersten Aufruf aufgebaut)."""
     global _engine_singleton
     if _engine_singleton is None:
         repo = get_repository()
         tz_service = DefaultTimezoneService(default_tz="Europe/Vienna")
         ai_router = DummyAIRouter()
-        _engine_singleton = FollowUpEngine(
+        engine = FollowUpEngine(
             repo=repo,
             ai_router=ai_router,
             tz_service=tz_service,
+            due_index=InMemoryDueIndex(),
         )
+        await engine.rebuild_due_index()
+        _engine_singleton = engine
     return _engine_singleton
 
 
@@ -86,6 +92,12 @@ def _extract_user_id(current_user) -> str:
     return str(user_id)
 
 
+async def invalidate_views_after_write(current_user=Depends(get_current_active_user)):
+    """Nach erfolgreichen Writes gecachte Follow-up-/Queue-Ansichten verwerfen."""
+    yield
+    await invalidate_views(_extract_user_id(current_user))
+
+
 # ============================================================================
 # Lead-bezogene Follow-up Aktionen (Mapping für Frontend Buttons)
 # ============================================================================
@@ -96,6 +108,7 @@ async def mark_responded(
     lead_id: str,
     current_user=Depends(get_current_active_user),
     db=Depends(get_db),
+    _invalidate=Depends(invalidate_views_after_write),
 ):
     """Markiert Follow-up als beantwortet."""
     user_id = current_user.get("sub") or current_user.get("id")
@@ -117,6 +130,7 @@ async def mark_completed(
     lead_id: str,
     current_user=Depends(get_current_active_user),
     db=Depends(get_db),
+    _invalidate=Depends(invalidate_views_after_write),
 ):
     """Markiert Follow-up als erledigt."""
     user_id = current_user.get("sub") or current_user.get("id")
@@ -138,6 +152,7 @@ async def mark_no_response(
     lead_id: str,
     current_user=Depends(get_current_active_user),
     db=Depends(get_db),
+    _invalidate=Depends(invalidate_views_after_write),
 ):
     """Markiert als keine Antwort erhalten und plant neuen Follow-up."""
     user_id = current_user.get("sub") or current_user.get("id")
@@ -166,6 +181,7 @@ async def mark_lost(
     lead_id: str,
     current_user=Depends(get_current_active_user),
     db=Depends(get_db),
+    _invalidate=Depends(invalidate_views_after_write),
 ):
     """Markiert Follow-up als verloren."""
     user_id = current_user.get("sub") or current_user.get("id")
@@ -224,6 +240,7 @@ async def start_sequence_v2(
     lead_id: str,
     current_user=Depends(get_current_active_user),
     db=Depends(get_db),
+    _invalidate=Depends(invalidate_views_after_write),
 ):
     """Startet eine Follow-up Sequenz für einen Lead (Tag 1, 3, 7)."""
     user_id = _extract_user_id(current_user)
@@ -329,6 +346,7 @@ class BatchFollowUpResponse(BaseModel):
     """Response für Batch Follow-up Mode"""
     generated: int
     messages: List[AIMessage]
+    report: Optional[Dict[str, Any]] = None     # Calls, Kosten/Latenz pro Nachricht vs. Einzel-Calls
 
 
 # ─────────────────────────────────
@@ -471,6 +489,7 @@ async def snooze_followup(
     lead_id: UUID,
     body: SnoozeFollowUpRequest,
     repo: InMemoryFollowUpRepository = Depends(get_repository),
+    engine: FollowUpEngine = Depends(get_engine),
 ) -> SnoozeResponse:
     """Verschiebt einen Follow-up."""
     from app.services.timezone_service import DefaultTimezoneService
@@ -508,6 +527,7 @@ async def snooze_followup(
         state.paused_until = new_time
         state.status = FollowUpSequenceStatus.PAUSED
         await repo.upsert_sequence_state(state)
+    await engine.reschedule_due_entry(str(lead.owner_id), str(lead_id), new_time)
     
     return SnoozeResponse(
         success=True,
@@ -533,16 +553,11 @@ async def batch_generate_followups(
     engine: FollowUpEngine = Depends(get_engine),
 ) -> BatchFollowUpResponse:
     """Generiert Nachrichten für mehrere Leads."""
-    messages: List[AIMessage] = []
     start_time = time.time()
     
-    for lead_id in body.lead_ids[:10]:  # Max 10 auf einmal
-        try:
-            message = await engine.generate_message(lead_id=lead_id)
-            if message:
-                messages.append(message)
-        except Exception:
-            continue  # Skip bei Fehlern
+    # Max 10 auf einmal; gleiche Templates/Steps in einem AI-Call
+    generated, report = await engine.generate_messages(body.lead_ids[:10])
+    messages: List[AIMessage] = [message for message in generated.values() if message]
     
     # Event publishen: Batch sequence steps executed
     latency_ms = int((time.time() - start_time) * 1000)
@@ -558,9 +573,33 @@ async def batch_generate_followups(
     return BatchFollowUpResponse(
         generated=len(messages),
         messages=messages,
+        report=report.to_dict(),
     )
 
 
+@router.post(
+    "/due-index/rebuild",
+    summary="Due-Index neu aufbauen",
+    description="Baut die Warteschlange fälliger Follow-ups aus den eigenen Leads neu auf (Konsistenz-Check).",
+)
+async def rebuild_due_index(
+    current_user=Depends(get_current_active_user),
+    engine: FollowUpEngine = Depends(get_engine),
+) -> Dict[str, Any]:
+    """Rebuild des Due-Index, beschränkt auf die Leads des Aufrufers."""
+    try:
+        owner_id = UUID(_extract_user_id(current_user))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Ungültige User-ID")
+    start_time = time.time()
+    indexed = await engine.rebuild_due_index(user_id=owner_id)
+    return {
+        "success": True,
+        "indexed": indexed,
+        "duration_ms": int((time.time() - start_time) * 1000),
+    }
+
+
 # ─────────────────────────────────
 # Debug Endpoints
 # ─────────────────────────────────
@@ -629,51 +668,26 @@ def _get_user_id(user: Any) -> str:
 
 @router_v2.get("/pending")
 async def get_pending_suggestions_v2(
-    limit: int = 50,
+    limit: int = CacheWarmingConfig.PENDING_FOLLOWUPS_LIMIT,
     user=Depends(get_current_active_user),
     supabase=Depends(get_supabase),
 ):
     """Hole alle fälligen Follow-up Vorschläge (nächste 7 Tage) mit Confidence Scores."""
     user_id = _get_user_id(user)
-    
-    # Nächste 90 Tage laden (erweitert von 7 Tagen)
-    end_of_range = (datetime.utcnow() + timedelta(days=90)).isoformat()
-
-    result = (
-        supabase.table("followup_suggestions")
-        .select("*, leads(id, name, email, phone, company, status, whatsapp, instagram, linkedin)")
-        .eq("user_id", user_id)
-        .eq("status", "pending")
-        .lte("due_at", end_of_range)
-        .order("confidence_score", desc=True)  # High confidence zuerst
-        .order("due_at")
-        .limit(limit)
-        .execute()
-    )
 
-    suggestions = result.data or []
-    
-    # Enrichiere mit Confidence-Anzeige
-    for sug in suggestions:
-        confidence = sug.get("confidence_score")
-        if confidence is not None:
-            if confidence >= 90:
-                sug["confidence_display"] = f"🟢 {int(confidence)}%"
-            elif confidence >= 70:
-                sug["confidence_display"] = f"🟡 {int(confidence)}%"
-            else:
-                sug["confidence_display"] = f"🔴 {int(confidence)}%"
-        else:
-            sug["confidence_display"] = "⚪ N/A"
-    
-    return {"suggestions": suggestions, "count": len(suggestions)}
+    if limit == CacheWarmingConfig.PENDING_FOLLOWUPS_LIMIT:
+        # Default-Limit: vorberechnet vom Cache-Warming
+        pending, _meta = await read_view("followups", user_id, supabase)
+        return pending
+    return await get_pending_suggestions(supabase, user_id, limit=limit)
 
 
 @router_v2.post("")
 async def create_followup(
     data: dict,
     current_user = Depends(get_current_active_user),
-    db = Depends(get_supabase)
+    db = Depends(get_supabase),
+    _invalidate=Depends(invalidate_views_after_write),
 ):
     """Erstellt einen neuen Follow-up/Termin"""
     user_id = current_user.get("sub") or current_user.get("id")
@@ -783,6 +797,7 @@ async def handle_suggestion_v2(
     action: SuggestionAction,
     user=Depends(get_current_active_user),
     supabase=Depends(get_supabase),
+    _invalidate=Depends(invalidate_views_after_write),
 ):
     """Bearbeite einen Follow-up Vorschlag."""
     user_id = _get_user_id(user)
@@ -896,6 +911,7 @@ async def start_flow_for_lead_v2(
     request: StartFlowRequest,
     user=Depends(get_current_active_user),
     supabase=Depends(get_supabase),
+    _invalidate=Depends(invalidate_views_after_write),
 ):
     """Startet einen Follow-up Flow für einen Lead."""
     user_id = _get_user_id(user)
@@ -967,7 +983,7 @@ async def generate_suggestions_for_user(user_id: str, supabase):
         return
 
     # Import für Confidence-Generierung
-    from app.services.followup_autopilot import generate_followup_with_confidence
+    from app.services.followup_autopilot import generate_followups_with_confidence
     
     # Hole letzte Nachricht für Kontext
     def get_previous_message(lead_id: str):
@@ -983,6 +999,7 @@ async def generate_suggestions_for_user(user_id: str, supabase):
             return interactions.data[0].get("raw_notes") or interactions.data[0].get("notes")
         return None
 
+    pending: List[Any] = []
     for lead in leads_result.data:
         existing = (
             supabase.table("followup_suggestions")
@@ -1013,31 +1030,44 @@ async def generate_suggestions_for_user(user_id: str, supabase):
             ).eq("id", lead["id"]).execute()
             continue
 
-        # Generiere Nachricht mit Confidence Score
-        previous_msg = get_previous_message(lead["id"])
-        
-        context = {
-            "lead_name": lead.get("name"),
-            "lead_status": lead.get("status"),
-            "flow": lead.get("flow"),
-            "stage": lead.get("follow_up_stage")
+        pending.append((lead, rule.data))
+
+    # Nachrichten mit Confidence Score: gleiche Templates/Stages in einem AI-Call
+    items = [
+        {
+            "lead_id": lead["id"],
+            "context": {
+                "lead_name": lead.get("name"),
+                "lead_status": lead.get("status"),
+                "flow": lead.get("flow"),
+                "stage": lead.get("follow_up_stage")
+            },
+            "previous_message": get_previous_message(lead["id"]),
+            "template_key": rule.get("template_key"),
+            "stage": lead.get("follow_up_stage"),
+            "language": lead.get("language"),
+            "name": lead.get("name"),
         }
-        
+        for lead, rule in pending
+    ]
+    confidence_results: Dict[str, Dict[str, Any]] = {}
+    if items:
         try:
-            confidence_result = await generate_followup_with_confidence(
-                lead_id=lead["id"],
-                user_id=user_id,
-                context=context,
-                previous_message=previous_msg
-            )
+            confidence_results, report = await generate_followups_with_confidence(user_id, items)
+            logger.info(f"Follow-up suggestions generated for user {user_id}: {report}")
+        except Exception as e:
+            logger.warning(f"Error generating confidence for user {user_id}: {e}")
+
+    for lead, rule in pending:
+        confidence_result = confidence_results.get(str(lead["id"]))
+        if confidence_result:
             message = confidence_result.get("message", "")
             confidence_score = confidence_result.get("confidence_score", 70.0)
             confidence_reason = confidence_result.get("confidence_reason", "Standard Follow-up")
             execution_mode = confidence_result.get("execution_mode", "prepared")
-        except Exception as e:
-            logger.warning(f"Error generating confidence for lead {lead['id']}: {e}")
+        else:
             # Fallback zu Template
-            template_body = rule.data.get("message_templates", {}).get("body", "")
+            template_body = rule.get("message_templates", {}).get("body", "")
             message = template_body.replace("{name}", lead.get("name", ""))
             confidence_score = 70.0
             confidence_reason = "Template-basiert"
@@ -1049,10 +1079,10 @@ async def generate_suggestions_for_user(user_id: str, supabase):
                 "lead_id": lead["id"],
                 "flow": lead.get("flow"),
                 "stage": lead.get("follow_up_stage"),
-                "template_key": rule.data.get("template_key"),
+                "template_key": rule.get("template_key"),
                 "channel": lead.get("preferred_channel", "WHATSAPP"),
                 "suggested_message": message,
-                "reason": rule.data.get("description", f"Stage {lead.get('follow_up_stage')}"),
+                "reason": rule.get("description", f"Stage {lead.get('follow_up_stage')}"),
                 "due_at": now.isoformat(),
                 "status": "pending",
                 "confidence_score": confidence_score,
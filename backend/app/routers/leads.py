@@ -20,6 +20,7 @@ from ..core.security import get_current_active_user
 from ..db.session import get_db
 from ..models.user import User
 from ..events.helpers import publish_lead_created_event
+from ..services.cache_warming import invalidate_views
 from ..services.csv_import import CSVImportService
 
 router = APIRouter(
@@ -49,6 +50,14 @@ def _extract_user_id(current_user: User) -> Optional[str]:
     return str(user_id) if user_id else None
 
 
+async def invalidate_views_after_write(current_user: User = Depends(get_current_active_user)):
+    """Nach Lead-Writes gecachte Dashboard-/Queue-/Hot-Lead-Ansichten verwerfen."""
+    yield
+    user_id = _extract_user_id(current_user)
+    if user_id:
+        await invalidate_views(user_id)
+
+
 class LeadCreate(BaseModel):
     name: str
     platform: str = "WhatsApp"
@@ -168,7 +177,11 @@ async def get_lead(lead_id: str, current_user: User = Depends(get_current_active
 
 @router.post("/")
 @router.post("")
-async def create_lead(request: Request, current_user: User = Depends(get_current_active_user)):
+async def create_lead(
+    request: Request,
+    current_user: User = Depends(get_current_active_user),
+    _invalidate=Depends(invalidate_views_after_write),
+):
     """
     Create a new lead - flexible schema.
     POST /api/leads oder POST /api/leads/
@@ -316,7 +329,12 @@ async def create_lead(request: Request, current_user: User = Depends(get_current
 
 @router.put("/{lead_id}")
 @router.patch("/{lead_id}")
-async def update_lead(lead_id: str, request: Request, current_user: User = Depends(get_current_active_user)):
+async def update_lead(
+    lead_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_active_user),
+    _invalidate=Depends(invalidate_views_after_write),
+):
     import json
     try:
         body = await request.body()
@@ -384,7 +402,11 @@ async def update_lead(lead_id: str, request: Request, current_user: User = Depen
 
 
 @router.delete("/{lead_id}")
-async def delete_lead(lead_id: str, current_user: User = Depends(get_current_active_user)):
+async def delete_lead(
+    lead_id: str,
+    current_user: User = Depends(get_current_active_user),
+    _invalidate=Depends(invalidate_views_after_write),
+):
     try:
         db = get_supabase()
         db.table("leads").delete().eq("id", lead_id).execute()
@@ -410,6 +432,7 @@ async def import_leads(
     mapping: str = Form(None),
     skip_duplicates: bool = Form(True),
     current_user: User = Depends(get_current_active_user),
+    _invalidate=Depends(invalidate_views_after_write),
 ):
     """
     Bulk-Import für Leads.
@@ -603,6 +626,7 @@ async def mark_message_sent(
     lead_id: str,
     body: MessageSentBody,
     current_user: User = Depends(get_current_active_user),
+    _invalidate=Depends(invalidate_views_after_write),
 ):
     """
     Markiert dass eine Nachricht an einen Lead gesendet wurde.
@@ -825,7 +849,8 @@ def parse_date(date_string: str) -> Optional[str]:
 @router.post("/bulk-import")
 async def bulk_import_leads(
     request: Request,
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    _invalidate=Depends(invalidate_views_after_write),
 ):
     """
     Bulk import leads from Excel/CSV data.
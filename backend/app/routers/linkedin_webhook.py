@@ -90,7 +90,7 @@ async def handle_linkedin_webhook(
 ):
     raw_body = await request.body()
     client_ip = request.client.host if request.client else "0.0.0.0"
-    enforce_rate_limit(client_ip, key_prefix="linkedin_webhook")
+    await enforce_rate_limit(client_ip, key_prefix="linkedin_webhook")
     enforce_ip_whitelist(client_ip, allowed_cidrs=settings.linkedin_webhook_ip_whitelist)
 
     verify_linkedin_signature(raw_body, request, settings.linkedin_client_secret)
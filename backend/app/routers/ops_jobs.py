@@ -0,0 +1,60 @@
+"""
+Ops Jobs Router - Background job telemetry (duration/throughput percentiles,
+error rate, DB/LLM usage per run, replica heartbeats)
+"""
+
+from typing import Any, Dict
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from redis.exceptions import RedisError
+import logging
+
+from ..core.security import get_current_active_user
+from ..services.job_coordinator import get_job_coordinator
+from ..services.job_telemetry import get_job_telemetry
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/ops/jobs",
+    tags=["ops-jobs"],
+    dependencies=[Depends(get_current_active_user)]  # nur eingeloggte (Admins) dürfen das
+)
+
+
+@router.get("")
+async def get_jobs_overview() -> Dict[str, Any]:
+    """Telemetry summary per scheduler job plus the last heartbeat of each job."""
+    telemetry = get_job_telemetry()
+    snapshot = await telemetry.snapshot()
+
+    heartbeats: Dict[str, Any] = {}
+    coordinator = await get_job_coordinator()
+    if coordinator.redis is not None:
+        try:
+            heartbeats = await coordinator.heartbeats()
+        except RedisError as e:
+            logger.warning(f"Job heartbeats unavailable: {e}")
+    for job_id, summary in snapshot["jobs"].items():
+        summary["heartbeat"] = heartbeats.get(job_id)
+    return snapshot
+
+
+@router.get("/metrics")
+async def get_jobs_prometheus_metrics():
+    """Prometheus exposition (includes the job gauges)."""
+    try:
+        from ..core.metrics import metrics_endpoint
+    except ImportError:
+        raise HTTPException(status_code=503, detail="prometheus_client not installed")
+    return await metrics_endpoint()
+
+
+@router.get("/{job_id}/runs")
+async def get_job_runs(job_id: str, limit: int = Query(50, ge=1, le=200)) -> Dict[str, Any]:
+    """Latest runs of one job (newest first)."""
+    telemetry = get_job_telemetry()
+    if job_id not in telemetry.intervals:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    runs = await telemetry.runs(job_id)
+    return {"job": job_id, "runs": runs[:limit]}
@@ -107,12 +107,13 @@ async def start_sequence(lead_id: str, current_user=Depends(get_current_user), d
         raise HTTPException(status_code=500, detail=str(exc))
 from datetime import date, datetime, timedelta
 import urllib.parse
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional
 
 from fastapi import APIRouter, Body, Depends, HTTPException, Query
 from pydantic import BaseModel
 
 from app.core.deps import get_current_user
+from app.services.sequence_definitions import get_sequence_cache
 from app.supabase_client import get_supabase_client
 
 
@@ -217,6 +218,7 @@ async def create_sequence(
         }
         supabase.table("sequence_steps").insert(step_data).execute()
 
+    get_sequence_cache().invalidate(sequence["id"])
     return {"success": True, "sequence": sequence}
 
 
@@ -227,6 +229,7 @@ async def delete_sequence(sequence_id: str, current_user=Depends(get_current_use
     user_id = _extract_user_id(current_user)
 
     supabase.table("follow_up_sequences").delete().eq("id", sequence_id).eq("user_id", user_id).execute()
+    get_sequence_cache().invalidate(sequence_id)
     return {"success": True}
 
 
@@ -243,26 +246,20 @@ async def enroll_lead(request: EnrollLeadRequest, current_user=Depends(get_curre
     if existing.data:
         raise HTTPException(status_code=400, detail="Lead ist bereits in dieser Sequenz")
 
-    first_step = (
-        supabase.table("sequence_steps")
-        .select("*")
-        .eq("sequence_id", request.sequence_id)
-        .eq("step_number", 1)
-        .single()
-        .execute()
-    )
+    sequence = get_sequence_cache().load(supabase, [request.sequence_id]).get(request.sequence_id)
+    first_step = sequence.step(1) if sequence else None
 
-    if not first_step.data:
+    if not first_step:
         raise HTTPException(status_code=400, detail="Sequence hat keine Steps")
 
     start = request.start_date or date.today()
-    next_action = start + timedelta(days=first_step.data.get("delay_days", 0))
+    next_action = start + first_step.delay
 
     enrollment = {
         "lead_id": request.lead_id,
         "sequence_id": request.sequence_id,
         "user_id": user_id,
-        "current_step": first_step.data.get("step_number", 1),
+        "current_step": first_step.number,
         "status": "active",
         "next_action_date": next_action.isoformat(),
         "started_at": datetime.now().isoformat(),
@@ -307,25 +304,15 @@ async def get_due_today(current_user=Depends(get_current_user)):
     )
 
     enrollments = enrollment_result.data or []
-    sequence_ids = {item["sequence_id"] for item in enrollments}
-
-    steps_lookup: Dict[Tuple[str, int], Dict[str, Any]] = {}
-    if sequence_ids:
-        steps_result = (
-            supabase.table("sequence_steps")
-            .select("*")
-            .in_("sequence_id", list(sequence_ids))
-            .execute()
-        )
-        for step in steps_result.data or []:
-            steps_lookup[(step["sequence_id"], step["step_number"])] = step
+    sequences = get_sequence_cache().load(supabase, [item["sequence_id"] for item in enrollments])
 
     due_actions = []
     for enrollment in enrollments:
-        key = (enrollment["sequence_id"], enrollment.get("current_step", 1))
-        current_step = steps_lookup.get(key)
-        if not current_step:
+        sequence = sequences.get(str(enrollment["sequence_id"]))
+        compiled_step = sequence.step(enrollment.get("current_step", 1)) if sequence else None
+        if not compiled_step:
             continue
+        current_step = compiled_step.source
 
         lead = enrollment.get("leads") or {}
         message = _build_message(current_step.get("message_template", ""), lead)
@@ -377,17 +364,11 @@ async def advance_step(enrollment_id: str, current_user=Depends(get_current_user
 
         return {"success": True, "completed": True}
 
-    next_step_data = (
-        supabase.table("sequence_steps")
-        .select("delay_days")
-        .eq("sequence_id", current["sequence_id"])
-        .eq("step_number", next_step)
-        .single()
-        .execute()
-    )
+    sequence = get_sequence_cache().load(supabase, [current["sequence_id"]]).get(str(current["sequence_id"]))
+    next_step_data = sequence.step(next_step) if sequence else None
 
-    delay = (next_step_data.data or {}).get("delay_days", 1)
-    next_action = date.today() + timedelta(days=delay)
+    delay = next_step_data.delay if next_step_data else timedelta(days=1)
+    next_action = date.today() + delay
 
     supabase.table("sequence_enrollments").update(
         {"current_step": next_step, "next_action_date": next_action.isoformat()}
@@ -450,23 +431,18 @@ async def get_turbo_today(
     if not enrollments.data:
         return {"actions": [], "count": 0, "message": "Keine Follow-ups heute! 🎉"}
 
-    sequence_ids = list({e["sequence_id"] for e in enrollments.data})
-    steps = supabase.table("sequence_steps").select("*").in_("sequence_id", sequence_ids).execute()
-
-    steps_lookup = {}
-    for step in steps.data or []:
-        key = (step["sequence_id"], step["step_number"])
-        steps_lookup[key] = step
+    compiled = get_sequence_cache().load(supabase, [e["sequence_id"] for e in enrollments.data])
 
     actions = []
     for enrollment in enrollments.data:
         lead = enrollment.get("leads") or {}
         sequence = enrollment.get("follow_up_sequences") or {}
-        step_key = (enrollment["sequence_id"], enrollment.get("current_step", 1))
-        step = steps_lookup.get(step_key)
+        definition = compiled.get(str(enrollment["sequence_id"]))
+        compiled_step = definition.step(enrollment.get("current_step", 1)) if definition else None
 
-        if not step:
+        if not compiled_step:
             continue
+        step = compiled_step.source
 
         message = step.get("message_template", "")
         message = message.replace("{name}", lead.get("name") or "")
@@ -547,17 +523,12 @@ async def turbo_complete_action(
 
         return {"success": True, "completed": True, "message": "Sequence abgeschlossen! 🎉"}
 
-    next_step_data = (
-        supabase.table("sequence_steps")
-        .select("delay_days")
-        .eq("sequence_id", enrollment.data["sequence_id"])
-        .eq("step_number", current_step + 1)
-        .single()
-        .execute()
-    )
+    sequence_id = str(enrollment.data["sequence_id"])
+    sequence = get_sequence_cache().load(supabase, [sequence_id]).get(sequence_id)
+    next_step_data = sequence.step(current_step + 1) if sequence else None
 
-    delay_days = next_step_data.data.get("delay_days", 1) if next_step_data.data else 1
-    next_date = (date.today() + timedelta(days=delay_days)).isoformat()
+    delay = next_step_data.delay if next_step_data else timedelta(days=1)
+    next_date = (date.today() + delay).isoformat()
 
     supabase.table("sequence_enrollments").update(
         {"current_step": current_step + 1, "next_action_date": next_date}
@@ -9,6 +9,7 @@ NICHT für Produktion - später durch echten AI-Router ersetzen.
 from __future__ import annotations
 
 from typing import Any, Dict, Optional
+import json
 import random
 
 
@@ -81,6 +82,9 @@ class DummyAIRouter:
         Returns:
             Dict mit content, model, tokens_used etc.
         """
+        if task_type == "FOLLOWUP_GENERATION_BATCH":
+            return await self._generate_batch(user_payload, config)
+
         lead = user_payload.get("lead", {}) or {}
         suggestion = user_payload.get("suggestion", {}) or {}
 
@@ -114,6 +118,28 @@ class DummyAIRouter:
             },
         }
 
+    async def _generate_batch(
+        self,
+        user_payload: Dict[str, Any],
+        config: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Eine Variante pro Lead als JSON (siehe message_batching.py)."""
+        messages = []
+        for item in user_payload.get("leads", []):
+            lead = item.get("lead", {}) or {}
+            name = lead.get("first_name") or (lead.get("full_name") or "").split(" ")[0] or "du"
+            template = random.choice(self.TEMPLATES["default"])
+            messages.append({"id": item.get("id"), "message": template.format(name=name)})
+
+        content = json.dumps({"messages": messages}, ensure_ascii=False)
+        return {
+            "content": content,
+            "model": "dummy-local-v1",
+            "prompt_version": "v0.1",
+            "tokens_used": len(content.split()) * 2,
+            "raw": {"task_type": "FOLLOWUP_GENERATION_BATCH", "config": config or {}},
+        }
+
 
 __all__ = ["DummyAIRouter"]
 
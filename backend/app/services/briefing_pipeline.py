@@ -0,0 +1,337 @@
+"""
+============================================
+☀️ SALESFLOW AI - DAILY BRIEFING PIPELINE
+============================================
+
+Morning briefings in the user's own timezone instead of 7:30 server time
+for everyone:
+
+- Every user gets a local briefing slot: 07:30, 07:45 or 08:00, spread
+  by a stable hash of the user id so a timezone's users don't all land
+  on the same tick
+- The job runs every 15 minutes and picks the users whose slot passed
+  since the last run (watermark in `job_watermarks`, catch-up capped so
+  a long outage doesn't send stale briefings)
+- Due users are grouped into buckets (timezone + local day); each bucket
+  is counted with a few set-based queries (follow-ups due today and
+  overdue in one query, appointments in a second) per chunk of users
+- Notifications go out through notifications.create_notifications_batch,
+  in slot order; the watermark advances after every batch, so a failure
+  halfway through doesn't resend what already went out
+
+The recipient directory (briefing opt-in, first name, timezone) changes
+rarely and is cached in-process for an hour.
+
+Sync PostgREST pipeline; call it via asyncio.to_thread like the other
+batch pipelines.
+"""
+
+from __future__ import annotations
+
+import time
+import zlib
+from dataclasses import dataclass, field, replace
+from datetime import date, datetime, timedelta, timezone
+from datetime import time as dtime
+from typing import Any, Dict, List, Optional, Tuple
+
+import structlog
+
+from app.db.bulk import chunked
+from app.db.paging import keyset_pages, parse_timestamp
+from app.services.incremental_jobs import IncrementalWindow, WatermarkStore
+from app.services.timezone_service import get_timezone_service
+
+logger = structlog.get_logger()
+
+
+class BriefingConfig:
+    """Daily briefing defaults."""
+
+    JOB = "send_daily_briefing"
+    FIRST_SLOT = dtime(7, 30)               # Earliest local briefing time
+    SLOTS = 3                               # 07:30, 07:45, 08:00 local
+    TICK_MINUTES = 15                       # Scheduler interval = slot width
+    MAX_CATCH_UP = timedelta(hours=2)       # Older missed slots are skipped
+    DIRECTORY_TTL = 3600                    # Re-read recipients / timezones
+    IN_CHUNK = 200                          # Users per IN() filter
+    NOTIFY_BATCH = 500                      # Notifications per batch send
+
+
+# ==================== RECIPIENTS ====================
+
+
+@dataclass
+class Recipient:
+    """A user who gets the daily briefing."""
+
+    user_id: str
+    first_name: str = ""
+    timezone: Optional[str] = None
+
+    @property
+    def slot(self) -> dtime:
+        """Local briefing time, stable per user."""
+        offset = zlib.crc32(self.user_id.encode()) % BriefingConfig.SLOTS * BriefingConfig.TICK_MINUTES
+        return (datetime.combine(date.min, BriefingConfig.FIRST_SLOT) + timedelta(minutes=offset)).time()
+
+
+_directory: Optional[Tuple[float, List[Recipient]]] = None
+
+
+def _first_name(profile: Dict[str, Any]) -> str:
+    parts = (profile.get("name") or "").split()
+    return parts[0] if parts else ""
+
+
+def load_recipients(supabase: Any) -> List[Recipient]:
+    """Users with the daily briefing enabled (everyone if nobody set a preference)."""
+    prefs = (
+        supabase.table("user_notification_preferences")
+        .select("user_id")
+        .eq("daily_briefing", True)
+        .execute()
+    )
+    user_ids = sorted({row["user_id"] for row in prefs.data or [] if row.get("user_id")})
+
+    # Timezone may not exist as a column on older schemas, hence "*"
+    if user_ids:
+        profiles = []
+        for _, chunk in chunked(user_ids, BriefingConfig.IN_CHUNK):
+            result = supabase.table("profiles").select("*").in_("id", list(chunk)).execute()
+            profiles.extend(result.data or [])
+        by_id = {profile["id"]: profile for profile in profiles}
+    else:
+        by_id = {
+            profile["id"]: profile
+            for page in keyset_pages(lambda: supabase.table("profiles").select("*"))
+            for profile in page
+        }
+        user_ids = sorted(by_id)
+
+    return [
+        Recipient(
+            user_id=user_id,
+            first_name=_first_name(by_id.get(user_id, {})),
+            timezone=by_id.get(user_id, {}).get("timezone"),
+        )
+        for user_id in user_ids
+    ]
+
+
+def get_recipients(supabase: Any, refresh: bool = False) -> List[Recipient]:
+    """Cached recipient directory."""
+    global _directory
+    if refresh or _directory is None or time.monotonic() - _directory[0] > BriefingConfig.DIRECTORY_TTL:
+        _directory = (time.monotonic(), load_recipients(supabase))
+    return _directory[1]
+
+
+# ==================== BUCKETS ====================
+
+
+@dataclass
+class BriefingBucket:
+    """Due users of one timezone and local day."""
+
+    timezone: str
+    day: date
+    day_start: datetime                     # Local midnight, UTC
+    day_end: datetime                       # Next local midnight, UTC
+    recipients: List[Recipient] = field(default_factory=list)
+    slots: Dict[str, datetime] = field(default_factory=dict)   # user_id -> slot (UTC)
+
+
+def due_buckets(recipients: List[Recipient], since: datetime, until: datetime) -> List[BriefingBucket]:
+    """Users whose local briefing slot lies in (since, until], bucketed by timezone and day."""
+    tz_service = get_timezone_service()
+    zones: Dict[Optional[str], Any] = {}
+    buckets: Dict[Tuple[str, date], BriefingBucket] = {}
+
+    for recipient in recipients:
+        if recipient.timezone not in zones:
+            zones[recipient.timezone] = tz_service.resolve_tz(recipient.timezone)
+        zone = zones[recipient.timezone]
+
+        for day in sorted({since.astimezone(zone).date(), until.astimezone(zone).date()}):
+            slot = datetime.combine(day, recipient.slot, tzinfo=zone)
+            if not since < slot <= until:
+                continue
+            key = (zone.key, day)
+            if key not in buckets:
+                buckets[key] = BriefingBucket(
+                    timezone=zone.key,
+                    day=day,
+                    day_start=datetime.combine(day, dtime.min, tzinfo=zone).astimezone(timezone.utc),
+                    day_end=datetime.combine(day + timedelta(days=1), dtime.min, tzinfo=zone).astimezone(timezone.utc),
+                )
+            buckets[key].recipients.append(recipient)
+            buckets[key].slots[recipient.user_id] = slot.astimezone(timezone.utc)
+
+    return sorted(buckets.values(), key=lambda b: (b.day_start, b.timezone))
+
+
+def bucket_counts(supabase: Any, bucket: BriefingBucket) -> Dict[str, Dict[str, int]]:
+    """Follow-ups due today, overdue follow-ups and today's appointments per user."""
+    counts = {r.user_id: {"followups": 0, "appointments": 0, "overdue": 0} for r in bucket.recipients}
+    day_start, day_end = bucket.day_start.isoformat(), bucket.day_end.isoformat()
+
+    for _, chunk in chunked(sorted(counts), BriefingConfig.IN_CHUNK):
+        user_ids = list(chunk)
+
+        # Due today and overdue in one query, split by the local day start
+        for page in keyset_pages(lambda: (
+            supabase.table("followup_suggestions")
+            .select("id, user_id, due_at")
+            .in_("user_id", user_ids)
+            .eq("status", "pending")
+            .lt("due_at", day_end)
+        )):
+            for row in page:
+                due_at = parse_timestamp(row.get("due_at"))
+                if due_at is None:
+                    continue
+                counts[row["user_id"]]["followups" if due_at >= bucket.day_start else "overdue"] += 1
+
+        # Appointments (if calendar_events table exists)
+        try:
+            for page in keyset_pages(lambda: (
+                supabase.table("calendar_events")
+                .select("id, user_id")
+                .in_("user_id", user_ids)
+                .gte("start_time", day_start)
+                .lt("start_time", day_end)
+            )):
+                for row in page:
+                    counts[row["user_id"]]["appointments"] += 1
+        except Exception as e:
+            logger.debug("Calendar events unavailable", error=str(e))
+
+    return counts
+
+
+def build_briefing(recipient: Recipient, counts: Dict[str, int]) -> Dict[str, Any]:
+    """Notification payload for create_notifications_batch."""
+    parts = []
+
+    if counts["followups"]:
+        parts.append(f"📋 {counts['followups']} Follow-up{'s' if counts['followups'] > 1 else ''}")
+
+    if counts["appointments"]:
+        parts.append(f"📅 {counts['appointments']} Termin{'e' if counts['appointments'] > 1 else ''}")
+
+    if counts["overdue"]:
+        parts.append(f"⚠️ {counts['overdue']} überfällig")
+
+    return {
+        "user_id": recipient.user_id,
+        "title": f"☀️ Guten Morgen{', ' + recipient.first_name if recipient.first_name else ''}!",
+        "body": " | ".join(parts) if parts else "Keine geplanten Aktivitäten - perfekt für Akquise!",
+        "data": dict(counts),
+    }
+
+
+# ==================== RUN ====================
+
+
+@dataclass
+class BriefingPlan:
+    """Briefings due in one run, in slot order."""
+
+    window: IncrementalWindow
+    since: datetime
+    briefings: List[Dict[str, Any]] = field(default_factory=list)
+    slots: List[datetime] = field(default_factory=list)     # Slot (UTC) per briefing
+    buckets: Dict[str, int] = field(default_factory=dict)   # "tz/day" -> users
+
+    def progress(self, sent: int) -> Tuple[datetime, Dict[str, Any]]:
+        """
+        Watermark and job state once the first `sent` briefings are out.
+
+        The watermark is the last slot sent completely; users already sent
+        from a partly sent slot are kept in the state and skipped next run.
+        """
+        if sent >= len(self.briefings):
+            return self.window.until, {}
+        pending = self.slots[sent]
+        done = [slot for slot in self.slots[:sent] if slot < pending]
+        user_ids = [
+            briefing["user_id"]
+            for briefing, slot in zip(self.briefings[:sent], self.slots[:sent])
+            if slot == pending
+        ]
+        if self.window.state.get("slot") == pending.isoformat():
+            user_ids = self.window.state.get("sent", []) + user_ids
+        state = {"slot": pending.isoformat(), "sent": user_ids} if user_ids else {}
+        return (done[-1] if done else self.since), state
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "since": self.since.isoformat(),
+            "until": self.window.until.isoformat(),
+            "briefings": len(self.briefings),
+            "buckets": self.buckets,
+        }
+
+
+def plan_daily_briefings(
+    supabase: Any,
+    store: WatermarkStore,
+    now: Optional[datetime] = None,
+    recipients: Optional[List[Recipient]] = None,
+) -> BriefingPlan:
+    """
+    Briefings for all users whose slot passed since the last run.
+
+    Call `commit_progress` after every notification batch.
+    """
+    # Slots are never "reconciled": the first run (or kill switch) only covers the last tick
+    window = store.begin(BriefingConfig.JOB, now, reconcile_every=timedelta.max)
+    since = window.since or window.until - timedelta(minutes=BriefingConfig.TICK_MINUTES)
+    since = max(since, window.until - BriefingConfig.MAX_CATCH_UP)
+
+    if recipients is None:
+        recipients = get_recipients(supabase)
+
+    # Users already sent from a partly sent slot (previous run failed halfway)
+    partial_slot = window.state.get("slot")
+    already_sent = set(window.state.get("sent", []))
+
+    plan = BriefingPlan(window=window, since=since)
+    due: List[Tuple[datetime, str, Dict[str, Any]]] = []
+    for bucket in due_buckets(recipients, since, window.until):
+        counts = bucket_counts(supabase, bucket)
+        for r in bucket.recipients:
+            slot = bucket.slots[r.user_id]
+            if slot.isoformat() == partial_slot and r.user_id in already_sent:
+                continue
+            due.append((slot, r.user_id, build_briefing(r, counts[r.user_id])))
+        plan.buckets[f"{bucket.timezone}/{bucket.day.isoformat()}"] = len(bucket.recipients)
+
+    due.sort(key=lambda item: (item[0], item[1]))
+    plan.slots = [slot for slot, _, _ in due]
+    plan.briefings = [briefing for _, _, briefing in due]
+
+    logger.info("Daily briefings planned", **plan.to_dict())
+    return plan
+
+
+def commit_progress(store: WatermarkStore, plan: BriefingPlan, sent: int) -> None:
+    """Advance the watermark past the first `sent` briefings of the plan."""
+    until, state = plan.progress(sent)
+    store.commit(replace(plan.window, until=until), state=state)
+
+
+__all__ = [
+    "BriefingBucket",
+    "BriefingConfig",
+    "BriefingPlan",
+    "Recipient",
+    "build_briefing",
+    "bucket_counts",
+    "commit_progress",
+    "due_buckets",
+    "get_recipients",
+    "load_recipients",
+    "plan_daily_briefings",
+]
@@ -5,21 +5,49 @@ Stellt High-Level Cache Operations für:
 - Lead Operations (CRUD mit Cache Invalidation)
 - Dashboard Operations (mit Cache)
 - User Session Data
+
+Dashboard und Analytics nutzen Stale-while-revalidate: nach Ablauf der
+TTL wird der alte Wert innerhalb eines Grace-Fensters sofort geliefert
+und im Hintergrund genau einmal neu berechnet. Die TTLs haben Jitter,
+damit nicht alle Dashboards gleichzeitig (z.B. nach dem 7:30-Briefing)
+ablaufen. Alter/Status des Werts steht in `_cache` der Antwort.
 """
 
 import logging
 from typing import Any, Dict, List, Optional
 
-from app.core.cache import get_cache_service
+from app.core.cache import (
+    CacheConfig,
+    CacheKeyBuilder,
+    CacheService,
+    CacheTags,
+    get_cache_service,
+)
 
 logger = logging.getLogger(__name__)
 
 
-class LeadCacheService:
-    """Service für Lead-spezifische Cache Operations."""
+def _with_cache_meta(data: Any, meta: dict) -> Any:
+    """Cache-Metadaten an Dict-Antworten anhängen (Kopie, nie den Cache-Wert)."""
+    if isinstance(data, dict):
+        return {**data, "_cache": meta}
+    return data
+
+
+class _CacheBackedService:
+    """Gemeinsame Basis: holt den (async) CacheService beim ersten Zugriff."""
 
-    def __init__(self):
-        self.cache = get_cache_service()
+    def __init__(self, cache: Optional[CacheService] = None):
+        self.cache = cache
+
+    async def _get_cache(self) -> CacheService:
+        if self.cache is None:
+            self.cache = await get_cache_service()
+        return self.cache
+
+
+class LeadCacheService(_CacheBackedService):
+    """Service für Lead-spezifische Cache Operations."""
 
     async def get_lead_with_cache(self, lead_id: str, fetch_func) -> Optional[Dict[str, Any]]:
         """
@@ -32,8 +60,10 @@ class LeadCacheService:
         Returns:
             Lead data or None
         """
+        cache = await self._get_cache()
+
         # Try cache first
-        cached = await self.cache.get_cached_lead(lead_id)
+        cached = await cache.get_cached_lead(lead_id)
         if cached:
             logger.debug(f"Cache hit for lead: {lead_id}")
             return cached
@@ -42,67 +72,71 @@ class LeadCacheService:
         lead_data = await fetch_func(lead_id)
         if lead_data:
             # Cache for future requests
-            await self.cache.cache_lead_data(lead_id, lead_data)
+            await cache.cache_lead(lead_id, lead_data)
             logger.debug(f"Cached lead data: {lead_id}")
 
         return lead_data
 
     async def invalidate_lead_cache(self, lead_id: str) -> None:
         """Invalidate Lead Cache bei Updates/Deletes."""
-        await self.cache.invalidate_lead_cache(lead_id)
+        cache = await self._get_cache()
+        await cache.delete(CacheKeyBuilder.lead(lead_id))
         logger.debug(f"Invalidated lead cache: {lead_id}")
 
 
-class DashboardCacheService:
-    """Service für Dashboard Cache Operations."""
-
-    def __init__(self):
-        self.cache = get_cache_service()
+class DashboardCacheService(_CacheBackedService):
+    """Service für Dashboard Cache Operations (Stale-while-revalidate)."""
 
-    async def get_dashboard_with_cache(self, user_id: str, fetch_func) -> Optional[Dict[str, Any]]:
+    async def get_dashboard_with_cache(
+        self,
+        user_id: str,
+        fetch_func,
+        ttl: int = CacheConfig.DASHBOARD_STATS_TTL,
+        grace: int = CacheConfig.SWR_GRACE_SECONDS,
+    ) -> Optional[Dict[str, Any]]:
         """
         Get Dashboard Data mit Cache Fallback.
 
         Args:
             user_id: User UUID
             fetch_func: Async function to fetch dashboard data
+            ttl: Frische-Dauer in Sekunden (mit Jitter)
+            grace: Wie lange danach noch stale geliefert werden darf
 
         Returns:
-            Dashboard data or None
+            Dashboard data (mit `_cache`: status, age_seconds,
+            stale_seconds, refreshing) or None
         """
-        # Try cache first
-        cached = await self.cache.get_cached_dashboard(user_id)
-        if cached:
-            logger.debug(f"Cache hit for dashboard: {user_id}")
-            return cached
-
-        # Fetch fresh data
-        dashboard_data = await fetch_func(user_id)
-        if dashboard_data:
-            # Cache for future requests
-            await self.cache.cache_dashboard_data(user_id, dashboard_data)
-            logger.debug(f"Cached dashboard data: {user_id}")
-
-        return dashboard_data
+        cache = await self._get_cache()
+        data, meta = await cache.get_with_swr(
+            CacheKeyBuilder.dashboard_stats(user_id),
+            lambda: fetch_func(user_id),
+            ttl=ttl,
+            grace=grace,
+            tags=[CacheTags.user(user_id)],
+        )
+        if meta["status"] == "stale":
+            logger.debug(f"Serving stale dashboard ({meta['stale_seconds']}s): {user_id}")
+        if not data:
+            return data
+        return _with_cache_meta(data, meta)
 
     async def invalidate_user_dashboard(self, user_id: str) -> None:
         """Invalidate Dashboard Cache bei Daten-Änderungen."""
-        key = f"dashboard:{user_id}"
-        await self.cache.delete_cache(key)
+        cache = await self._get_cache()
+        await cache.invalidate_dashboard(user_id)
         logger.debug(f"Invalidated dashboard cache: {user_id}")
 
 
-class AnalyticsCacheService:
-    """Service für Analytics Cache Operations."""
-
-    def __init__(self):
-        self.cache = get_cache_service()
+class AnalyticsCacheService(_CacheBackedService):
+    """Service für Analytics Cache Operations (Stale-while-revalidate)."""
 
     async def get_analytics_with_cache(
         self,
         cache_key: str,
         fetch_func,
-        ttl: int = 1800  # 30 minutes
+        ttl: int = 1800,  # 30 minutes
+        grace: int = CacheConfig.SWR_GRACE_SECONDS,
     ) -> Optional[Any]:
         """
         Get Analytics Data mit Cache.
@@ -110,25 +144,19 @@ class AnalyticsCacheService:
         Args:
             cache_key: Unique cache key
             fetch_func: Async function to fetch data
-            ttl: Cache TTL in seconds
+            ttl: Cache TTL in seconds (mit Jitter)
+            grace: Wie lange danach noch stale geliefert werden darf
 
         Returns:
-            Analytics data or None
+            Analytics data or None (Dicts mit `_cache`-Metadaten)
         """
-        # Try cache first
-        cached = await self.cache.get_cache(cache_key)
-        if cached:
-            logger.debug(f"Cache hit for analytics: {cache_key}")
-            return cached
-
-        # Fetch fresh data
-        data = await fetch_func()
-        if data:
-            # Cache for future requests
-            await self.cache.set_cache(cache_key, data, ttl)
-            logger.debug(f"Cached analytics data: {cache_key}")
-
-        return data
+        cache = await self._get_cache()
+        data, meta = await cache.get_with_swr(cache_key, fetch_func, ttl=ttl, grace=grace)
+        if meta["status"] == "stale":
+            logger.debug(f"Serving stale analytics ({meta['stale_seconds']}s): {cache_key}")
+        if not data:
+            return data
+        return _with_cache_meta(data, meta)
 
 
 # Global service instances
@@ -0,0 +1,562 @@
+"""
+============================================
+🔥 SALESFLOW AI - CACHE WARMING
+============================================
+
+Precomputes the views users open first thing in the morning, so the
+7:30 briefing and the 9:50 power hour don't hit cold caches all at once:
+
+- Daily briefing (GET /dashboard/today)
+- Command-center queue (GET /command-center/queue)
+- Hot leads (GET /analytics/hot-leads, default filters)
+- Pending follow-ups (GET /followups/pending, default limit)
+
+The job runs every few minutes and warms users (active in the last N
+days) whose expected login falls within the next window, each user once
+per local day, earliest login first, with bounded concurrency. The
+expected login is learned from the user's first activity per day in
+their own timezone.
+
+Read paths go through `read_view()`: stale-while-revalidate on the
+shared CacheService, plus bookkeeping of which warmed keys were actually
+read, so the job can report warmed/used ratios per view. Views live in
+their own namespace (`warm:view:*`), separate from the request handlers'
+keys, since the stored payload is the SWR envelope.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from datetime import time as dtime
+from statistics import median
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+import structlog
+from redis.exceptions import RedisError
+
+from app.core.cache import CacheConfig, CacheKeyBuilder, CacheService, CacheTags, get_cache_service
+from app.db.routing import replica_job
+from app.services.job_telemetry import record_items
+from app.services.timezone_service import get_timezone_service
+
+logger = structlog.get_logger()
+
+
+class CacheWarmingConfig:
+    """Cache warming defaults (overridable via settings.cache_warm_*)."""
+
+    ACTIVE_DAYS = 14                # Only users with activity in this period
+    WINDOW_MINUTES = 45             # Warm users whose login is at most this far ahead
+    CONCURRENCY = 8                 # Users warmed in parallel
+    INTERVAL_MINUTES = 10           # Scheduler interval
+    DEFAULT_LOGIN = dtime(7, 30)    # Daily briefing, if there is no history
+    MIN_HISTORY_DAYS = 3            # Days of activity needed to trust the history
+    CANDIDATE_REFRESH = 6 * 3600    # Re-read active users / login times
+    ACTIVITY_PAGE_SIZE = 1000
+    MAX_ACTIVITY_ROWS = 100_000
+    PROFILE_CHUNK = 200
+    PENDING_MAX_AGE = 6 * 3600      # Warmed keys not read by then count as unused
+    STATS_TTL = 7 * 86400
+
+    # Default filters of the warmed views (requests with other filters bypass the cache)
+    COMMAND_QUEUE_LIMIT = 20
+    HOT_LEADS_MIN_SCORE = 75
+    HOT_LEADS_LIMIT = 20
+    PENDING_FOLLOWUPS_LIMIT = 50
+
+    KEY_PREFIX = f"{CacheKeyBuilder.PREFIX}:warm"
+    VIEW_PREFIX = f"{KEY_PREFIX}:view"
+    PENDING_KEY = f"{KEY_PREFIX}:pending"        # ZSET cache key -> warmed_at
+
+
+def _stats_key(day: date) -> str:
+    return f"{CacheWarmingConfig.KEY_PREFIX}:stats:{day.isoformat()}"
+
+
+def _done_key(local_day: date) -> str:
+    return f"{CacheWarmingConfig.KEY_PREFIX}:done:{local_day.isoformat()}"
+
+
+# ==================== VIEWS ====================
+
+
+async def _build_dashboard(db, user_id: str) -> Any:
+    from app.services.daily_briefing import get_today_briefing_payload
+    return await get_today_briefing_payload(db, user_id)
+
+
+async def _build_command_queue(db, user_id: str) -> Any:
+    from app.services.chief_brain import ChiefBrain
+    return await ChiefBrain(db, user_id).get_queue_buckets(limit=CacheWarmingConfig.COMMAND_QUEUE_LIMIT)
+
+
+async def _build_hot_leads(db, user_id: str) -> Any:
+    from app.services.predictive_scoring import get_hot_leads
+    return await get_hot_leads(
+        db,
+        user_id=user_id,
+        min_score=CacheWarmingConfig.HOT_LEADS_MIN_SCORE,
+        limit=CacheWarmingConfig.HOT_LEADS_LIMIT,
+    )
+
+
+async def _build_pending_followups(db, user_id: str) -> Any:
+    from app.services.daily_briefing import get_pending_suggestions
+    return await get_pending_suggestions(db, user_id, limit=CacheWarmingConfig.PENDING_FOLLOWUPS_LIMIT)
+
+
+@dataclass(frozen=True)
+class WarmView:
+    """A per-user view that can be precomputed."""
+    name: str
+    build: Callable[[Any, str], Awaitable[Any]]
+    ttl: int
+
+    def key(self, user_id: str) -> str:
+        return f"{CacheWarmingConfig.VIEW_PREFIX}:{self.name}:{user_id}"
+
+
+VIEWS: Dict[str, WarmView] = {
+    view.name: view
+    for view in (
+        WarmView("dashboard", _build_dashboard, CacheConfig.DASHBOARD_STATS_TTL),
+        WarmView("command_queue", _build_command_queue, CacheConfig.LEAD_DATA_TTL),
+        WarmView("hot_leads", _build_hot_leads, CacheConfig.LEAD_DATA_TTL),
+        WarmView("followups", _build_pending_followups, CacheConfig.LEAD_DATA_TTL),
+    )
+}
+
+# Per-worker counters for Prometheus (view -> event -> count)
+_counters: Dict[str, Dict[str, int]] = {
+    name: {"warmed": 0, "failed": 0, "used": 0} for name in VIEWS
+}
+
+
+def warm_counters() -> Dict[str, Dict[str, int]]:
+    """Warmed/failed/used counts of this worker since startup."""
+    return {name: dict(counts) for name, counts in _counters.items()}
+
+
+# ==================== READ PATH ====================
+
+
+# Usage bookkeeping in flight (kept referenced until done)
+_usage_tasks: Set[asyncio.Task] = set()
+
+
+async def _record_use(cache: CacheService, view: WarmView, key: str) -> None:
+    """Count the first read of a warmed key (ZREM succeeds only once)."""
+    try:
+        async with cache.redis.pipeline(transaction=False) as pipe:
+            pipe.zscore(CacheWarmingConfig.PENDING_KEY, key)
+            pipe.zrem(CacheWarmingConfig.PENDING_KEY, key)
+            warmed_at, removed = await pipe.execute()
+        if warmed_at is None or not removed:
+            return
+        _counters[view.name]["used"] += 1
+        # Attributed to the day it was warmed, so the daily ratio adds up
+        warmed_day = datetime.fromtimestamp(float(warmed_at), timezone.utc).date()
+        await cache.redis.hincrby(_stats_key(warmed_day), f"used:{view.name}", 1)
+    except RedisError as e:
+        logger.debug("Warm usage tracking failed", key=key, error=str(e))
+
+
+def _track_use(cache: CacheService, view: WarmView, key: str) -> None:
+    """Record the read in the background, off the request's latency path."""
+    task = asyncio.create_task(_record_use(cache, view, key))
+    _usage_tasks.add(task)
+    task.add_done_callback(_usage_tasks.discard)
+
+
+async def read_view(
+    name: str,
+    user_id: str,
+    db,
+    cache: Optional[CacheService] = None,
+) -> tuple[Any, dict]:
+    """
+    Serve a warmable view through the cache (stale-while-revalidate).
+
+    Falls back to computing the view directly if Redis is unavailable.
+
+    Returns:
+        (value, meta) with meta as in CacheService.get_with_swr.
+    """
+    view = VIEWS[name]
+    try:
+        cache = cache or await get_cache_service()
+    except Exception as e:
+        logger.warning("Cache unavailable, computing view", view=name, error=str(e))
+        return await view.build(db, user_id), {"status": "bypass"}
+
+    key = view.key(user_id)
+    value, meta = await cache.get_with_swr(
+        key,
+        lambda: view.build(db, user_id),
+        ttl=view.ttl,
+        tags=[CacheTags.user(user_id)],
+    )
+    if meta["status"] != "miss":
+        _track_use(cache, view, key)
+    return value, meta
+
+
+async def invalidate_views(user_id: str, cache: Optional[CacheService] = None) -> None:
+    """Drop a user's warmable views after a write (best effort)."""
+    try:
+        cache = cache or await get_cache_service()
+        await cache.invalidate(keys=[view.key(user_id) for view in VIEWS.values()])
+    except Exception as e:
+        logger.warning("View invalidation failed", user_id=user_id, error=str(e))
+
+
+# ==================== CANDIDATES ====================
+
+
+@dataclass
+class WarmCandidate:
+    """An active user and when they are expected to log in."""
+    user_id: str
+    tz: str
+    login: dtime
+    last_active: datetime
+    history_days: int = 0
+
+    def next_login(self, now: datetime) -> datetime:
+        """Today's expected login (UTC), in the user's timezone."""
+        local_now = now.astimezone(get_timezone_service().resolve_tz(self.tz))
+        local_login = local_now.replace(
+            hour=self.login.hour, minute=self.login.minute, second=0, microsecond=0
+        )
+        return local_login.astimezone(timezone.utc)
+
+
+def expected_login(local_activity: List[datetime]) -> Optional[dtime]:
+    """Median of the first activity per local day (None without enough history)."""
+    first_per_day: Dict[date, datetime] = {}
+    for ts in local_activity:
+        day = ts.date()
+        if day not in first_per_day or ts < first_per_day[day]:
+            first_per_day[day] = ts
+    if len(first_per_day) < CacheWarmingConfig.MIN_HISTORY_DAYS:
+        return None
+    minutes = median(ts.hour * 60 + ts.minute for ts in first_per_day.values())
+    return dtime(int(minutes // 60), int(minutes % 60))
+
+
+def _parse_ts(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        ts = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def build_candidates(
+    activity_rows: List[dict],
+    timezones: Dict[str, Optional[str]],
+) -> List[WarmCandidate]:
+    """Active users with their learned login time (pure, for tests)."""
+    tz_service = get_timezone_service()
+    activity: Dict[str, List[datetime]] = {}
+    for row in activity_rows:
+        ts = _parse_ts(row.get("created_at"))
+        if row.get("user_id") and ts:
+            activity.setdefault(row["user_id"], []).append(ts)
+
+    candidates = []
+    for user_id, stamps in activity.items():
+        tz_name = timezones.get(user_id)
+        zone = tz_service.resolve_tz(tz_name)
+        local = [ts.astimezone(zone) for ts in stamps]
+        login = expected_login(local)
+        candidates.append(WarmCandidate(
+            user_id=user_id,
+            tz=zone.key,
+            login=login or CacheWarmingConfig.DEFAULT_LOGIN,
+            last_active=max(stamps),
+            history_days=len({ts.date() for ts in local}),
+        ))
+    return candidates
+
+
+def _fetch_activity(db, since: datetime) -> List[dict]:
+    rows: List[dict] = []
+    page = CacheWarmingConfig.ACTIVITY_PAGE_SIZE
+    while len(rows) < CacheWarmingConfig.MAX_ACTIVITY_ROWS:
+        result = (
+            db.table("lead_activities")
+            .select("user_id, created_at")
+            .gte("created_at", since.isoformat())
+            .order("created_at", desc=True)
+            .range(len(rows), len(rows) + page - 1)
+            .execute()
+        )
+        batch = result.data or []
+        rows.extend(batch)
+        if len(batch) < page:
+            break
+    return rows
+
+
+def _fetch_timezones(db, user_ids: List[str]) -> Dict[str, Optional[str]]:
+    timezones: Dict[str, Optional[str]] = {}
+    chunk = CacheWarmingConfig.PROFILE_CHUNK
+    for i in range(0, len(user_ids), chunk):
+        try:
+            result = db.table("profiles").select("*").in_("id", user_ids[i:i + chunk]).execute()
+        except Exception as e:
+            logger.warning("Could not load profile timezones", error=str(e))
+            return timezones
+        for profile in result.data or []:
+            timezones[profile["id"]] = profile.get("timezone")
+    return timezones
+
+
+# ==================== WARMER ====================
+
+
+@dataclass
+class WarmRunReport:
+    """Outcome of one warming run."""
+    candidates: int = 0
+    due: int = 0
+    warmed_users: int = 0           # At least one view stored
+    failed_users: int = 0           # Every attempted view failed; retried next run
+    skipped_done: int = 0
+    deferred: int = 0
+    views: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    expired_unused: int = 0
+    duration_seconds: float = 0.0
+
+
+class CacheWarmer:
+    """
+    Warms per-user views ahead of their expected login.
+
+    Usage:
+        warmer = CacheWarmer(db, cache)
+        report = await warmer.run()
+    """
+
+    def __init__(
+        self,
+        db,
+        cache: CacheService,
+        active_days: int = CacheWarmingConfig.ACTIVE_DAYS,
+        window_minutes: int = CacheWarmingConfig.WINDOW_MINUTES,
+        concurrency: int = CacheWarmingConfig.CONCURRENCY,
+        views: Optional[List[str]] = None,
+    ):
+        self.db = db
+        self.cache = cache
+        self.active_days = active_days
+        self.window = timedelta(minutes=window_minutes)
+        self.concurrency = concurrency
+        self.views = [VIEWS[name] for name in (views or VIEWS)]
+        self._candidates: List[WarmCandidate] = []
+        self._candidates_at = 0.0
+
+    async def load_candidates(self, now: datetime, force: bool = False) -> List[WarmCandidate]:
+        """Active users and login times (refreshed every few hours)."""
+        if not force and time.monotonic() - self._candidates_at < CacheWarmingConfig.CANDIDATE_REFRESH:
+            return self._candidates
+        since = now - timedelta(days=self.active_days)
+        rows = await asyncio.to_thread(_fetch_activity, self.db, since)
+        user_ids = sorted({row["user_id"] for row in rows if row.get("user_id")})
+        timezones = await asyncio.to_thread(_fetch_timezones, self.db, user_ids)
+        self._candidates = build_candidates(rows, timezones)
+        self._candidates_at = time.monotonic()
+        return self._candidates
+
+    def due(self, candidates: List[WarmCandidate], now: datetime) -> List[tuple]:
+        """(login_utc, candidate) within the window, earliest login / most recent activity first."""
+        due = []
+        for candidate in candidates:
+            login = candidate.next_login(now)
+            if now <= login <= now + self.window:
+                due.append((login, candidate))
+        due.sort(key=lambda item: (item[0], -item[1].last_active.timestamp()))
+        return due
+
+    async def _claim(self, candidate: WarmCandidate, login: datetime) -> bool:
+        """Once per user and local day, across workers and runs."""
+        zone = get_timezone_service().resolve_tz(candidate.tz)
+        key = _done_key(login.astimezone(zone).date())
+        added = await self.cache.redis.sadd(key, candidate.user_id)
+        await self.cache.redis.expire(key, 2 * 86400)
+        return bool(added)
+
+    async def _unclaim(self, candidate: WarmCandidate, login: datetime) -> None:
+        """Release the day's claim so the next run retries the user."""
+        zone = get_timezone_service().resolve_tz(candidate.tz)
+        await self.cache.redis.srem(_done_key(login.astimezone(zone).date()), candidate.user_id)
+
+    async def warm_user(self, candidate: WarmCandidate, login: datetime, now: datetime) -> Dict[str, str]:
+        """Compute and store all views for one user; returns view -> outcome."""
+        # Fresh for the view's normal TTL only, so job writes in the meantime
+        # don't stay hidden; the grace window keeps the value until the login,
+        # where the first read serves it and refreshes in the background
+        lead_seconds = max(0, int((login - now).total_seconds()))
+        outcome = {}
+        for view in self.views:
+            key = view.key(candidate.user_id)
+            try:
+                value = await view.build(self.db, candidate.user_id)
+                if value is None:
+                    outcome[view.name] = "empty"
+                    continue
+                await self.cache.set_swr(
+                    key,
+                    value,
+                    view.ttl,
+                    grace=CacheConfig.SWR_GRACE_SECONDS + lead_seconds,
+                    tags=[CacheTags.user(candidate.user_id)],
+                )
+                await self.cache.redis.zadd(CacheWarmingConfig.PENDING_KEY, {key: now.timestamp()})
+                outcome[view.name] = "warmed"
+            except Exception as e:
+                logger.warning("Warming view failed", view=view.name, user_id=candidate.user_id, error=str(e))
+                outcome[view.name] = "failed"
+        return outcome
+
+    async def _expire_pending(self, now: datetime) -> int:
+        """Drop warmed keys nobody read in time (they count as unused)."""
+        cutoff = now.timestamp() - CacheWarmingConfig.PENDING_MAX_AGE
+        return await self.cache.redis.zremrangebyscore(CacheWarmingConfig.PENDING_KEY, "-inf", cutoff)
+
+    async def run(self, now: Optional[datetime] = None, deadline_seconds: Optional[float] = None) -> WarmRunReport:
+        """Warm everyone due within the window (stops starting new users at the deadline)."""
+        started = time.monotonic()
+        now = now or datetime.now(timezone.utc)
+        report = WarmRunReport(views={view.name: {"warmed": 0, "failed": 0, "empty": 0} for view in self.views})
+
+        candidates = await self.load_candidates(now)
+        due = self.due(candidates, now)
+        report.candidates, report.due = len(candidates), len(due)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        stats_key = _stats_key(now.date())
+
+        async def warm(login: datetime, candidate: WarmCandidate):
+            async with semaphore:
+                if deadline_seconds is not None and time.monotonic() - started > deadline_seconds:
+                    report.deferred += 1  # Still due next run
+                    return
+                if not await self._claim(candidate, login):
+                    report.skipped_done += 1
+                    return
+                outcome = await self.warm_user(candidate, login, now)
+                results = set(outcome.values())
+                if "warmed" in results:
+                    report.warmed_users += 1
+                elif "failed" in results:
+                    report.failed_users += 1
+                    await self._unclaim(candidate, login)
+                for view_name, result in outcome.items():
+                    report.views[view_name][result] += 1
+                    if result in ("warmed", "failed"):
+                        _counters[view_name][result] += 1
+                        await self.cache.redis.hincrby(stats_key, f"{result}:{view_name}", 1)
+
+        await asyncio.gather(*(warm(login, candidate) for login, candidate in due))
+
+        report.expired_unused = await self._expire_pending(now)
+        if report.expired_unused:
+            await self.cache.redis.hincrby(stats_key, "expired_unused", report.expired_unused)
+        await self.cache.redis.expire(stats_key, CacheWarmingConfig.STATS_TTL)
+        report.duration_seconds = round(time.monotonic() - started, 2)
+        return report
+
+
+async def warm_stats(cache: CacheService, day: Optional[date] = None) -> dict:
+    """Warmed/used counts and ratio per view for a (UTC) day, across workers."""
+    day = day or datetime.now(timezone.utc).date()
+    raw = await cache.redis.hgetall(_stats_key(day))
+    counts: Dict[str, int] = {}
+    for field_name, value in (raw or {}).items():
+        name = field_name.decode() if isinstance(field_name, bytes) else field_name
+        counts[name] = int(value)
+
+    views = {}
+    for name in VIEWS:
+        warmed = counts.get(f"warmed:{name}", 0)
+        used = counts.get(f"used:{name}", 0)
+        views[name] = {
+            "warmed": warmed,
+            "used": used,
+            "failed": counts.get(f"failed:{name}", 0),
+            "used_ratio": round(used / warmed, 3) if warmed else None,
+        }
+    return {"date": day.isoformat(), "views": views, "expired_unused": counts.get("expired_unused", 0)}
+
+
+# ==================== JOB ====================
+
+_warmer: Optional[CacheWarmer] = None
+
+
+@replica_job
+async def warm_caches():
+    """Scheduler job: warm users whose expected login is within the window."""
+    global _warmer
+    from app.core.config import get_settings
+    from app.core.deps import get_supabase_read
+
+    settings = get_settings()
+    if not settings.cache_warm_enabled:
+        return None
+
+    try:
+        cache = await get_cache_service()
+    except Exception as e:
+        logger.warning("Cache warming skipped, Redis unavailable", error=str(e))
+        return None
+
+    if _warmer is None:
+        _warmer = CacheWarmer(
+            await get_supabase_read(),
+            cache,
+            active_days=settings.cache_warm_active_days,
+            window_minutes=settings.cache_warm_window_minutes,
+            concurrency=settings.cache_warm_concurrency,
+        )
+
+    # Leave room before the next run instead of overlapping with it
+    report = await _warmer.run(deadline_seconds=CacheWarmingConfig.INTERVAL_MINUTES * 60 * 0.8)
+    record_items(report.warmed_users)
+    stats = await warm_stats(cache)
+    logger.info(
+        "Cache warming run",
+        candidates=report.candidates,
+        due=report.due,
+        warmed_users=report.warmed_users,
+        failed_users=report.failed_users,
+        skipped_done=report.skipped_done,
+        deferred=report.deferred,
+        expired_unused=report.expired_unused,
+        duration_seconds=report.duration_seconds,
+        views=report.views,
+        used_ratio={name: view["used_ratio"] for name, view in stats["views"].items()},
+    )
+    return report
+
+
+__all__ = [
+    "CacheWarmingConfig",
+    "CacheWarmer",
+    "WarmCandidate",
+    "WarmRunReport",
+    "WarmView",
+    "VIEWS",
+    "build_candidates",
+    "expected_login",
+    "invalidate_views",
+    "read_view",
+    "warm_caches",
+    "warm_counters",
+    "warm_stats",
+]
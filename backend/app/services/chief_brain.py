@@ -807,7 +807,57 @@ class ChiefBrain:
         
         logger.info(f"Total queue size: {len(queue)}")
         return queue[:limit]
-    
+
+    async def get_queue_buckets(self, limit: int = 20) -> Dict[str, Any]:
+        """
+        Priorisierte Queue gruppiert nach Workflow Case (Antwort von
+        GET /command-center/queue, wird auch vom Cache-Warming genutzt).
+        """
+        queue_items = await self.get_prioritized_queue(limit=limit)
+
+        queue = {
+            "action_required": [],   # Lead wartet auf Antwort
+            "followups_today": [],   # Follow-ups fällig
+            "hot_leads": [],         # Hot ohne Aktivität 24h
+            "new_leads": [],         # Noch nie kontaktiert
+            "nurture": [],           # >7 Tage kein Kontakt
+            "appointments_today": [] # Termine heute
+        }
+
+        for item in queue_items:
+            lead = item['lead']
+            workflow = item['workflow']
+
+            # Füge workflow als suggested_action hinzu (für Kompatibilität)
+            lead["suggested_action"] = workflow
+            lead["priority"] = workflow.get('priority', 'medium')
+            lead["workflow"] = workflow
+
+            # Kategorisiere basierend auf Workflow Case
+            case = workflow.get('case', '').upper()
+
+            if case == 'RESPONSE_RECEIVED':
+                queue["action_required"].append(lead)
+            elif case == 'FOLLOWUP_DUE':
+                queue["followups_today"].append(lead)
+            elif case == 'HOT_LEAD':
+                queue["hot_leads"].append(lead)
+            elif case == 'NEW_LEAD':
+                queue["new_leads"].append(lead)
+            elif case == 'GONE_COLD':
+                queue["nurture"].append(lead)
+            elif case == 'QUALIFIED':
+                queue["action_required"].append(lead)
+            else:
+                # Default: in new_leads
+                queue["new_leads"].append(lead)
+
+        return {
+            "queue": queue,
+            "total_actionable": sum(len(v) for v in queue.values()),
+            "generated_at": datetime.now().isoformat()
+        }
+
     async def _load_lead_messages(self, lead_id: str) -> List[Dict]:
         """Lädt Nachrichten für einen Lead."""
         try:
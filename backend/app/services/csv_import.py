@@ -12,6 +12,8 @@ import pandas as pd
 import uuid
 from datetime import datetime
 
+from app.db.bulk import SupabaseBulkWriter
+
 logger = logging.getLogger(__name__)
 
 
@@ -235,21 +237,19 @@ class CSVImportService:
         for lead in leads:
             lead['user_id'] = user_id
 
-        # Batch insert
-        try:
-            if leads:
-                self.db.table('leads').insert(leads).execute()
-                result.imported = len(leads)
-
-            logger.info(f"Imported {result.imported} leads for user {user_id}")
+        # Chunked batch insert; failing rows are isolated and reported individually
+        if leads:
+            write_result = SupabaseBulkWriter(self.db, 'leads').write_sync(leads)
+            result.imported = write_result.written
+            for row_error in write_result.errors:
+                logger.error(f"Import error in row {row_error.index}: {row_error.error}")
+                result.errors.append({
+                    'type': 'database_error',
+                    'message': row_error.error,
+                    'row': row_error.index
+                })
 
-        except Exception as e:
-            logger.error(f"Import error: {e}")
-            result.errors.append({
-                'type': 'database_error',
-                'message': str(e),
-                'row': None
-            })
+        logger.info(f"Imported {result.imported} leads for user {user_id}")
 
         return result
 
@@ -295,3 +295,75 @@ class DailyBriefingService:
             return max(0, (today - due_date).days)
         except:
             return 0
+
+
+def briefing_to_dict(briefing: DailyBriefing) -> Dict[str, Any]:
+    """JSON shape of GET /dashboard/today (also what gets cached)."""
+    return {
+        "leads": [
+            {
+                "id": lead.id,
+                "name": lead.name,
+                "company": lead.company,
+                "phone": lead.phone,
+                "email": lead.email,
+                "status": lead.status,
+                "score": lead.score,
+                "last_contact": lead.last_contact,
+                "next_follow_up": lead.next_follow_up,
+                "reason": lead.reason,
+                "reason_text": lead.reason_text,
+                "priority": lead.priority
+            }
+            for lead in briefing.leads
+        ],
+        "stats": {
+            "overdue": briefing.stats.overdue,
+            "today": briefing.stats.today,
+            "hot": briefing.stats.hot,
+            "total": briefing.stats.total
+        },
+        "last_updated": briefing.last_updated
+    }
+
+
+async def get_today_briefing_payload(db_client, user_id: str) -> Dict[str, Any]:
+    """Build the daily briefing for a user as a JSON-ready dict."""
+    briefing = await DailyBriefingService(db_client).get_daily_briefing(user_id)
+    return briefing_to_dict(briefing)
+
+
+def _confidence_display(confidence: Optional[float]) -> str:
+    if confidence is None:
+        return "⚪ N/A"
+    if confidence >= 90:
+        return f"🟢 {int(confidence)}%"
+    if confidence >= 70:
+        return f"🟡 {int(confidence)}%"
+    return f"🔴 {int(confidence)}%"
+
+
+async def get_pending_suggestions(db_client, user_id: str, limit: int = 50) -> Dict[str, Any]:
+    """
+    Pending follow-up suggestions (next 90 days), highest confidence first.
+    JSON shape of GET /followups/pending.
+    """
+    end_of_range = (datetime.utcnow() + timedelta(days=90)).isoformat()
+
+    result = (
+        db_client.table("followup_suggestions")
+        .select("*, leads(id, name, email, phone, company, status, whatsapp, instagram, linkedin)")
+        .eq("user_id", user_id)
+        .eq("status", "pending")
+        .lte("due_at", end_of_range)
+        .order("confidence_score", desc=True)  # High confidence zuerst
+        .order("due_at")
+        .limit(limit)
+        .execute()
+    )
+
+    suggestions = result.data or []
+    for sug in suggestions:
+        sug["confidence_display"] = _confidence_display(sug.get("confidence_score"))
+
+    return {"suggestions": suggestions, "count": len(suggestions)}
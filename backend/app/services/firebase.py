@@ -11,6 +11,9 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# FCM accepts up to 500 messages per send_each call
+FCM_BATCH_SIZE = 500
+
 # Initialize Firebase Admin SDK
 _firebase_app = None
 
@@ -40,6 +43,35 @@ def get_firebase_app():
     return _firebase_app
 
 
+def build_message(
+    token: str,
+    title: str,
+    body: str,
+    data: dict = None,
+    image_url: str = None
+) -> messaging.Message:
+    """Build the FCM message for one device."""
+    return messaging.Message(
+        notification=messaging.Notification(
+            title=title,
+            body=body,
+            image=image_url
+        ),
+        data={k: str(v) for k, v in (data or {}).items()},
+        token=token,
+        webpush=messaging.WebpushConfig(
+            notification=messaging.WebpushNotification(
+                icon="/icon-192.png",
+                badge="/badge-72.png",
+                vibrate=[200, 100, 200]
+            ),
+            fcm_options=messaging.WebpushFCMOptions(
+                link="https://aura-os-git-main-sales-flow-ais-projects.vercel.app/chat"
+            )
+        )
+    )
+
+
 async def send_push_notification(
     token: str,
     title: str,
@@ -55,29 +87,7 @@ async def send_push_notification(
     get_firebase_app()
 
     try:
-        # Build notification
-        notification = messaging.Notification(
-            title=title,
-            body=body,
-            image=image_url
-        )
-
-        # Build message
-        message = messaging.Message(
-            notification=notification,
-            data={k: str(v) for k, v in (data or {}).items()},
-            token=token,
-            webpush=messaging.WebpushConfig(
-                notification=messaging.WebpushNotification(
-                    icon="/icon-192.png",
-                    badge="/badge-72.png",
-                    vibrate=[200, 100, 200]
-                ),
-                fcm_options=messaging.WebpushFCMOptions(
-                    link="https://aura-os-git-main-sales-flow-ais-projects.vercel.app/chat"
-                )
-            )
-        )
+        message = build_message(token, title, body, data, image_url)
 
         # Send
         response = messaging.send(message)
@@ -138,3 +148,69 @@ async def send_push_to_user(
         "success": any(r.get("success") for r in results),
         "results": results
     }
+
+
+def send_push_batch(db, pushes: list) -> dict:
+    """
+    Send push notifications to many users at once.
+
+    Blocking (sync Supabase client, FCM send_each); jobs call it via
+    asyncio.to_thread.
+
+    Args:
+        pushes: [{"user_id", "title", "body", "data"}, ...]
+
+    Returns:
+        user_id -> True if at least one device received the push
+    """
+    delivered = {push["user_id"]: False for push in pushes}
+    if not pushes:
+        return delivered
+
+    # One subscriptions query per chunk of users instead of one per user
+    user_ids = list(delivered)
+    subscriptions = []
+    for i in range(0, len(user_ids), 200):
+        result = db.from_("push_subscriptions").select(
+            "user_id, fcm_token, device_type"
+        ).in_("user_id", user_ids[i:i + 200]).not_.is_("fcm_token", "null").execute()
+        subscriptions.extend(result.data or [])
+
+    by_user = {}
+    for sub in subscriptions:
+        if sub.get("fcm_token"):
+            by_user.setdefault(sub["user_id"], []).append(sub["fcm_token"])
+
+    targets = []
+    for push in pushes:
+        for token in by_user.get(push["user_id"], []):
+            targets.append((push["user_id"], token, build_message(token, push["title"], push["body"], push.get("data"))))
+    if not targets:
+        return delivered
+
+    get_firebase_app()
+    unregistered = []
+    for i in range(0, len(targets), FCM_BATCH_SIZE):
+        chunk = targets[i:i + FCM_BATCH_SIZE]
+        try:
+            batch = messaging.send_each([message for _, _, message in chunk])
+        except Exception as e:
+            logger.error(f"Push batch failed: {e}")
+            continue
+        for (user_id, token, _), response in zip(chunk, batch.responses):
+            if response.success:
+                delivered[user_id] = True
+            elif isinstance(response.exception, messaging.UnregisteredError):
+                unregistered.append(token)
+
+    # Remove unregistered tokens
+    for i in range(0, len(unregistered), 200):
+        db.from_("push_subscriptions").delete().in_(
+            "fcm_token", unregistered[i:i + 200]
+        ).execute()
+
+    logger.info(
+        f"Push batch: {sum(delivered.values())}/{len(delivered)} users reached, "
+        f"{len(targets)} devices, {len(unregistered)} unregistered"
+    )
+    return delivered
@@ -7,19 +7,55 @@ Integriert Autopilot-Funktionalität in das Follow-up-System:
 - Background Processing
 """
 
+import asyncio
 import json
 import logging
+import time
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from uuid import UUID
 
+from redis.exceptions import RedisError
+
 from ..supabase_client import get_supabase_client
 from ..services.gmail_service import GmailService
 from ..core.config import get_settings
+from .job_coordinator import get_job_coordinator, shard_filter
+from .job_telemetry import record_failure, record_items
+from .message_batching import SINGLE, BatchCall, BatchedMessageGenerator, GeneratedMessage, MessageRequest, get_generation_stats
+from .user_fanout import FanoutReport, UserFanout
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+CONFIDENCE_MODEL = "gpt-4o-mini"
+CONFIDENCE_SYSTEM_PROMPT = "Du bist ein Sales-Assistent. Antworte IMMER als JSON."
+CONFIDENCE_RULES = """Confidence Score Regeln:
+- 90-100: Standard Follow-up, keine offenen Fragen, klarer Kontext ("Hast du meine Nachricht gesehen?")
+- 70-89: Kontext-spezifisch aber sicher, gute Datenlage
+- 50-69: Komplex, sollte geprüft werden, unklare Situation
+- <50: Riskant, manuelle Prüfung nötig, wenig Kontext
+
+Wichtig: Sei ehrlich beim Confidence Score. Niedrige Scores sind OK wenn der Kontext unklar ist."""
+
+
+def _execution_mode(confidence_score: float) -> str:
+    """Execution Mode aus dem Confidence Score."""
+    if confidence_score >= 90:
+        return "autopilot"  # Kann automatisch gesendet werden
+    if confidence_score >= 70:
+        return "prepared"  # User entscheidet
+    return "manual"  # Sollte geprüft werden
+
+
+def _fallback_result() -> Dict[str, Any]:
+    return {
+        "message": "Hallo, ich wollte kurz nachfragen wie es dir geht.",
+        "confidence_score": 50.0,
+        "confidence_reason": "Fehler bei AI-Generierung - manuelle Prüfung empfohlen",
+        "execution_mode": "manual"
+    }
+
 
 async def generate_followup_with_confidence(
     lead_id: str,
@@ -55,23 +91,26 @@ Antworte als JSON:
     "confidence_reason": "Warum dieser Score"
 }}
 
-Confidence Score Regeln:
-- 90-100: Standard Follow-up, keine offenen Fragen, klarer Kontext ("Hast du meine Nachricht gesehen?")
-- 70-89: Kontext-spezifisch aber sicher, gute Datenlage
-- 50-69: Komplex, sollte geprüft werden, unklare Situation
-- <50: Riskant, manuelle Prüfung nötig, wenig Kontext
-
-Wichtig: Sei ehrlich beim Confidence Score. Niedrige Scores sind OK wenn der Kontext unklar ist.
+{CONFIDENCE_RULES}
 """
         
+        started = time.monotonic()
         response_text = await chat_completion(
             messages=[
-                {"role": "system", "content": "Du bist ein Sales-Assistent. Antworte IMMER als JSON."},
+                {"role": "system", "content": CONFIDENCE_SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
-            model="gpt-4o-mini",
+            model=CONFIDENCE_MODEL,
             max_tokens=500
         )
+        get_generation_stats().record(
+            "autopilot",
+            SINGLE,
+            seconds=time.monotonic() - started,
+            prompt=CONFIDENCE_SYSTEM_PROMPT + prompt,
+            response=response_text,
+            model=CONFIDENCE_MODEL,
+        )
         
         result = json.loads(response_text)
         
@@ -79,30 +118,112 @@ Wichtig: Sei ehrlich beim Confidence Score. Niedrige Scores sind OK wenn der Kon
         confidence_reason = result.get("confidence_reason", "Standard Follow-up")
         message = result.get("message", "")
         
-        # Determine execution mode based on confidence
-        if confidence_score >= 90:
-            execution_mode = "autopilot"  # Kann automatisch gesendet werden
-        elif confidence_score >= 70:
-            execution_mode = "prepared"  # User entscheidet
-        else:
-            execution_mode = "manual"  # Sollte geprüft werden
-        
         return {
             "message": message,
             "confidence_score": confidence_score,
             "confidence_reason": confidence_reason,
-            "execution_mode": execution_mode
+            "execution_mode": _execution_mode(confidence_score)
         }
         
     except Exception as e:
         logger.error(f"Error generating followup with confidence: {e}", exc_info=True)
         # Fallback: Return default
-        return {
-            "message": "Hallo, ich wollte kurz nachfragen wie es dir geht.",
-            "confidence_score": 50.0,
-            "confidence_reason": "Fehler bei AI-Generierung - manuelle Prüfung empfohlen",
-            "execution_mode": "manual"
+        return _fallback_result()
+
+
+async def generate_followups_with_confidence(
+    user_id: str,
+    items: List[Dict[str, Any]],
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
+    """
+    Batch-Variante von generate_followup_with_confidence.
+    
+    Leads mit gleichem Template, Stage und Sprache teilen sich einen
+    Call, der pro Lead Nachricht + Confidence Score liefert (siehe
+    message_batching.py); ungültige Varianten laufen über den Einzel-Call.
+    
+    Args:
+        items: {"lead_id", "context", "previous_message", "template_key", "stage", "language", "name"}
+    
+    Returns:
+        (lead_id -> Ergebnis wie generate_followup_with_confidence, Bericht mit Kosten/Latenz pro Nachricht)
+    """
+    from ..ai_client import chat_completion
+    
+    requests = [
+        MessageRequest(
+            key=str(item["lead_id"]),
+            template=str(item.get("template_key") or "default"),
+            step=str(item.get("stage")),
+            language=item.get("language") or "de",
+            lead={
+                "kontext": item.get("context") or {},
+                "letzte_nachricht": item.get("previous_message") or "Keine vorherige Nachricht",
+            },
+            name=(item.get("name") or "").split(" ")[0],
+            payload=item,
+        )
+        for item in items
+    ]
+    
+    def shared_prompt(request: MessageRequest) -> str:
+        return f"""
+Generiere Follow-up Nachrichten (Template: {request.template}, Stage: {request.step}).
+Jede Nachricht: kurz, persönlich, mit klarem CTA.
+
+{CONFIDENCE_RULES}
+"""
+    
+    async def complete(call: BatchCall) -> str:
+        return await chat_completion(
+            messages=[
+                {"role": "system", "content": call.system},
+                {"role": "user", "content": call.prompt}
+            ],
+            model=CONFIDENCE_MODEL,
+            max_tokens=call.max_tokens
+        )
+    
+    async def single(request: MessageRequest) -> GeneratedMessage:
+        result = await generate_followup_with_confidence(
+            lead_id=request.key,
+            user_id=user_id,
+            context=request.payload.get("context"),
+            previous_message=request.payload.get("previous_message"),
+        )
+        return GeneratedMessage(
+            key=request.key,
+            content=result.get("message"),
+            path=SINGLE,
+            confidence_score=result.get("confidence_score"),
+            confidence_reason=result.get("confidence_reason"),
+            model=CONFIDENCE_MODEL,
+        )
+    
+    generator = BatchedMessageGenerator(
+        "autopilot",
+        complete=complete,
+        single=single,
+        shared_prompt=shared_prompt,
+        system_prompt=CONFIDENCE_SYSTEM_PROMPT,
+        model=CONFIDENCE_MODEL,
+        with_confidence=True,
+    )
+    generated, report = await generator.generate(requests)
+    
+    results: Dict[str, Dict[str, Any]] = {}
+    for key, message in generated.items():
+        if not message.content:
+            results[key] = _fallback_result()
+            continue
+        score = float(message.confidence_score if message.confidence_score is not None else 70)
+        results[key] = {
+            "message": message.content,
+            "confidence_score": score,
+            "confidence_reason": message.confidence_reason or "Standard Follow-up",
+            "execution_mode": _execution_mode(score)
         }
+    return results, report.to_dict()
 
 
 async def process_autopilot_sends(user_id: str) -> Dict[str, Any]:
@@ -248,38 +369,102 @@ async def process_autopilot_sends(user_id: str) -> Dict[str, Any]:
         return {"processed": 0, "sent": 0, "skipped": 0, "error": str(e)}
 
 
-async def run_autopilot_for_all_users():
+# Every 15 minutes: stop starting new users well before the next run
+AUTOPILOT_DEADLINE_SECONDS = 12 * 60
+# Per-user lease across replicas (covers users still running after their timeout)
+AUTOPILOT_USER_LEASE_SECONDS = 15 * 60
+
+_autopilot_fanout: Optional[UserFanout] = None
+
+
+def _get_autopilot_fanout() -> UserFanout:
+    global _autopilot_fanout
+    if _autopilot_fanout is None:
+        _autopilot_fanout = UserFanout(
+            "autopilot",
+            concurrency=settings.autopilot_concurrency,
+            user_timeout=settings.autopilot_user_timeout_seconds,
+        )
+    return _autopilot_fanout
+
+
+async def _process_user_isolated(user_id: str) -> Dict[str, Any]:
+    """
+    Process one user under a Redis lease, so replicas (e.g. after a shard
+    change mid-run) never send for the same user at the same time.
+    """
+    coordinator = await get_job_coordinator()
+    if coordinator.redis is None:
+        return await process_autopilot_sends(user_id)
+
+    lock_name = f"autopilot:user:{user_id}"
+    try:
+        token = await coordinator.acquire(lock_name, ttl=AUTOPILOT_USER_LEASE_SECONDS)
+    except RedisError as e:
+        # Fail open like the job lock: a duplicate check beats no sends
+        logger.warning(f"Autopilot user lease unavailable for {user_id}: {e}")
+        return await process_autopilot_sends(user_id)
+    if not token:
+        logger.debug(f"Autopilot user {user_id} is being processed by another replica")
+        return {"processed": 0, "sent": 0, "skipped": 0, "leased_elsewhere": True}
+
+    try:
+        return await process_autopilot_sends(user_id)
+    finally:
+        try:
+            await coordinator.release(lock_name, token)
+        except RedisError as e:
+            logger.warning(f"Could not release autopilot user lease for {user_id}: {e}")
+
+
+def _active_autopilot_user_ids(db) -> List[str]:
+    result = (
+        db.table("autopilot_settings")
+        .select("user_id")
+        .eq("is_active", True)
+        .neq("mode", "off")
+        .execute()
+    )
+    return sorted(set(row["user_id"] for row in result.data or [] if row.get("user_id")))
+
+
+async def run_autopilot_for_all_users() -> Optional[FanoutReport]:
     """
     Background Job: Verarbeitet Autopilot Follow-ups für alle aktiven User.
-    Wird alle 15 Minuten ausgeführt.
+    Wird alle 15 Minuten ausgeführt; bei mehreren Replicas verarbeitet
+    jede ihren Shard der User (siehe job_coordinator.py).
+
+    User laufen parallel (settings.autopilot_concurrency) mit Timeout pro
+    User; am längsten nicht verarbeitete User zuerst (siehe user_fanout.py).
+    Ein Redis-Lease pro User verhindert parallele Sends auf zwei Replicas.
     """
     db = get_supabase_client()
     
     try:
         # Hole alle User mit aktivem Autopilot
-        users_result = (
-            db.table("autopilot_settings")
-            .select("user_id")
-            .eq("is_active", True)
-            .neq("mode", "off")
-            .execute()
-        )
-        
-        if not users_result.data:
-            return
+        user_ids = await asyncio.to_thread(_active_autopilot_user_ids, db)
+        if not user_ids:
+            return None
         
-        user_ids = list(set([u["user_id"] for u in users_result.data]))
+        # Sharded job: each replica processes its share of the users
+        user_ids = shard_filter(user_ids)
         
-        total_processed = 0
-        total_sent = 0
-        
-        for user_id in user_ids:
-            result = await process_autopilot_sends(user_id)
-            total_processed += result.get("processed", 0)
-            total_sent += result.get("sent", 0)
+        report = await _get_autopilot_fanout().run(
+            user_ids, _process_user_isolated, deadline_seconds=AUTOPILOT_DEADLINE_SECONDS
+        )
+        total_processed = sum(r.get("processed", 0) for r in report.results.values())
+        total_sent = sum(r.get("sent", 0) for r in report.results.values())
+        record_items(total_processed)
         
-        logger.info(f"Autopilot processed: {total_processed} followups, {total_sent} sent for {len(user_ids)} users")
+        logger.info(
+            f"Autopilot processed: {total_processed} followups, {total_sent} sent for "
+            f"{report.completed}/{len(user_ids)} users in {report.duration_seconds}s "
+            f"({report.users_per_second} users/s, timed_out={report.timed_out}, "
+            f"deferred={report.deferred}, max_lag={report.max_lag_seconds}s)"
+        )
+        return report
         
     except Exception as e:
         logger.error(f"Error in run_autopilot_for_all_users: {e}", exc_info=True)
-
+        record_failure(str(e))
+        return None
@@ -0,0 +1,124 @@
+# file: app/services/followup_due_index.py
+"""
+Follow-Up Due Index - Zeitgeordnete Warteschlange fälliger Follow-ups
+
+Statt für "Heute fällig" alle Leads zu laden und für jeden die komplette
+Sequenz-Logik auszuführen, hält der Index pro Lead einen Eintrag
+(recommended_time, priority, lead_id):
+
+- FollowUpEngine.get_next_follow_up schreibt/entfernt den Eintrag samt
+  fertig berechneter Suggestion
+- change_lead_state / process_sent_followup setzen den Eintrag auf den
+  neuen Fälligkeitszeitpunkt, ohne Suggestion ("neu bewerten")
+- get_today_followups wird zu einem Range-Read bis Tagesende
+- FollowUpEngine.rebuild_due_index baut den Index aus den Leads neu auf
+
+Implementierung: InMemoryDueIndex, sortierte Liste (bisect) passend zum
+InMemory-Repo. Der Supabase-Pfad (routers/followup_engine.py) liest fällige
+Einträge direkt aus contact_follow_up_queue und braucht keinen Index.
+"""
+
+from __future__ import annotations
+
+import bisect
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.models.followup import FollowUpPriority, FollowUpSuggestion
+
+# Kleinerer Rang = dringender
+PRIORITY_RANK = {
+    FollowUpPriority.CRITICAL: 0,
+    FollowUpPriority.HIGH: 1,
+    FollowUpPriority.MEDIUM: 2,
+    FollowUpPriority.LOW: 3,
+}
+
+
+def _utc(value: datetime) -> datetime:
+    """Naive Zeiten gelten als Server-Lokalzeit (wie datetime.now())."""
+    if value.tzinfo is None:
+        value = value.astimezone()
+    return value.astimezone(timezone.utc)
+
+
+@dataclass
+class DueEntry:
+    """Ein Lead in der Warteschlange."""
+
+    lead_id: str
+    owner_id: str
+    recommended_time: datetime
+    priority: FollowUpPriority = FollowUpPriority.MEDIUM
+    suggestion: Optional[Dict[str, Any]] = None     # None: beim Lesen neu bewerten
+
+    @classmethod
+    def from_suggestion(cls, suggestion: FollowUpSuggestion) -> "DueEntry":
+        return cls(
+            lead_id=str(suggestion.lead_id),
+            owner_id=str(suggestion.owner_id),
+            recommended_time=_utc(suggestion.recommended_time),
+            priority=suggestion.priority,
+            suggestion=suggestion.model_dump(mode="json"),
+        )
+
+    @property
+    def sort_key(self) -> Tuple[datetime, int, str]:
+        return (_utc(self.recommended_time), PRIORITY_RANK.get(self.priority, 99), self.lead_id)
+
+    def to_suggestion(self) -> Optional[FollowUpSuggestion]:
+        return FollowUpSuggestion.model_validate(self.suggestion) if self.suggestion else None
+
+
+class InMemoryDueIndex:
+    """Sortierte Liste pro Owner plus globale Liste (für Abfragen ohne User)."""
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, DueEntry] = {}
+        self._global: List[Tuple[Tuple[datetime, int, str], str]] = []
+        self._by_owner: Dict[str, List[Tuple[Tuple[datetime, int, str], str]]] = {}
+
+    def _discard(self, lead_id: str) -> None:
+        entry = self._entries.pop(lead_id, None)
+        if entry is None:
+            return
+        item = (entry.sort_key, lead_id)
+        for ordered in (self._global, self._by_owner.get(entry.owner_id, [])):
+            pos = bisect.bisect_left(ordered, item)
+            if pos < len(ordered) and ordered[pos] == item:
+                del ordered[pos]
+
+    async def upsert(self, entry: DueEntry) -> None:
+        self._discard(entry.lead_id)
+        self._entries[entry.lead_id] = entry
+        item = (entry.sort_key, entry.lead_id)
+        bisect.insort(self._global, item)
+        bisect.insort(self._by_owner.setdefault(entry.owner_id, []), item)
+
+    async def get(self, lead_id: str) -> Optional[DueEntry]:
+        return self._entries.get(lead_id)
+
+    async def remove(self, lead_id: str) -> None:
+        self._discard(lead_id)
+
+    async def range(self, until: datetime, owner_id: Optional[str] = None) -> List[DueEntry]:
+        """Einträge mit recommended_time < until, zeitlich sortiert."""
+        ordered = self._global if owner_id is None else self._by_owner.get(owner_id, [])
+        end = bisect.bisect_left(ordered, ((_utc(until), -1, ""), ""))
+        return [self._entries[lead_id] for _, lead_id in ordered[:end]]
+
+    async def replace(self, entries: List[DueEntry], owner_id: Optional[str] = None) -> None:
+        """Ersetzt alle Einträge (eines Owners) - für den Rebuild."""
+        stale = [lid for lid, e in self._entries.items() if owner_id is None or e.owner_id == owner_id]
+        for lead_id in stale:
+            self._discard(lead_id)
+        for entry in entries:
+            await self.upsert(entry)
+
+
+__all__ = [
+    "DueEntry",
+    "InMemoryDueIndex",
+    "PRIORITY_RANK",
+]
@@ -16,14 +16,16 @@ Die Engine kombiniert:
 
 from __future__ import annotations
 
-from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Protocol
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Protocol, Tuple
 from uuid import UUID
 
 from app.models.followup import (
     AIMessage,
     FollowUpChannel,
-    FollowUpCondition,
     FollowUpPriority,
     FollowUpSequence,
     FollowUpSequenceState,
@@ -32,6 +34,23 @@ from app.models.followup import (
     FollowUpSuggestion,
     LeadContext,
 )
+from app.services.followup_due_index import PRIORITY_RANK, DueEntry
+from app.services.message_batching import (
+    BATCHED,
+    SINGLE,
+    BatchCall,
+    BatchedMessageGenerator,
+    BatchReport,
+    GeneratedMessage,
+    MessageRequest,
+    get_generation_stats,
+)
+from app.services.sequence_definitions import (
+    CompiledStep,
+    SequenceDefinitionCache,
+    condition_predicate,
+    get_sequence_cache,
+)
 
 # State transition rules
 STATE_TRANSITIONS = {
@@ -44,6 +63,14 @@ STATE_TRANSITIONS = {
     'dormant': ['engaged', 'new']
 }
 
+logger = logging.getLogger(__name__)
+
+# Range-Read "heute": Leads in Zeitzonen hinter dem Server (bis UTC-12)
+TODAY_TZ_MARGIN = timedelta(hours=14)
+
+# Lead-Felder, die im gebündelten Prompt pro Lead mitgehen
+LEAD_PROMPT_FIELDS = {"first_name", "full_name", "primary_channel", "lead_score", "tags", "meta"}
+
 # ─────────────────────────────────────
 # Protocols für Abhängigkeiten
 # (damit der Code testbar & austauschbar bleibt)
@@ -84,6 +111,32 @@ class FollowUpRepository(Protocol):
         """Liefert alle Leads (für /today Endpoint)."""
         ...
 
+    # Batch-Varianten (für get_next_follow_ups). Die Defaults fallen auf
+    # die Einzel-Calls zurück; Implementierungen sollten gesammelt laden.
+
+    async def get_lead_contexts(self, lead_ids: List[UUID]) -> Dict[UUID, LeadContext]:
+        """lead_id -> LeadContext (unbekannte Leads fehlen)."""
+        leads = {lead_id: await self.get_lead_context(lead_id) for lead_id in lead_ids}
+        return {lead_id: lead for lead_id, lead in leads.items() if lead}
+
+    async def get_active_sequence_states(self, lead_ids: List[UUID]) -> Dict[UUID, FollowUpSequenceState]:
+        """lead_id -> aktiver State (Leads ohne State fehlen)."""
+        states = {lead_id: await self.get_active_sequence_state(lead_id) for lead_id in lead_ids}
+        return {lead_id: state for lead_id, state in states.items() if state}
+
+    async def get_recent_interactions_bulk(
+        self, lead_ids: List[UUID], limit: int = 20
+    ) -> Dict[UUID, List[Dict[str, Any]]]:
+        """lead_id -> Events/Message-Logs (neueste zuerst)."""
+        return {lead_id: await self.get_recent_interactions(lead_id, limit) for lead_id in lead_ids}
+
+    async def upsert_sequence_states(self, states: List[FollowUpSequenceState]) -> List[FollowUpSequenceState]:
+        return [await self.upsert_sequence_state(state) for state in states]
+
+    async def log_followup_suggestions(self, suggestions: List[FollowUpSuggestion]) -> None:
+        for suggestion in suggestions:
+            await self.log_followup_suggestion(suggestion)
+
 
 class AIRouterProtocol(Protocol):
     """
@@ -117,6 +170,29 @@ class TimezoneServiceProtocol(Protocol):
         ...
 
 
+class FollowUpDueIndex(Protocol):
+    """
+    Zeitgeordnete Warteschlange (recommended_time, priority, lead_id).
+    Implementierungen: siehe services/followup_due_index.py
+    """
+
+    async def upsert(self, entry: DueEntry) -> None:
+        ...
+
+    async def get(self, lead_id: str) -> Optional[DueEntry]:
+        ...
+
+    async def remove(self, lead_id: str) -> None:
+        ...
+
+    async def range(self, until: datetime, owner_id: Optional[str] = None) -> List[DueEntry]:
+        """Einträge mit recommended_time < until, zeitlich sortiert."""
+        ...
+
+    async def replace(self, entries: List[DueEntry], owner_id: Optional[str] = None) -> None:
+        ...
+
+
 # ─────────────────────────────────────
 # FollowUpEngine
 # ─────────────────────────────────────
@@ -137,10 +213,14 @@ class FollowUpEngine:
         repo: FollowUpRepository,
         ai_router: AIRouterProtocol,
         tz_service: TimezoneServiceProtocol,
+        due_index: Optional[FollowUpDueIndex] = None,
+        sequence_cache: Optional[SequenceDefinitionCache] = None,
     ) -> None:
         self.repo = repo
         self.ai = ai_router
         self.tz = tz_service
+        self.due_index = due_index
+        self.sequences = sequence_cache or get_sequence_cache()
 
     # ─────────────────────────────────
     # PUBLIC API
@@ -160,6 +240,19 @@ class FollowUpEngine:
         Returns:
             FollowUpSuggestion oder None wenn kein Follow-up fällig
         """
+        suggestion = await self._evaluate_next_follow_up(lead_id)
+
+        # Due-Index aktuell halten
+        if self.due_index is not None:
+            if suggestion:
+                await self.due_index.upsert(DueEntry.from_suggestion(suggestion))
+            else:
+                await self.due_index.remove(str(lead_id))
+
+        return suggestion
+
+    async def _evaluate_next_follow_up(self, lead_id: UUID) -> Optional[FollowUpSuggestion]:
+        """Sequenz-Logik für get_next_follow_up (ohne Index-Pflege)."""
         lead = await self.repo.get_lead_context(lead_id)
         if not lead:
             return None
@@ -175,56 +268,114 @@ class FollowUpEngine:
             # State direkt persistieren
             state = await self.repo.upsert_sequence_state(state)
         else:
-            sequence = await self.repo.get_sequence_by_id(state.sequence_id)
+            sequence = await self._load_sequence(state.sequence_id)
             if not sequence:
                 return None
 
-        # Beendete Sequenzen überspringen
-        if state.status in {
-            FollowUpSequenceStatus.COMPLETED,
-            FollowUpSequenceStatus.STOPPED,
-            FollowUpSequenceStatus.GHOSTED,
-        }:
-            return None
-
-        next_step = self._determine_next_step(sequence, state, lead)
+        next_step = self._pending_step(lead, state, sequence)
         if not next_step:
             return None
 
         # Conditions prüfen (z.B. NO_REPLY etc.)
         interactions = await self.repo.get_recent_interactions(lead_id)
-        if not self._condition_satisfied(next_step, interactions):
+        if not next_step.condition(interactions):
             return None
 
-        # Zeitpunkt bestimmen
-        recommended_time = self._compute_recommended_time(lead, state, next_step)
-
-        # Priorität bestimmen
-        priority = self._compute_priority(lead, state, next_step)
-
-        suggestion = FollowUpSuggestion(
-            lead_id=lead.id,
-            workspace_id=lead.workspace_id,
-            owner_id=lead.owner_id,
-            sequence_id=sequence.id,
-            step_id=next_step.id,
-            recommended_channel=next_step.channel,
-            recommended_time=recommended_time,
-            priority=priority,
-            reason=self._build_reason(lead, state, next_step),
-            meta={
-                "sequence_name": sequence.name,
-                "step_action": next_step.action,
-                "day_offset": next_step.day_offset,
-                "template_key": next_step.template_key,
-            },
-        )
+        suggestion = self._build_suggestion(lead, state, sequence, next_step.source)
 
         # Logging
         await self.repo.log_followup_suggestion(suggestion)
 
         return suggestion
 
+    async def get_next_follow_ups(
+        self,
+        lead_ids: List[UUID],
+        skip_errors: bool = False,
+    ) -> Dict[UUID, Optional[FollowUpSuggestion]]:
+        """
+        Batch-Variante von get_next_follow_up.
+        
+        Lead-Kontexte, States und Interaktionen werden gesammelt geladen,
+        Sequenzen kommen aus dem Definitions-Cache; die Entscheidungslogik
+        läuft danach ohne weitere Repository-Calls.
+        
+        Returns:
+            lead_id -> FollowUpSuggestion oder None (Reihenfolge wie lead_ids)
+        """
+        suggestions = await self._evaluate_next_follow_ups(lead_ids, skip_errors=skip_errors)
+
+        if self.due_index is not None:
+            for lead_id, suggestion in suggestions.items():
+                if suggestion:
+                    await self.due_index.upsert(DueEntry.from_suggestion(suggestion))
+                else:
+                    await self.due_index.remove(str(lead_id))
+
+        return suggestions
+
+    async def _evaluate_next_follow_ups(
+        self,
+        lead_ids: List[UUID],
+        skip_errors: bool = False,
+    ) -> Dict[UUID, Optional[FollowUpSuggestion]]:
+        """Sequenz-Logik für get_next_follow_ups (ohne Index-Pflege)."""
+        results: Dict[UUID, Optional[FollowUpSuggestion]] = {lead_id: None for lead_id in lead_ids}
+        if not results:
+            return results
+
+        leads = await self.repo.get_lead_contexts(list(results))
+        states = await self.repo.get_active_sequence_states(list(leads))
+        sequences: Dict[UUID, Optional[FollowUpSequence]] = {}
+
+        # Leads ohne aktive Sequenz: Standard-Sequenz wählen, States gesammelt persistieren
+        new_states: List[FollowUpSequenceState] = []
+        for lead_id, lead in leads.items():
+            if lead_id in states:
+                continue
+            sequence = await self.repo.get_default_sequence_for_lead(lead)
+            if sequence:
+                sequences[sequence.id] = sequence
+                new_states.append(self._init_sequence_state(lead, sequence))
+        for state in await self.repo.upsert_sequence_states(new_states) if new_states else []:
+            states[state.lead_id] = state
+
+        # Sequenzen einmal pro Batch auflösen (Cache, sonst Repository)
+        for state in states.values():
+            if state.sequence_id not in sequences:
+                sequences[state.sequence_id] = await self._load_sequence(state.sequence_id)
+
+        pending: Dict[UUID, CompiledStep] = {}
+        for lead_id, state in states.items():
+            sequence = sequences.get(state.sequence_id)
+            if lead_id in leads and sequence:
+                step = self._pending_step(leads[lead_id], state, sequence)
+                if step:
+                    pending[lead_id] = step
+
+        interactions = await self.repo.get_recent_interactions_bulk(list(pending)) if pending else {}
+
+        suggestions: List[FollowUpSuggestion] = []
+        for lead_id, step in pending.items():
+            try:
+                if not step.condition(interactions.get(lead_id, [])):
+                    continue
+                state = states[lead_id]
+                suggestion = self._build_suggestion(leads[lead_id], state, sequences[state.sequence_id], step.source)
+            except Exception as e:
+                if not skip_errors:
+                    raise
+                logger.warning(f"Follow-up evaluation skipped lead {lead_id}: {e}")
+                continue
+            results[lead_id] = suggestion
+            suggestions.append(suggestion)
+
+        # Logging
+        if suggestions:
+            await self.repo.log_followup_suggestions(suggestions)
+
+        return results
+
     async def generate_message(
         self,
         lead_id: UUID,
@@ -261,6 +412,7 @@ class FollowUpEngine:
             "user_context": context or {},
         }
 
+        started = time.monotonic()
         ai_response = await self.ai.generate(
             task_type="FOLLOWUP_GENERATION",
             user_payload=payload,
@@ -271,10 +423,145 @@ class FollowUpEngine:
         )
 
         content = ai_response.get("content", "").strip()
+        get_generation_stats().record(
+            "followup_engine",
+            SINGLE,
+            seconds=time.monotonic() - started,
+            prompt=json.dumps(payload, default=str),
+            response=content,
+            model=ai_response.get("model"),
+        )
         if not content:
             return None
 
-        message = AIMessage(
+        message = self._build_ai_message(
+            lead,
+            suggestion,
+            content,
+            model_name=ai_response.get("model"),
+            prompt_version=ai_response.get("prompt_version"),
+            tokens_used=ai_response.get("tokens_used"),
+            meta={"raw_ai_response": ai_response},
+        )
+
+        await self.repo.log_followup_message(message)
+        return message
+
+    async def generate_messages(
+        self,
+        lead_ids: List[UUID],
+        context: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[Dict[UUID, Optional[AIMessage]], BatchReport]:
+        """
+        Batch-Variante von generate_message.
+        
+        Suggestions kommen aus get_next_follow_ups (fehlerhafte Leads werden
+        übersprungen); Leads mit gleichem
+        Template, Step und Sprache werden in einem AI-Call generiert
+        (siehe message_batching.py), ungültige Varianten über generate_message.
+        
+        Returns:
+            (lead_id -> AIMessage oder None, Bericht mit Kosten/Latenz pro Nachricht)
+        """
+        results: Dict[UUID, Optional[AIMessage]] = {lead_id: None for lead_id in lead_ids}
+        suggestions = {
+            lead_id: suggestion
+            for lead_id, suggestion in (await self.get_next_follow_ups(list(results), skip_errors=True)).items()
+            if suggestion
+        }
+        leads = await self.repo.get_lead_contexts(list(suggestions)) if suggestions else {}
+
+        requests = [
+            MessageRequest(
+                key=str(lead_id),
+                template=suggestion.meta.get("template_key") or "default",
+                step=str(suggestion.step_id),
+                language=leads[lead_id].language or "de",
+                lead={
+                    "lead": leads[lead_id].model_dump(mode="json", include=LEAD_PROMPT_FIELDS),
+                    "reason": suggestion.reason,
+                },
+                name=leads[lead_id].first_name or (leads[lead_id].full_name or "").split(" ")[0],
+                payload=(leads[lead_id], suggestion),
+            )
+            for lead_id, suggestion in suggestions.items()
+            if lead_id in leads
+        ]
+
+        def shared_prompt(request: MessageRequest) -> str:
+            _, suggestion = request.payload
+            return json.dumps({
+                "task": "FOLLOWUP_GENERATION",
+                "template_key": request.template,
+                "step_action": suggestion.meta.get("step_action"),
+                "channel": suggestion.recommended_channel.value,
+                "language": request.language,
+                "user_context": context or {},
+            }, ensure_ascii=False, default=str)
+
+        async def complete(call: BatchCall) -> Dict[str, Any]:
+            return await self.ai.generate(
+                task_type="FOLLOWUP_GENERATION_BATCH",
+                user_payload={"prompt": call.prompt, "leads": call.items, "response_format": "json"},
+                config={
+                    "importance": "high",
+                    "cost_sensitivity": "medium",
+                    "system_prompt": call.system,
+                    "max_tokens": call.max_tokens,
+                },
+            )
+
+        single_messages: Dict[str, Optional[AIMessage]] = {}
+
+        async def single(request: MessageRequest) -> GeneratedMessage:
+            message = await self.generate_message(UUID(request.key), context)
+            single_messages[request.key] = message
+            return GeneratedMessage(
+                key=request.key,
+                content=message.content if message else None,
+                path=SINGLE,
+                model=message.model_name if message else None,
+            )
+
+        generator = BatchedMessageGenerator(
+            "followup_engine",
+            complete=complete,
+            single=single,
+            shared_prompt=shared_prompt,
+            system_prompt="Follow-up Nachrichten für Network-Marketing-Leads, eine pro Lead.",
+        )
+        generated, report = await generator.generate(requests)
+
+        for request in requests:
+            result = generated[request.key]
+            lead, suggestion = request.payload
+            if result.path == SINGLE:
+                results[lead.id] = single_messages.get(request.key)
+            elif result.path == BATCHED:
+                message = self._build_ai_message(
+                    lead,
+                    suggestion,
+                    result.content,
+                    model_name=result.model,
+                    meta={"batched": True, "group": list(request.group_key)},
+                )
+                await self.repo.log_followup_message(message)
+                results[lead.id] = message
+
+        return results, report
+
+    def _build_ai_message(
+        self,
+        lead: LeadContext,
+        suggestion: FollowUpSuggestion,
+        content: str,
+        model_name: Optional[str] = None,
+        prompt_version: Optional[str] = None,
+        tokens_used: Optional[int] = None,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> AIMessage:
+        """AIMessage für generierten Text (Einzel- und Batch-Pfad)."""
+        return AIMessage(
             lead_id=lead.id,
             workspace_id=lead.workspace_id,
             owner_id=lead.owner_id,
@@ -284,50 +571,73 @@ class FollowUpEngine:
             template_key=suggestion.meta.get("template_key"),
             used_sequence_id=suggestion.sequence_id,
             used_step_id=suggestion.step_id,
-            model_name=ai_response.get("model"),
-            prompt_version=ai_response.get("prompt_version"),
-            tokens_used=ai_response.get("tokens_used"),
-            meta={"raw_ai_response": ai_response},
+            model_name=model_name,
+            prompt_version=prompt_version,
+            tokens_used=tokens_used,
+            meta=meta or {},
         )
 
-        await self.repo.log_followup_message(message)
-        return message
-
     async def get_today_followups(self, user_id: Optional[UUID] = None) -> List[FollowUpSuggestion]:
         """
         Holt alle Follow-ups die heute fällig sind.
         
+        Mit Due-Index ein Range-Read bis Tagesende; nur Einträge ohne
+        gespeicherte Suggestion (nach State-Wechseln) werden neu bewertet.
+        
         Args:
             user_id: Optional - Filter auf User
             
         Returns:
             Liste von FollowUpSuggestions, sortiert nach Priorität
         """
-        leads = await self.repo.list_all_leads()
+        today = datetime.now().date()
         suggestions: List[FollowUpSuggestion] = []
-        
-        for lead in leads:
+
+        if self.due_index is not None:
+            # Spielraum für Leads in Zeitzonen hinter dem Server, deren lokales "heute" später endet
+            until = datetime.combine(today + timedelta(days=1), datetime.min.time()) + TODAY_TZ_MARGIN
+            entries = await self.due_index.range(until, owner_id=str(user_id) if user_id else None)
+            for entry in entries:
+                suggestion = entry.to_suggestion() or await self.get_next_follow_up(UUID(entry.lead_id))
+                if suggestion and suggestion.recommended_time.date() <= today:
+                    suggestions.append(suggestion)
+        else:
+            leads = await self.repo.list_all_leads()
             # Optional: Filter auf User
-            if user_id and lead.owner_id != user_id:
-                continue
-                
-            suggestion = await self.get_next_follow_up(lead.id)
-            if suggestion:
+            lead_ids = [lead.id for lead in leads if not user_id or lead.owner_id == user_id]
+
+            for suggestion in (await self.get_next_follow_ups(lead_ids)).values():
                 # Nur heute fällige
-                if suggestion.recommended_time.date() <= datetime.now().date():
+                if suggestion and suggestion.recommended_time.date() <= today:
                     suggestions.append(suggestion)
         
         # Nach Priorität sortieren
-        priority_order = {
-            FollowUpPriority.CRITICAL: 0,
-            FollowUpPriority.HIGH: 1,
-            FollowUpPriority.MEDIUM: 2,
-            FollowUpPriority.LOW: 3,
-        }
-        suggestions.sort(key=lambda s: priority_order.get(s.priority, 99))
+        suggestions.sort(key=lambda s: PRIORITY_RANK.get(s.priority, 99))
         
         return suggestions
 
+    async def rebuild_due_index(self, user_id: Optional[UUID] = None) -> int:
+        """
+        Baut den Due-Index aus allen Leads neu auf (Konsistenz-Check,
+        z.B. nach Deploys oder direkten DB-Änderungen).
+        
+        Returns:
+            Anzahl indizierter Leads
+        """
+        if self.due_index is None:
+            return 0
+
+        lead_ids = [
+            lead.id for lead in await self.repo.list_all_leads()
+            if not user_id or lead.owner_id == user_id
+        ]
+        # Ein defekter Lead soll den Rebuild nicht abbrechen
+        suggestions = await self._evaluate_next_follow_ups(lead_ids, skip_errors=True)
+        entries = [DueEntry.from_suggestion(s) for s in suggestions.values() if s]
+
+        await self.due_index.replace(entries, owner_id=str(user_id) if user_id else None)
+        return len(entries)
+
     # ─────────────────────────────────
     # INTERNAL HELPERS
     # ─────────────────────────────────
@@ -355,6 +665,65 @@ class FollowUpEngine:
             last_interaction_at=None,
         )
 
+    async def _load_sequence(self, sequence_id: UUID) -> Optional[FollowUpSequence]:
+        """Sequenz aus dem Definitions-Cache, bei Miss aus dem Repository (und kompilieren)."""
+        compiled = self.sequences.get(sequence_id)
+        if compiled and isinstance(compiled.source, FollowUpSequence):
+            return compiled.source
+        sequence = await self.repo.get_sequence_by_id(sequence_id)
+        if sequence:
+            self.sequences.compile(sequence)
+        return sequence
+
+    def _pending_step(
+        self,
+        lead: LeadContext,
+        state: FollowUpSequenceState,
+        sequence: FollowUpSequence,
+    ) -> Optional[CompiledStep]:
+        """Nächster (kompilierter) Step, sofern die Sequenz nicht beendet ist."""
+        # Beendete Sequenzen überspringen
+        if state.status in {
+            FollowUpSequenceStatus.COMPLETED,
+            FollowUpSequenceStatus.STOPPED,
+            FollowUpSequenceStatus.GHOSTED,
+        }:
+            return None
+
+        return self.sequences.compile(sequence).after(state.current_step_index)
+
+    def _build_suggestion(
+        self,
+        lead: LeadContext,
+        state: FollowUpSequenceState,
+        sequence: FollowUpSequence,
+        next_step: FollowUpStep,
+    ) -> FollowUpSuggestion:
+        """Zeitpunkt, Priorität und Begründung für einen fälligen Step."""
+        # Zeitpunkt bestimmen
+        recommended_time = self._compute_recommended_time(lead, state, next_step)
+
+        # Priorität bestimmen
+        priority = self._compute_priority(lead, state, next_step)
+
+        return FollowUpSuggestion(
+            lead_id=lead.id,
+            workspace_id=lead.workspace_id,
+            owner_id=lead.owner_id,
+            sequence_id=sequence.id,
+            step_id=next_step.id,
+            recommended_channel=next_step.channel,
+            recommended_time=recommended_time,
+            priority=priority,
+            reason=self._build_reason(lead, state, next_step),
+            meta={
+                "sequence_name": sequence.name,
+                "step_action": next_step.action,
+                "day_offset": next_step.day_offset,
+                "template_key": next_step.template_key,
+            },
+        )
+
     def _determine_next_step(
         self,
         sequence: FollowUpSequence,
@@ -364,22 +733,12 @@ class FollowUpEngine:
         """
         Findet den nächsten Step innerhalb der Sequenz.
         
-        Logik:
+        Logik (siehe CompiledSequence.after):
         - Wenn noch kein Step gestartet → erster Step
-        - Sonst: nächster Step mit höherem order_index
+        - Sonst: nächster Step nach (day_offset, order_index)
         """
-        if not sequence.steps:
-            return None
-
-        sorted_steps = sorted(sequence.steps, key=lambda s: (s.day_offset, s.order_index))
-
-        if state.current_step_index is None:
-            return sorted_steps[0]
-
-        if state.current_step_index + 1 >= len(sorted_steps):
-            return None
-
-        return sorted_steps[state.current_step_index + 1]
+        step = self.sequences.compile(sequence).after(state.current_step_index)
+        return step.source if step else None
 
     def _condition_satisfied(
         self,
@@ -389,24 +748,7 @@ class FollowUpEngine:
         """
         Prüft Step-Condition gegen Interaktions-Historie.
         """
-        if step.condition == FollowUpCondition.ALWAYS:
-            return True
-
-        if not interactions:
-            return step.condition == FollowUpCondition.NO_REPLY
-
-        last_type = interactions[0].get("type", "")
-
-        if step.condition == FollowUpCondition.NO_REPLY:
-            return not last_type.startswith("reply_")
-
-        if step.condition == FollowUpCondition.REPLIED_POSITIVE:
-            return last_type == "reply_positive"
-
-        if step.condition == FollowUpCondition.REPLIED_NEGATIVE:
-            return last_type == "reply_negative"
-
-        return True
+        return condition_predicate(step.condition)(interactions)
 
     def _compute_recommended_time(
         self,
@@ -484,6 +826,22 @@ class FollowUpEngine:
     # STATE MACHINE METHODS
     # ─────────────────────────────────
 
+    async def reschedule_due_entry(self, user_id: str, lead_id: str, due_at: Optional[datetime]) -> None:
+        """
+        Setzt den Index-Eintrag nach einem State-Wechsel / gesendeten Follow-up
+        / Snooze auf den neuen Fälligkeitszeitpunkt; die Suggestion wird beim
+        nächsten Lesen neu bewertet. Ohne neuen Zeitpunkt: sofort neu bewerten.
+        """
+        if self.due_index is None:
+            return
+        current = await self.due_index.get(lead_id)
+        await self.due_index.upsert(DueEntry(
+            lead_id=lead_id,
+            owner_id=user_id,
+            recommended_time=due_at or datetime.utcnow().replace(tzinfo=timezone.utc),
+            priority=current.priority if current else FollowUpPriority.MEDIUM,
+        ))
+
     async def change_lead_state(
         self, 
         user_id: str, 
@@ -552,6 +910,7 @@ class FollowUpEngine:
                 "next_due_at": due_at.isoformat(),
                 "status": "pending"
             }).execute()
+            await self.reschedule_due_entry(user_id, lead_id, due_at.replace(tzinfo=timezone.utc))
             
             return {
                 "success": True,
@@ -565,6 +924,7 @@ class FollowUpEngine:
                 }
             }
         
+        await self.reschedule_due_entry(user_id, lead_id, None)
         return {
             "success": True,
             "message": f"Lead moved to {new_state_lower} (no cycles defined for this state)"
@@ -622,6 +982,7 @@ class FollowUpEngine:
                 "next_due_at": due_at.isoformat(),
                 "status": "pending"
             }).execute()
+            await self.reschedule_due_entry(user_id, queue_item["contact_id"], due_at.replace(tzinfo=timezone.utc))
             
             return {
                 "success": True,
@@ -634,6 +995,7 @@ class FollowUpEngine:
                 }
             }
         
+        await self.reschedule_due_entry(user_id, queue_item["contact_id"], None)
         return {
             "success": True,
             "message": "Sequence complete for this state",
@@ -663,6 +1025,7 @@ class FollowUpEngine:
 
 
 __all__ = [
+    "FollowUpDueIndex",
     "FollowUpEngine",
     "FollowUpRepository",
     "AIRouterProtocol",
@@ -0,0 +1,287 @@
+"""
+Follow-up Suggestion Generation (batch pipeline)
+
+Creates pending `followup_suggestions` for all leads whose
+`next_follow_up_at` is due, across all users:
+
+1. Due leads, paged by id (one query per page, all users at once)
+2. Existing pending suggestions for the page (anti-join, chunked IN)
+3. Rules and templates loaded once per run into dicts
+4. Messages personalized in memory
+5. Suggestions written with chunked bulk inserts
+
+Query count per run: pages × (1 + pending chunks + insert chunks) + 2,
+independent of the number of leads per user.
+
+The scheduled run (`run_followup_generation`) is incremental: it only
+scans leads that became due or were updated since its watermark, with a
+daily full scan (see incremental_jobs.py).
+"""
+
+from __future__ import annotations
+
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import structlog
+
+from app.db.bulk import SupabaseBulkWriter, chunked
+from app.services.incremental_jobs import IncrementalWindow, WatermarkStore
+
+logger = structlog.get_logger()
+
+
+class FollowupGenerationConfig:
+    """Batch sizes for the generation pipeline"""
+
+    PAGE_SIZE = 1000          # Due leads per query
+    IN_CHUNK = 200            # Ids per IN() filter (URL length)
+    INSERT_CHUNK = 500        # Suggestions per insert request
+    RECONCILE_EVERY = timedelta(days=1)   # Full due-lead scan at least daily
+
+
+LEAD_COLUMNS = "id, user_id, name, company, flow, follow_up_stage, last_outreach_at, preferred_channel"
+
+
+@dataclass
+class FollowupGenerationReport:
+    """Outcome of one generation run"""
+
+    users: int = 0
+    leads_scanned: int = 0
+    pages: int = 0
+    skipped_pending: int = 0
+    skipped_no_rule: int = 0
+    skipped_no_template: int = 0
+    created: int = 0
+    failed: int = 0
+    duration_ms: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        if self.duration_ms <= 0:
+            return 0.0
+        return round(self.created / (self.duration_ms / 1000), 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "rows_per_second": self.rows_per_second}
+
+
+# ==================== QUERIES ====================
+
+def iter_due_leads(
+    supabase: Any,
+    now: datetime,
+    page_size: int = FollowupGenerationConfig.PAGE_SIZE,
+    window: Optional[IncrementalWindow] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Due leads with an active flow across all users, keyset-paged by id.
+
+    With an incremental `window`: only leads that became due in the window
+    or were updated since it started.
+    """
+    last_id: Optional[str] = None
+    while True:
+        query = (
+            supabase.table("leads")
+            .select(LEAD_COLUMNS)
+            .not_.is_("flow", "null")
+            .lte("next_follow_up_at", now.isoformat())
+            .or_("do_not_contact.is.null,do_not_contact.eq.false")
+        )
+        if window is not None and not window.full:
+            query = query.or_(
+                f"next_follow_up_at.gt.{window.since.isoformat()},"
+                f"updated_at.gt.{window.changed_since.isoformat()}"
+            )
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = query.order("id").limit(page_size).execute().data or []
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        last_id = page[-1]["id"]
+
+
+def pending_lead_ids(supabase: Any, lead_ids: Sequence[str]) -> Set[str]:
+    """Lead ids that already have a pending suggestion."""
+    pending: Set[str] = set()
+    for _, chunk in chunked(list(lead_ids), FollowupGenerationConfig.IN_CHUNK):
+        result = (
+            supabase.table("followup_suggestions")
+            .select("lead_id")
+            .in_("lead_id", list(chunk))
+            .eq("status", "pending")
+            .execute()
+        )
+        pending.update(row["lead_id"] for row in result.data or [])
+    return pending
+
+
+def load_rules(supabase: Any) -> Dict[Tuple[str, int], Dict[str, Any]]:
+    """All follow-up rules keyed by (flow, stage); first rule wins."""
+    result = supabase.table("followup_rules").select("*").execute()
+    rules: Dict[Tuple[str, int], Dict[str, Any]] = {}
+    for rule in result.data or []:
+        rules.setdefault((rule.get("flow"), rule.get("stage") or 0), rule)
+    return rules
+
+
+def load_templates(supabase: Any, step_keys: Set[str]) -> Dict[str, str]:
+    """Template texts keyed by step_key; first template wins."""
+    templates: Dict[str, str] = {}
+    for _, chunk in chunked(sorted(step_keys), FollowupGenerationConfig.IN_CHUNK):
+        result = (
+            supabase.table("message_templates")
+            .select("step_key, template_text")
+            .in_("step_key", list(chunk))
+            .execute()
+        )
+        for row in result.data or []:
+            templates.setdefault(row["step_key"], row.get("template_text") or "")
+    return templates
+
+
+# ==================== PERSONALIZATION ====================
+
+def build_suggestion(
+    lead: Dict[str, Any],
+    rule: Dict[str, Any],
+    template_text: str,
+    now: datetime,
+) -> Dict[str, Any]:
+    """Personalized pending suggestion row for one lead."""
+    lead_name = lead["name"].split()[0] if lead.get("name") else ""
+    message = template_text.replace("{name}", lead_name)
+    if "{company}" in message:
+        message = message.replace("{company}", lead.get("company") or "")
+
+    days_waiting = 0
+    if lead.get("last_outreach_at"):
+        try:
+            last_outreach = datetime.fromisoformat(lead["last_outreach_at"].replace("Z", "+00:00"))
+            days_waiting = (now - last_outreach).days
+        except Exception:
+            pass
+
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": lead["user_id"],
+        "lead_id": lead["id"],
+        "flow": lead["flow"],
+        "stage": lead.get("follow_up_stage", 0),
+        "template_key": rule["template_key"],
+        "channel": lead.get("preferred_channel") or "WHATSAPP",
+        "suggested_message": message,
+        "reason": f"Keine Antwort seit {days_waiting} Tagen" if days_waiting > 0 else "Follow-up fällig",
+        "due_at": now.isoformat(),
+        "status": "pending",
+    }
+
+
+# ==================== PIPELINE ====================
+
+def generate_followup_suggestions(
+    supabase: Any = None,
+    now: Optional[datetime] = None,
+    page_size: int = FollowupGenerationConfig.PAGE_SIZE,
+    window: Optional[IncrementalWindow] = None,
+) -> FollowupGenerationReport:
+    """
+    Run the batch pipeline once (sync; call via asyncio.to_thread).
+
+    Scans all due leads, or only the changed ones for an incremental `window`.
+
+    Returns:
+        FollowupGenerationReport with counts, duration and rows/sec
+    """
+    if supabase is None:
+        from app.supabase_client import get_supabase_client
+        supabase = get_supabase_client()
+    now = now or datetime.now(timezone.utc)
+    started = time.perf_counter()
+    report = FollowupGenerationReport()
+
+    rules = load_rules(supabase)
+    templates = load_templates(
+        supabase, {rule["template_key"] for rule in rules.values() if rule.get("template_key")}
+    )
+    writer = SupabaseBulkWriter(
+        supabase, "followup_suggestions", chunk_size=FollowupGenerationConfig.INSERT_CHUNK
+    )
+    users: Set[str] = set()
+
+    for page in iter_due_leads(supabase, now, page_size, window):
+        report.pages += 1
+        report.leads_scanned += len(page)
+        pending = pending_lead_ids(supabase, [lead["id"] for lead in page])
+
+        rows = []
+        for lead in page:
+            if not lead.get("user_id"):
+                continue
+            users.add(lead["user_id"])
+            if lead["id"] in pending:
+                report.skipped_pending += 1
+                continue
+            rule = rules.get((lead["flow"], lead.get("follow_up_stage") or 0))
+            if not rule or not rule.get("template_key"):
+                report.skipped_no_rule += 1
+                continue
+            template_text = templates.get(rule["template_key"])
+            if template_text is None:
+                report.skipped_no_template += 1
+                continue
+            rows.append(build_suggestion(lead, rule, template_text, now))
+
+        if rows:
+            result = writer.write_sync(rows)
+            report.created += result.written
+            report.failed += result.failed
+
+    report.users = len(users)
+    report.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+    logger.info("Follow-up generation finished", **report.to_dict())
+    return report
+
+
+def run_followup_generation(
+    supabase: Any = None,
+    now: Optional[datetime] = None,
+) -> FollowupGenerationReport:
+    """
+    Scheduled run: incremental over the `followup_generation` watermark.
+
+    The watermark is not advanced when inserts failed, so those leads are
+    scanned again next run.
+    """
+    if supabase is None:
+        from app.supabase_client import get_supabase_client
+        supabase = get_supabase_client()
+    now = now or datetime.now(timezone.utc)
+    store = WatermarkStore(supabase)
+    window = store.begin("followup_generation", now, reconcile_every=FollowupGenerationConfig.RECONCILE_EVERY)
+
+    report = generate_followup_suggestions(supabase, now, window=window)
+    if not report.failed:
+        store.commit(window)
+    return report
+
+
+__all__ = [
+    "FollowupGenerationConfig",
+    "FollowupGenerationReport",
+    "generate_followup_suggestions",
+    "run_followup_generation",
+    "iter_due_leads",
+    "pending_lead_ids",
+    "load_rules",
+    "load_templates",
+    "build_suggestion",
+]
@@ -0,0 +1,308 @@
+"""
+============================================
+🔖 SALESFLOW AI - INCREMENTAL JOBS
+============================================
+
+Watermarks for scheduler jobs that used to rescan whole tables:
+
+- Each job stores a watermark (end of the last processed window) and
+  optional job state in `job_watermarks`
+- A run only reads rows changed (`updated_at`) or crossing a time
+  threshold (due date, inactivity cutoff) since the watermark
+- Every `reconcile_every` the job runs a full scan instead, which catches
+  drift (deletes, rows written without `updated_at`, missed windows)
+- The watermark only advances when the job finished without errors;
+  a failed run re-reads the same window next time
+
+The job-specific scans below (overdue follow-ups, churn candidates,
+monthly revenue) are sync PostgREST pipelines; call them via
+asyncio.to_thread like the other batch pipelines.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+import structlog
+
+from app.db.bulk import chunked
+from app.db.paging import keyset_pages, parse_timestamp
+
+logger = structlog.get_logger()
+
+
+class IncrementalJobConfig:
+    """Watermark defaults."""
+
+    TABLE = "job_watermarks"
+    OVERLAP = timedelta(minutes=5)          # updated_at re-read before the watermark (late commits)
+    RECONCILE_EVERY = timedelta(days=7)     # Full scan at least this often
+    IN_CHUNK = 200                          # Ids per IN() filter (URL length)
+
+
+# ==================== WATERMARKS ====================
+
+
+@dataclass
+class Watermark:
+    """Persisted progress of one job"""
+
+    job: str
+    value: Optional[datetime] = None
+    last_full_at: Optional[datetime] = None
+    state: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class IncrementalWindow:
+    """
+    What one run has to process: time thresholds crossed in (since, until]
+    and rows updated after `changed_since`.
+    """
+
+    job: str
+    until: datetime
+    since: Optional[datetime] = None        # None: full reconciliation
+    state: Dict[str, Any] = field(default_factory=dict)
+    last_full_at: Optional[datetime] = None
+
+    @property
+    def full(self) -> bool:
+        return self.since is None
+
+    @property
+    def changed_since(self) -> Optional[datetime]:
+        """`updated_at` lower bound: overlaps the last window for late commits."""
+        return self.since - IncrementalJobConfig.OVERLAP if self.since else None
+
+
+class WatermarkStore:
+    """
+    Job watermarks in `job_watermarks` (sync Supabase client).
+
+    Usage:
+        store = WatermarkStore(supabase)
+        window = store.begin("detect_churn_risks")
+        ... process window.since / window.until ...
+        store.commit(window)
+    """
+
+    def __init__(self, supabase: Any, enabled: Optional[bool] = None):
+        self.supabase = supabase
+        if enabled is None:
+            from app.core.config import settings
+            enabled = settings.incremental_jobs_enabled
+        self.enabled = enabled
+
+    def load(self, job: str) -> Watermark:
+        result = (
+            self.supabase.table(IncrementalJobConfig.TABLE)
+            .select("job, watermark, last_full_at, state")
+            .eq("job", job)
+            .limit(1)
+            .execute()
+        )
+        if not result.data:
+            return Watermark(job=job)
+        row = result.data[0]
+        return Watermark(
+            job=job,
+            value=parse_timestamp(row.get("watermark")),
+            last_full_at=parse_timestamp(row.get("last_full_at")),
+            state=row.get("state") or {},
+        )
+
+    def save(self, watermark: Watermark) -> None:
+        self.supabase.table(IncrementalJobConfig.TABLE).upsert({
+            "job": watermark.job,
+            "watermark": watermark.value.isoformat() if watermark.value else None,
+            "last_full_at": watermark.last_full_at.isoformat() if watermark.last_full_at else None,
+            "state": watermark.state,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }, on_conflict="job").execute()
+
+    def begin(
+        self,
+        job: str,
+        now: Optional[datetime] = None,
+        reconcile_every: timedelta = IncrementalJobConfig.RECONCILE_EVERY,
+        force_full: bool = False,
+    ) -> IncrementalWindow:
+        """Window for this run; full when there is no watermark or reconciliation is due."""
+        now = now or datetime.now(timezone.utc)
+        watermark = self.load(job)
+        window = IncrementalWindow(
+            job=job, until=now, state=watermark.state, last_full_at=watermark.last_full_at
+        )
+        full = (
+            force_full
+            or not self.enabled
+            or watermark.value is None
+            or watermark.last_full_at is None
+            or now - watermark.last_full_at >= reconcile_every
+        )
+        if not full:
+            window.since = watermark.value
+        logger.info(
+            "Incremental job window",
+            job=job,
+            mode="full" if window.full else "incremental",
+            since=window.since.isoformat() if window.since else None,
+        )
+        return window
+
+    def commit(self, window: IncrementalWindow, state: Optional[Dict[str, Any]] = None) -> None:
+        """Advance the watermark to the end of a successfully processed window."""
+        self.save(Watermark(
+            job=window.job,
+            value=window.until,
+            last_full_at=window.until if window.full else window.last_full_at,
+            state=window.state if state is None else state,
+        ))
+
+
+# ==================== SCANS ====================
+
+
+def _changed_users(make_query) -> Set[str]:
+    return {row["user_id"] for page in keyset_pages(make_query) for row in page if row.get("user_id")}
+
+
+def _rows_for_users(make_query, user_ids: Optional[Sequence[str]]) -> List[Dict[str, Any]]:
+    """All rows of `make_query()`, restricted to `user_ids` unless None (full scan)."""
+    if user_ids is None:
+        return [row for page in keyset_pages(make_query) for row in page]
+    rows: List[Dict[str, Any]] = []
+    for _, chunk in chunked(sorted(user_ids), IncrementalJobConfig.IN_CHUNK):
+        rows.extend(
+            row for page in keyset_pages(lambda: make_query().in_("user_id", list(chunk))) for row in page
+        )
+    return rows
+
+
+def _group_by_user(rows: List[Dict[str, Any]], order_key: str) -> Dict[str, List[Dict[str, Any]]]:
+    by_user: Dict[str, List[Dict[str, Any]]] = {}
+    for row in sorted(rows, key=lambda r: r.get(order_key) or ""):
+        if row.get("user_id"):
+            by_user.setdefault(row["user_id"], []).append(row)
+    return by_user
+
+
+def overdue_followups_by_user(supabase: Any, window: IncrementalWindow) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Overdue pending follow-ups (oldest first) of users with a change in the window.
+
+    Incremental: users with a task that became overdue or was updated
+    (snoozed back, rescheduled) since the watermark; their full overdue
+    list is loaded so the notification stays complete.
+    """
+    until = window.until.isoformat()
+
+    def overdue():
+        return (
+            supabase.table("followup_suggestions")
+            .select("id, title, due_at, user_id, lead_id, leads(name)")
+            .eq("status", "pending")
+            .lt("due_at", until)
+        )
+
+    users: Optional[Set[str]] = None
+    if not window.full:
+        since, changed = window.since.isoformat(), window.changed_since.isoformat()
+        users = _changed_users(lambda: (
+            supabase.table("followup_suggestions")
+            .select("id, user_id")
+            .eq("status", "pending")
+            .lt("due_at", until)
+            .or_(f"due_at.gte.{since},updated_at.gt.{changed}")
+        ))
+    return _group_by_user(_rows_for_users(overdue, users), "due_at")
+
+
+def churn_risks_by_user(
+    supabase: Any,
+    window: IncrementalWindow,
+    inactive_days: int = 30,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Won customers without contact for `inactive_days` (longest silent first).
+
+    Incremental: users with a customer that crossed the inactivity cutoff
+    since the watermark, or whose lead changed (e.g. became won).
+    """
+    cutoff = (window.until - timedelta(days=inactive_days)).isoformat()
+
+    def at_risk():
+        return (
+            supabase.table("leads")
+            .select("id, user_id, name, company, last_contact")
+            .eq("status", "won")
+            .lt("last_contact", cutoff)
+        )
+
+    users: Optional[Set[str]] = None
+    if not window.full:
+        previous_cutoff = (window.since - timedelta(days=inactive_days)).isoformat()
+        changed = window.changed_since.isoformat()
+        users = _changed_users(lambda: (
+            supabase.table("leads")
+            .select("id, user_id")
+            .eq("status", "won")
+            .lt("last_contact", cutoff)
+            .or_(f"last_contact.gte.{previous_cutoff},updated_at.gt.{changed}")
+        ))
+    return _group_by_user(_rows_for_users(at_risk, users), "last_contact")
+
+
+def monthly_revenue_by_user(supabase: Any, window: IncrementalWindow) -> Dict[str, float]:
+    """
+    Won revenue per user in the current month.
+
+    Kept in the watermark state; incremental runs recompute only users
+    with a deal changed since the watermark. A new month starts full.
+    """
+    month_start = window.until.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    month = month_start.strftime("%Y-%m")
+    state = window.state or {}
+    revenue: Dict[str, float] = dict(state.get("revenue") or {}) if state.get("month") == month else {}
+
+    def won_deals():
+        return (
+            supabase.table("deals")
+            .select("id, user_id, value")
+            .eq("status", "won")
+            .gte("closed_at", month_start.isoformat())
+        )
+
+    users: Optional[Set[str]] = None
+    if not window.full and state.get("month") == month:
+        changed = window.changed_since.isoformat()
+        users = _changed_users(lambda: (
+            supabase.table("deals")
+            .select("id, user_id")
+            .or_(f"updated_at.gt.{changed},closed_at.gt.{changed}")
+        ))
+        for user_id in users:
+            revenue.pop(user_id, None)
+    else:
+        revenue = {}
+
+    for deal in _rows_for_users(won_deals, users):
+        if deal.get("user_id"):
+            revenue[deal["user_id"]] = revenue.get(deal["user_id"], 0) + (deal.get("value") or 0)
+
+    window.state = {"month": month, "revenue": revenue}
+    return revenue
+
+
+__all__ = [
+    "IncrementalJobConfig",
+    "IncrementalWindow",
+    "Watermark",
+    "WatermarkStore",
+    "churn_risks_by_user",
+    "monthly_revenue_by_user",
+    "overdue_followups_by_user",
+]
@@ -0,0 +1,410 @@
+"""
+============================================
+🗓️ SALESFLOW AI - JOB COORDINATOR
+============================================
+
+Every API replica starts the same APScheduler jobs. The coordinator makes
+sure each run happens once across replicas instead of once per replica:
+
+- Per-job lease lock in Redis (SET NX PX + owner token); the holder
+  renews it with a heartbeat while the job runs and keeps it after the
+  run for the job's interval (minus a little slack), so replicas whose
+  IntervalTrigger fires at a different offset don't run it again in the
+  same period; cron jobs keep it for at least a minute. A crashed
+  replica's lock expires with the lease
+- Sharded jobs: users are hashed into a fixed number of slots
+  (SHARD_SLOTS); each replica claims `job:slot:i` locks, at most its
+  fair share of the live replicas in the membership ZSET, and handles
+  the users of the slots it holds (`in_current_shard(user_id)`). The
+  locks, not the membership view, decide ownership, so replicas joining
+  or leaving mid-tick can't make shards overlap
+- Heartbeats per job (instance, shard, started/beat/finished) in one
+  Redis hash for ops visibility
+
+Without Redis (local dev, outage) jobs run locally, as before.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+import zlib
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import structlog
+from redis.exceptions import RedisError
+
+logger = structlog.get_logger()
+
+
+class JobCoordinatorConfig:
+    """Job coordinator defaults."""
+
+    LEASE_SECONDS = 120           # Lock TTL, renewed by the heartbeat while a job runs
+    HEARTBEAT_SECONDS = 30        # Lease renewal / membership heartbeat interval
+    MEMBER_TTL = 90               # Replicas not seen for this long leave the shard ring
+    REDIS_RETRY_SECONDS = 30      # Back-off before asking for Redis again after an error
+    MIN_HOLD_SECONDS = 60         # Locks outlive short runs, so skewed replica clocks don't re-run them
+    HOLD_SLACK_SECONDS = 30       # Interval jobs: lock released this long before the next tick
+    SHARD_SLOTS = 16              # Fixed slot count for sharded jobs (upper bound on useful replicas)
+
+    KEY_PREFIX = "jobs"
+    MEMBERS_KEY = f"{KEY_PREFIX}:members"         # ZSET instance -> last heartbeat
+    HEARTBEATS_KEY = f"{KEY_PREFIX}:heartbeats"   # HASH job id -> JSON
+
+
+def _lock_key(name: str) -> str:
+    return f"{JobCoordinatorConfig.KEY_PREFIX}:lock:{name}"
+
+
+# KEYS[1] = lock key, ARGV[1] = owner token, ARGV[2] = ttl ms
+_RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# KEYS[1] = lock key, ARGV[1] = owner token, ARGV[2] = remaining hold ms (0 = delete)
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    if tonumber(ARGV[2]) > 0 then
+        return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    end
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+# ==================== SHARDING ====================
+
+
+@dataclass(frozen=True)
+class Shard:
+    """The slots (of `count` fixed slots) held by this replica for a job run."""
+
+    slots: FrozenSet[int] = frozenset({0})
+    count: int = 1
+
+    def owns(self, key: str) -> bool:
+        if self.count <= 1:
+            return True
+        return zlib.crc32(str(key).encode()) % self.count in self.slots
+
+    def __str__(self) -> str:
+        return f"{','.join(str(s) for s in sorted(self.slots)) or '-'}/{self.count}"
+
+
+_current_shard: ContextVar[Shard] = ContextVar("job_shard", default=Shard())
+
+
+def current_shard() -> Shard:
+    """Shard of the job running in this task (0/1 outside sharded jobs)."""
+    return _current_shard.get()
+
+
+def in_current_shard(key: Any) -> bool:
+    """True if this replica handles `key` (e.g. a user id) in the current job run."""
+    return _current_shard.get().owns(str(key))
+
+
+def shard_filter(keys: Iterable[Any]) -> List[Any]:
+    """The subset of `keys` handled by this replica in the current job run."""
+    shard = _current_shard.get()
+    return [key for key in keys if shard.owns(str(key))]
+
+
+# ==================== COORDINATOR ====================
+
+
+class JobCoordinator:
+    """Lease locks, replica membership and job heartbeats on Redis."""
+
+    def __init__(
+        self,
+        redis=None,
+        instance_id: Optional[str] = None,
+        lease_seconds: float = JobCoordinatorConfig.LEASE_SECONDS,
+        heartbeat_seconds: float = JobCoordinatorConfig.HEARTBEAT_SECONDS,
+        member_ttl: float = JobCoordinatorConfig.MEMBER_TTL,
+        min_hold_seconds: float = JobCoordinatorConfig.MIN_HOLD_SECONDS,
+        hold_slack_seconds: float = JobCoordinatorConfig.HOLD_SLACK_SECONDS,
+        shard_slots: int = JobCoordinatorConfig.SHARD_SLOTS,
+    ):
+        self.redis = redis
+        self.instance_id = instance_id or uuid.uuid4().hex[:12]
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.member_ttl = member_ttl
+        self.min_hold_seconds = min_hold_seconds
+        self.hold_slack_seconds = hold_slack_seconds
+        self.shard_slots = shard_slots
+        self.stats = {"ran": 0, "skipped_locked": 0, "ran_local": 0, "lease_lost": 0, "failed": 0}
+
+    # ---------- membership ----------
+
+    async def register(self) -> None:
+        """Membership heartbeat: mark this replica alive, drop stale replicas."""
+        now = time.time()
+        await self.redis.zadd(JobCoordinatorConfig.MEMBERS_KEY, {self.instance_id: now})
+        await self.redis.zremrangebyscore(JobCoordinatorConfig.MEMBERS_KEY, "-inf", now - self.member_ttl)
+
+    async def leave(self) -> None:
+        await self.redis.zrem(JobCoordinatorConfig.MEMBERS_KEY, self.instance_id)
+
+    async def members(self) -> List[str]:
+        cutoff = time.time() - self.member_ttl
+        raw = await self.redis.zrangebyscore(JobCoordinatorConfig.MEMBERS_KEY, cutoff, "+inf")
+        return sorted(m.decode() if isinstance(m, bytes) else m for m in raw)
+
+    async def claim_slots(self, job_id: str) -> Tuple[Shard, Dict[str, str]]:
+        """
+        Lock up to this replica's fair share of the job's slots.
+
+        Membership only decides where to start and how many slots to take;
+        a slot is owned by whoever holds its lock. Slots left over (e.g. a
+        dead replica still counted as live) are free again next tick.
+
+        Returns:
+            (shard with the held slots, lock name -> owner token)
+        """
+        members = await self.members()
+        if self.instance_id not in members:
+            await self.register()
+            members = await self.members()
+        live = max(1, len(members))
+        position = members.index(self.instance_id) if self.instance_id in members else 0
+        quota = -(-self.shard_slots // live)
+        start = position * self.shard_slots // live
+
+        held: List[int] = []
+        tokens: Dict[str, str] = {}
+        for offset in range(self.shard_slots):
+            slot = (start + offset) % self.shard_slots
+            name = f"{job_id}:slot:{slot}"
+            token = await self.acquire(name)
+            if token:
+                held.append(slot)
+                tokens[name] = token
+                if len(held) >= quota:
+                    break
+        return Shard(frozenset(held), self.shard_slots), tokens
+
+    # ---------- locks ----------
+
+    async def acquire(self, name: str, ttl: Optional[float] = None) -> Optional[str]:
+        """Owner token if the lock was taken, None if another replica holds it."""
+        token = f"{self.instance_id}:{uuid.uuid4().hex[:8]}"
+        ttl_ms = int((ttl or self.lease_seconds) * 1000)
+        if await self.redis.set(_lock_key(name), token, nx=True, px=ttl_ms):
+            return token
+        return None
+
+    async def renew(self, name: str, token: str, ttl: Optional[float] = None) -> bool:
+        ttl_ms = int((ttl or self.lease_seconds) * 1000)
+        return bool(await self.redis.eval(_RENEW_SCRIPT, 1, _lock_key(name), token, ttl_ms))
+
+    async def release(self, name: str, token: str, hold_seconds: float = 0) -> bool:
+        """Release the lock, or let it expire after `hold_seconds`."""
+        hold_ms = max(0, int(hold_seconds * 1000))
+        return bool(await self.redis.eval(_RELEASE_SCRIPT, 1, _lock_key(name), token, hold_ms))
+
+    # ---------- heartbeats ----------
+
+    async def _beat(self, job_id: str, record: Dict[str, Any]) -> None:
+        try:
+            await self.redis.hset(JobCoordinatorConfig.HEARTBEATS_KEY, job_id, json.dumps(record))
+        except RedisError as e:
+            logger.warning("Job heartbeat failed", job=job_id, error=str(e))
+
+    async def _keep_alive(self, job_id: str, locks: Dict[str, str], record: Dict[str, Any]) -> None:
+        """Renew the leases and refresh the heartbeat until cancelled."""
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                for lock_name, token in locks.items():
+                    if not await self.renew(lock_name, token):
+                        self.stats["lease_lost"] += 1
+                        logger.warning("Job lease lost while running", job=job_id, lock=lock_name)
+                        return
+                await self.register()
+            except RedisError as e:
+                logger.warning("Job lease renewal failed", job=job_id, error=str(e))
+            record["beat_at"] = time.time()
+            await self._beat(job_id, record)
+
+    async def heartbeats(self) -> Dict[str, Dict[str, Any]]:
+        """Last heartbeat per job id (all replicas)."""
+        raw = await self.redis.hgetall(JobCoordinatorConfig.HEARTBEATS_KEY)
+        return {
+            (k.decode() if isinstance(k, bytes) else k): json.loads(v)
+            for k, v in raw.items()
+        }
+
+    # ---------- running jobs ----------
+
+    def hold_seconds(self, interval: Optional[float] = None) -> float:
+        """How long a lock is kept after the run started (the job's period, minus slack)."""
+        if not interval:
+            return self.min_hold_seconds
+        return max(self.min_hold_seconds, interval - self.hold_slack_seconds)
+
+    async def run(
+        self,
+        job_id: str,
+        func: Callable[[], Awaitable[Any]],
+        sharded: bool = False,
+        interval: Optional[float] = None,
+    ) -> Any:
+        """
+        Run `func` if this replica wins the job's lock (or some of its slots).
+
+        Args:
+            interval: Seconds between runs for IntervalTrigger jobs; the
+                lock is kept that long so each period runs once overall
+
+        Returns:
+            The job's result, or None if other replicas hold the lock(s)
+        """
+        if self.redis is None:
+            self.stats["ran_local"] += 1
+            return await func()
+
+        try:
+            if sharded:
+                shard, locks = await self.claim_slots(job_id)
+            else:
+                shard = Shard()
+                token = await self.acquire(job_id)
+                locks = {job_id: token} if token else {}
+        except RedisError as e:
+            # Fail open: a duplicate run is better than no run
+            logger.warning("Job coordination unavailable, running locally", job=job_id, error=str(e))
+            self.stats["ran_local"] += 1
+            return await func()
+
+        if not locks:
+            self.stats["skipped_locked"] += 1
+            logger.debug("Job held by another replica", job=job_id)
+            return None
+
+        record = {
+            "instance": self.instance_id,
+            "shard": str(shard) if sharded else None,
+            "state": "running",
+            "started_at": time.time(),
+            "beat_at": time.time(),
+        }
+        # Bounded key set: one entry per job id (sharded: the latest replica's
+        # record, which names its shard), so the ops view can look it up
+        await self._beat(job_id, record)
+        keep_alive = asyncio.create_task(self._keep_alive(job_id, locks, record))
+        shard_token = _current_shard.set(shard)
+        try:
+            result = await func()
+            record["state"] = "succeeded"
+            self.stats["ran"] += 1
+            return result
+        except Exception:
+            record["state"] = "failed"
+            self.stats["failed"] += 1
+            raise
+        finally:
+            _current_shard.reset(shard_token)
+            keep_alive.cancel()
+            record["finished_at"] = time.time()
+            await self._beat(job_id, record)
+            elapsed = record["finished_at"] - record["started_at"]
+            for lock_name, token in locks.items():
+                try:
+                    await self.release(lock_name, token, hold_seconds=self.hold_seconds(interval) - elapsed)
+                except RedisError as e:
+                    logger.warning("Job lock release failed, expires with the lease", job=job_id, error=str(e))
+
+
+# ==================== SINGLETON ====================
+
+_coordinator: Optional[JobCoordinator] = None
+_redis_retry_at = 0.0
+
+
+def configure_job_coordinator(redis=None, **options: Any) -> JobCoordinator:
+    """Replace the process-wide coordinator (tests, explicit Redis)."""
+    global _coordinator
+    _coordinator = JobCoordinator(redis, **options)
+    return _coordinator
+
+
+async def get_job_coordinator() -> JobCoordinator:
+    """Process-wide coordinator; attaches the shared Redis once available."""
+    global _redis_retry_at
+    from app.core.config import settings
+
+    if _coordinator is not None and (
+        _coordinator.redis is not None
+        or not settings.job_coordination_enabled
+        or time.monotonic() < _redis_retry_at
+    ):
+        return _coordinator
+
+    redis = None
+    if settings.job_coordination_enabled:
+        try:
+            from app.core.cache import get_cache_service
+            redis = (await get_cache_service()).redis
+        except Exception as e:
+            _redis_retry_at = time.monotonic() + JobCoordinatorConfig.REDIS_RETRY_SECONDS
+            logger.warning("Job coordination without Redis, jobs run on every replica", error=str(e))
+
+    instance_id = _coordinator.instance_id if _coordinator is not None else None
+    return configure_job_coordinator(redis, instance_id=instance_id)
+
+
+def coordinated(
+    job_id: str,
+    func: Callable[[], Awaitable[Any]],
+    sharded: bool = False,
+    interval: Optional[float] = None,
+) -> Callable[[], Awaitable[Any]]:
+    """
+    Scheduler job wrapper: run `func` once across replicas (or once per slot).
+
+    Pass `interval` (seconds) for IntervalTrigger jobs, whose replicas fire
+    at unrelated offsets.
+    """
+
+    @wraps(func)
+    async def job() -> Any:
+        coordinator = await get_job_coordinator()
+        return await coordinator.run(job_id, func, sharded=sharded, interval=interval)
+
+    return job
+
+
+async def coordinator_heartbeat() -> None:
+    """Scheduler job (every replica): keep this replica in the shard ring."""
+    coordinator = await get_job_coordinator()
+    if coordinator.redis is None:
+        return
+    try:
+        await coordinator.register()
+    except RedisError as e:
+        logger.warning("Replica heartbeat failed", error=str(e))
+
+
+__all__ = [
+    "JobCoordinatorConfig",
+    "JobCoordinator",
+    "Shard",
+    "configure_job_coordinator",
+    "coordinated",
+    "coordinator_heartbeat",
+    "current_shard",
+    "get_job_coordinator",
+    "in_current_shard",
+    "shard_filter",
+]
@@ -0,0 +1,361 @@
+"""
+============================================
+⏱️ SALESFLOW AI - JOB TELEMETRY
+============================================
+
+Per-run instrumentation for scheduler jobs:
+
+- Duration, items processed (+ items/sec), status and error
+- DB queries: PostgREST requests of the shared Supabase clients,
+  counted by an httpx request hook (`instrument_supabase_client`)
+- LLM calls: counted in app/ai_client.py via `record_llm_call()`
+- Items: `log_job_complete(records_processed=...)` and jobs returning
+  reports call `record_items()`
+- Errors: exceptions escaping the job, or `record_failure()` /
+  `log_job_complete(error=...)` for jobs that catch their own
+
+Counters are attributed to the job run in the current context (also
+across asyncio.to_thread / worker threads with their own event loop).
+
+Run history is kept per job (bounded) in-process and, when the job
+coordinator has Redis, in a shared Redis list so every replica reports
+the same percentiles. Exposed as JSON on /api/ops/jobs and as Prometheus
+gauges (collect_job_metrics in app/core/metrics.py). Runs longer than the
+job's interval fire the `job_overrun` alert on the AlertManager.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from functools import wraps
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+import structlog
+from redis.exceptions import RedisError
+
+logger = structlog.get_logger()
+
+
+class JobTelemetryConfig:
+    """Job telemetry defaults."""
+
+    HISTORY_SIZE = 200                  # Runs kept per job (percentiles over these)
+    PERCENTILES = (50, 90, 99)
+    KEY_PREFIX = "jobs:runs"            # Redis list per job, newest first
+
+
+# ==================== RUN CONTEXT ====================
+
+
+class JobRun:
+    """Counters of one running job (thread-safe: jobs fan out to threads)."""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.started_at = time.time()
+        self.items = 0
+        self.db_queries = 0
+        self.llm_calls = 0
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def add(self, field_name: str, count: int = 1) -> None:
+        with self._lock:
+            setattr(self, field_name, getattr(self, field_name) + count)
+
+
+_current_run: ContextVar[Optional[JobRun]] = ContextVar("job_run", default=None)
+
+
+def current_job_run() -> Optional[JobRun]:
+    return _current_run.get()
+
+
+def record_items(count: int) -> None:
+    """Items processed by the current job run (no-op outside jobs)."""
+    run = _current_run.get()
+    if run is not None and count:
+        run.add("items", int(count))
+
+
+def record_failure(error: str) -> None:
+    """Mark the current run failed for jobs that catch their own exceptions."""
+    run = _current_run.get()
+    if run is not None:
+        run.error = error or "failed"
+
+
+def record_db_query(count: int = 1) -> None:
+    run = _current_run.get()
+    if run is not None:
+        run.add("db_queries", count)
+
+
+def record_llm_call(count: int = 1) -> None:
+    run = _current_run.get()
+    if run is not None:
+        run.add("llm_calls", count)
+
+
+def _count_db_request(request: Any) -> None:
+    record_db_query()
+
+
+def instrument_supabase_client(client: Any) -> Any:
+    """Count PostgREST requests (tables + RPC) of `client` towards the running job."""
+    try:
+        session = client.postgrest.session
+        hooks = session.event_hooks
+        if _count_db_request not in hooks["request"]:
+            hooks["request"].append(_count_db_request)
+            session.event_hooks = hooks
+    except Exception as e:
+        logger.debug("Supabase client not instrumented", error=str(e))
+    return client
+
+
+# ==================== RUN RECORDS ====================
+
+
+@dataclass
+class JobRunRecord:
+    """Outcome of one job run"""
+
+    job: str
+    started_at: float
+    duration_seconds: float
+    status: str                       # succeeded | failed
+    items: int = 0
+    db_queries: int = 0
+    llm_calls: int = 0
+    error: Optional[str] = None
+    overran: bool = False
+
+    @property
+    def items_per_second(self) -> float:
+        if self.duration_seconds <= 0:
+            return 0.0
+        return round(self.items / self.duration_seconds, 2)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "items_per_second": self.items_per_second}
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile (None for no values)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return round(ordered[rank], 3)
+
+
+def summarize_runs(job_id: str, runs: List[Dict[str, Any]], interval_seconds: Optional[float]) -> Dict[str, Any]:
+    """Percentiles and rates over a job's run history (newest first)."""
+    durations = [r["duration_seconds"] for r in runs]
+    rates = [r["items_per_second"] for r in runs]
+    failed = sum(1 for r in runs if r["status"] == "failed")
+    succeeded = [r for r in runs if r["status"] == "succeeded"]
+    summary: Dict[str, Any] = {
+        "job": job_id,
+        "interval_seconds": interval_seconds,
+        "runs": len(runs),
+        "error_rate": round(failed / len(runs), 3) if runs else None,
+        "overruns": sum(1 for r in runs if r.get("overran")),
+        "duration_seconds": {f"p{p}": percentile(durations, p) for p in JobTelemetryConfig.PERCENTILES},
+        "items_per_second": {f"p{p}": percentile(rates, p) for p in JobTelemetryConfig.PERCENTILES},
+        "avg_db_queries": round(sum(r["db_queries"] for r in runs) / len(runs), 1) if runs else None,
+        "avg_llm_calls": round(sum(r["llm_calls"] for r in runs) / len(runs), 1) if runs else None,
+        "last_run": runs[0] if runs else None,
+        "last_success_at": (
+            succeeded[0]["started_at"] + succeeded[0]["duration_seconds"] if succeeded else None
+        ),
+    }
+    return summary
+
+
+# ==================== TELEMETRY ====================
+
+
+class JobTelemetry:
+    """Run history, Prometheus export and overrun alerts for scheduler jobs."""
+
+    def __init__(
+        self,
+        redis=None,
+        history_size: int = JobTelemetryConfig.HISTORY_SIZE,
+        alert_manager=None,
+    ):
+        self.redis = redis
+        self.history_size = history_size
+        self._alert_manager = alert_manager
+        self.intervals: Dict[str, Optional[float]] = {}
+        self.history: Dict[str, Deque[Dict[str, Any]]] = {}
+
+    def register(self, job_id: str, interval_seconds: Optional[float] = None) -> None:
+        self.intervals[job_id] = interval_seconds
+        self.history.setdefault(job_id, deque(maxlen=self.history_size))
+
+    @property
+    def alert_manager(self):
+        if self._alert_manager is None:
+            from app.routers.analytics_extended import get_alert_manager
+            self._alert_manager = get_alert_manager()
+        return self._alert_manager
+
+    async def track(self, job_id: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `func` as one instrumented run of `job_id`."""
+        self.register(job_id, self.intervals.get(job_id))
+        run = JobRun(job_id)
+        token = _current_run.set(run)
+        started = time.monotonic()
+        error: Optional[str] = None
+        try:
+            return await func()
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            raise
+        finally:
+            _current_run.reset(token)
+            error = error or run.error
+            record = JobRunRecord(
+                job=job_id,
+                started_at=run.started_at,
+                duration_seconds=round(time.monotonic() - started, 6),
+                status="failed" if error else "succeeded",
+                items=run.items,
+                db_queries=run.db_queries,
+                llm_calls=run.llm_calls,
+                error=error,
+            )
+            interval = self.intervals.get(job_id)
+            record.overran = bool(interval) and record.duration_seconds > interval
+            await self._store(record)
+            await self._check_overrun(record, interval)
+
+    async def _store(self, record: JobRunRecord) -> None:
+        data = record.to_dict()
+        self.history[record.job].appendleft(data)
+        logger.info("Job run", **data)
+        if self.redis is None:
+            return
+        try:
+            key = f"{JobTelemetryConfig.KEY_PREFIX}:{record.job}"
+            await self.redis.lpush(key, json.dumps(data))
+            await self.redis.ltrim(key, 0, self.history_size - 1)
+        except RedisError as e:
+            logger.warning("Job run not shared", job=record.job, error=str(e))
+
+    async def _check_overrun(self, record: JobRunRecord, interval: Optional[float]) -> None:
+        if not interval:
+            return
+        # AlertManager fingerprints by rule + tenant: one alert per job
+        tenant = f"job:{record.job}"
+        try:
+            manager = self.alert_manager
+            if record.overran:
+                await manager.fire_alert(
+                    "job_overrun",
+                    title=f"Job {record.job} overran its interval",
+                    message=(
+                        f"{record.job} took {record.duration_seconds:.0f}s, "
+                        f"interval is {interval:.0f}s ({record.status})"
+                    ),
+                    context={"job": record.job, "duration_seconds": record.duration_seconds, "interval_seconds": interval},
+                    tenant_id=tenant,
+                )
+            else:
+                for alert in manager.get_active_alerts(tenant_id=tenant):
+                    if alert.rule_name == "job_overrun":
+                        await manager.resolve_alert(alert.fingerprint, f"Last run took {record.duration_seconds:.0f}s")
+        except Exception as e:
+            logger.warning("Job overrun alerting failed", job=record.job, error=str(e))
+
+    async def runs(self, job_id: str) -> List[Dict[str, Any]]:
+        """Run history (newest first), shared across replicas when Redis is available."""
+        if self.redis is not None:
+            try:
+                raw = await self.redis.lrange(f"{JobTelemetryConfig.KEY_PREFIX}:{job_id}", 0, self.history_size - 1)
+                return [json.loads(item) for item in raw]
+            except RedisError as e:
+                logger.warning("Shared job history unavailable, using local", job=job_id, error=str(e))
+        return list(self.history.get(job_id, ()))
+
+    async def snapshot(self) -> Dict[str, Any]:
+        """Summary per registered job."""
+        jobs = {}
+        for job_id in sorted(self.intervals):
+            jobs[job_id] = summarize_runs(job_id, await self.runs(job_id), self.intervals[job_id])
+        return {"jobs": jobs, "generated_at": time.time()}
+
+
+# ==================== SINGLETON ====================
+
+_telemetry: Optional[JobTelemetry] = None
+
+
+def get_job_telemetry() -> JobTelemetry:
+    global _telemetry
+    if _telemetry is None:
+        _telemetry = JobTelemetry()
+    return _telemetry
+
+
+def configure_job_telemetry(redis=None, **options: Any) -> JobTelemetry:
+    """Replace the process-wide telemetry (tests, explicit Redis); keeps registrations."""
+    global _telemetry
+    previous = _telemetry
+    _telemetry = JobTelemetry(redis, **options)
+    if previous is not None:
+        for job_id, interval in previous.intervals.items():
+            _telemetry.register(job_id, interval)
+    return _telemetry
+
+
+def instrumented(
+    job_id: str,
+    func: Callable[[], Awaitable[Any]],
+    interval_seconds: Optional[float] = None,
+) -> Callable[[], Awaitable[Any]]:
+    """Scheduler job wrapper: record each run of `func` under `job_id`."""
+    get_job_telemetry().register(job_id, interval_seconds)
+
+    @wraps(func)
+    async def job() -> Any:
+        telemetry = get_job_telemetry()
+        if telemetry.redis is None:
+            await _attach_shared_redis(telemetry)
+        return await telemetry.track(job_id, func)
+
+    return job
+
+
+async def _attach_shared_redis(telemetry: JobTelemetry) -> None:
+    """Share run history through the job coordinator's Redis once it has one."""
+    from app.services.job_coordinator import get_job_coordinator
+
+    coordinator = await get_job_coordinator()
+    if coordinator.redis is not None:
+        telemetry.redis = coordinator.redis
+
+
+__all__ = [
+    "JobTelemetryConfig",
+    "JobRun",
+    "JobRunRecord",
+    "JobTelemetry",
+    "configure_job_telemetry",
+    "current_job_run",
+    "get_job_telemetry",
+    "instrument_supabase_client",
+    "instrumented",
+    "percentile",
+    "record_db_query",
+    "record_failure",
+    "record_items",
+    "record_llm_call",
+    "summarize_runs",
+]
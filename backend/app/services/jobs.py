@@ -2,15 +2,33 @@
 Background Jobs for Al Sales Solutions
 
 Automated tasks that run on schedule to make the AI proactive.
+
+The Supabase client is sync: every query and helper (job logs,
+notifications, watermark scans) runs via asyncio.to_thread.
 """
 
-from datetime import datetime, timedelta
+import asyncio
+from datetime import datetime, timedelta, timezone
 import logging
-from ..core.deps import get_supabase
-from .notifications import create_notification, log_job_start, log_job_complete
+from ..core.deps import get_supabase, get_supabase_read
+from ..db.routing import use_replica
+from .briefing_pipeline import BriefingConfig, commit_progress, plan_daily_briefings
+from .incremental_jobs import (
+    WatermarkStore,
+    churn_risks_by_user,
+    monthly_revenue_by_user,
+    overdue_followups_by_user,
+)
+from .lead_scoring import group_hot_leads, hot_lead_notification, recalculate_lead_scores, score_lead
+from .notifications import create_notification, create_notifications_batch, log_job_start, log_job_complete
 
 logger = logging.getLogger(__name__)
 
+# Full reconciliation of the incremental jobs (see incremental_jobs.py)
+FOLLOW_UP_RECONCILE = timedelta(days=1)
+CHURN_RECONCILE = timedelta(days=7)
+GOALS_RECONCILE = timedelta(days=7)
+
 
 # ═══════════════════════════════════════════════════════════
 # JOB 1: FOLLOW-UP CHECKER (every 4 hours)
@@ -20,25 +38,20 @@ async def check_follow_ups():
     """
     Checks for overdue follow-ups and leads without response.
     Creates notifications for users.
+
+    Incremental: only users with a task that became overdue or changed
+    since the last run are notified; a daily full run reminds everyone.
     """
     db = await get_supabase()  # MUSS awaited werden!
-    job_id = await log_job_start(db, "check_follow_ups")
+    job_id = await asyncio.to_thread(log_job_start, db, "check_follow_ups")
 
     try:
-        # Get all overdue follow-up suggestions grouped by user
-        overdue = await db.from_("followup_suggestions").select(
-            "id, title, due_at, user_id, lead_id, leads(name)"
-        ).eq("status", "pending").lt(
-            "due_at", datetime.now().isoformat()
-        ).execute()
-
-        # Group by user
-        by_user = {}
-        for task in overdue.data:
-            user_id = task["user_id"]
-            if user_id not in by_user:
-                by_user[user_id] = []
-            by_user[user_id].append(task)
+        store = WatermarkStore(db)
+        window = await asyncio.to_thread(store.begin, "check_follow_ups", reconcile_every=FOLLOW_UP_RECONCILE)
+
+        # Overdue follow-up suggestions grouped by user, oldest first
+        by_user = await asyncio.to_thread(overdue_followups_by_user, db, window)
+        overdue_count = sum(len(tasks) for tasks in by_user.values())
 
         # Create notifications
         notifications_created = 0
@@ -46,7 +59,8 @@ async def check_follow_ups():
             count = len(tasks)
             oldest = tasks[0]
 
-            await create_notification(
+            await asyncio.to_thread(
+                create_notification,
                 db=db,
                 user_id=user_id,
                 type="overdue_followups",
@@ -59,12 +73,16 @@ async def check_follow_ups():
             )
             notifications_created += 1
 
-        await log_job_complete(db, job_id, records_processed=len(overdue.data))
-        logger.info(f"FollowUp Checker: {len(overdue.data)} overdue, {notifications_created} notifications")
+        await asyncio.to_thread(store.commit, window)
+        await asyncio.to_thread(log_job_complete, db, job_id, records_processed=overdue_count, metadata={
+            "mode": "full" if window.full else "incremental",
+            "users": len(by_user),
+        })
+        logger.info(f"FollowUp Checker: {overdue_count} overdue, {notifications_created} notifications")
 
     except Exception as e:
         logger.error(f"FollowUp Checker failed: {e}")
-        await log_job_complete(db, job_id, error=str(e))
+        await asyncio.to_thread(log_job_complete, db, job_id, error=str(e))
 
 
 # ═══════════════════════════════════════════════════════════
@@ -74,112 +92,51 @@ async def check_follow_ups():
 async def update_lead_scores():
     """
     Recalculates lead scores and flags newly hot leads.
+
+    Set-based: see services/lead_scoring.py. Hot-lead notifications are
+    sent once per user.
     """
     db = await get_supabase()  # MUSS awaited werden!
-    job_id = await log_job_start(db, "update_lead_scores")
+    job_id = await asyncio.to_thread(log_job_start, db, "update_lead_scores")
 
     try:
-        # Get all active leads
-        leads = await db.from_("leads").select(
-            "id, user_id, name, score, last_contact, status, created_at"
-        ).not_.in_("status", ["lost", "won"]).execute()
-
-        updated = 0
-        new_hot_leads = []
-
-        for lead in leads.data:
-            old_score = lead.get("score") or 0
-            new_score = await calculate_lead_score(db, lead)
-
-            # Update if changed
-            if new_score != old_score:
-                await db.from_("leads").update({
-                    "score": new_score
-                }).eq("id", lead["id"]).execute()
-                updated += 1
-
-            # Track newly hot leads
-            if new_score >= 70 and old_score < 70:
-                new_hot_leads.append({
-                    "lead": lead,
-                    "new_score": new_score
-                })
-
-        # Notify about new hot leads
-        for hot in new_hot_leads:
-            await create_notification(
-                db=db,
-                user_id=hot["lead"]["user_id"],
-                type="hot_lead",
-                title="🔥 Neuer Hot Lead!",
-                body=f"{hot['lead']['name']} ist jetzt ein Hot Lead (Score: {hot['new_score']})",
-                data={
-                    "lead_id": hot["lead"]["id"],
-                    "score": hot["new_score"]
-                }
-            )
+        report = await asyncio.to_thread(recalculate_lead_scores)
+
+        notified = 0
+        for user_id, leads in group_hot_leads(report.hot_leads).items():
+            try:
+                await asyncio.to_thread(
+                    create_notification, db=db, user_id=user_id, type="hot_lead", **hot_lead_notification(leads)
+                )
+                notified += 1
+            except Exception as e:
+                logger.error(f"Hot lead notification failed for user {user_id}: {e}")
 
-        await log_job_complete(db, job_id, records_processed=updated, metadata={
-            "new_hot_leads": len(new_hot_leads)
+        await asyncio.to_thread(log_job_complete, db, job_id, records_processed=report.updated, metadata={
+            **report.to_dict(),
+            "notified_users": notified,
         })
-        logger.info(f"Lead Scorer: {updated} updated, {len(new_hot_leads)} new hot leads")
+        logger.info(
+            f"Lead Scorer: {report.leads_scanned} scored, {report.updated} updated, "
+            f"{report.new_hot_leads} new hot leads in {report.duration_ms}ms"
+        )
 
     except Exception as e:
         logger.error(f"Lead Scorer failed: {e}")
-        await log_job_complete(db, job_id, error=str(e))
-
-
-async def calculate_lead_score(db, lead: dict) -> int:
-    """Calculate a lead's score based on various factors."""
-
-    score = 50  # Base score
-
-    # Factor 1: Recency of contact (-20 to +20)
-    if lead.get("last_contact"):
-        last_contact = datetime.fromisoformat(lead["last_contact"].replace("Z", ""))
-        days_since = (datetime.now() - last_contact).days
-
-        if days_since <= 3:
-            score += 20
-        elif days_since <= 7:
-            score += 10
-        elif days_since <= 14:
-            score += 0
-        elif days_since <= 30:
-            score -= 10
-        else:
-            score -= 20
-    else:
-        score -= 10
-
-    # Factor 2: Number of interactions (+2 per interaction, max +20)
-    interactions = await db.from_("lead_interactions").select(
+        await asyncio.to_thread(log_job_complete, db, job_id, error=str(e))
+
+
+def calculate_lead_score(db, lead: dict) -> int:
+    """Calculate a single lead's score (the batch job uses lead_scoring directly)."""
+    interactions = db.from_("lead_interactions").select(
         "id"
     ).eq("lead_id", lead["id"]).execute()
 
-    interaction_bonus = min(len(interactions.data) * 2, 20)
-    score += interaction_bonus
-
-    # Factor 3: Positive outcomes (+5 each, max +15)
-    positive = await db.from_("lead_interactions").select(
+    positive = db.from_("lead_interactions").select(
         "id"
     ).eq("lead_id", lead["id"]).eq("outcome", "positive").execute()
 
-    positive_bonus = min(len(positive.data) * 5, 15)
-    score += positive_bonus
-
-    # Factor 4: Status progression
-    status_scores = {
-        "new": 0,
-        "contacted": 5,
-        "qualified": 15,
-        "proposal": 25,
-        "negotiation": 30
-    }
-    score += status_scores.get(lead.get("status"), 0)
-
-    # Clamp score to 0-100
-    return max(0, min(100, score))
+    return score_lead(lead, len(interactions.data), len(positive.data))
 
 
 # ═══════════════════════════════════════════════════════════
@@ -189,27 +146,22 @@ async def calculate_lead_score(db, lead: dict) -> int:
 async def detect_churn_risks():
     """
     Identifies customers at risk of churning.
+
+    Incremental: only users with a customer that crossed the 30-day
+    cutoff or changed since the last run; weekly full run.
     """
     db = await get_supabase()  # MUSS awaited werden!
-    job_id = await log_job_start(db, "detect_churn_risks")
+    job_id = await asyncio.to_thread(log_job_start, db, "detect_churn_risks")
+    with use_replica():
+        read_db = await get_supabase_read()  # Report-Reads über die Read-Replica
 
     try:
-        # Find customers with no contact for 30+ days
-        cutoff = datetime.now() - timedelta(days=30)
-
-        at_risk = await db.from_("leads").select(
-            "id, user_id, name, company, last_contact"
-        ).eq("status", "won").lt(
-            "last_contact", cutoff.isoformat()
-        ).execute()
-
-        # Group by user
-        by_user = {}
-        for lead in at_risk.data:
-            user_id = lead["user_id"]
-            if user_id not in by_user:
-                by_user[user_id] = []
-            by_user[user_id].append(lead)
+        store = WatermarkStore(db)
+        window = await asyncio.to_thread(store.begin, "detect_churn_risks", reconcile_every=CHURN_RECONCILE)
+
+        # Customers with no contact for 30+ days, grouped by user
+        by_user = await asyncio.to_thread(churn_risks_by_user, read_db, window, 30)
+        at_risk_count = sum(len(leads) for leads in by_user.values())
 
         # Create notifications
         for user_id, leads in by_user.items():
@@ -220,10 +172,13 @@ async def detect_churn_risks():
             first = leads[0]
 
             # Calculate days since last contact
-            last_contact = datetime.fromisoformat(first["last_contact"].replace("Z", ""))
-            days_since = (datetime.now() - last_contact).days
+            last_contact = datetime.fromisoformat(first["last_contact"].replace("Z", "+00:00"))
+            if last_contact.tzinfo is None:
+                last_contact = last_contact.replace(tzinfo=timezone.utc)
+            days_since = (window.until - last_contact).days
 
-            await create_notification(
+            await asyncio.to_thread(
+                create_notification,
                 db=db,
                 user_id=user_id,
                 type="churn_risk",
@@ -235,12 +190,16 @@ async def detect_churn_risks():
                 }
             )
 
-        await log_job_complete(db, job_id, records_processed=len(at_risk.data))
-        logger.info(f"Churn Detector: {len(at_risk.data)} at risk customers found")
+        await asyncio.to_thread(store.commit, window)
+        await asyncio.to_thread(log_job_complete, db, job_id, records_processed=at_risk_count, metadata={
+            "mode": "full" if window.full else "incremental",
+            "users": len(by_user),
+        })
+        logger.info(f"Churn Detector: {at_risk_count} at risk customers found")
 
     except Exception as e:
         logger.error(f"Churn Detector failed: {e}")
-        await log_job_complete(db, job_id, error=str(e))
+        await asyncio.to_thread(log_job_complete, db, job_id, error=str(e))
 
 
 # ═══════════════════════════════════════════════════════════
@@ -250,17 +209,26 @@ async def detect_churn_risks():
 async def track_goals():
     """
     Compares current performance vs goals.
+
+    Monthly revenue per user is kept in the job watermark; each run only
+    re-reads the deals of users with changed deals (weekly/monthly full run).
     """
     db = await get_supabase()  # MUSS awaited werden!
-    job_id = await log_job_start(db, "track_goals")
+    job_id = await asyncio.to_thread(log_job_start, db, "track_goals")
+    with use_replica():
+        read_db = await get_supabase_read()  # Report-Reads über die Read-Replica
 
     try:
+        store = WatermarkStore(db)
+        window = await asyncio.to_thread(store.begin, "track_goals", reconcile_every=GOALS_RECONCILE)
+        revenue_by_user = await asyncio.to_thread(monthly_revenue_by_user, read_db, window)
+
         # Get all users with goals
-        users = await db.from_("profiles").select(
+        users = await asyncio.to_thread(read_db.from_("profiles").select(
             "id, name, monthly_revenue_goal"
         ).not_.is_("monthly_revenue_goal", "null").gt(
             "monthly_revenue_goal", 0
-        ).execute()
+        ).execute)
 
         notifications_sent = 0
 
@@ -268,16 +236,8 @@ async def track_goals():
             user_id = user["id"]
             goal = user["monthly_revenue_goal"]
 
-            # Get current month's revenue
-            start_of_month = datetime.now().replace(day=1, hour=0, minute=0, second=0)
-
-            revenue = await db.from_("deals").select(
-                "value"
-            ).eq("user_id", user_id).eq(
-                "status", "won"
-            ).gte("closed_at", start_of_month.isoformat()).execute()
-
-            current = sum([d["value"] or 0 for d in revenue.data])
+            # Current month's revenue
+            current = revenue_by_user.get(user_id, 0)
             percentage = (current / goal * 100) if goal > 0 else 0
 
             # Calculate expected percentage based on day of month
@@ -288,7 +248,8 @@ async def track_goals():
             # Determine notification type
             if percentage >= expected_percentage + 10:
                 # Ahead of goal
-                await create_notification(
+                await asyncio.to_thread(
+                    create_notification,
                     db=db,
                     user_id=user_id,
                     type="goal_ahead",
@@ -305,7 +266,8 @@ async def track_goals():
             elif percentage < expected_percentage - 20:
                 # Behind goal
                 remaining = goal - current
-                await create_notification(
+                await asyncio.to_thread(
+                    create_notification,
                     db=db,
                     user_id=user_id,
                     type="goal_behind",
@@ -320,118 +282,53 @@ async def track_goals():
                 )
                 notifications_sent += 1
 
-        await log_job_complete(db, job_id, records_processed=len(users.data), metadata={
-            "notifications_sent": notifications_sent
+        await asyncio.to_thread(store.commit, window)
+        await asyncio.to_thread(log_job_complete, db, job_id, records_processed=len(users.data), metadata={
+            "notifications_sent": notifications_sent,
+            "mode": "full" if window.full else "incremental",
         })
         logger.info(f"Goal Tracker: {len(users.data)} users checked, {notifications_sent} notifications")
 
     except Exception as e:
         logger.error(f"Goal Tracker failed: {e}")
-        await log_job_complete(db, job_id, error=str(e))
+        await asyncio.to_thread(log_job_complete, db, job_id, error=str(e))
 
 
 # ═══════════════════════════════════════════════════════════
-# JOB 5: DAILY BRIEFING (daily at 7:30)
+# JOB 5: DAILY BRIEFING (every 15 minutes, 7:30-8:00 local)
 # ═══════════════════════════════════════════════════════════
 
 async def send_daily_briefing():
     """
-    Sends personalized morning briefing to all users.
+    Sends personalized morning briefings to users whose local briefing
+    slot passed since the last run.
+
+    Timezone buckets with set-based counts and batched notifications:
+    see services/briefing_pipeline.py.
     """
     db = await get_supabase()  # MUSS awaited werden!
-    job_id = await log_job_start(db, "send_daily_briefing")
+    job_id = await asyncio.to_thread(log_job_start, db, "send_daily_briefing")
 
     try:
-        # Get all users with daily briefing enabled
-        users = await db.from_("user_notification_preferences").select(
-            "user_id"
-        ).eq("daily_briefing", True).execute()
-
-        # If no preferences set, get all users
-        if not users.data:
-            users = await db.from_("profiles").select("id").execute()
-            user_ids = [u["id"] for u in users.data]
-        else:
-            user_ids = [u["user_id"] for u in users.data]
+        store = WatermarkStore(db)
+        plan = await asyncio.to_thread(plan_daily_briefings, db, store)
 
         briefings_sent = 0
-        today = datetime.now().date()
-        tomorrow = today + timedelta(days=1)
-
-        for user_id in user_ids:
-            # Get user name
-            user = await db.from_("profiles").select("name").eq(
-                "id", user_id
-            ).single().execute()
-
-            user_name = user.data.get("name", "").split()[0] if user.data else ""
-
-            # Get today's follow-ups
-            followups = await db.from_("followup_suggestions").select(
-                "id"
-            ).eq("user_id", user_id).eq("status", "pending").gte(
-                "due_at", today.isoformat()
-            ).lt(
-                "due_at", tomorrow.isoformat()
-            ).execute()
-
-            # Get today's appointments (if calendar_events table exists)
-            try:
-                appointments = await db.from_("calendar_events").select(
-                    "id"
-                ).eq("user_id", user_id).gte(
-                    "start_time", today.isoformat()
-                ).lt(
-                    "start_time", tomorrow.isoformat()
-                ).execute()
-                appointment_count = len(appointments.data)
-            except:
-                appointment_count = 0
-
-            # Get overdue tasks
-            overdue = await db.from_("followup_suggestions").select(
-                "id"
-            ).eq("user_id", user_id).eq("status", "pending").lt(
-                "due_at", today.isoformat()
-            ).execute()
-
-            # Build briefing
-            parts = []
-
-            if followups.data:
-                parts.append(f"📋 {len(followups.data)} Follow-up{'s' if len(followups.data) > 1 else ''}")
-
-            if appointment_count > 0:
-                parts.append(f"📅 {appointment_count} Termin{'e' if appointment_count > 1 else ''}")
-
-            if overdue.data:
-                parts.append(f"⚠️ {len(overdue.data)} überfällig")
-
-            if not parts:
-                body = "Keine geplanten Aktivitäten - perfekt für Akquise!"
-            else:
-                body = " | ".join(parts)
-
-            await create_notification(
-                db=db,
-                user_id=user_id,
-                type="daily_briefing",
-                title=f"☀️ Guten Morgen{', ' + user_name if user_name else ''}!",
-                body=body,
-                data={
-                    "followups": len(followups.data),
-                    "appointments": appointment_count,
-                    "overdue": len(overdue.data)
-                }
-            )
-            briefings_sent += 1
-
-        await log_job_complete(db, job_id, records_processed=briefings_sent)
-        logger.info(f"Daily Briefing: {briefings_sent} briefings sent")
+        for i in range(0, len(plan.briefings), BriefingConfig.NOTIFY_BATCH):
+            batch = plan.briefings[i:i + BriefingConfig.NOTIFY_BATCH]
+            result = await asyncio.to_thread(create_notifications_batch, db, "daily_briefing", batch)
+            briefings_sent += result["created"]
+            # Per batch, so a later failure doesn't resend these
+            await asyncio.to_thread(commit_progress, store, plan, i + len(batch))
+
+        if not plan.briefings:
+            await asyncio.to_thread(commit_progress, store, plan, 0)
+        await asyncio.to_thread(log_job_complete, db, job_id, records_processed=briefings_sent, metadata=plan.to_dict())
+        logger.info(f"Daily Briefing: {briefings_sent} briefings sent in {len(plan.buckets)} timezone buckets")
 
     except Exception as e:
         logger.error(f"Daily Briefing failed: {e}")
-        await log_job_complete(db, job_id, error=str(e))
+        await asyncio.to_thread(log_job_complete, db, job_id, error=str(e))
 
 
 # ═══════════════════════════════════════════════════════════
@@ -443,15 +340,15 @@ async def power_hour_reminder():
     Reminds users about upcoming Power Hour.
     """
     db = await get_supabase()  # MUSS awaited werden!
-    job_id = await log_job_start(db, "power_hour_reminder")
+    job_id = await asyncio.to_thread(log_job_start, db, "power_hour_reminder")
 
     try:
         current_hour = datetime.now().hour + 1  # Reminder is 10 min before
 
         # Get users with Power Hour enabled at this time
-        users = await db.from_("user_notification_preferences").select(
+        users = await asyncio.to_thread(db.from_("user_notification_preferences").select(
             "user_id, power_hour_times"
-        ).eq("power_hour_enabled", True).execute()
+        ).eq("power_hour_enabled", True).execute)
 
         reminders_sent = 0
 
@@ -459,7 +356,8 @@ async def power_hour_reminder():
             times = pref.get("power_hour_times", [10, 15])
 
             if current_hour in times:
-                await create_notification(
+                await asyncio.to_thread(
+                    create_notification,
                     db=db,
                     user_id=pref["user_id"],
                     type="power_hour",
@@ -472,12 +370,12 @@ async def power_hour_reminder():
                 )
                 reminders_sent += 1
 
-        await log_job_complete(db, job_id, records_processed=reminders_sent)
+        await asyncio.to_thread(log_job_complete, db, job_id, records_processed=reminders_sent)
         logger.info(f"Power Hour Reminder: {reminders_sent} reminders sent")
 
     except Exception as e:
         logger.error(f"Power Hour Reminder failed: {e}")
-        await log_job_complete(db, job_id, error=str(e))
+        await asyncio.to_thread(log_job_complete, db, job_id, error=str(e))
 
 
 # ═══════════════════════════════════════════════════════════
@@ -490,15 +388,15 @@ async def generate_all_suggestions():
     Aktuell nur Logging – kann später mit Supabase-Flow befüllt werden.
     """
     db = await get_supabase()  # MUSS awaited werden!
-    job_id = await log_job_start(db, "generate_all_suggestions")
+    job_id = await asyncio.to_thread(log_job_start, db, "generate_all_suggestions")
 
     try:
         # Die eigentliche Generierung wird vom Follow-up Router übernommen.
-        await log_job_complete(db, job_id, metadata={"status": "noop"})
+        await asyncio.to_thread(log_job_complete, db, job_id, metadata={"status": "noop"})
         logger.info("generate_all_suggestions executed (noop)")
     except Exception as e:
         logger.error(f"generate_all_suggestions failed: {e}")
-        await log_job_complete(db, job_id, error=str(e))
+        await asyncio.to_thread(log_job_complete, db, job_id, error=str(e))
 
 
 __all__ = [
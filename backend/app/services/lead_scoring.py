@@ -0,0 +1,356 @@
+"""
+Lead Scoring (batch pipeline)
+
+Recalculates `leads.score` for all active leads across all users:
+
+1. Active leads, paged by id (one query per page)
+2. Interaction + positive-outcome counts per lead (one grouped RPC per page)
+3. Scores computed over numpy arrays for the whole page
+4. Changed scores written with a chunked bulk UPDATE (RPC)
+5. Newly hot leads collected and notified once per user
+
+Query count per run: pages × (1 + 1 + update chunks), independent of the
+number of leads and interactions.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import structlog
+
+from app.db.bulk import chunked
+
+logger = structlog.get_logger()
+
+
+class LeadScoringConfig:
+    """Batch sizes and scoring constants"""
+
+    PAGE_SIZE = 2000          # Active leads per query
+    UPDATE_CHUNK = 1000       # Scores per apply_lead_scores call
+    FALLBACK_IN_CHUNK = 200   # Ids per IN() filter if the RPC is missing
+
+    BASE_SCORE = 50
+    HOT_THRESHOLD = 70
+    INTERACTION_POINTS, INTERACTION_MAX = 2, 20
+    POSITIVE_POINTS, POSITIVE_MAX = 5, 15
+    NO_CONTACT_PENALTY = -10
+
+    # (max days since last contact, points); older than the last bound: -20
+    RECENCY_STEPS = ((3, 20), (7, 10), (14, 0), (30, -10))
+    RECENCY_STALE = -20
+
+    STATUS_SCORES = {
+        "new": 0,
+        "contacted": 5,
+        "qualified": 15,
+        "proposal": 25,
+        "negotiation": 30,
+    }
+
+
+INACTIVE_STATUSES = ["lost", "won"]
+LEAD_COLUMNS = "id, user_id, name, score, last_contact, status"
+
+
+@dataclass
+class LeadScoringReport:
+    """Outcome of one scoring run"""
+
+    leads_scanned: int = 0
+    pages: int = 0
+    updated: int = 0
+    failed: int = 0
+    new_hot_leads: int = 0
+    fetch_ms: float = 0.0
+    aggregate_ms: float = 0.0
+    compute_ms: float = 0.0
+    write_ms: float = 0.0
+    duration_ms: float = 0.0
+    hot_leads: List[Dict[str, Any]] = field(default_factory=list, repr=False)
+
+    @property
+    def leads_per_second(self) -> float:
+        if self.duration_ms <= 0:
+            return 0.0
+        return round(self.leads_scanned / (self.duration_ms / 1000), 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("hot_leads")
+        return {**data, "leads_per_second": self.leads_per_second}
+
+
+# ==================== SCORING ====================
+
+def _days_since(value: Optional[str], now: datetime) -> float:
+    """Whole days since an ISO timestamp; NaN if missing or unparsable."""
+    if not value:
+        return np.nan
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return np.nan
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return float((now - parsed).days)
+
+
+def compute_scores(
+    days_since: np.ndarray,
+    interactions: np.ndarray,
+    positive: np.ndarray,
+    status_points: np.ndarray,
+) -> np.ndarray:
+    """
+    Score a batch of leads at once.
+
+    Args:
+        days_since: Days since last contact, NaN for never contacted
+        interactions: Interaction count per lead
+        positive: Positive-outcome count per lead
+        status_points: Points for each lead's pipeline status
+
+    Returns:
+        int array of scores clamped to 0-100
+    """
+    cfg = LeadScoringConfig
+    contacted = ~np.isnan(days_since)
+    days = np.where(contacted, days_since, 0)
+
+    recency = np.select(
+        [days <= bound for bound, _ in cfg.RECENCY_STEPS],
+        [points for _, points in cfg.RECENCY_STEPS],
+        default=cfg.RECENCY_STALE,
+    )
+    recency = np.where(contacted, recency, cfg.NO_CONTACT_PENALTY)
+
+    scores = (
+        cfg.BASE_SCORE
+        + recency
+        + np.minimum(interactions * cfg.INTERACTION_POINTS, cfg.INTERACTION_MAX)
+        + np.minimum(positive * cfg.POSITIVE_POINTS, cfg.POSITIVE_MAX)
+        + status_points
+    )
+    return np.clip(scores, 0, 100).astype(int)
+
+
+def score_lead(lead: Dict[str, Any], interactions: int, positive: int, now: Optional[datetime] = None) -> int:
+    """Score a single lead (same math as the batch pipeline)."""
+    now = now or datetime.now(timezone.utc)
+    return int(compute_scores(
+        np.array([_days_since(lead.get("last_contact"), now)]),
+        np.array([interactions]),
+        np.array([positive]),
+        np.array([LeadScoringConfig.STATUS_SCORES.get(lead.get("status"), 0)]),
+    )[0])
+
+
+# ==================== QUERIES ====================
+
+def iter_active_leads(
+    supabase: Any,
+    page_size: int = LeadScoringConfig.PAGE_SIZE,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Leads not lost/won across all users, keyset-paged by id."""
+    last_id: Optional[str] = None
+    while True:
+        query = (
+            supabase.table("leads")
+            .select(LEAD_COLUMNS)
+            .not_.in_("status", INACTIVE_STATUSES)
+        )
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = query.order("id").limit(page_size).execute().data or []
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        last_id = page[-1]["id"]
+
+
+def interaction_counts(supabase: Any, lead_ids: Sequence[str]) -> Dict[str, Tuple[int, int]]:
+    """
+    (interactions, positive outcomes) per lead id.
+
+    Uses the grouped `lead_interaction_counts` RPC; falls back to counting
+    chunked row selects if the migration is not deployed yet.
+    """
+    counts: Dict[str, Tuple[int, int]] = {}
+    try:
+        result = supabase.rpc("lead_interaction_counts", {"p_lead_ids": list(lead_ids)}).execute()
+        for row in result.data or []:
+            counts[str(row["lead_id"])] = (int(row["interactions"] or 0), int(row["positive"] or 0))
+        return counts
+    except Exception as e:
+        logger.warning("lead_interaction_counts RPC failed, counting rows", error=str(e))
+
+    for _, chunk in chunked(list(lead_ids), LeadScoringConfig.FALLBACK_IN_CHUNK):
+        result = (
+            supabase.table("lead_interactions")
+            .select("lead_id, outcome")
+            .in_("lead_id", list(chunk))
+            .execute()
+        )
+        for row in result.data or []:
+            total, positive = counts.get(row["lead_id"], (0, 0))
+            counts[row["lead_id"]] = (total + 1, positive + (row.get("outcome") == "positive"))
+    return counts
+
+
+def apply_scores(supabase: Any, scores: Sequence[Dict[str, Any]]) -> Tuple[int, int]:
+    """Write {id, score} rows in chunks. Returns (updated, failed)."""
+    updated = failed = 0
+    for offset, chunk in chunked(list(scores), LeadScoringConfig.UPDATE_CHUNK):
+        try:
+            result = supabase.rpc("apply_lead_scores", {"p_scores": list(chunk)}).execute()
+            updated += int(result.data or 0)
+        except Exception as e:
+            failed += len(chunk)
+            logger.error("apply_lead_scores failed", offset=offset, rows=len(chunk), error=str(e))
+    return updated, failed
+
+
+# ==================== PIPELINE ====================
+
+def score_page(
+    page: Sequence[Dict[str, Any]],
+    counts: Dict[str, Tuple[int, int]],
+    now: datetime,
+) -> np.ndarray:
+    """New scores for one page of leads, in page order."""
+    statuses = LeadScoringConfig.STATUS_SCORES
+    n = len(page)
+    interactions = np.zeros(n, dtype=int)
+    positive = np.zeros(n, dtype=int)
+    for i, lead in enumerate(page):
+        interactions[i], positive[i] = counts.get(lead["id"], (0, 0))
+
+    return compute_scores(
+        np.fromiter((_days_since(lead.get("last_contact"), now) for lead in page), dtype=float, count=n),
+        interactions,
+        positive,
+        np.fromiter((statuses.get(lead.get("status"), 0) for lead in page), dtype=int, count=n),
+    )
+
+
+def recalculate_lead_scores(
+    supabase: Any = None,
+    now: Optional[datetime] = None,
+    page_size: int = LeadScoringConfig.PAGE_SIZE,
+) -> LeadScoringReport:
+    """
+    Run the scoring pipeline once (sync; call via asyncio.to_thread).
+
+    Returns:
+        LeadScoringReport with counts, phase timings and the newly hot
+        leads ({lead_id, user_id, name, score}) for notification
+    """
+    if supabase is None:
+        from app.supabase_client import get_supabase_client
+        supabase = get_supabase_client()
+    now = now or datetime.now(timezone.utc)
+    started = time.perf_counter()
+    report = LeadScoringReport()
+    hot = LeadScoringConfig.HOT_THRESHOLD
+
+    pages = iter_active_leads(supabase, page_size)
+    while True:
+        t0 = time.perf_counter()
+        page = next(pages, None)
+        t1 = time.perf_counter()
+        report.fetch_ms += (t1 - t0) * 1000
+        if page is None:
+            break
+        report.pages += 1
+        report.leads_scanned += len(page)
+
+        counts = interaction_counts(supabase, [lead["id"] for lead in page])
+        t2 = time.perf_counter()
+
+        new_scores = score_page(page, counts, now)
+        old_scores = np.fromiter((lead.get("score") or 0 for lead in page), dtype=int, count=len(page))
+        changed = np.flatnonzero(new_scores != old_scores)
+        for i in np.flatnonzero((new_scores >= hot) & (old_scores < hot)):
+            lead = page[i]
+            report.hot_leads.append({
+                "lead_id": lead["id"],
+                "user_id": lead["user_id"],
+                "name": lead.get("name"),
+                "score": int(new_scores[i]),
+            })
+        t3 = time.perf_counter()
+
+        if changed.size:
+            updated, failed = apply_scores(
+                supabase, [{"id": page[i]["id"], "score": int(new_scores[i])} for i in changed]
+            )
+            report.updated += updated
+            report.failed += failed
+        t4 = time.perf_counter()
+
+        report.aggregate_ms += (t2 - t1) * 1000
+        report.compute_ms += (t3 - t2) * 1000
+        report.write_ms += (t4 - t3) * 1000
+
+    report.new_hot_leads = len(report.hot_leads)
+    for name in ("fetch_ms", "aggregate_ms", "compute_ms", "write_ms"):
+        setattr(report, name, round(getattr(report, name), 1))
+    report.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+    logger.info("Lead scoring finished", **report.to_dict())
+    return report
+
+
+def group_hot_leads(hot_leads: Sequence[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Newly hot leads per user, highest score first."""
+    by_user: Dict[str, List[Dict[str, Any]]] = {}
+    for lead in hot_leads:
+        if lead.get("user_id"):
+            by_user.setdefault(lead["user_id"], []).append(lead)
+    for leads in by_user.values():
+        leads.sort(key=lambda lead: -lead["score"])
+    return by_user
+
+
+def hot_lead_notification(leads: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """title/body/data for one user's newly hot leads."""
+    if len(leads) == 1:
+        lead = leads[0]
+        return {
+            "title": "🔥 Neuer Hot Lead!",
+            "body": f"{lead['name']} ist jetzt ein Hot Lead (Score: {lead['score']})",
+            "data": {"lead_id": lead["lead_id"], "score": lead["score"]},
+        }
+    names = ", ".join(lead["name"] or "Unbekannt" for lead in leads[:3])
+    more = f" und {len(leads) - 3} weitere" if len(leads) > 3 else ""
+    return {
+        "title": f"🔥 {len(leads)} neue Hot Leads!",
+        "body": f"{names}{more} sind jetzt Hot Leads",
+        "data": {
+            "lead_id": leads[0]["lead_id"],
+            "score": leads[0]["score"],
+            "lead_ids": [lead["lead_id"] for lead in leads],
+        },
+    }
+
+
+__all__ = [
+    "LeadScoringConfig",
+    "LeadScoringReport",
+    "compute_scores",
+    "score_lead",
+    "iter_active_leads",
+    "interaction_counts",
+    "apply_scores",
+    "score_page",
+    "recalculate_lead_scores",
+    "group_hot_leads",
+    "hot_lead_notification",
+]
@@ -0,0 +1,492 @@
+# file: app/services/message_batching.py
+"""
+Message Batching - Gebündelte Generierung von Follow-up-Nachrichten
+
+Statt eines LLM-Calls pro Lead:
+- Leads mit gleichem Template, Step und Sprache bilden eine Gruppe
+- Pro Gruppe (max. GROUP_SIZE Leads) ein strukturierter Call, der N
+  personalisierte Varianten als JSON liefert; der gemeinsame Kontext
+  (Template-Anweisungen, Ton, Regeln) steht nur einmal im Prompt
+- Gruppen laufen parallel, begrenzt durch CONCURRENCY
+- Jede Variante wird einzeln validiert (vorhanden, nicht leer, Länge,
+  keine offenen Platzhalter, kein Name eines anderen Leads der Gruppe);
+  fehlende oder ungültige Varianten laufen über den Einzel-Call
+- Kosten (Token-Schätzung × Modellpreis) und Latenz pro Nachricht werden
+  pro Lauf berichtet (BatchReport, inkl. Schätzung für den Einzel-Call-Pfad)
+  und prozessweit je Generator und Pfad gesammelt (GenerationStats)
+
+Aufrufer (jeweils mit ihrem bisherigen Einzel-Call als Fallback):
+- FollowUpEngine.generate_messages
+- queue_message_generator.generate_queue_messages
+- followup_autopilot.generate_followups_with_confidence
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+
+class MessageBatchingConfig:
+    """Defaults für die gebündelte Generierung."""
+
+    GROUP_SIZE = 10                 # Varianten pro Call
+    CONCURRENCY = 4                 # Gruppen-Calls parallel
+    TOKENS_PER_MESSAGE = 200        # max_tokens-Budget pro Variante
+    MAX_CHARS = 1000                # Längere Varianten gelten als ungültig
+    DEFAULT_MODEL = "gpt-4o-mini"
+    DEFAULT_CONFIDENCE = 70.0       # Wie der Einzel-Call ohne Score
+
+
+BATCHED = "batched"
+SINGLE = "single"
+FAILED = "failed"
+
+# Nicht ersetzte Platzhalter: {name}, {{name}}
+_PLACEHOLDER = re.compile(r"\{\{?\s*[A-Za-z_]+\s*\}?\}")
+_CODE_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+def estimate_tokens(text: str) -> int:
+    """Grobe Heuristik wie ai_client.estimate_token_count (~4 Zeichen pro Token)."""
+    return len(text or "") // 4 + 10
+
+
+def estimate_cost(model: Optional[str], input_tokens: int, output_tokens: int) -> float:
+    """Kosten in USD nach CostTracker.MODEL_COSTS."""
+    from app.ai.cost_tracker import CostTracker
+
+    costs = CostTracker.MODEL_COSTS.get(model or "", CostTracker.MODEL_COSTS[MessageBatchingConfig.DEFAULT_MODEL])
+    return (input_tokens * costs["input"] + output_tokens * costs["output"]) / 1_000_000
+
+
+# ─────────────────────────────────────
+# Datenmodelle
+# ─────────────────────────────────────
+
+@dataclass
+class MessageRequest:
+    """Eine zu generierende Nachricht."""
+
+    key: str                                    # ID beim Aufrufer (lead_id, queue_id)
+    template: str
+    step: str
+    language: str
+    lead: Dict[str, Any]                        # Personalisierung, landet als JSON im Prompt
+    name: str = ""                              # Vorname für die Kreuz-Validierung
+    payload: Any = None                         # Daten des Aufrufers (für den Einzel-Call)
+
+    @property
+    def group_key(self) -> Tuple[str, str, str]:
+        return (self.template, self.step, self.language)
+
+
+@dataclass
+class GeneratedMessage:
+    """Ergebnis pro Nachricht."""
+
+    key: str
+    content: Optional[str]
+    path: str = BATCHED                         # batched | single | failed
+    confidence_score: Optional[float] = None
+    confidence_reason: Optional[str] = None
+    model: Optional[str] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class BatchCall:
+    """Ein strukturierter Call für eine Gruppe."""
+
+    system: str
+    prompt: str
+    max_tokens: int
+    items: List[Dict[str, Any]]                 # {"id": ..., **request.lead}
+    group_key: Tuple[str, str, str]
+
+
+@dataclass
+class PathUsage:
+    """Calls, Nachrichten, Latenz und geschätzte Kosten eines Pfads."""
+
+    calls: int = 0
+    messages: int = 0
+    seconds: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost_usd: float = 0.0
+
+    def add(self, *, messages: int, seconds: float, input_tokens: int, output_tokens: int,
+            model: Optional[str], calls: int = 1) -> None:
+        self.calls += calls
+        self.messages += messages
+        self.seconds += seconds
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        self.cost_usd += estimate_cost(model, input_tokens, output_tokens)
+
+    def to_dict(self) -> Dict[str, Any]:
+        per = max(self.messages, 1)
+        return {
+            "calls": self.calls,
+            "messages": self.messages,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+            "cost_per_message_usd": round(self.cost_usd / per, 6) if self.messages else None,
+            "latency_per_message_seconds": round(self.seconds / per, 3) if self.messages else None,
+        }
+
+
+class GenerationStats:
+    """Prozessweite Summen je Generator und Pfad (batched/single)."""
+
+    def __init__(self) -> None:
+        self._usage: Dict[Tuple[str, str], PathUsage] = {}
+
+    def usage(self, generator: str, path: str) -> PathUsage:
+        return self._usage.setdefault((generator, path), PathUsage())
+
+    def record(self, generator: str, path: str, *, seconds: float, prompt: str, response: str,
+               model: Optional[str], messages: int = 1) -> None:
+        self.usage(generator, path).add(
+            messages=messages,
+            seconds=seconds,
+            input_tokens=estimate_tokens(prompt),
+            output_tokens=estimate_tokens(response),
+            model=model,
+        )
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        result: Dict[str, Dict[str, Any]] = {}
+        for (generator, path), usage in sorted(self._usage.items()):
+            result.setdefault(generator, {})[path] = usage.to_dict()
+        return result
+
+
+_generation_stats: Optional[GenerationStats] = None
+
+
+def get_generation_stats() -> GenerationStats:
+    """Prozessweite Statistik."""
+    global _generation_stats
+    if _generation_stats is None:
+        _generation_stats = GenerationStats()
+    return _generation_stats
+
+
+@dataclass
+class BatchReport:
+    """Ein Lauf: tatsächliche Kosten/Latenz gegenüber dem Einzel-Call-Pfad."""
+
+    generator: str
+    messages: int = 0
+    groups: int = 0
+    invalid: int = 0                            # Varianten, die die Validierung nicht bestanden
+    failed: int = 0                             # Auch im Einzel-Call ohne Ergebnis
+    wall_seconds: float = 0.0
+    batched: PathUsage = field(default_factory=PathUsage)
+    fallback: PathUsage = field(default_factory=PathUsage)
+    single_estimate: PathUsage = field(default_factory=PathUsage)
+
+    def to_dict(self) -> Dict[str, Any]:
+        per = max(self.messages, 1)
+        cost = self.batched.cost_usd + self.fallback.cost_usd
+        return {
+            "generator": self.generator,
+            "messages": self.messages,
+            "groups": self.groups,
+            "calls": self.batched.calls + self.fallback.calls,
+            "invalid": self.invalid,
+            "failed": self.failed,
+            "wall_seconds": round(self.wall_seconds, 3),
+            "cost_per_message_usd": round(cost / per, 6),
+            "latency_per_message_seconds": round(self.wall_seconds / per, 3),
+            "batched": self.batched.to_dict(),
+            "fallback": self.fallback.to_dict(),
+            "single_call_estimate": self.single_estimate.to_dict(),
+        }
+
+
+# ─────────────────────────────────────
+# Generator
+# ─────────────────────────────────────
+
+Complete = Callable[[BatchCall], Awaitable[Union[str, Dict[str, Any]]]]
+Single = Callable[[MessageRequest], Awaitable[GeneratedMessage]]
+
+
+class BatchedMessageGenerator:
+    """
+    Gruppiert Requests, generiert pro Gruppe in einem Call und fällt pro
+    Nachricht auf den Einzel-Call zurück.
+
+    - complete(call): Gruppen-Call, liefert Text (oder {"content", "model"})
+    - single(request): bisheriger Einzel-Call
+    - shared_prompt(request): gemeinsamer Prompt-Teil einer Gruppe
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        complete: Complete,
+        single: Single,
+        shared_prompt: Callable[[MessageRequest], str],
+        system_prompt: str,
+        model: Optional[str] = MessageBatchingConfig.DEFAULT_MODEL,
+        with_confidence: bool = False,
+        group_size: int = MessageBatchingConfig.GROUP_SIZE,
+        concurrency: int = MessageBatchingConfig.CONCURRENCY,
+        stats: Optional[GenerationStats] = None,
+    ) -> None:
+        self.name = name
+        self.complete = complete
+        self.single = single
+        self.shared_prompt = shared_prompt
+        self.system_prompt = system_prompt
+        self.model = model
+        self.with_confidence = with_confidence
+        self.group_size = max(1, group_size)
+        self.concurrency = max(1, concurrency)
+        self.stats = stats or get_generation_stats()
+
+    async def generate(
+        self,
+        requests: Sequence[MessageRequest],
+    ) -> Tuple[Dict[str, GeneratedMessage], BatchReport]:
+        """Nachrichten für alle Requests (Reihenfolge wie requests)."""
+        started = time.monotonic()
+        requests = list({r.key: r for r in requests}.values())
+        report = BatchReport(generator=self.name, messages=len(requests))
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results: Dict[str, GeneratedMessage] = {}
+
+        groups = self._groups(requests)
+        report.groups = len(groups)
+
+        async def run_group(group: List[MessageRequest]) -> None:
+            async with semaphore:
+                results.update(await self._run_group(group, report))
+
+        await asyncio.gather(*(run_group(group) for group in groups))
+
+        async def run_single(request: MessageRequest) -> None:
+            async with semaphore:
+                results[request.key] = await self._run_single(request, report)
+
+        await asyncio.gather(*(run_single(r) for r in requests if r.key not in results))
+
+        report.failed = sum(1 for r in results.values() if r.path == FAILED)
+        report.wall_seconds = time.monotonic() - started
+        self._estimate_single_path(requests, results, report)
+
+        logger.info(f"Message batch {self.name}: {json.dumps(report.to_dict())}")
+        return {r.key: results[r.key] for r in requests}, report
+
+    # ─────────────────────────────────
+    # Gruppen
+    # ─────────────────────────────────
+
+    def _groups(self, requests: List[MessageRequest]) -> List[List[MessageRequest]]:
+        by_key: Dict[Tuple[str, str, str], List[MessageRequest]] = {}
+        for request in requests:
+            by_key.setdefault(request.group_key, []).append(request)
+        return [
+            members[i:i + self.group_size]
+            for members in by_key.values()
+            for i in range(0, len(members), self.group_size)
+        ]
+
+    def batch_prompt(self, group: List[MessageRequest]) -> Tuple[str, List[Dict[str, Any]]]:
+        """Gemeinsamer Teil einmal, danach die Leads als JSON-Liste."""
+        items = [{"id": str(i + 1), **request.lead} for i, request in enumerate(group)]
+        fields = '"id": "<id>", "message": "<Nachricht>"'
+        if self.with_confidence:
+            fields += ', "confidence_score": 0-100, "confidence_reason": "<Warum dieser Score>"'
+
+        prompt = f"""{self.shared_prompt(group[0])}
+
+=== MEHRERE LEADS ===
+Schreibe für JEDEN der {len(group)} folgenden Leads eine eigene, persönliche Nachricht
+(Sprache: {group[0].language}). Die Anweisungen oben gelten für jede einzelne Nachricht.
+Nutze nur die Daten des jeweiligen Leads und erwähne keine anderen Leads.
+
+LEADS:
+{json.dumps(items, ensure_ascii=False, default=str)}
+
+Antworte NUR als JSON:
+{{"messages": [{{{fields}}}]}}
+"""
+        return prompt, items
+
+    async def _run_group(self, group: List[MessageRequest], report: BatchReport) -> Dict[str, GeneratedMessage]:
+        if len(group) == 1:
+            return {}                                   # Einzel-Call ist hier günstiger
+
+        prompt, items = self.batch_prompt(group)
+        call = BatchCall(
+            system=self.system_prompt,
+            prompt=prompt,
+            max_tokens=MessageBatchingConfig.TOKENS_PER_MESSAGE * len(group),
+            items=items,
+            group_key=group[0].group_key,
+        )
+
+        started = time.monotonic()
+        try:
+            raw = await self.complete(call)
+        except Exception as e:
+            logger.warning(f"Batched generation failed for group {call.group_key}: {e}")
+            return {}
+        seconds = time.monotonic() - started
+
+        text, model = (raw.get("content") or "", raw.get("model")) if isinstance(raw, dict) else (raw or "", None)
+        model = model or self.model
+        report.batched.add(
+            messages=len(group),
+            seconds=seconds,
+            input_tokens=estimate_tokens(self.system_prompt) + estimate_tokens(prompt),
+            output_tokens=estimate_tokens(text),
+            model=model,
+        )
+        self.stats.record(self.name, BATCHED, seconds=seconds, prompt=self.system_prompt + prompt,
+                          response=text, model=model, messages=len(group))
+
+        variants = _parse_variants(text)
+        results: Dict[str, GeneratedMessage] = {}
+        for item, request in zip(items, group):
+            message, error = self._validate(variants.get(item["id"]), request, group)
+            if message is None:
+                report.invalid += 1
+                logger.debug(f"Variant for {request.key} rejected: {error}")
+                continue
+            message.model = model
+            results[request.key] = message
+        return results
+
+    async def _run_single(self, request: MessageRequest, report: BatchReport) -> GeneratedMessage:
+        started = time.monotonic()
+        try:
+            result = await self.single(request)
+        except Exception as e:
+            logger.warning(f"Single generation failed for {request.key}: {e}")
+            result = GeneratedMessage(key=request.key, content=None, path=FAILED, error=str(e))
+        seconds = time.monotonic() - started
+
+        report.fallback.add(
+            messages=1,
+            seconds=seconds,
+            input_tokens=self._single_input_tokens(request),
+            output_tokens=estimate_tokens(result.content or ""),
+            model=result.model or self.model,
+        )
+        if not result.content and result.path != FAILED:
+            result.path = FAILED
+        return result
+
+    # ─────────────────────────────────
+    # Validierung
+    # ─────────────────────────────────
+
+    def _validate(
+        self,
+        variant: Optional[Dict[str, Any]],
+        request: MessageRequest,
+        group: List[MessageRequest],
+    ) -> Tuple[Optional[GeneratedMessage], Optional[str]]:
+        if not isinstance(variant, dict):
+            return None, "missing"
+
+        content = variant.get("message")
+        if not isinstance(content, str) or not content.strip():
+            return None, "empty"
+        content = content.strip()
+        if len(content) > MessageBatchingConfig.MAX_CHARS:
+            return None, "too long"
+        if _PLACEHOLDER.search(content):
+            return None, "unresolved placeholder"
+
+        own = request.name.strip().lower()
+        for other in group:
+            name = other.name.strip()
+            if other is request or len(name) < 3 or name.lower() in own:
+                continue
+            if re.search(rf"\b{re.escape(name)}\b", content, re.IGNORECASE):
+                return None, f"mentions other lead {name}"
+
+        message = GeneratedMessage(key=request.key, content=content, path=BATCHED)
+        if self.with_confidence:
+            try:
+                score = float(variant.get("confidence_score", MessageBatchingConfig.DEFAULT_CONFIDENCE))
+            except (TypeError, ValueError):
+                return None, "invalid confidence_score"
+            message.confidence_score = min(max(score, 0.0), 100.0)
+            message.confidence_reason = variant.get("confidence_reason") or "Standard Follow-up"
+        return message, None
+
+    # ─────────────────────────────────
+    # Vergleich mit dem Einzel-Call-Pfad
+    # ─────────────────────────────────
+
+    def _single_input_tokens(self, request: MessageRequest) -> int:
+        lead = json.dumps(request.lead, ensure_ascii=False, default=str)
+        return estimate_tokens(self.system_prompt) + estimate_tokens(self.shared_prompt(request) + lead)
+
+    def _estimate_single_path(
+        self,
+        requests: List[MessageRequest],
+        results: Dict[str, GeneratedMessage],
+        report: BatchReport,
+    ) -> None:
+        """Gleiche Nachrichten über je einen Call: Tokens geschätzt, Latenz aus beobachteten Einzel-Calls."""
+        observed = self.stats.usage(self.name, SINGLE)
+        if report.fallback.messages:
+            per_call = report.fallback.seconds / report.fallback.messages
+        elif observed.messages:
+            per_call = observed.seconds / observed.messages
+        else:
+            per_call = 0.0
+
+        for request in requests:
+            report.single_estimate.add(
+                messages=1,
+                seconds=per_call,                       # Sequenziell wie bisher
+                input_tokens=self._single_input_tokens(request),
+                output_tokens=estimate_tokens(results[request.key].content or ""),
+                model=results[request.key].model or self.model,
+            )
+
+
+def _parse_variants(text: str) -> Dict[str, Dict[str, Any]]:
+    """{"messages": [{"id": ..., ...}]} (oder direkt die Liste) -> id -> Variante."""
+    try:
+        data = json.loads(_CODE_FENCE.sub("", (text or "").strip()))
+    except (TypeError, ValueError):
+        return {}
+    items = data.get("messages") if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return {}
+    return {str(item["id"]): item for item in items if isinstance(item, dict) and "id" in item}
+
+
+__all__ = [
+    "BatchCall",
+    "BatchReport",
+    "BatchedMessageGenerator",
+    "GeneratedMessage",
+    "GenerationStats",
+    "MessageBatchingConfig",
+    "MessageRequest",
+    "PathUsage",
+    "estimate_cost",
+    "estimate_tokens",
+    "get_generation_stats",
+]
@@ -7,12 +7,55 @@ Handles notification creation, queuing, and delivery for background jobs.
 from datetime import datetime
 from typing import Optional
 import logging
-from .firebase import send_push_to_user
+from .firebase import send_push_batch
+from .job_telemetry import record_failure, record_items
 
 logger = logging.getLogger(__name__)
 
+# Users / rows per IN() filter and bulk insert
+BATCH_CHUNK = 200
 
-async def create_notification(
+
+# Notification type -> preference flag
+TYPE_PREFERENCES = {
+    "overdue_followups": "overdue_followups",
+    "hot_lead": "hot_lead_alerts",
+    "churn_risk": "churn_alerts",
+    "goal_ahead": "goal_updates",
+    "goal_behind": "goal_updates",
+    "daily_briefing": "daily_briefing",
+    "power_hour": "power_hour_enabled"
+}
+
+
+def _skip_reason(prefs_data: dict, type: str) -> Optional[str]:
+    """Why a notification of `type` must not be sent with these preferences (None: send)."""
+    pref_key = TYPE_PREFERENCES.get(type)
+    if pref_key and not prefs_data.get(pref_key, True):
+        return "notification_disabled"
+
+    # Daily briefing ignores quiet hours
+    if type == "daily_briefing":
+        return None
+
+    now = datetime.now().time()
+    quiet_start = prefs_data.get("quiet_hours_start", "22:00")
+    quiet_end = prefs_data.get("quiet_hours_end", "07:00")
+
+    if isinstance(quiet_start, str):
+        quiet_start = datetime.strptime(quiet_start, "%H:%M").time()
+    if isinstance(quiet_end, str):
+        quiet_end = datetime.strptime(quiet_end, "%H:%M").time()
+
+    if quiet_start > quiet_end:  # Spans midnight
+        if now >= quiet_start or now <= quiet_end:
+            return "quiet_hours"
+    elif quiet_start <= now <= quiet_end:
+        return "quiet_hours"
+    return None
+
+
+def create_notification(
     db,
     user_id: str,
     type: str,
@@ -22,56 +65,27 @@ async def create_notification(
 ) -> dict:
     """
     Create a notification and send push notification.
+
+    Blocking (sync Supabase client); jobs call it via asyncio.to_thread.
     """
 
     # Check preferences (existing code)
-    prefs = await db.from_("user_notification_preferences").select(
+    prefs = db.from_("user_notification_preferences").select(
         "*"
     ).eq("user_id", user_id).single().execute()
 
     prefs_data = prefs.data or {}
 
-    # Check notification type preference
-    type_mapping = {
-        "overdue_followups": "overdue_followups",
-        "hot_lead": "hot_lead_alerts",
-        "churn_risk": "churn_alerts",
-        "goal_ahead": "goal_updates",
-        "goal_behind": "goal_updates",
-        "daily_briefing": "daily_briefing",
-        "power_hour": "power_hour_enabled"
-    }
-
-    pref_key = type_mapping.get(type)
-    if pref_key and not prefs_data.get(pref_key, True):
+    skip_reason = _skip_reason(prefs_data, type)
+    if skip_reason == "notification_disabled":
         logger.info(f"Notification type {type} disabled for user {user_id}")
-        return {"skipped": True, "reason": "notification_disabled"}
-
-    # Check quiet hours (existing code)
-    now = datetime.now().time()
-    quiet_start = prefs_data.get("quiet_hours_start", "22:00")
-    quiet_end = prefs_data.get("quiet_hours_end", "07:00")
-
-    if isinstance(quiet_start, str):
-        quiet_start = datetime.strptime(quiet_start, "%H:%M").time()
-    if isinstance(quiet_end, str):
-        quiet_end = datetime.strptime(quiet_end, "%H:%M").time()
-
-    in_quiet_hours = False
-    if type != "daily_briefing":
-        if quiet_start > quiet_end:  # Spans midnight
-            if now >= quiet_start or now <= quiet_end:
-                in_quiet_hours = True
-        else:
-            if quiet_start <= now <= quiet_end:
-                in_quiet_hours = True
-
-    if in_quiet_hours:
+        return {"skipped": True, "reason": skip_reason}
+    if skip_reason == "quiet_hours":
         logger.info(f"Quiet hours active for user {user_id}")
-        return {"skipped": True, "reason": "quiet_hours"}
+        return {"skipped": True, "reason": skip_reason}
 
     # Create notification in queue
-    result = await db.from_("notification_queue").insert({
+    result = db.from_("notification_queue").insert({
         "user_id": user_id,
         "type": type,
         "title": title,
@@ -87,21 +101,21 @@ async def create_notification(
     # NEW: Send Push Notification
     # ═══════════════════════════════════════════════════════════
 
-    push_result = await send_push_to_user(
-        db=db,
-        user_id=user_id,
-        title=title,
-        body=body,
-        data={
+    delivered = send_push_batch(db, [{
+        "user_id": user_id,
+        "title": title,
+        "body": body,
+        "data": {
             "notification_id": notification_id,
             "type": type,
             **(data or {})
         }
-    )
+    }])
+    push_result = {"success": delivered.get(user_id, False)}
 
     # Update notification status based on push result
     if push_result.get("success"):
-        await db.from_("notification_queue").update({
+        db.from_("notification_queue").update({
             "status": "sent",
             "sent_at": datetime.now().isoformat()
         }).eq("id", notification_id).execute()
@@ -115,9 +129,72 @@ async def create_notification(
     }
 
 
-async def log_job_start(db, job_name: str) -> str:
-    """Log the start of a background job."""
-    result = await db.from_("background_job_logs").insert({
+def create_notifications_batch(db, type: str, notifications: list) -> dict:
+    """
+    Create and push notifications of one type for many users.
+
+    Same rules as create_notification, but set-based: one preferences
+    query and one queue insert per chunk, pushes via FCM batch sends.
+    Blocking (sync Supabase client); jobs call it via asyncio.to_thread.
+
+    Args:
+        notifications: [{"user_id", "title", "body", "data"}, ...]
+    """
+    if not notifications:
+        return {"created": 0, "skipped": 0, "pushed": 0}
+
+    user_ids = [n["user_id"] for n in notifications]
+    prefs_by_user = {}
+    for i in range(0, len(user_ids), BATCH_CHUNK):
+        prefs = db.from_("user_notification_preferences").select(
+            "*"
+        ).in_("user_id", user_ids[i:i + BATCH_CHUNK]).execute()
+        for row in prefs.data or []:
+            prefs_by_user[row["user_id"]] = row
+
+    allowed = [n for n in notifications if not _skip_reason(prefs_by_user.get(n["user_id"], {}), type)]
+
+    created_at = datetime.now().isoformat()
+    queued = []
+    for i in range(0, len(allowed), BATCH_CHUNK):
+        chunk = allowed[i:i + BATCH_CHUNK]
+        result = db.from_("notification_queue").insert([{
+            "user_id": n["user_id"],
+            "type": type,
+            "title": n["title"],
+            "body": n["body"],
+            "data": n.get("data") or {},
+            "status": "pending",
+            "created_at": created_at
+        } for n in chunk]).execute()
+        ids = {row["user_id"]: row["id"] for row in result.data or []}
+        queued.extend((n, ids.get(n["user_id"])) for n in chunk)
+
+    delivered = send_push_batch(db, [{
+        "user_id": n["user_id"],
+        "title": n["title"],
+        "body": n["body"],
+        "data": {"notification_id": notification_id, "type": type, **(n.get("data") or {})}
+    } for n, notification_id in queued])
+
+    sent_ids = [notification_id for n, notification_id in queued if notification_id and delivered.get(n["user_id"])]
+    for i in range(0, len(sent_ids), BATCH_CHUNK):
+        db.from_("notification_queue").update({
+            "status": "sent",
+            "sent_at": datetime.now().isoformat()
+        }).in_("id", sent_ids[i:i + BATCH_CHUNK]).execute()
+
+    logger.info(f"Notification batch {type}: {len(queued)} created, {len(sent_ids)} pushed")
+    return {
+        "created": len(queued),
+        "skipped": len(notifications) - len(allowed),
+        "pushed": len(sent_ids)
+    }
+
+
+def log_job_start(db, job_name: str) -> str:
+    """Log the start of a background job (blocking, see create_notifications_batch)."""
+    result = db.from_("background_job_logs").insert({
         "job_name": job_name,
         "started_at": datetime.now().isoformat(),
         "status": "running"
@@ -126,15 +203,18 @@ async def log_job_start(db, job_name: str) -> str:
     return result.data[0]["id"] if result.data else None
 
 
-async def log_job_complete(
+def log_job_complete(
     db,
     job_id: str,
     records_processed: int = 0,
     error: str = None,
     metadata: dict = None
 ):
-    """Log the completion of a background job."""
-    await db.from_("background_job_logs").update({
+    """Log the completion of a background job (records count towards job telemetry; blocking)."""
+    record_items(records_processed)
+    if error:
+        record_failure(error)
+    db.from_("background_job_logs").update({
         "completed_at": datetime.now().isoformat(),
         "status": "failed" if error else "completed",
         "records_processed": records_processed,
@@ -143,4 +223,4 @@ async def log_job_complete(
     }).eq("id", job_id).execute()
 
 
-__all__ = ["create_notification", "log_job_start", "log_job_complete"]
+__all__ = ["create_notification", "create_notifications_batch", "log_job_start", "log_job_complete"]
@@ -10,12 +10,16 @@ Version 1.0 - Heuristischer Ansatz
 """
 
 from datetime import datetime, timedelta
-from typing import Optional, Tuple, List, Dict, Any
+from typing import Optional, Tuple, List, Dict, Any, Iterator, Sequence
 from uuid import UUID
 import logging
+import time
 
+import numpy as np
 from supabase import Client
 
+from app.db.bulk import chunked
+
 logger = logging.getLogger(__name__)
 
 
@@ -35,6 +39,16 @@ SCORE_CONFIG = {
     "hot_lead_days": 7,            # Zeitfenster für "heiße" Leads
 }
 
+# Batch-Recalc: Seitengrößen und Write-Chunks
+BATCH_CONFIG = {
+    "lead_page_size": 1000,        # Leads pro Query
+    "event_page_size": 5000,       # Events pro Query
+    "write_chunk": 1000,           # Scores pro apply_p_scores-Aufruf
+}
+
+POSITIVE_STATUSES = ("INTERESTED", "QUALIFIED", "PROPOSAL")
+NEGATIVE_STATUSES = ("GHOSTING", "LOST", "INACTIVE")
+
 
 # ============================================================================
 # CORE SCORING FUNCTIONS
@@ -90,8 +104,13 @@ async def calculate_p_score_for_lead(
         cutoff_14d = (datetime.utcnow() - timedelta(days=SCORE_CONFIG["recent_days"])).isoformat()
         cutoff_7d = (datetime.utcnow() - timedelta(days=SCORE_CONFIG["hot_lead_days"])).isoformat()
         
-        # Events via contact_id oder user_id
-        events_query = db.table("message_events").select("*").gte("created_at", cutoff_14d)
+        # Events dieses Leads (contact_id = lead_id)
+        events_query = (
+            db.table("message_events")
+            .select("direction, created_at")
+            .eq("contact_id", lead_id)
+            .gte("created_at", cutoff_14d)
+        )
         
         # Wenn wir eine user_id haben, filtern wir danach
         if user_id:
@@ -146,7 +165,7 @@ async def calculate_p_score_for_lead(
             factors["penalties"].append(f"Cap bei {SCORE_CONFIG['outbound_only_cap']} (nur outbound)")
         
         # Lead-Stage berücksichtigen (wenn vorhanden)
-        status = lead.get("status", "").upper()
+        status = (lead.get("status") or "").upper()
         if status in ["INTERESTED", "QUALIFIED", "PROPOSAL"]:
             bonus = 15
             score += bonus
@@ -157,7 +176,9 @@ async def calculate_p_score_for_lead(
             factors["penalties"].append(f"-{penalty} für Status {status}")
         
         # Temperatur-Einfluss (manueller Score)
-        temperature = lead.get("temperature", 50)
+        temperature = lead.get("temperature")
+        if temperature is None:
+            temperature = 50
         if temperature >= 80:
             score += 10
             factors["bonuses"].append("+10 für hohe Temperatur")
@@ -189,6 +210,136 @@ async def calculate_p_score_for_lead(
         return 0.0, "flat", {"error": str(e)}
 
 
+# ============================================================================
+# BATCH SCORING
+# ============================================================================
+
+
+def iter_leads(db: Client, user_id: str, limit: int) -> Iterator[List[Dict[str, Any]]]:
+    """Bis zu `limit` Leads des Users, keyset-paginiert nach id."""
+    page_size = BATCH_CONFIG["lead_page_size"]
+    remaining = limit
+    last_id: Optional[str] = None
+    while remaining > 0:
+        query = db.table("leads").select("*").eq("user_id", user_id)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = query.order("id").limit(min(page_size, remaining)).execute().data or []
+        if not page:
+            return
+        yield page
+        remaining -= len(page)
+        if len(page) < page_size:
+            return
+        last_id = page[-1]["id"]
+
+
+def fetch_recent_events(db: Client, user_id: str, since: str) -> List[Dict[str, Any]]:
+    """Alle Message Events des Users seit `since` (einmal pro Recalc, paginiert)."""
+    page_size = BATCH_CONFIG["event_page_size"]
+    events: List[Dict[str, Any]] = []
+    last_id: Optional[str] = None
+    while True:
+        query = (
+            db.table("message_events")
+            .select("id, contact_id, direction, created_at")
+            .eq("user_id", user_id)
+            .gte("created_at", since)
+            .not_.is_("contact_id", "null")
+        )
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = query.order("id").limit(page_size).execute().data or []
+        events.extend(page)
+        if len(page) < page_size:
+            return events
+        last_id = page[-1]["id"]
+
+
+def count_events_by_lead(
+    events: Sequence[Dict[str, Any]],
+    lead_index: Dict[str, int],
+    cutoff_7d: str,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Zählt Events pro Lead (Zeile = Position in `lead_index`).
+
+    Returns:
+        (inbound_7d, inbound_14d, outbound_14d) als int-Arrays
+    """
+    n = len(lead_index)
+    rows = np.fromiter((lead_index.get(e.get("contact_id"), -1) for e in events), dtype=int, count=len(events))
+    inbound = np.fromiter((e.get("direction") == "inbound" for e in events), dtype=bool, count=len(events))
+    outbound = np.fromiter((e.get("direction") == "outbound" for e in events), dtype=bool, count=len(events))
+    recent = np.fromiter((e.get("created_at", "") >= cutoff_7d for e in events), dtype=bool, count=len(events))
+    known = rows >= 0
+
+    def counts(mask: np.ndarray) -> np.ndarray:
+        return np.bincount(rows[known & mask], minlength=n)
+
+    return counts(inbound & recent), counts(inbound), counts(outbound)
+
+
+def compute_p_scores(
+    inbound_7d: np.ndarray,
+    inbound_14d: np.ndarray,
+    outbound_14d: np.ndarray,
+    statuses: Sequence[Optional[str]],
+    temperatures: Sequence[Optional[float]],
+) -> np.ndarray:
+    """P-Scores für viele Leads auf einmal (gleiche Heuristik wie calculate_p_score_for_lead)."""
+    cfg = SCORE_CONFIG
+    score = np.full(len(inbound_14d), float(cfg["base_score"]))
+    score += np.where(inbound_7d >= 1, cfg["inbound_7d_bonus"], 0)
+    score += np.minimum(np.maximum(inbound_14d - 1, 0) * cfg["inbound_per_event"], cfg["max_inbound_bonus"])
+    score = np.where((outbound_14d > 0) & (inbound_14d == 0), np.minimum(score, cfg["outbound_only_cap"]), score)
+
+    status = np.array([(s or "").upper() for s in statuses], dtype=object)
+    score += np.where(np.isin(status, POSITIVE_STATUSES), 15, 0)
+    score -= np.where(np.isin(status, NEGATIVE_STATUSES), 20, 0)
+
+    temperature = np.array([50 if t is None else t for t in temperatures], dtype=float)
+    score += np.where(temperature >= 80, 10, 0)
+    score -= np.where(temperature <= 20, 10, 0)
+
+    return np.clip(score, 0, 100)
+
+
+def compute_trends(new_scores: np.ndarray, old_scores: Sequence[Optional[float]]) -> List[str]:
+    """up/down/flat gegenüber dem bisherigen Score (flat ohne alten Score)."""
+    old = np.array([np.nan if s is None else float(s) for s in old_scores], dtype=float)
+    diff = new_scores - old
+    threshold = SCORE_CONFIG["trend_threshold"]
+    trends = np.where(diff >= threshold, "up", np.where(diff <= -threshold, "down", "flat"))
+    return trends.tolist()
+
+
+def apply_p_scores(db: Client, rows: Sequence[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Schreibt {id, p_score, p_score_trend, last_scored_at} gebündelt.
+
+    Nutzt die RPC `apply_p_scores`; fehlt sie, wird der Chunk zeilenweise
+    geschrieben. Returns: Fehler pro Lead-ID
+    """
+    errors: Dict[str, str] = {}
+    for offset, chunk in chunked(list(rows), BATCH_CONFIG["write_chunk"]):
+        try:
+            db.rpc("apply_p_scores", {"p_scores": list(chunk)}).execute()
+            continue
+        except Exception as e:
+            logger.warning(f"apply_p_scores failed at offset {offset}, updating row by row: {e}")
+        for row in chunk:
+            try:
+                db.table("leads").update({
+                    "p_score": row["p_score"],
+                    "p_score_trend": row["p_score_trend"],
+                    "last_scored_at": row["last_scored_at"],
+                }).eq("id", row["id"]).execute()
+            except Exception as e:
+                errors[row["id"]] = str(e)
+    return errors
+
+
 async def recalc_p_scores_for_user(
     db: Client,
     user_id: str,
@@ -196,6 +347,10 @@ async def recalc_p_scores_for_user(
 ) -> Dict[str, Any]:
     """
     Berechnet P-Scores für bis zu `limit` aktive Leads eines Users neu.
+
+    Batch: Events des Users werden einmal geladen und nach Lead
+    (contact_id) gruppiert, Scores über Arrays berechnet und gebündelt
+    geschrieben.
     
     Args:
         db: Supabase Client
@@ -206,7 +361,7 @@ async def recalc_p_scores_for_user(
         dict: Summary mit Statistiken
     """
     logger.info(f"Recalculating P-Scores for user: {user_id}, limit={limit}")
-    start_time = datetime.utcnow()
+    started = time.perf_counter()
     
     summary = {
         "total_leads": 0,
@@ -218,67 +373,56 @@ async def recalc_p_scores_for_user(
     }
     
     try:
-        # 1. Leads holen (alle, da wir keinen owner_id haben in der einfachen leads-Tabelle)
-        # In einer erweiterten Version würde man hier nach user_id filtern
-        leads_result = (
-            db.table("leads")
-            .select("id, name, status")
-            .limit(limit)
-            .execute()
-        )
-        
-        leads = leads_result.data or []
+        # 1. Leads des Users holen (Events werden auch nur für ihn geladen)
+        leads = [lead for page in iter_leads(db, user_id, limit) for lead in page]
         summary["total_leads"] = len(leads)
         
         if not leads:
             logger.info("No leads found to score")
             return summary
         
-        # 2. Jeden Lead scoren und updaten
-        scores = []
-        now = datetime.utcnow().isoformat()
-        
-        for lead in leads:
-            lead_id = lead["id"]
-            try:
-                score, trend, factors = await calculate_p_score_for_lead(
-                    db=db,
-                    lead_id=lead_id,
-                    user_id=user_id,
-                )
-                
-                # Update in DB
-                db.table("leads").update({
-                    "p_score": score,
-                    "p_score_trend": trend,
-                    "last_scored_at": now,
-                }).eq("id", lead_id).execute()
-                
-                scores.append(score)
-                summary["leads_scored"] += 1
-                
-                # Distribution
-                if score >= 80:
-                    summary["score_distribution"]["hot"] += 1
-                elif score >= 50:
-                    summary["score_distribution"]["warm"] += 1
-                else:
-                    summary["score_distribution"]["cold"] += 1
-                    
-            except Exception as e:
-                error_msg = f"Lead {lead_id}: {str(e)}"
-                summary["errors"].append(error_msg)
-                logger.error(error_msg)
-        
-        # 3. Statistiken berechnen
-        if scores:
-            summary["avg_score"] = round(sum(scores) / len(scores), 2)
-        
-        duration = datetime.utcnow() - start_time
-        summary["duration_ms"] = int(duration.total_seconds() * 1000)
+        # 2. Events einmal laden und pro Lead zählen
+        now = datetime.utcnow()
+        cutoff_14d = (now - timedelta(days=SCORE_CONFIG["recent_days"])).isoformat()
+        cutoff_7d = (now - timedelta(days=SCORE_CONFIG["hot_lead_days"])).isoformat()
+        events = fetch_recent_events(db, user_id, cutoff_14d)
+        inbound_7d, inbound_14d, outbound_14d = count_events_by_lead(
+            events, {lead["id"]: i for i, lead in enumerate(leads)}, cutoff_7d
+        )
+
+        # 3. Scores + Trends für alle Leads
+        scores = compute_p_scores(
+            inbound_7d,
+            inbound_14d,
+            outbound_14d,
+            [lead.get("status") for lead in leads],
+            [lead.get("temperature") for lead in leads],
+        )
+        trends = compute_trends(scores, [lead.get("p_score") for lead in leads])
+
+        # 4. Gebündelt schreiben
+        scored_at = now.isoformat()
+        errors = apply_p_scores(db, [
+            {"id": lead["id"], "p_score": float(score), "p_score_trend": trend, "last_scored_at": scored_at}
+            for lead, score, trend in zip(leads, scores, trends)
+        ])
+        summary["errors"].extend(f"Lead {lead_id}: {error}" for lead_id, error in errors.items())
+
+        ok = np.array([lead["id"] not in errors for lead in leads], dtype=bool)
+        written = scores[ok]
+        summary["leads_scored"] = int(written.size)
+        summary["score_distribution"] = {
+            "hot": int((written >= 80).sum()),
+            "warm": int(((written >= 50) & (written < 80)).sum()),
+            "cold": int((written < 50).sum()),
+        }
+        if written.size:
+            summary["avg_score"] = round(float(written.mean()), 2)
+        
+        summary["duration_ms"] = int((time.perf_counter() - started) * 1000)
         
         logger.info(
-            f"P-Score recalc complete: scored={summary['leads_scored']}, "
+            f"P-Score recalc complete: scored={summary['leads_scored']}, events={len(events)}, "
             f"avg={summary['avg_score']}, duration={summary['duration_ms']}ms"
         )
         
@@ -334,6 +478,8 @@ __all__ = [
     "calculate_p_score_for_lead",
     "recalc_p_scores_for_user",
     "get_hot_leads",
+    "compute_p_scores",
+    "count_events_by_lead",
     "SCORE_CONFIG",
 ]
 
@@ -6,9 +6,27 @@ High-Level AI-powered message generation for follow-up sequences
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 import logging
+import time
+
+from app.db.bulk import chunked
+from app.services.message_batching import (
+    BATCHED,
+    SINGLE,
+    BatchCall,
+    BatchedMessageGenerator,
+    GeneratedMessage,
+    MessageRequest,
+    get_generation_stats,
+)
 
 logger = logging.getLogger(__name__)
 
+SYSTEM_PROMPT = "Du bist CHIEF, ein Elite-Sales-Coach. Du schreibst Nachrichten die natürlich klingen und konvertieren."
+IN_CHUNK = 200      # IDs pro IN()-Filter
+HISTORY_PER_LEAD = 5        # Letzte Aktivitäten pro Lead im Prompt
+HISTORY_PAGE_SIZE = 500     # lead_activities-Zeilen pro Seite
+HISTORY_MAX_PAGES = 4       # Obergrenze pro Chunk (sehr aktive Leads)
+
 # Psychologie pro State - was der Lead denkt/fühlt
 STATE_PSYCHOLOGY = {
     "new": {
@@ -295,26 +313,8 @@ TEMPLATE_PROMPTS = {
 }
 
 
-def build_queue_message_prompt(
-    lead: Dict[str, Any],
-    template_key: str,
-    state: str,
-    user_patterns: List[Dict[str, Any]] = None,
-    interaction_history: List[Dict[str, Any]] = None,
-) -> str:
-    """
-    Baut einen hochoptimierten Prompt für die Nachrichtengenerierung.
-    """
-    
-    # State Psychology
-    psychology = STATE_PSYCHOLOGY.get(state, STATE_PSYCHOLOGY["new"])
-    
-    # Template Info
-    template = TEMPLATE_PROMPTS.get(template_key, {})
-    
-    # Lead Kontext aufbauen
-    lead_name = lead.get("name", "").split()[0] if lead.get("name") else "du"
-    lead_context = f"""
+def _lead_context(lead: Dict[str, Any]) -> str:
+    return f"""
 LEAD INFORMATIONEN:
 - Name: {lead.get('name', 'Unbekannt')}
 - Quelle: {lead.get('source', lead.get('instagram', 'Unbekannt'))}
@@ -324,24 +324,30 @@ LEAD INFORMATIONEN:
 - Notizen: {lead.get('notes', 'Keine')}
 """
 
-    # Interaktions-History
+
+def _history_context(interaction_history: Optional[List[Dict[str, Any]]]) -> str:
     history_context = ""
     if interaction_history:
         history_context = "\nLETZTE INTERAKTIONEN:\n"
         for interaction in interaction_history[-5:]:  # Letzte 5
             history_context += f"- {interaction.get('type', 'Kontakt')}: {interaction.get('notes', '')[:100]}\n"
-    
-    # User Patterns (gelernte Präferenzen)
+    return history_context
+
+
+def _pattern_context(user_patterns: Optional[List[Dict[str, Any]]]) -> str:
     pattern_context = ""
     if user_patterns:
         pattern_context = "\nGELERNTE USER-PRÄFERENZEN:\n"
         for pattern in user_patterns:
             pattern_context += f"- {pattern.get('instruction', '')}\n"
-    
-    # Template-spezifische Anweisungen
-    template_instructions = ""
-    if template:
-        template_instructions = f"""
+    return pattern_context
+
+
+def _template_instructions(template_key: str) -> str:
+    template = TEMPLATE_PROMPTS.get(template_key, {})
+    if not template:
+        return ""
+    return f"""
 TEMPLATE: {template_key}
 INTENT: {template.get('intent', '')}
 
@@ -354,8 +360,10 @@ MÖGLICHE ANSÄTZE:
 LÄNGE: {template.get('max_length', '2-3 Sätze')}
 """
 
-    # Haupt-Prompt
-    prompt = f"""Du bist CHIEF, ein Elite-Sales-Coach der Nachrichten schreibt die wirklich konvertieren.
+
+def _psychology_header(state: str) -> str:
+    psychology = STATE_PSYCHOLOGY.get(state, STATE_PSYCHOLOGY["new"])
+    return f"""Du bist CHIEF, ein Elite-Sales-Coach der Nachrichten schreibt die wirklich konvertieren.
 
 === PSYCHOLOGIE FÜR "{state.upper()}" STATE ===
 Mindset des Leads: {psychology['mindset']}
@@ -363,15 +371,10 @@ Dein Ziel: {psychology['goal']}
 Ton: {psychology['tone']}
 VERMEIDE: {psychology['avoid']}
 Erfolgsmessung: {psychology['success_metric']}
+"""
 
-{lead_context}
-{history_context}
-{pattern_context}
-{template_instructions}
 
-=== DEINE AUFGABE ===
-Schreibe eine Nachricht für {lead_name} die:
-1. Sich NATÜRLICH anfühlt (kein Bot, kein Template)
+MESSAGE_RULES = """1. Sich NATÜRLICH anfühlt (kein Bot, kein Template)
 2. IHRE Situation/Interessen anspricht
 3. Den nächsten logischen Schritt ermöglicht
 4. Emojis nutzt aber dezent (1-2 max)
@@ -380,7 +383,31 @@ WICHTIG:
 - Schreibe wie ein echter Mensch, nicht wie ein Verkäufer
 - Kurz und prägnant - Respektiere ihre Zeit
 - Personalisiere basierend auf dem was du weißt
-- Keine "Ich hoffe es geht dir gut" Floskeln
+- Keine "Ich hoffe es geht dir gut" Floskeln"""
+
+
+def build_queue_message_prompt(
+    lead: Dict[str, Any],
+    template_key: str,
+    state: str,
+    user_patterns: List[Dict[str, Any]] = None,
+    interaction_history: List[Dict[str, Any]] = None,
+) -> str:
+    """
+    Baut einen hochoptimierten Prompt für die Nachrichtengenerierung.
+    """
+    lead_name = lead.get("name", "").split()[0] if lead.get("name") else "du"
+
+    # Haupt-Prompt
+    prompt = f"""{_psychology_header(state)}
+{_lead_context(lead)}
+{_history_context(interaction_history)}
+{_pattern_context(user_patterns)}
+{_template_instructions(template_key)}
+
+=== DEINE AUFGABE ===
+Schreibe eine Nachricht für {lead_name} die:
+{MESSAGE_RULES}
 - Antworte NUR mit der Nachricht, keine Erklärungen
 
 NACHRICHT:"""
@@ -388,6 +415,24 @@ NACHRICHT:"""
     return prompt
 
 
+def build_queue_batch_prompt(
+    template_key: str,
+    state: str,
+    user_patterns: List[Dict[str, Any]] = None,
+) -> str:
+    """
+    Gemeinsamer Prompt-Teil für mehrere Leads mit gleichem Template und
+    State (Lead-Daten folgen als JSON, siehe message_batching.py).
+    """
+    return f"""{_psychology_header(state)}
+{_pattern_context(user_patterns)}
+{_template_instructions(template_key)}
+
+=== DEINE AUFGABE ===
+Schreibe pro Lead eine Nachricht die:
+{MESSAGE_RULES}"""
+
+
 async def generate_queue_message(
     db,
     queue_id: str,
@@ -465,12 +510,21 @@ async def generate_queue_message(
         )
         
         # 6. AI generieren
+        started = time.monotonic()
         message = await ai_client.generate_async(
-            system_prompt="Du bist CHIEF, ein Elite-Sales-Coach. Du schreibst Nachrichten die natürlich klingen und konvertieren.",
+            system_prompt=SYSTEM_PROMPT,
             messages=[{"role": "user", "content": prompt}],
         )
         
         generated_message = message.strip()
+        get_generation_stats().record(
+            "queue_message",
+            SINGLE,
+            seconds=time.monotonic() - started,
+            prompt=SYSTEM_PROMPT + prompt,
+            response=generated_message,
+            model=getattr(ai_client, "model", None),
+        )
         
         # 7. In DB speichern
         db.table("contact_follow_up_queue")\
@@ -491,3 +545,156 @@ async def generate_queue_message(
         logger.error(f"Error generating queue message: {e}")
         return {"success": False, "error": str(e)}
 
+
+async def generate_queue_messages(
+    db,
+    queue_ids: List[str],
+    user_id: str,
+    ai_client,
+) -> Dict[str, Any]:
+    """
+    Generiert Nachrichten für mehrere Queue Items und speichert sie.
+    
+    Queue Items, Leads, Patterns und History werden gesammelt geladen;
+    Items mit gleichem Template, State und Sprache teilen sich einen
+    AI-Call (siehe message_batching.py). Ungültige Varianten laufen
+    über generate_queue_message.
+    """
+    
+    try:
+        # 1. Queue Items mit Cycle laden
+        queue_items: List[Dict[str, Any]] = []
+        for _, chunk in chunked(list(dict.fromkeys(queue_ids)), IN_CHUNK):
+            result = db.table("contact_follow_up_queue")\
+                .select("*, follow_up_cycles(*)")\
+                .in_("id", list(chunk))\
+                .eq("user_id", user_id)\
+                .execute()
+            queue_items.extend(result.data or [])
+        
+        # 2. Leads gesammelt laden
+        leads: Dict[str, Dict[str, Any]] = {}
+        contact_ids = sorted({item["contact_id"] for item in queue_items if item.get("contact_id")})
+        for _, chunk in chunked(contact_ids, IN_CHUNK):
+            result = db.table("leads")\
+                .select("*")\
+                .in_("id", list(chunk))\
+                .eq("user_id", user_id)\
+                .execute()
+            leads.update({lead["id"]: lead for lead in result.data or []})
+        
+        # 3. User Patterns einmal pro User
+        patterns = []
+        try:
+            patterns_result = db.table("chief_learned_patterns")\
+                .select("*")\
+                .eq("user_id", user_id)\
+                .eq("pattern_type", "auto_apply")\
+                .execute()
+            patterns = patterns_result.data or []
+        except Exception:
+            pass
+        
+        # 4. Interaktions-History (letzte 5 pro Lead), seitenweise bis alle Leads voll sind
+        history: Dict[str, List[Dict[str, Any]]] = {}
+        try:
+            for _, chunk in chunked(list(leads), IN_CHUNK):
+                open_leads = set(chunk)
+                for page in range(HISTORY_MAX_PAGES):
+                    start = page * HISTORY_PAGE_SIZE
+                    rows = db.table("lead_activities")\
+                        .select("lead_id, type, notes, created_at")\
+                        .in_("lead_id", list(chunk))\
+                        .order("created_at", desc=True)\
+                        .range(start, start + HISTORY_PAGE_SIZE - 1)\
+                        .execute().data or []
+                    for row in rows:
+                        activities = history.setdefault(row.get("lead_id"), [])
+                        if len(activities) < HISTORY_PER_LEAD:
+                            activities.append(row)
+                        if len(activities) >= HISTORY_PER_LEAD:
+                            open_leads.discard(row.get("lead_id"))
+                    if len(rows) < HISTORY_PAGE_SIZE or not open_leads:
+                        break
+        except Exception:
+            pass
+        
+        # 5. Requests: gleiche Template/State/Sprache landen in einer Gruppe
+        requests: List[MessageRequest] = []
+        for item in queue_items:
+            lead = leads.get(item.get("contact_id"))
+            if not lead:
+                continue
+            template_key = (item.get("follow_up_cycles") or {}).get("template_key", "mlm_first_contact")
+            state = item.get("current_state", "new")
+            lead_info = {
+                key: lead.get(key)
+                for key in ("name", "source", "company", "position", "instagram", "notes")
+                if lead.get(key)
+            }
+            lead_info["interaktionen"] = [
+                f"{a.get('type', 'Kontakt')}: {(a.get('notes') or '')[:100]}"
+                for a in history.get(lead.get("id"), [])
+            ]
+            requests.append(MessageRequest(
+                key=item["id"],
+                template=str(template_key),
+                step=str(state),
+                language=lead.get("language") or "de",
+                lead=lead_info,
+                name=(lead.get("name") or "").split(" ")[0],
+                payload=(item, lead, template_key, state),
+            ))
+        
+        async def complete(call: BatchCall) -> str:
+            return await ai_client.generate_async(
+                system_prompt=call.system,
+                messages=[{"role": "user", "content": call.prompt}],
+                max_tokens=call.max_tokens,
+            )
+        
+        async def single(request: MessageRequest) -> GeneratedMessage:
+            result = await generate_queue_message(db, request.key, user_id, ai_client)
+            return GeneratedMessage(
+                key=request.key,
+                content=result.get("message") if result.get("success") else None,
+                path=SINGLE,
+                error=result.get("error"),
+            )
+        
+        generator = BatchedMessageGenerator(
+            "queue_message",
+            complete=complete,
+            single=single,
+            shared_prompt=lambda r: build_queue_batch_prompt(r.payload[2], r.payload[3], patterns),
+            system_prompt=SYSTEM_PROMPT,
+            model=getattr(ai_client, "model", None) or "gpt-4o-mini",
+        )
+        generated, report = await generator.generate(requests)
+        
+        # 6. Gebündelt generierte Nachrichten speichern (Einzel-Calls speichern selbst)
+        results = []
+        for request in requests:
+            item, lead, template_key, state = request.payload
+            message = generated[request.key]
+            if message.path == BATCHED:
+                db.table("contact_follow_up_queue")\
+                    .update({"ai_generated_content": message.content})\
+                    .eq("id", request.key)\
+                    .execute()
+            results.append({
+                "success": bool(message.content),
+                "message": message.content,
+                "queue_id": request.key,
+                "template_key": template_key,
+                "state": state,
+                "lead_name": lead.get("name"),
+                "batched": message.path == BATCHED,
+                **({"error": message.error} if message.error else {}),
+            })
+        
+        return {"success": True, "results": results, "report": report.to_dict()}
+        
+    except Exception as e:
+        logger.error(f"Error generating queue messages: {e}")
+        return {"success": False, "error": str(e)}
@@ -3,6 +3,12 @@ Background Services Scheduler
 
 APScheduler-based background job scheduler for SalesFlow AI.
 Handles proactive notifications and automated tasks.
+
+Every replica schedules all jobs; `coordinated()` (job_coordinator.py)
+lets exactly one replica run each job, or one per slot for sharded jobs;
+IntervalTrigger jobs pass their interval so the lock covers the period.
+`instrumented()` (job_telemetry.py) records each run for /api/ops/jobs and
+Prometheus.
 """
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
@@ -15,6 +21,11 @@ logger = logging.getLogger(__name__)
 # Global scheduler instance
 scheduler = AsyncIOScheduler()
 
+# Job intervals in seconds (telemetry alerts when a run takes longer)
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
 
 def setup_scheduler():
     """Setup and start the background job scheduler."""
@@ -29,10 +40,13 @@ def setup_scheduler():
     )
     from .jobs import generate_all_suggestions  # optional background Follow-up Generator
     from .followup_autopilot import run_autopilot_for_all_users
+    from .cache_warming import CacheWarmingConfig, warm_caches
+    from .job_coordinator import JobCoordinatorConfig, coordinated, coordinator_heartbeat
+    from .job_telemetry import instrumented
 
     # FollowUp Checker - every 4 hours
     scheduler.add_job(
-        check_follow_ups,
+        coordinated("check_follow_ups", instrumented("check_follow_ups", check_follow_ups, 4 * HOUR), interval=4 * HOUR),
         IntervalTrigger(hours=4),
         id="check_follow_ups",
         name="Check Follow-ups",
@@ -41,7 +55,7 @@ def setup_scheduler():
 
     # Lead Scorer - daily at 6:00
     scheduler.add_job(
-        update_lead_scores,
+        coordinated("update_lead_scores", instrumented("update_lead_scores", update_lead_scores, DAY)),
         CronTrigger(hour=6, minute=0),
         id="update_lead_scores",
         name="Update Lead Scores",
@@ -50,7 +64,7 @@ def setup_scheduler():
 
     # Churn Detector - daily at 7:00
     scheduler.add_job(
-        detect_churn_risks,
+        coordinated("detect_churn_risks", instrumented("detect_churn_risks", detect_churn_risks, DAY)),
         CronTrigger(hour=7, minute=0),
         id="detect_churn_risks",
         name="Detect Churn Risks",
@@ -59,17 +73,17 @@ def setup_scheduler():
 
     # Goal Tracker - daily at 8:00
     scheduler.add_job(
-        track_goals,
+        coordinated("track_goals", instrumented("track_goals", track_goals, DAY)),
         CronTrigger(hour=8, minute=0),
         id="track_goals",
         name="Track Goals",
         replace_existing=True
     )
 
-    # Daily Briefing - daily at 7:30
+    # Daily Briefing - every 15 minutes, users get it at 7:30-8:00 in their own timezone
     scheduler.add_job(
-        send_daily_briefing,
-        CronTrigger(hour=7, minute=30),
+        coordinated("send_daily_briefing", instrumented("send_daily_briefing", send_daily_briefing, 15 * MINUTE)),
+        CronTrigger(minute="*/15"),
         id="send_daily_briefing",
         name="Send Daily Briefing",
         replace_existing=True
@@ -77,7 +91,7 @@ def setup_scheduler():
 
     # Power Hour Reminder - at 9:50 and 14:50
     scheduler.add_job(
-        power_hour_reminder,
+        coordinated("power_hour_reminder_morning", instrumented("power_hour_reminder_morning", power_hour_reminder, DAY)),
         CronTrigger(hour=9, minute=50),
         id="power_hour_reminder_morning",
         name="Power Hour Reminder (Morning)",
@@ -85,7 +99,7 @@ def setup_scheduler():
     )
 
     scheduler.add_job(
-        power_hour_reminder,
+        coordinated("power_hour_reminder_afternoon", instrumented("power_hour_reminder_afternoon", power_hour_reminder, DAY)),
         CronTrigger(hour=14, minute=50),
         id="power_hour_reminder_afternoon",
         name="Power Hour Reminder (Afternoon)",
@@ -94,7 +108,7 @@ def setup_scheduler():
 
     # Follow-up Suggestions Generator - every 15 minutes
     scheduler.add_job(
-        generate_all_suggestions,
+        coordinated("generate_all_suggestions", instrumented("generate_all_suggestions", generate_all_suggestions, 15 * MINUTE), interval=15 * MINUTE),
         IntervalTrigger(minutes=15),
         id="generate_all_suggestions",
         name="Generate Follow-up Suggestions",
@@ -103,13 +117,31 @@ def setup_scheduler():
 
     # Autopilot Follow-up Processor - every 15 minutes
     scheduler.add_job(
-        run_autopilot_for_all_users,
+        coordinated("run_autopilot_followups", instrumented("run_autopilot_followups", run_autopilot_for_all_users, 15 * MINUTE), sharded=True, interval=15 * MINUTE),
         IntervalTrigger(minutes=15),
         id="run_autopilot_followups",
         name="Process Autopilot Follow-ups",
         replace_existing=True
     )
 
+    # Cache Warming - every 10 minutes, warms users ahead of their expected login
+    scheduler.add_job(
+        coordinated("warm_caches", instrumented("warm_caches", warm_caches, CacheWarmingConfig.INTERVAL_MINUTES * MINUTE), interval=CacheWarmingConfig.INTERVAL_MINUTES * MINUTE),
+        IntervalTrigger(minutes=CacheWarmingConfig.INTERVAL_MINUTES),
+        id="warm_caches",
+        name="Warm Caches Before Login",
+        replace_existing=True
+    )
+
+    # Replica heartbeat - keeps this instance in the shard ring (runs on every replica)
+    scheduler.add_job(
+        coordinator_heartbeat,
+        IntervalTrigger(seconds=JobCoordinatorConfig.HEARTBEAT_SECONDS),
+        id="job_coordinator_heartbeat",
+        name="Job Coordinator Heartbeat",
+        replace_existing=True
+    )
+
     scheduler.start()
     logger.info("Background scheduler started")
 
@@ -22,9 +22,11 @@ async def run_sequence_cron(db) -> dict:
         stats["errors"].append(str(exc))
         return stats
 
+    # One engine for the whole run: compiled flow and step templates are shared
+    engine = SequenceEngine(db)
+
     for user in users:
         user_id = user.get("id")
-        engine = SequenceEngine(db)
 
         # Process due follow-ups
         try:
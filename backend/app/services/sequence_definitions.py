@@ -0,0 +1,322 @@
+# file: app/services/sequence_definitions.py
+"""
+Sequence Definitions - Kompilierte Sequenzen mit In-Memory-Cache
+
+Sequenzen werden einmal pro Version in eine unveränderliche
+State-Machine übersetzt (sortierte Steps, Delays, Conditions als
+Prädikate) statt bei jeder Bewertung neu interpretiert zu werden:
+
+- FollowUpEngine: FollowUpSequence-Modelle (Repository)
+- routers/sequences.py: Tabellen follow_up_sequences + sequence_steps
+- SequenceEngine / sequence_cron: STATUS_FLOW und Templates pro Status
+  aus follow_up_sequence_steps
+
+Der Cache ist pro Prozess; Einträge gelten bis zur Invalidierung
+(Sequenz angelegt/gelöscht über routers/sequences.py), einer neuen
+Version (updated_at) oder dem TTL-Ablauf (Änderungen auf anderen Replicas).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from app.models.followup import FollowUpCondition, FollowUpSequence
+
+Interactions = List[Dict[str, Any]]
+Predicate = Callable[[Interactions], bool]
+
+
+class SequenceDefinitionConfig:
+    """Cache-Defaults."""
+
+    TTL_SECONDS = 300           # Sicherheitsnetz für Änderungen auf anderen Replicas
+    IN_CHUNK = 200              # Sequenz-IDs pro IN()-Filter
+
+
+# ─────────────────────────────────────
+# Conditions als Prädikate
+# ─────────────────────────────────────
+
+def _last_type(interactions: Interactions) -> str:
+    return interactions[0].get("type", "") if interactions else ""
+
+
+def _no_reply(interactions: Interactions) -> bool:
+    return not _last_type(interactions).startswith("reply_")
+
+
+def _replied(kind: str) -> Predicate:
+    return lambda interactions: bool(interactions) and _last_type(interactions) == kind
+
+
+def _always(interactions: Interactions) -> bool:
+    return True
+
+
+def _any_interaction(interactions: Interactions) -> bool:
+    return bool(interactions)
+
+
+# Interaktionen: neueste zuerst
+CONDITION_PREDICATES: Mapping[FollowUpCondition, Predicate] = MappingProxyType({
+    FollowUpCondition.ALWAYS: _always,
+    FollowUpCondition.NO_REPLY: _no_reply,
+    FollowUpCondition.REPLIED_POSITIVE: _replied("reply_positive"),
+    FollowUpCondition.REPLIED_NEGATIVE: _replied("reply_negative"),
+})
+
+
+def condition_predicate(condition: Optional[FollowUpCondition]) -> Predicate:
+    """Prädikat für eine Step-Condition (unbekannte: erfüllt, sobald es Interaktionen gibt)."""
+    if condition is None:
+        return _always
+    return CONDITION_PREDICATES.get(condition, _any_interaction)
+
+
+# ─────────────────────────────────────
+# Kompilierte Sequenzen
+# ─────────────────────────────────────
+
+@dataclass(frozen=True)
+class CompiledStep:
+    """Ein Step mit fertig aufgelöstem Delay und Condition."""
+
+    number: int                         # Position ab 1 (sequence_steps.step_number)
+    delay: timedelta
+    channel: Optional[str]
+    template: Optional[str]
+    subject: Optional[str]
+    condition: Predicate
+    source: Any = None                  # FollowUpStep bzw. sequence_steps-Zeile
+
+
+@dataclass(frozen=True)
+class CompiledSequence:
+    """Unveränderliche State-Machine einer Sequenz-Version."""
+
+    id: str
+    version: str
+    name: Optional[str]
+    steps: Tuple[CompiledStep, ...]
+    by_number: Mapping[int, CompiledStep] = field(default_factory=lambda: MappingProxyType({}))
+    source: Any = None                  # FollowUpSequence bzw. follow_up_sequences-Zeile
+
+    @property
+    def total_steps(self) -> int:
+        return len(self.steps)
+
+    def step(self, number: int) -> Optional[CompiledStep]:
+        """Step nach Nummer (ab 1)."""
+        return self.by_number.get(number)
+
+    def after(self, index: Optional[int]) -> Optional[CompiledStep]:
+        """Nächster Step nach dem 0-basierten Index (None: erster Step)."""
+        position = 0 if index is None else index + 1
+        return self.steps[position] if position < len(self.steps) else None
+
+
+def _compiled(id: str, version: str, name: Optional[str], steps: Iterable[CompiledStep], source: Any) -> CompiledSequence:
+    steps = tuple(steps)
+    return CompiledSequence(
+        id=id,
+        version=version,
+        name=name,
+        steps=steps,
+        by_number=MappingProxyType({step.number: step for step in steps}),
+        source=source,
+    )
+
+
+def compile_followup_sequence(sequence: FollowUpSequence) -> CompiledSequence:
+    """FollowUpSequence (Engine-Modell) kompilieren; Reihenfolge nach (day_offset, order_index)."""
+    ordered = sorted(sequence.steps, key=lambda s: (s.day_offset, s.order_index))
+    return _compiled(
+        id=str(sequence.id),
+        version=sequence.updated_at.isoformat(),
+        name=sequence.name,
+        steps=(
+            CompiledStep(
+                number=i + 1,
+                delay=timedelta(days=step.day_offset),
+                channel=step.channel.value if step.channel else None,
+                template=step.template_key,
+                subject=None,
+                condition=condition_predicate(step.condition),
+                source=step,
+            )
+            for i, step in enumerate(ordered)
+        ),
+        source=sequence,
+    )
+
+
+def compile_sequence_row(row: Dict[str, Any]) -> CompiledSequence:
+    """follow_up_sequences-Zeile inkl. sequence_steps(*) kompilieren."""
+    steps = sorted(row.get("sequence_steps") or [], key=lambda s: s.get("step_number") or 0)
+    return _compiled(
+        id=str(row["id"]),
+        version=str(row.get("updated_at") or row.get("created_at") or ""),
+        name=row.get("name"),
+        steps=(
+            CompiledStep(
+                number=step.get("step_number") or 0,
+                delay=timedelta(days=step.get("delay_days") or 0),
+                channel=step.get("channel"),
+                template=step.get("message_template"),
+                subject=step.get("subject"),
+                condition=_always,
+                source=step,
+            )
+            for step in steps
+        ),
+        source=row,
+    )
+
+
+@dataclass(frozen=True)
+class StatusTransition:
+    """Ein Übergang der Status-Sequenz (SequenceEngine.STATUS_FLOW)."""
+
+    status: str
+    next: Optional[str]
+    action: Optional[str]
+    wait: timedelta
+
+
+def compile_status_flow(flow: Mapping[str, Mapping[str, Any]]) -> Mapping[str, StatusTransition]:
+    """STATUS_FLOW-Dict in unveränderliche Übergänge übersetzen."""
+    return MappingProxyType({
+        status: StatusTransition(
+            status=status,
+            next=rule.get("next"),
+            action=rule.get("action"),
+            wait=timedelta(days=rule.get("wait_days", 0)),
+        )
+        for status, rule in flow.items()
+    })
+
+
+# ─────────────────────────────────────
+# Cache
+# ─────────────────────────────────────
+
+class SequenceDefinitionCache:
+    """
+    Kompilierte Sequenzen pro ID (+ Version), thread-safe (Cron-Pfade
+    laufen teils in Worker-Threads).
+    """
+
+    def __init__(self, ttl_seconds: float = SequenceDefinitionConfig.TTL_SECONDS) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, Tuple[float, CompiledSequence]] = {}
+        self._status_templates: Optional[Tuple[float, Mapping[str, Dict[str, Any]]]] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self, stored_at: float) -> bool:
+        return time.monotonic() - stored_at < self.ttl_seconds
+
+    def get(self, sequence_id: Any, version: Optional[str] = None) -> Optional[CompiledSequence]:
+        """Gecachte Sequenz (None bei Miss, abgelaufen oder anderer Version)."""
+        with self._lock:
+            entry = self._entries.get(str(sequence_id))
+            if entry and self._fresh(entry[0]) and (version is None or entry[1].version == version):
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, compiled: CompiledSequence) -> CompiledSequence:
+        with self._lock:
+            self._entries[compiled.id] = (time.monotonic(), compiled)
+        return compiled
+
+    def compile(self, sequence: FollowUpSequence) -> CompiledSequence:
+        """Kompilierte Version eines Engine-Modells (neu kompiliert bei neuer Version)."""
+        cached = self.get(sequence.id, sequence.updated_at.isoformat())
+        return cached or self.put(compile_followup_sequence(sequence))
+
+    def load(self, supabase: Any, sequence_ids: Iterable[Any]) -> Dict[str, CompiledSequence]:
+        """DB-Sequenzen (follow_up_sequences + sequence_steps); fehlende mit einer Query pro Chunk."""
+        result: Dict[str, CompiledSequence] = {}
+        missing: List[str] = []
+        for sequence_id in dict.fromkeys(str(s) for s in sequence_ids):
+            cached = self.get(sequence_id)
+            if cached:
+                result[sequence_id] = cached
+            else:
+                missing.append(sequence_id)
+
+        for i in range(0, len(missing), SequenceDefinitionConfig.IN_CHUNK):
+            rows = (
+                supabase.table("follow_up_sequences")
+                .select("*, sequence_steps(*)")
+                .in_("id", missing[i:i + SequenceDefinitionConfig.IN_CHUNK])
+                .execute()
+            )
+            for row in rows.data or []:
+                compiled = self.put(compile_sequence_row(row))
+                result[compiled.id] = compiled
+        return result
+
+    def status_templates(self, supabase: Any) -> Mapping[str, Dict[str, Any]]:
+        """Template pro Sequenz-Status aus follow_up_sequence_steps (erstes je Status)."""
+        with self._lock:
+            if self._status_templates and self._fresh(self._status_templates[0]):
+                self.hits += 1
+                return self._status_templates[1]
+            self.misses += 1
+
+        rows = supabase.table("follow_up_sequence_steps").select("status, template_key, template_message").execute()
+        templates: Dict[str, Dict[str, Any]] = {}
+        for row in rows.data or []:
+            templates.setdefault(row.get("status"), row)
+
+        frozen = MappingProxyType(templates)
+        with self._lock:
+            self._status_templates = (time.monotonic(), frozen)
+        return frozen
+
+    def invalidate(self, sequence_id: Any = None) -> None:
+        """Eine Sequenz verwerfen, ohne ID alles (inkl. Status-Templates)."""
+        with self._lock:
+            if sequence_id is None:
+                self._entries.clear()
+                self._status_templates = None
+            else:
+                self._entries.pop(str(sequence_id), None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_sequence_cache: Optional[SequenceDefinitionCache] = None
+
+
+def get_sequence_cache() -> SequenceDefinitionCache:
+    """Prozessweiter Cache."""
+    global _sequence_cache
+    if _sequence_cache is None:
+        _sequence_cache = SequenceDefinitionCache()
+    return _sequence_cache
+
+
+__all__ = [
+    "CONDITION_PREDICATES",
+    "CompiledSequence",
+    "CompiledStep",
+    "SequenceDefinitionCache",
+    "SequenceDefinitionConfig",
+    "StatusTransition",
+    "compile_followup_sequence",
+    "compile_sequence_row",
+    "compile_status_flow",
+    "condition_predicate",
+    "get_sequence_cache",
+]
@@ -4,6 +4,8 @@ import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any, List
 
+from app.services.sequence_definitions import SequenceDefinitionCache, compile_status_flow, get_sequence_cache
+
 logger = logging.getLogger(__name__)
 
 
@@ -22,10 +24,13 @@ STATUS_FLOW: Dict[str, Dict[str, Any]] = {
     "cold": {"next": None, "action": "archive"},
 }
 
+COMPILED_STATUS_FLOW = compile_status_flow(STATUS_FLOW)
+
 
 class SequenceEngine:
-    def __init__(self, db):
+    def __init__(self, db, sequence_cache: Optional[SequenceDefinitionCache] = None):
         self.db = db
+        self.sequences = sequence_cache or get_sequence_cache()
 
     # Public API -----------------------------------------------------
     async def process_lead_response(self, lead_id: str, responded: bool) -> dict:
@@ -56,18 +61,17 @@ class SequenceEngine:
 
             lead_data = lead.data
             current_status = lead_data.get("sequence_status") or "new"
-            flow = STATUS_FLOW.get(current_status)
-            if not flow:
+            transition = COMPILED_STATUS_FLOW.get(current_status)
+            if not transition:
                 return {"success": False, "error": f"Unbekannter Sequenz-Status: {current_status}"}
 
-            next_status = flow.get("next")
-            action = flow.get("action")
-            wait_days = flow.get("wait_days", 0)
+            next_status = transition.next
+            action = transition.action
 
             now = datetime.now(timezone.utc)
             next_follow_up_at: Optional[str] = None
-            if wait_days:
-                next_follow_up_at = (now + timedelta(days=wait_days)).isoformat()
+            if transition.wait:
+                next_follow_up_at = (now + transition.wait).isoformat()
 
             follow_up_count = (lead_data.get("follow_up_count") or 0) + 1
 
@@ -149,14 +153,8 @@ class SequenceEngine:
     async def _create_follow_up_task(self, lead: dict, status: str, step: int):
         """Create follow-up task based on sequence step template."""
         try:
-            template_result = (
-                self.db.table("follow_up_sequence_steps")
-                .select("template_key, template_message")
-                .eq("status", status)
-                .limit(1)
-                .execute()
-            )
-            template = template_result.data[0] if template_result and template_result.data else None
+            # Templates per status are cached (one query per TTL instead of one per lead)
+            template = self.sequences.status_templates(self.db).get(status)
 
             first_name = (lead.get("name") or "").split(" ")[0] if lead.get("name") else "Lead"
             message = template.get("template_message") if template else "Follow-up Nachricht"
@@ -28,6 +28,8 @@ import structlog
 
 from pydantic import BaseModel, EmailStr, Field
 
+from app.core.quota_manager import invalidate_user_plan
+
 logger = structlog.get_logger()
 
 # Import Email Service for automated welcome sequences
@@ -722,6 +724,7 @@ class StripeService:
                 "subscription_status": "cancelled",
                 "updated_at": datetime.utcnow().isoformat()
             }).eq("subscription_id", subscription_id).execute()
+            invalidate_user_plan(user_id)
             
             # Deactivate addons
             supabase.table("user_addons").update({
@@ -841,6 +844,7 @@ class StripeService:
                     "subscription_status": "active",
                     "updated_at": datetime.utcnow().isoformat()
                 }).eq("id", user_id).execute()
+                invalidate_user_plan(user_id)
                 logger.info(f"User {user_id} upgraded to {plan_name}")
                 
             elif user_id and addon_name:
@@ -1126,6 +1130,7 @@ class StripeService:
                 "subscription_status": subscription["status"],
                 "updated_at": datetime.utcnow().isoformat()
             }).eq("id", user_id).execute()
+            invalidate_user_plan(user_id)
             
             logger.info(
                 "User subscription status updated",
@@ -45,7 +45,7 @@ class DefaultTimezoneService:
     def __init__(self, default_tz: str = "Europe/Vienna") -> None:
         self.default_tz = default_tz
 
-    def _resolve_tz(self, tz_name: Optional[str]) -> ZoneInfo:
+    def resolve_tz(self, tz_name: Optional[str]) -> ZoneInfo:
         """Löst Timezone-Namen auf, mit Fallback auf Default."""
         name = tz_name or self.default_tz
         try:
@@ -55,7 +55,7 @@ class DefaultTimezoneService:
 
     def now_in_tz(self, tz_name: Optional[str]) -> datetime:
         """Gibt aktuelle Zeit in der angegebenen Timezone zurück."""
-        tz = self._resolve_tz(tz_name)
+        tz = self.resolve_tz(tz_name)
         return datetime.now(tz=tz)
 
     def next_best_contact_time(
@@ -77,7 +77,7 @@ class DefaultTimezoneService:
         Returns:
             Datetime der empfohlenen Kontaktzeit
         """
-        tz = self._resolve_tz(tz_name)
+        tz = self.resolve_tz(tz_name)
         base_dt = (base or datetime.now(tz=tz)).astimezone(tz)
 
         # Heuristik: 18:00 lokale Zeit ist optimal für Networker
@@ -104,7 +104,7 @@ class DefaultTimezoneService:
         
         Nützlich für "Snooze bis morgen früh".
         """
-        tz = self._resolve_tz(tz_name)
+        tz = self.resolve_tz(tz_name)
         base_dt = (base or datetime.now(tz=tz)).astimezone(tz)
         
         target_today = datetime.combine(
@@ -129,7 +129,7 @@ class DefaultTimezoneService:
         
         Nützlich für "Snooze bis nächsten Montag".
         """
-        tz = self._resolve_tz(tz_name)
+        tz = self.resolve_tz(tz_name)
         now = datetime.now(tz=tz)
         
         days_ahead = target_weekday - now.weekday()
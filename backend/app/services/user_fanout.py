@@ -0,0 +1,189 @@
+"""
+============================================
+🧵 SALESFLOW AI - PER-USER JOB FAN-OUT
+============================================
+
+Runs a per-user coroutine for many users with:
+
+- Bounded concurrency (semaphore)
+- Per-user timeout: a slow user is left running in the background and
+  skipped by later runs until it finishes, the rest go on. It keeps its
+  concurrency slot until then, also across runs, so stragglers never
+  push the parallel work past the limit
+- Isolation: one user's exception never aborts the run
+- Fairness: users processed longest ago (or never) go first; users not
+  started before the run deadline are deferred to the next run and are
+  then at the front of the queue
+- Skip-if-still-running: overlapping runs of the same job return at once
+
+Each run returns a FanoutReport with throughput and lag (time since each
+user was last processed).
+"""
+
+import asyncio
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+import structlog
+
+logger = structlog.get_logger()
+
+
+class UserFanoutConfig:
+    """Fan-out defaults."""
+
+    CONCURRENCY = 8               # Users processed in parallel
+    USER_TIMEOUT_SECONDS = 120    # Stop waiting for one user after this
+
+
+@dataclass
+class FanoutReport:
+    """Outcome of one fan-out run"""
+
+    job: str
+    users: int = 0
+    completed: int = 0
+    failed: int = 0
+    timed_out: int = 0
+    deferred: int = 0
+    skipped_in_flight: int = 0
+    skipped_running: bool = False
+    duration_seconds: float = 0.0
+    max_lag_seconds: Optional[float] = None
+    avg_lag_seconds: Optional[float] = None
+    results: Dict[str, Any] = field(default_factory=dict, repr=False)
+
+    @property
+    def users_per_second(self) -> float:
+        if self.duration_seconds <= 0:
+            return 0.0
+        return round((self.completed + self.failed) / self.duration_seconds, 2)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("results")
+        return {**data, "users_per_second": self.users_per_second}
+
+
+class UserFanout:
+    """
+    Per-user fan-out executor for one scheduler job.
+
+    Usage:
+        fanout = UserFanout("autopilot", concurrency=8)
+        report = await fanout.run(user_ids, process_user)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        concurrency: int = UserFanoutConfig.CONCURRENCY,
+        user_timeout: float = UserFanoutConfig.USER_TIMEOUT_SECONDS,
+    ):
+        self.name = name
+        self.concurrency = concurrency
+        self.user_timeout = user_timeout
+        self._last_done: Dict[str, float] = {}
+        self._in_flight: Set[str] = set()
+        self._permits: Optional[asyncio.Semaphore] = None
+        self._running = False
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def order(self, user_ids: Iterable[str]) -> List[str]:
+        """Never processed first, then longest ago; ties by id."""
+        return sorted(set(user_ids), key=lambda uid: (self._last_done.get(uid, float("-inf")), uid))
+
+    def _track(self, user_id: str, task: "asyncio.Future[Any]") -> None:
+        self._in_flight.add(user_id)
+
+        def done(finished: "asyncio.Future[Any]") -> None:
+            self._in_flight.discard(user_id)
+            self._last_done[user_id] = time.time()
+            if not finished.cancelled():
+                finished.exception()  # Late failures of timed-out users: retrieved, not "never retrieved"
+
+        task.add_done_callback(done)
+
+    async def run(
+        self,
+        user_ids: Iterable[str],
+        work: Callable[[str], Awaitable[Any]],
+        deadline_seconds: Optional[float] = None,
+    ) -> FanoutReport:
+        """
+        Process all users once.
+
+        Args:
+            user_ids: Users to process (duplicates ignored)
+            work: Coroutine function called with one user id
+            deadline_seconds: Don't start new users after this
+
+        Returns:
+            FanoutReport; per-user return values in `results`
+        """
+        report = FanoutReport(job=self.name)
+        if self._running:
+            report.skipped_running = True
+            logger.warning("Fan-out still running, skipping this run", job=self.name)
+            return report
+
+        self._running = True
+        started = time.monotonic()
+        now = time.time()
+        try:
+            queue = self.order(user_ids)
+            report.users = len(queue)
+            lags = [now - self._last_done[uid] for uid in queue if uid in self._last_done]
+            if lags:
+                report.max_lag_seconds = round(max(lags), 1)
+                report.avg_lag_seconds = round(sum(lags) / len(lags), 1)
+
+            # Stragglers of earlier runs still hold permits of the shared semaphore
+            if self._permits is None or not self._in_flight:
+                self._permits = asyncio.Semaphore(self.concurrency)
+            permits = self._permits
+
+            async def process(user_id: str) -> None:
+                if user_id in self._in_flight:
+                    report.skipped_in_flight += 1
+                    return
+                await permits.acquire()
+                if deadline_seconds is not None and time.monotonic() - started > deadline_seconds:
+                    permits.release()
+                    report.deferred += 1
+                    return
+                task = asyncio.ensure_future(work(user_id))
+                self._track(user_id, task)
+                # The permit is held until the task itself finishes, not until we stop waiting
+                task.add_done_callback(lambda _: permits.release())
+                try:
+                    # shield: on timeout the user keeps running on its own
+                    report.results[user_id] = await asyncio.wait_for(
+                        asyncio.shield(task), self.user_timeout
+                    )
+                    report.completed += 1
+                except asyncio.TimeoutError:
+                    report.timed_out += 1
+                    logger.warning("User timed out, continuing in background", job=self.name, user_id=user_id)
+                except Exception as e:
+                    report.failed += 1
+                    logger.error("User failed", job=self.name, user_id=user_id, error=str(e))
+
+            await asyncio.gather(*(process(uid) for uid in queue))
+        finally:
+            self._running = False
+            report.duration_seconds = round(time.monotonic() - started, 3)
+
+        logger.info("Fan-out finished", **report.to_dict())
+        return report
+
+
+__all__ = [
+    "UserFanoutConfig",
+    "FanoutReport",
+    "UserFanout",
+]
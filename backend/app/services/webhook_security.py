@@ -1,19 +1,69 @@
 import hmac
 import hashlib
+import math
 import time
 import logging
 from ipaddress import ip_address, ip_network
-from typing import Iterable
+from typing import Iterable, Optional
 from fastapi import HTTPException, status, Request
 
+from app.core.config import settings
+from app.core.rate_limit import RateLimiter
+
 logger = logging.getLogger(__name__)
 
 FACEBOOK_SIGNATURE_HEADER = "X-Hub-Signature-256"
 LINKEDIN_SIGNATURE_HEADER = "X-LI-Signature"
 INSTAGRAM_SIGNATURE_HEADER = "X-Hub-Signature-256"
 
-# Simple in-memory Rate Limit (pro Prozess).
-_rate_limit_store: dict[str, list[float]] = {}
+
+class WebhookRateLimitConfig:
+    """Rate-Limit-Defaults für Webhook-Endpoints."""
+
+    MAX_REQUESTS_PER_MINUTE = 100
+    KEY_PREFIX = "webhook_ratelimit"
+    REDIS_RETRY_SECONDS = 60.0    # Nach fehlgeschlagenem Connect erst später erneut versuchen
+
+
+# GCRA-Limiter: pro Key nur ein Float (theoretische Ankunftszeit) statt
+# einer Liste von Timestamps. Mit Redis teilen sich alle Worker den
+# Zustand; ohne Redis bleibt er im Prozess, begrenzt auf max_keys (LRU).
+_webhook_limiter: Optional[RateLimiter] = None
+_redis_retry_at = 0.0
+
+
+def configure_webhook_rate_limiter(redis=None, max_keys: Optional[int] = None) -> RateLimiter:
+    """Setzt den Webhook-Limiter (Redis-Client oder None = nur In-Process)."""
+    global _webhook_limiter
+    _webhook_limiter = RateLimiter(
+        redis,
+        local_lease=redis is not None,
+        fallback_max_keys=max_keys or settings.webhook_rate_limit_max_keys,
+    )
+    return _webhook_limiter
+
+
+async def _get_webhook_limiter() -> RateLimiter:
+    global _redis_retry_at
+    if _webhook_limiter is not None and (
+        _webhook_limiter.redis is not None
+        or not settings.webhook_rate_limit_shared
+        or time.monotonic() < _redis_retry_at
+    ):
+        return _webhook_limiter
+
+    redis = None
+    if settings.webhook_rate_limit_shared:
+        try:
+            from app.core.cache import get_cache_service
+            redis = (await get_cache_service()).redis
+        except Exception as e:
+            _redis_retry_at = time.monotonic() + WebhookRateLimitConfig.REDIS_RETRY_SECONDS
+            logger.warning("Webhook rate limit without Redis, using in-process state: %s", e)
+            if _webhook_limiter is not None:
+                return _webhook_limiter
+    return configure_webhook_rate_limiter(redis)
+
 
 def _verify_hmac_signature(
     secret: str,
@@ -32,28 +82,25 @@ def _verify_hmac_signature(
     expected = hmac.new(secret.encode("utf-8"), payload, hashlib.sha256).hexdigest()
     return hmac.compare_digest(expected, signature)
 
-def enforce_rate_limit(
+async def enforce_rate_limit(
     client_ip: str,
     key_prefix: str,
-    max_requests_per_minute: int = 100,
+    max_requests_per_minute: int = WebhookRateLimitConfig.MAX_REQUESTS_PER_MINUTE,
 ) -> None:
     """
-    Minimaler Schutz: max_requests_per_minute pro (IP + key_prefix).
-    Für Produktion: durch Redis / API-Gateway ersetzen.
+    max_requests_per_minute pro (IP + key_prefix), konstanter Speicher pro Key.
+    Wirft 429 mit Retry-After-Header.
     """
-    bucket_key = f"{key_prefix}:{client_ip}"
-    now = time.time()
-    window_start = now - 60
-    history = _rate_limit_store.get(bucket_key, [])
-    history = [ts for ts in history if ts >= window_start]
-    if len(history) >= max_requests_per_minute:
-        logger.warning("Rate limit exceeded for %s", bucket_key)
+    limiter = await _get_webhook_limiter()
+    bucket_key = f"{WebhookRateLimitConfig.KEY_PREFIX}:{key_prefix}:{client_ip}"
+    result = await limiter.hit(bucket_key, max_requests_per_minute, 60)
+    if not result.allowed:
+        logger.warning("Rate limit exceeded for %s:%s", key_prefix, client_ip)
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             detail="Rate limit exceeded",
+            headers={"Retry-After": str(max(1, math.ceil(result.retry_after)))},
         )
-    history.append(now)
-    _rate_limit_store[bucket_key] = history
 
 def enforce_ip_whitelist(
     client_ip: str,
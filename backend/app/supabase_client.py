@@ -9,6 +9,7 @@ from typing import Optional
 from supabase import Client, create_client
 
 from .config import get_settings
+from .db.routing import DbRole, current_role, replica_router
 
 
 class SupabaseNotConfiguredError(RuntimeError):
@@ -16,6 +17,7 @@ class SupabaseNotConfiguredError(RuntimeError):
 
 
 _supabase_client: Optional[Client] = None
+_supabase_read_client: Optional[Client] = None
 
 
 def get_supabase_client() -> Client:
@@ -59,7 +61,8 @@ def get_supabase_client() -> Client:
         # Die Supabase-Bibliothek verwendet intern httpx, das automatisch Proxy-Umgebungsvariablen
         # lesen könnte. Falls das ein Problem ist, müssen die Proxy-Umgebungsvariablen
         # deaktiviert werden (NO_PROXY=* oder explizite Proxy-Deaktivierung).
-        _supabase_client = create_client(url, key)
+        from app.services.job_telemetry import instrument_supabase_client  # Job telemetry: DB query count
+        _supabase_client = instrument_supabase_client(create_client(url, key))
         return _supabase_client
     except TypeError as exc:
         # Cache löschen bei Fehler
@@ -83,10 +86,60 @@ def get_supabase_client() -> Client:
         ) from exc
 
 
+def get_supabase_read_client() -> Client:
+    """
+    Liefert einen Supabase-Client für die Read-Replica (PostgREST).
+
+    Ist SUPABASE_READ_REPLICA_URL nicht gesetzt oder der Replica-Client nicht
+    erstellbar, wird der Primary-Client zurückgegeben.
+    Nur für Lesezugriffe verwenden – die Replica ist read-only.
+    """
+    global _supabase_read_client
+
+    if _supabase_read_client is not None:
+        return _supabase_read_client
+
+    settings = get_settings()
+    replica_url = (settings.supabase_read_replica_url or "").strip()
+    key = str(settings.supabase_service_role_key or "").strip()
+    if not replica_url or not key:
+        replica_router.record(DbRole.REPLICA, "fallbacks")
+        return get_supabase_client()
+
+    try:
+        from app.services.job_telemetry import instrument_supabase_client
+        _supabase_read_client = instrument_supabase_client(create_client(replica_url, key))
+        return _supabase_read_client
+    except Exception:
+        replica_router.record(DbRole.REPLICA, "errors")
+        return get_supabase_client()
+
+
+def get_routed_supabase_client() -> Client:
+    """
+    Liefert den Client passend zum aktuellen Routing (siehe app/db/routing.py).
+
+    GET-Requests (ohne kürzlichen eigenen Write) und Replica-Jobs erhalten den
+    Replica-Client, alle anderen den Primary-Client.
+    """
+    if current_role() == DbRole.REPLICA:
+        replica_router.record(DbRole.REPLICA, "sessions")
+        return get_supabase_read_client()
+    replica_router.record(DbRole.PRIMARY, "sessions")
+    return get_supabase_client()
+
+
 def clear_supabase_cache() -> None:
     """Löscht den Supabase-Client-Cache."""
-    global _supabase_client
+    global _supabase_client, _supabase_read_client
     _supabase_client = None
+    _supabase_read_client = None
 
 
-__all__ = ["get_supabase_client", "SupabaseNotConfiguredError", "clear_supabase_cache"]
+__all__ = [
+    "get_supabase_client",
+    "get_supabase_read_client",
+    "get_routed_supabase_client",
+    "SupabaseNotConfiguredError",
+    "clear_supabase_cache",
+]
@@ -0,0 +1,143 @@
+"""
+SalesFlow AI - Cache Codec Benchmark
+====================================
+
+Vergleicht alle installierten Codec-Kombinationen (Serializer +
+Kompression) auf repräsentativen Cache-Payloads: Lead-Liste,
+Dashboard-Stats, Follow-up-Liste. Gemessen werden Bytes in Redis und
+Encode-/Decode-Zeit.
+
+Ausführung:
+    python -m scripts.benchmark_cache_codec
+    python -m scripts.benchmark_cache_codec --leads 5000 --rounds 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from statistics import median
+
+from app.core.cache_codec import CacheCodec, CodecConfig, available_codecs
+
+STATUSES = ["new", "contacted", "warm", "hot", "customer", "lost"]
+SOURCES = ["instagram", "whatsapp", "referral", "event", "csv_import"]
+
+
+def lead_list(count: int) -> list[dict]:
+    """Lead-Liste wie sie /api/leads liefert."""
+    rng = random.Random(42)
+    now = datetime(2024, 11, 20, 9, 30)
+    return [
+        {
+            "id": f"6f1c2a4e-0000-4000-8000-{i:012d}",
+            "user_id": "0b8e3f52-1111-4000-8000-000000000001",
+            "name": f"Lead {i} {rng.choice(['Schmidt', 'Müller', 'Weber', 'Fischer'])}",
+            "email": f"lead{i}@example.com",
+            "phone": f"+49 151 {rng.randint(1000000, 9999999)}",
+            "status": rng.choice(STATUSES),
+            "source": rng.choice(SOURCES),
+            "score": rng.randint(0, 100),
+            "p_score": round(rng.random() * 100, 2),
+            "tags": rng.sample(["mlm", "fitness", "beauty", "vip", "reactivate"], 2),
+            "notes": "Interessiert am Starter-Paket, meldet sich nach dem Urlaub." if i % 3 == 0 else None,
+            "last_contact": (now - timedelta(days=rng.randint(0, 60))).isoformat(),
+            "created_at": (now - timedelta(days=rng.randint(30, 400))).isoformat(),
+            "deal_value": rng.choice([None, 49.9, 199.0, 1250.0]),
+        }
+        for i in range(count)
+    ]
+
+
+def dashboard_stats() -> dict:
+    """Dashboard-Stats wie DashboardCacheService sie cached."""
+    rng = random.Random(7)
+    return {
+        "total_leads": 1834,
+        "hot_leads": 57,
+        "followups_due_today": 23,
+        "followups_overdue": 6,
+        "conversion_rate": 0.137,
+        "revenue_month": 12840.5,
+        "pipeline": {status: rng.randint(10, 500) for status in STATUSES},
+        "activity_last_30_days": [
+            {"date": (datetime(2024, 11, 1) + timedelta(days=d)).date().isoformat(),
+             "messages": rng.randint(0, 80), "calls": rng.randint(0, 10)}
+            for d in range(30)
+        ],
+        "top_leads": lead_list(10),
+    }
+
+
+def followup_list(count: int) -> list[dict]:
+    """Geplante Follow-ups eines Users."""
+    rng = random.Random(3)
+    return [
+        {
+            "id": f"fu-{i}",
+            "lead_id": f"6f1c2a4e-0000-4000-8000-{i:012d}",
+            "channel": rng.choice(["whatsapp", "email", "instagram"]),
+            "scheduled_at": datetime(2024, 11, 21, 9, 0).isoformat(),
+            "message": "Hey! Wollte kurz nachhaken, ob du dir das Angebot schon anschauen konntest?",
+            "priority": rng.randint(1, 5),
+        }
+        for i in range(count)
+    ]
+
+
+def _time_us(func, rounds: int) -> float:
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1_000_000)
+    return median(samples)
+
+
+def run(leads: int, rounds: int, threshold: int) -> list[dict]:
+    payloads = {
+        f"lead_list[{leads}]": lead_list(leads),
+        "dashboard_stats": dashboard_stats(),
+        "followups[200]": followup_list(200),
+    }
+    codecs = available_codecs()
+    results = []
+    for payload_name, payload in payloads.items():
+        for serializer in codecs["serializers"]:
+            for compression in codecs["compressors"]:
+                codec = CacheCodec(serializer, compression, compress_min_bytes=threshold)
+                blob = codec.encode(payload)
+                results.append({
+                    "payload": payload_name,
+                    "codec": codec.name,
+                    "bytes": len(blob),
+                    "encode_us": _time_us(lambda: codec.encode(payload), rounds),
+                    "decode_us": _time_us(lambda: codec.decode(blob), rounds),
+                })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark cache codecs")
+    parser.add_argument("--leads", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--threshold", type=int, default=CodecConfig.COMPRESS_MIN_BYTES)
+    args = parser.parse_args()
+
+    results = run(args.leads, args.rounds, args.threshold)
+    print(f"{'payload':<20} {'codec':<16} {'bytes':>10} {'encode µs':>11} {'decode µs':>11}")
+    current = None
+    for row in results:
+        if row["payload"] != current and current is not None:
+            print()
+        current = row["payload"]
+        print(
+            f"{row['payload']:<20} {row['codec']:<16} {row['bytes']:>10} "
+            f"{row['encode_us']:>11.0f} {row['decode_us']:>11.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
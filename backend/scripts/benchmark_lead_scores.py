@@ -0,0 +1,89 @@
+"""
+SalesFlow AI - Lead Score Recalc Benchmark
+==========================================
+
+Misst die Rechenschritte des Batch-Scorings (lead_scoring) auf
+synthetischen Daten: eine Seite Leads in Arrays überführen und Scores
+berechnen. DB-Zugriffe sind nicht enthalten; wie viele Queries ein
+Lauf braucht, prüft tests/test_lead_scoring.py.
+
+Ausführung:
+    python -m scripts.benchmark_lead_scores
+    python -m scripts.benchmark_lead_scores --leads 100000 --page-size 2000 --rounds 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from statistics import median
+
+from app.services.lead_scoring import LeadScoringConfig, score_page
+
+STATUSES = ["new", "contacted", "qualified", "proposal", "negotiation", None]
+
+
+def leads(count: int, now: datetime) -> list[dict]:
+    """Aktive Leads wie iter_active_leads sie liefert."""
+    rng = random.Random(42)
+    return [
+        {
+            "id": f"lead-{i:06d}",
+            "user_id": f"user-{i % 50}",
+            "name": f"Lead {i}",
+            "score": rng.randrange(101),
+            "status": rng.choice(STATUSES),
+            "last_contact": rng.choice([None, (now - timedelta(days=rng.randrange(90))).isoformat()]),
+        }
+        for i in range(count)
+    ]
+
+
+def counts(rows: list[dict]) -> dict:
+    """(interactions, positive) pro Lead wie lead_interaction_counts sie liefert."""
+    rng = random.Random(7)
+    return {
+        lead["id"]: (n, rng.randrange(n + 1))
+        for lead in rows
+        if (n := rng.randrange(12))
+    }
+
+
+def _time_ms(func, rounds: int) -> float:
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return median(samples)
+
+
+def run(lead_count: int, page_size: int, rounds: int) -> float:
+    now = datetime.now(timezone.utc)
+    rows = leads(lead_count, now)
+    interaction_counts = counts(rows)
+    pages = [rows[i:i + page_size] for i in range(0, len(rows), page_size)]
+
+    def total() -> None:
+        for page in pages:
+            score_page(page, interaction_counts, now)
+
+    return _time_ms(total, rounds)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the lead score batch recalc")
+    parser.add_argument("--leads", type=int, default=20_000)
+    parser.add_argument("--page-size", type=int, default=LeadScoringConfig.PAGE_SIZE)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    ms = run(args.leads, args.page_size, args.rounds)
+    print(f"{args.leads} leads, pages of {args.page_size}, median of {args.rounds} rounds")
+    print(f"score_page total: {ms:.1f} ms ({ms * 1000 / args.leads:.2f} µs/lead)")
+
+
+if __name__ == "__main__":
+    main()
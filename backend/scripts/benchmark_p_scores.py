@@ -0,0 +1,111 @@
+"""
+SalesFlow AI - P-Score Recalc Benchmark
+=======================================
+
+Misst die Rechenschritte des Batch-Recalcs (predictive_scoring) auf
+synthetischen Daten: Events pro Lead zählen, P-Scores und Trends über
+Arrays berechnen. DB-Zugriffe sind nicht enthalten; wie viele Queries
+ein Recalc braucht, prüft tests/test_predictive_scoring.py.
+
+Ausführung:
+    python -m scripts.benchmark_p_scores
+    python -m scripts.benchmark_p_scores --leads 50000 --events 300000 --rounds 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from statistics import median
+
+from app.services.predictive_scoring import (
+    SCORE_CONFIG,
+    compute_p_scores,
+    compute_trends,
+    count_events_by_lead,
+)
+
+STATUSES = ["new", "contacted", "interested", "qualified", "proposal", "ghosting", "lost", None]
+
+
+def leads(count: int) -> list[dict]:
+    """Aktive Leads wie iter_leads sie liefert."""
+    rng = random.Random(42)
+    return [
+        {
+            "id": f"6f1c2a4e-0000-4000-8000-{i:012d}",
+            "status": rng.choice(STATUSES),
+            "temperature": rng.choice([None, 10, 50, 85]),
+            "p_score": rng.choice([None, round(rng.random() * 100, 2)]),
+        }
+        for i in range(count)
+    ]
+
+
+def events(count: int, lead_count: int, now: datetime) -> list[dict]:
+    """Message Events der letzten 14 Tage wie fetch_recent_events sie liefert."""
+    rng = random.Random(7)
+    days = SCORE_CONFIG["recent_days"]
+    return [
+        {
+            "id": f"ev-{i:09d}",
+            "contact_id": f"6f1c2a4e-0000-4000-8000-{rng.randrange(lead_count):012d}",
+            "direction": rng.choice(["inbound", "outbound"]),
+            "created_at": (now - timedelta(minutes=rng.randrange(days * 24 * 60))).isoformat(),
+        }
+        for i in range(count)
+    ]
+
+
+def _time_ms(func, rounds: int) -> float:
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return median(samples)
+
+
+def run(lead_count: int, event_count: int, rounds: int) -> list[dict]:
+    now = datetime.utcnow()
+    cutoff_7d = (now - timedelta(days=SCORE_CONFIG["hot_lead_days"])).isoformat()
+    rows = leads(lead_count)
+    recent = events(event_count, lead_count, now)
+    index = {lead["id"]: i for i, lead in enumerate(rows)}
+    statuses = [lead["status"] for lead in rows]
+    temperatures = [lead["temperature"] for lead in rows]
+    old_scores = [lead["p_score"] for lead in rows]
+
+    counts = count_events_by_lead(recent, index, cutoff_7d)
+    scores = compute_p_scores(*counts, statuses, temperatures)
+
+    def total() -> None:
+        new = compute_p_scores(*count_events_by_lead(recent, index, cutoff_7d), statuses, temperatures)
+        compute_trends(new, old_scores)
+
+    return [
+        {"step": "count_events_by_lead", "ms": _time_ms(lambda: count_events_by_lead(recent, index, cutoff_7d), rounds)},
+        {"step": "compute_p_scores", "ms": _time_ms(lambda: compute_p_scores(*counts, statuses, temperatures), rounds)},
+        {"step": "compute_trends", "ms": _time_ms(lambda: compute_trends(scores, old_scores), rounds)},
+        {"step": "total", "ms": _time_ms(total, rounds)},
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the P-score batch recalc")
+    parser.add_argument("--leads", type=int, default=10_000)
+    parser.add_argument("--events", type=int, default=60_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    results = run(args.leads, args.events, args.rounds)
+    print(f"{args.leads} leads, {args.events} events, median of {args.rounds} rounds")
+    print(f"{'step':<22} {'ms':>10} {'µs/lead':>10}")
+    for row in results:
+        print(f"{row['step']:<22} {row['ms']:>10.1f} {row['ms'] * 1000 / args.leads:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
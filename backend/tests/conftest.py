@@ -5,7 +5,7 @@ Gemeinsame Fixtures und Konfiguration.
 """
 import pytest
 import asyncio
-from typing import Generator, Any
+from typing import Any, Callable, Dict, Generator, List, Optional
 
 
 # ============= Async Event Loop =============
@@ -66,6 +66,222 @@ def mock_supabase_client():
     return MockSupabase()
 
 
+# ============= In-Memory Supabase =============
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+_LITERALS = {"null": None, "true": True, "false": False}
+
+
+def _compare(op: str, left: Any, right: Any) -> bool:
+    if op == "is":
+        return left is _LITERALS.get(str(right).lower(), right)
+    if op in ("eq", "neq"):
+        right = _LITERALS.get(right, right) if isinstance(right, str) else right
+        return (left == right) == (op == "eq")
+    if left is None:
+        return False
+    return {
+        "gt": lambda: left > right,
+        "gte": lambda: left >= right,
+        "lt": lambda: left < right,
+        "lte": lambda: left <= right,
+    }[op]()
+
+
+class FakeQuery:
+    """
+    PostgREST builder subset über `db.tables` (sync wie der supabase-py Client).
+
+    Filter inkl. `not_` und `or_("col.op.value,...")`; Ergebnisse nach id
+    sortiert (Keyset-Paging), `limit`/`range` wie PostgREST.
+    """
+
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db, self.table = db, table
+        self.filters: List[Callable[[dict], bool]] = []
+        self.negate = False
+        self.limit_n: Optional[int] = None
+        self.offset = 0
+        self.single_row = False
+        self.write = None
+
+    @property
+    def not_(self):
+        self.negate = True
+        return self
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def _add(self, check):
+        negate, self.negate = self.negate, False
+        self.filters.append(lambda r: check(r) != negate)
+        return self
+
+    def _op(self, op, column, value):
+        return self._add(lambda r: _compare(op, r.get(column), value))
+
+    def eq(self, column, value):
+        return self._op("eq", column, value)
+
+    def neq(self, column, value):
+        return self._op("neq", column, value)
+
+    def gt(self, column, value):
+        return self._op("gt", column, value)
+
+    def gte(self, column, value):
+        return self._op("gte", column, value)
+
+    def lt(self, column, value):
+        return self._op("lt", column, value)
+
+    def lte(self, column, value):
+        return self._op("lte", column, value)
+
+    def is_(self, column, value):
+        return self._op("is", column, value)
+
+    def in_(self, column, values):
+        values = set(values)
+        return self._add(lambda r: r.get(column) in values)
+
+    def or_(self, expression):
+        terms = [term.split(".", 2) for term in expression.split(",")]
+        return self._add(lambda r: any(_compare(op, r.get(col), value) for col, op, value in terms))
+
+    def order(self, column, **kwargs):
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    def range(self, start, end):
+        self.offset, self.limit_n = start, end - start + 1
+        return self
+
+    def single(self):
+        self.single_row = True
+        return self
+
+    def insert(self, rows):
+        self.write = ("insert", rows)
+        return self
+
+    def upsert(self, rows, on_conflict="id", **kwargs):
+        self.write = ("upsert", (rows, on_conflict))
+        return self
+
+    def update(self, values):
+        self.write = ("update", values)
+        return self
+
+    def delete(self):
+        self.write = ("delete", None)
+        return self
+
+    def _execute(self):
+        self.db.queries.append(self.table)
+        rows = self.db.tables.setdefault(self.table, [])
+        kind, payload = self.write or (None, None)
+        if kind == "insert":
+            many = isinstance(payload, list)
+            inserted = [
+                {"id": f"{self.table}-{len(rows) + i}", **row} if self.db.assign_ids else row
+                for i, row in enumerate(payload if many else [payload])
+            ]
+            rows.extend(inserted)
+            return FakeResponse(inserted)
+        if kind == "upsert":
+            payload, on_conflict = payload
+            written = payload if isinstance(payload, list) else [payload]
+            columns = (on_conflict or "id").split(",")
+            keys = {tuple(row.get(c) for c in columns) for row in written}
+            rows[:] = [r for r in rows if tuple(r.get(c) for c in columns) not in keys] + list(written)
+            return FakeResponse(written)
+        matched = [r for r in rows if all(f(r) for f in self.filters)]
+        if kind == "update":
+            for row in matched:
+                row.update(payload)
+            return FakeResponse(matched)
+        if kind == "delete":
+            rows[:] = [r for r in rows if r not in matched]
+            return FakeResponse(matched)
+        data = sorted((dict(r) for r in matched), key=lambda r: str(r.get("id")))
+        data = data[self.offset:]
+        if self.limit_n is not None:
+            data = data[: self.limit_n]
+        if self.single_row:
+            return FakeResponse(data[0] if data else None)
+        return FakeResponse(data)
+
+    def execute(self):
+        return self._execute()
+
+
+class AwaitableQuery(FakeQuery):
+    """Für Code, der execute() awaited (async Client)."""
+
+    async def execute(self):
+        return self._execute()
+
+
+class FakeRpc:
+    def __init__(self, db: "FakeSupabase", name: str, params: dict):
+        self.db, self.name, self.params = db, name, params
+
+    def execute(self):
+        self.db.queries.append(self.name)
+        handler = self.db.rpcs.get(self.name)
+        if handler is None:
+            raise RuntimeError(f"function {self.name} does not exist")
+        return FakeResponse(handler(self.db, self.params))
+
+
+class FakeSupabase:
+    """
+    In-Memory Supabase-Client für Service- und Job-Tests.
+
+    Args:
+        tables: Tabellenname -> Zeilen (werden direkt verändert)
+        rpcs: RPC-Name -> handler(db, params); unbekannte RPCs schlagen fehl
+        awaitable: execute() als Coroutine (async Client)
+        assign_ids: Inserts ohne id bekommen "<table>-<n>"
+    """
+
+    def __init__(
+        self,
+        tables: Optional[Dict[str, List[dict]]] = None,
+        rpcs: Optional[Dict[str, Callable[["FakeSupabase", dict], Any]]] = None,
+        awaitable: bool = False,
+        assign_ids: bool = False,
+    ):
+        self.tables = tables if tables is not None else {}
+        self.rpcs = dict(rpcs or {})
+        self.awaitable = awaitable
+        self.assign_ids = assign_ids
+        self.queries: List[str] = []
+
+    def table(self, name: str) -> FakeQuery:
+        return (AwaitableQuery if self.awaitable else FakeQuery)(self, name)
+
+    from_ = table
+
+    def rpc(self, name: str, params: dict) -> FakeRpc:
+        return FakeRpc(self, name, params)
+
+
+@pytest.fixture
+def fake_supabase() -> Callable[..., FakeSupabase]:
+    """Factory für In-Memory Supabase-Clients: `fake_supabase({"leads": [...]})`."""
+    return FakeSupabase
+
+
 @pytest.fixture
 def mock_openai_client():
     """Mock OpenAI Client für Tests."""
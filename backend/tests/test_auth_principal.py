@@ -0,0 +1,127 @@
+"""
+Tests für den Principal-Cache in get_current_user.
+
+Testet:
+- Wiederholte Requests ohne DB-Round-Trip
+- Token-Version: ältere Tokens nach Deaktivierung/Rollenwechsel abgelehnt
+- Logout verwirft den gecachten Principal
+- Claims im Token, Dict-Shape unverändert
+"""
+import pytest
+from fastapi import HTTPException
+
+from app.core.security import main as security
+from app.core.security import (
+    create_token_pair,
+    get_current_user,
+    get_current_user_dict,
+    invalidate_principal,
+    principal_claims,
+)
+
+USER = {
+    "id": "user-1",
+    "email": "anna@example.com",
+    "first_name": "Anna",
+    "last_name": "Berg",
+    "role": "user",
+    "is_active": True,
+    "is_verified": True,
+    "company": "ACME",
+    "token_version": 0,
+}
+
+
+@pytest.fixture
+def users(monkeypatch):
+    state = {"row": dict(USER), "lookups": 0}
+
+    def load(user_id):
+        state["lookups"] += 1
+        row = state["row"]
+        return {k: row[k] for k in ("is_active", "role", "token_version")}
+
+    monkeypatch.setattr(security, "_load_user_state", load)
+    security._principal_cache.clear()
+    yield state
+    security._principal_cache.clear()
+
+
+def _token(row):
+    return create_token_pair(row["id"], row["email"], claims=principal_claims(row))["access_token"]
+
+
+@pytest.mark.asyncio
+async def test_repeated_requests_skip_database(users):
+    token = _token(users["row"])
+
+    for _ in range(50):
+        payload = await get_current_user(token)
+
+    assert users["lookups"] == 1
+    assert payload["sub"] == "user-1"
+    assert payload["role"] == "user" and payload["first_name"] == "Anna"
+
+
+@pytest.mark.asyncio
+async def test_dict_shape_preserved(users):
+    payload = await get_current_user_dict(_token(users["row"]))
+
+    assert {"sub", "email", "exp", "iat", "type"} <= set(payload)
+    assert payload["email"] == "anna@example.com"
+
+
+@pytest.mark.asyncio
+async def test_old_token_rejected_after_role_change(users):
+    old_token = _token(users["row"])
+    await get_current_user(old_token)
+
+    # Role change bumps token_version (DB trigger) and clears this worker's cache
+    users["row"].update(role="admin", token_version=1)
+    invalidate_principal("user-1")
+
+    with pytest.raises(HTTPException) as exc:
+        await get_current_user(old_token)
+    assert exc.value.status_code == 401
+
+    payload = await get_current_user(_token(users["row"]))
+    assert payload["role"] == "admin" and payload["ver"] == 1
+
+
+@pytest.mark.asyncio
+async def test_logout_drops_cached_principal(users):
+    from app.routers.auth import logout
+
+    token = _token(users["row"])
+    payload = await get_current_user(token)
+    await logout(current_user=payload)
+
+    users["row"]["is_active"] = False
+    with pytest.raises(HTTPException) as exc:
+        await get_current_user(token)
+    assert exc.value.status_code == 401 and users["lookups"] == 2
+
+
+@pytest.mark.asyncio
+async def test_deactivated_user_rejected(users):
+    users["row"]["is_active"] = False
+
+    with pytest.raises(HTTPException) as exc:
+        await get_current_user(_token(users["row"]))
+    assert exc.value.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_lookup_failure_does_not_hit_db_per_request(users, monkeypatch):
+    calls = []
+
+    def broken(user_id):
+        calls.append(user_id)
+        raise RuntimeError("users table unavailable")
+
+    monkeypatch.setattr(security, "_load_user_state", broken)
+    token = _token(users["row"])
+
+    for _ in range(5):
+        assert (await get_current_user(token))["sub"] == "user-1"
+    assert len(calls) == 1
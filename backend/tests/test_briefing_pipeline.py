@@ -0,0 +1,272 @@
+"""
+Tests für die Daily-Briefing-Pipeline.
+
+Testet:
+- Lokale Briefing-Slots pro Zeitzone, über drei Ticks verteilt, jeder User genau einmal pro Tag
+- Zählungen pro Bucket mit fester Query-Anzahl (unabhängig von der User-Anzahl)
+- Watermark: verpasste Ticks werden nachgeholt, aber höchstens MAX_CATCH_UP
+- Watermark pro Batch: nach einem Abbruch wird nichts doppelt gesendet, auch mitten im Slot
+- Gebündelte Notifications: ein Prefs-Query, ein Insert, FCM send_each
+- send_daily_briefing Ende-zu-Ende mit einem (sync) Supabase-Client
+"""
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services.briefing_pipeline import (
+    BriefingConfig,
+    Recipient,
+    bucket_counts,
+    build_briefing,
+    commit_progress,
+    due_buckets,
+    plan_daily_briefings,
+)
+from app.services.incremental_jobs import WatermarkStore
+
+# Before the DST switch: Vienna = UTC+1, New York = UTC-4, Kolkata = UTC+5:30
+NOW = datetime(2025, 3, 12, 6, 30, tzinfo=timezone.utc)
+TICK = timedelta(minutes=BriefingConfig.TICK_MINUTES)
+ZONES = ["Europe/Vienna", "America/New_York", "Asia/Kolkata"]
+
+
+def _recipients(n):
+    return [Recipient(user_id=f"user-{i:04d}", first_name=f"U{i}", timezone=ZONES[i % 3]) for i in range(n)]
+
+
+def test_slots_follow_local_time_and_spread_over_ticks():
+    recipients = _recipients(600)
+
+    # 07:30 in Vienna: only Vienna users, only those in the first slot
+    buckets = due_buckets(recipients, NOW - TICK, NOW)
+    assert [(b.timezone, b.day.isoformat()) for b in buckets] == [("Europe/Vienna", "2025-03-12")]
+    first_slot = buckets[0].recipients
+    assert 0 < len(first_slot) < 200 and all(r.slot.strftime("%H:%M") == "07:30" for r in first_slot)
+    assert buckets[0].day_start == datetime(2025, 3, 11, 23, 0, tzinfo=timezone.utc)
+
+    # A full day of ticks: everyone exactly once, no tick gets more than ~half a timezone
+    seen, per_tick = Counter(), []
+    start = datetime(2025, 3, 12, 0, 0, tzinfo=timezone.utc)
+    for tick in range(96):
+        until = start + TICK * (tick + 1)
+        due = [r.user_id for b in due_buckets(recipients, until - TICK, until) for r in b.recipients]
+        seen.update(due)
+        per_tick.append(len(due))
+    assert set(seen.values()) == {1} and len(seen) == 600
+    assert max(per_tick) < 110
+    assert sum(1 for n in per_tick if n) == 9           # 3 timezones x 3 slots
+
+    # Unknown timezone falls back to Europe/Vienna
+    unknown = due_buckets([Recipient("user-0003", timezone="Mars/Olympus")], NOW - TICK, NOW + 2 * TICK)
+    assert unknown[0].timezone == "Europe/Vienna"
+
+
+def test_bucket_counts_use_fixed_number_of_queries(fake_supabase):
+    recipients = [Recipient(user_id=f"user-{i:04d}", timezone="Europe/Vienna") for i in range(450)]
+    local_midnight = datetime(2025, 3, 11, 23, 0, tzinfo=timezone.utc)
+    suggestions = []
+    for i, r in enumerate(recipients):
+        suggestions.append({"id": f"s-{i:04d}-a", "user_id": r.user_id, "status": "pending",
+                            "due_at": (local_midnight + timedelta(hours=10)).isoformat()})
+        suggestions.append({"id": f"s-{i:04d}-b", "user_id": r.user_id, "status": "pending",
+                            "due_at": (local_midnight - timedelta(minutes=30)).isoformat()})   # Yesterday local
+        suggestions.append({"id": f"s-{i:04d}-c", "user_id": r.user_id, "status": "done",
+                            "due_at": (local_midnight + timedelta(hours=2)).isoformat()})
+    events = [{"id": "e-1", "user_id": "user-0001", "start_time": (local_midnight + timedelta(hours=9)).isoformat()},
+              {"id": "e-2", "user_id": "user-0001", "start_time": (local_midnight + timedelta(hours=26)).isoformat()}]
+    db = fake_supabase({"followup_suggestions": suggestions, "calendar_events": events})
+
+    bucket = due_buckets(recipients, NOW - TICK, NOW + 2 * TICK)[0]
+    assert len(bucket.recipients) == 450
+    counts = bucket_counts(db, bucket)
+
+    assert counts["user-0001"] == {"followups": 1, "appointments": 1, "overdue": 1}
+    assert counts["user-0002"]["appointments"] == 0
+    assert len(db.queries) == 6                         # 3 chunks x (follow-ups + appointments)
+
+    briefing = build_briefing(Recipient("user-0001", first_name="Anna"), counts["user-0001"])
+    assert briefing["title"] == "☀️ Guten Morgen, Anna!"
+    assert briefing["body"] == "📋 1 Follow-up | 📅 1 Termin | ⚠️ 1 überfällig"
+    empty = build_briefing(Recipient("user-x"), {"followups": 0, "appointments": 0, "overdue": 0})
+    assert empty["body"] == "Keine geplanten Aktivitäten - perfekt für Akquise!"
+
+
+def test_plan_catches_up_missed_ticks_within_limit(fake_supabase):
+    recipients = _recipients(300)
+    db = fake_supabase()
+    store = WatermarkStore(db, enabled=True)
+
+    def users(plan):
+        return {b["user_id"] for b in plan.briefings}
+
+    # First run: only the last tick
+    first = plan_daily_briefings(db, store, now=NOW, recipients=recipients)
+    assert first.since == NOW - TICK
+    store.commit(first.window)
+
+    # Two ticks missed: the next run sends their slots too, nothing twice
+    later = plan_daily_briefings(db, store, now=NOW + 3 * TICK, recipients=recipients)
+    assert users(first).isdisjoint(users(later))
+    vienna = {r.user_id for r in recipients if r.timezone == "Europe/Vienna"}
+    assert users(first) | users(later) == vienna
+
+    # Without commit (failed run) the window is retried; a long outage is capped
+    retry = plan_daily_briefings(db, store, now=NOW + 3 * TICK, recipients=recipients)
+    assert users(retry) == users(later)
+    stale = plan_daily_briefings(db, store, now=NOW + timedelta(hours=6), recipients=recipients)
+    assert stale.since == NOW + timedelta(hours=4)
+
+
+def test_progress_commit_skips_sent_briefings_on_retry(fake_supabase):
+    recipients = _recipients(300)
+    db = fake_supabase()
+    store = WatermarkStore(db, enabled=True)
+    store.commit(plan_daily_briefings(db, store, now=NOW, recipients=recipients).window)
+
+    def plan():
+        return plan_daily_briefings(db, store, now=NOW + 3 * TICK, recipients=recipients)
+
+    # Two slots, in slot order; the run stops one user into the second slot
+    later = plan()
+    assert len(set(later.slots)) == 2 and later.slots == sorted(later.slots)
+    cut = later.slots.index(later.slots[-1]) + 1
+    commit_progress(store, later, cut)
+
+    retry = plan()
+    assert retry.since == later.slots[0]
+    assert retry.briefings == later.briefings[cut:]
+
+    # Stopping again in the same slot keeps the users from both attempts
+    commit_progress(store, retry, 1)
+    assert plan().briefings == later.briefings[cut + 1:]
+
+    # Everything out: the window is done and the state cleared
+    final = plan()
+    commit_progress(store, final, len(final.briefings))
+    assert plan().briefings == []
+    assert db.tables["job_watermarks"][0]["state"] == {}
+
+
+def test_notifications_batch_sends_with_few_queries(monkeypatch, fake_supabase):
+    from firebase_admin import messaging
+
+    from app.services import firebase
+    from app.services.notifications import create_notifications_batch
+
+    sent = []
+
+    class Response:
+        def __init__(self, token):
+            self.success = token != "stale"
+            self.exception = None if self.success else messaging.UnregisteredError("gone")
+
+    class BatchResponse:
+        def __init__(self, messages):
+            self.responses = [Response(m.token) for m in messages]
+
+    def send_each(messages):
+        sent.append(len(messages))
+        return BatchResponse(messages)
+
+    monkeypatch.setattr(firebase, "get_firebase_app", lambda: None)
+    monkeypatch.setattr(firebase.messaging, "send_each", send_each)
+
+    db = fake_supabase({
+        "user_notification_preferences": [{"user_id": "user-0001", "daily_briefing": False}],
+        "push_subscriptions": [
+            {"user_id": f"user-{i:04d}", "fcm_token": f"token-{i}", "device_type": "web"} for i in range(250)
+        ] + [{"user_id": "user-0002", "fcm_token": "stale", "device_type": "web"}],
+    }, assign_ids=True)
+    notifications = [
+        build_briefing(r, {"followups": 1, "appointments": 0, "overdue": 0}) for r in _recipients(300)
+    ]
+
+    result = create_notifications_batch(db, "daily_briefing", notifications)
+
+    assert result == {"created": 299, "skipped": 1, "pushed": 249}
+    assert sent == [250]
+    assert "stale" not in {s["fcm_token"] for s in db.tables["push_subscriptions"]}
+    statuses = Counter(n["status"] for n in db.tables["notification_queue"])
+    assert statuses == {"sent": 249, "pending": 50}
+    # prefs + inserts + subscriptions + token cleanup + status updates, in chunks of 200
+    assert len(db.queries) == 2 + 2 + 2 + 1 + 2
+
+
+@pytest.mark.asyncio
+async def test_send_daily_briefing_job_end_to_end(monkeypatch, fake_supabase):
+    from functools import partial
+
+    from app.services import briefing_pipeline, firebase, jobs
+
+    class BatchResponse:
+        def __init__(self, messages):
+            self.responses = [type("Response", (), {"success": True, "exception": None})() for _ in messages]
+
+    monkeypatch.setattr(firebase, "get_firebase_app", lambda: None)
+    monkeypatch.setattr(firebase.messaging, "send_each", BatchResponse)
+    monkeypatch.setattr(briefing_pipeline, "_directory", None)
+    monkeypatch.setattr(jobs, "plan_daily_briefings", partial(plan_daily_briefings, now=NOW))
+
+    recipients = _recipients(60)
+    db = fake_supabase({
+        "user_notification_preferences": [{"user_id": r.user_id, "daily_briefing": True} for r in recipients],
+        "profiles": [{"id": r.user_id, "name": f"{r.first_name} Test", "timezone": r.timezone} for r in recipients],
+        "push_subscriptions": [{"user_id": r.user_id, "fcm_token": f"t-{r.user_id}", "device_type": "web"}
+                               for r in recipients],
+    }, assign_ids=True)
+
+    async def get_supabase():
+        return db
+
+    monkeypatch.setattr(jobs, "get_supabase", get_supabase)
+    expected = plan_daily_briefings(db, WatermarkStore(fake_supabase(), enabled=True), now=NOW)
+    assert expected.briefings
+
+    await jobs.send_daily_briefing()
+
+    log = db.tables["background_job_logs"][0]
+    assert log["status"] == "completed", log.get("error")
+    assert log["records_processed"] == len(expected.briefings)
+    queue = db.tables["notification_queue"]
+    assert {n["user_id"] for n in queue} == {b["user_id"] for b in expected.briefings}
+    assert {n["status"] for n in queue} == {"sent"}
+    assert db.tables["job_watermarks"][0]["job"] == BriefingConfig.JOB
+
+
+@pytest.mark.asyncio
+async def test_send_daily_briefing_failure_keeps_sent_batches(monkeypatch, fake_supabase):
+    from functools import partial
+
+    from app.services import briefing_pipeline, jobs
+
+    monkeypatch.setattr(briefing_pipeline, "_directory", None)
+    monkeypatch.setattr(jobs, "plan_daily_briefings", partial(plan_daily_briefings, now=NOW))
+    monkeypatch.setattr(BriefingConfig, "NOTIFY_BATCH", 2)
+
+    recipients = _recipients(300)
+    db = fake_supabase({
+        "profiles": [{"id": r.user_id, "name": f"{r.first_name} Test", "timezone": r.timezone} for r in recipients],
+    }, assign_ids=True)
+    sent = []
+
+    def create_notifications_batch(_db, _type, batch):
+        if sent:
+            raise RuntimeError("FCM down")
+        sent.extend(batch)
+        return {"created": len(batch), "skipped": 0, "pushed": len(batch)}
+
+    async def get_supabase():
+        return db
+
+    monkeypatch.setattr(jobs, "get_supabase", get_supabase)
+    monkeypatch.setattr(jobs, "create_notifications_batch", create_notifications_batch)
+    expected = plan_daily_briefings(db, WatermarkStore(fake_supabase(), enabled=True), now=NOW)
+    assert len(expected.briefings) > 2
+
+    await jobs.send_daily_briefing()
+
+    assert db.tables["background_job_logs"][0]["status"] == "failed"
+    assert sent == expected.briefings[:2]
+    retry = plan_daily_briefings(db, WatermarkStore(db, enabled=True), now=NOW)
+    assert retry.briefings == expected.briefings[2:]
@@ -0,0 +1,186 @@
+"""
+Tests für die Bulk-Write-Engine (app.db.bulk).
+
+Testet:
+- Chunking
+- Upsert mit on_conflict
+- Isolierung fehlerhafter Zeilen (nur bei Datenfehlern, systemische Fehler ohne Bisektion)
+- update_columns wird im Supabase-Writer abgelehnt
+- Parallele Chunk-Übermittlung
+- create_many: PostgREST-Code/Details bleiben am geworfenen Fehler
+"""
+import pytest
+from postgrest.exceptions import APIError
+from pydantic import BaseModel
+
+from app.core.exceptions import ConflictError
+from app.db.bulk import SupabaseBulkWriter, chunked
+from app.db.repositories.base import BaseRepository
+
+
+class DummyResponse:
+    def __init__(self, data):
+        self.data = data
+        self.error = None
+
+
+class DummyQuery:
+    def __init__(self, parent, method, rows, kwargs):
+        self.parent = parent
+        self.method = method
+        self.rows = rows
+        self.kwargs = kwargs
+
+    def execute(self):
+        self.parent.calls.append((self.method, len(self.rows), self.kwargs))
+        if self.parent.down:
+            raise ConnectionError("connection refused")
+        if any(row.get("email") == "bad" for row in self.rows):
+            raise APIError({"message": "check constraint violated", "code": "23514"})
+        if any(row.get("email") == "dupe" for row in self.rows):
+            raise APIError({
+                "message": 'duplicate key value violates unique constraint "leads_email_key"',
+                "code": "23505",
+                "details": "Key (email)=(dupe) already exists.",
+                "hint": None,
+            })
+        self.parent.rows.extend(self.rows)
+        return DummyResponse(self.rows)
+
+
+class DummyTable:
+    def __init__(self, parent):
+        self.parent = parent
+
+    def insert(self, rows):
+        return DummyQuery(self.parent, "insert", rows, {})
+
+    def upsert(self, rows, **kwargs):
+        return DummyQuery(self.parent, "upsert", rows, kwargs)
+
+
+class DummySupabase:
+    def __init__(self):
+        self.rows = []
+        self.calls = []
+        self.down = False
+
+    def table(self, name):
+        assert name == "leads"
+        return DummyTable(self)
+
+
+def _rows(n, bad=()):
+    return [
+        {"email": "bad" if i in bad else f"lead{i}@example.com"}
+        for i in range(n)
+    ]
+
+
+def test_chunked_offsets():
+    chunks = chunked(list(range(5)), 2)
+    assert [offset for offset, _ in chunks] == [0, 2, 4]
+    assert [list(chunk) for _, chunk in chunks] == [[0, 1], [2, 3], [4]]
+
+
+def test_write_sync_chunks_inserts():
+    client = DummySupabase()
+    result = SupabaseBulkWriter(client, "leads", chunk_size=10).write_sync(_rows(25))
+
+    assert result.ok
+    assert result.written == 25
+    assert result.chunks == 3
+    assert [call[1] for call in client.calls] == [10, 10, 5]
+    assert all(call[0] == "insert" for call in client.calls)
+
+
+def test_on_conflict_uses_upsert():
+    client = DummySupabase()
+    writer = SupabaseBulkWriter(
+        client, "leads", chunk_size=10, on_conflict=["user_id", "email"]
+    )
+    writer.write_sync(_rows(3))
+
+    method, _, kwargs = client.calls[0]
+    assert method == "upsert"
+    assert kwargs["on_conflict"] == "user_id,email"
+    assert kwargs["ignore_duplicates"] is False
+
+
+def test_failing_rows_are_isolated():
+    client = DummySupabase()
+    writer = SupabaseBulkWriter(client, "leads", chunk_size=8)
+    result = writer.write_sync(_rows(16, bad={3, 12}))
+
+    assert result.written == 14
+    assert [e.index for e in result.errors] == [3, 12]
+    assert "check constraint" in result.errors[0].error
+    assert len(client.rows) == 14
+
+
+def test_without_isolation_whole_chunk_fails():
+    client = DummySupabase()
+    writer = SupabaseBulkWriter(client, "leads", chunk_size=4, isolate_errors=False)
+    result = writer.write_sync(_rows(8, bad={1}))
+
+    assert result.written == 4
+    assert [e.index for e in result.errors] == [0, 1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_systemic_errors_fail_fast_without_bisection():
+    client = DummySupabase()
+    client.down = True
+    writer = SupabaseBulkWriter(client, "leads", chunk_size=8, concurrency=1)
+
+    result = writer.write_sync(_rows(32))
+    assert len(client.calls) == 1                   # Kein Bisect, Rest-Chunks übersprungen
+    assert result.written == 0 and result.failed == 32
+    assert "connection refused" in result.errors[31].error
+
+    client.calls.clear()
+    result = await writer.write(_rows(32))
+    assert len(client.calls) == 1 and result.failed == 32
+
+
+def test_update_columns_rejected_for_supabase():
+    with pytest.raises(ValueError):
+        SupabaseBulkWriter(DummySupabase(), "leads", on_conflict=["email"], update_columns=["name"])
+
+
+@pytest.mark.asyncio
+async def test_async_write_parallel_chunks():
+    client = DummySupabase()
+    writer = SupabaseBulkWriter(client, "leads", chunk_size=5, concurrency=3)
+    result = await writer.write(_rows(23, bad={21}))
+
+    assert result.total == 23
+    assert result.written == 22
+    assert [e.index for e in result.errors] == [21]
+    assert len(client.rows) == 22
+
+
+class LeadRow(BaseModel):
+    email: str
+
+
+class LeadRowRepository(BaseRepository[LeadRow]):
+    table_name = "leads"
+    model_class = LeadRow
+
+
+@pytest.mark.asyncio
+async def test_create_many_keeps_api_error_code_and_details():
+    client = DummySupabase()
+    repository = LeadRowRepository(client)
+
+    created = await repository.create_many(_rows(3))
+    assert [lead.email for lead in created] == [f"lead{i}@example.com" for i in range(3)]
+
+    with pytest.raises(ConflictError) as error:
+        await repository.create_many([{"email": "dupe"}])
+
+    assert error.value.details["conflicting_field"] == "email"
+    assert error.value.details["db_code"] == "23505"
+    assert error.value.details["db_details"] == "Key (email)=(dupe) already exists."
+    assert isinstance(error.value.__cause__, APIError)
@@ -0,0 +1,51 @@
+"""
+Tests für den Cache-Codec.
+
+Testet:
+- Roundtrip für alle installierten Serializer/Kompressoren
+- Kompression erst ab Schwellwert
+- Lesen von Legacy-JSON ohne Header
+"""
+import json
+
+import pytest
+
+from app.core.cache_codec import CacheCodec, CodecError, available_codecs
+
+LEADS = [
+    {"id": f"lead-{i}", "name": f"Lead {i}", "status": "warm", "score": i % 100, "tags": ["mlm", "de"]}
+    for i in range(200)
+]
+
+
+@pytest.mark.parametrize("serializer", available_codecs()["serializers"])
+@pytest.mark.parametrize("compression", available_codecs()["compressors"])
+def test_roundtrip(serializer, compression):
+    codec = CacheCodec(serializer=serializer, compression=compression, compress_min_bytes=0)
+    assert codec.decode(codec.encode(LEADS)) == LEADS
+
+
+def test_compression_only_above_threshold():
+    codec = CacheCodec(serializer="json", compression="zlib", compress_min_bytes=1024)
+    small = codec.encode({"count": 3})
+    large = codec.encode(LEADS)
+
+    assert small[3:4] == b"-"
+    assert large[3:4] == b"g"
+    assert len(large) < len(json.dumps(LEADS))
+
+
+def test_reads_entries_from_other_codecs_and_legacy_json():
+    writer = CacheCodec(serializer="json", compression="zlib", compress_min_bytes=0)
+    reader = CacheCodec()
+
+    assert reader.decode(writer.encode(LEADS)) == LEADS
+    assert reader.decode(json.dumps({"count": 3})) == {"count": 3}
+    assert reader.decode(b'{"count": 3}') == {"count": 3}
+
+
+def test_unknown_format_raises():
+    with pytest.raises(CodecError):
+        CacheCodec().decode(b"\xfe\x01?-data")
+    with pytest.raises(ValueError):
+        CacheCodec(serializer="pickle")
@@ -0,0 +1,217 @@
+"""
+Tests für das Cache-Warming vor dem Morgen-Peak.
+
+Testet:
+- Erwartete Login-Zeit aus der Aktivität pro lokalem Tag
+- Auswahl im Fenster, früheste Logins zuerst
+- Einmal pro User und Tag, begrenzte Parallelität; fehlgeschlagene User beim nächsten Lauf erneut
+- Frisch nur für die View-TTL, Grace bis zum Login
+- Warmed/used-Zählung über read_view (im Hintergrund, gepipelined)
+- Eigener Key-Namespace, getrennt von den Request-Handler-Keys
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from datetime import time as dtime
+
+import pytest
+
+from app.core.cache import CacheConfig, CacheKeyBuilder
+from app.services import cache_warming
+from app.services.cache_warming import (
+    CacheWarmer,
+    CacheWarmingConfig,
+    WarmCandidate,
+    WarmView,
+    build_candidates,
+    read_view,
+    warm_stats,
+)
+from tests.test_local_cache import FakePipeline, FakeRedis, _service
+
+
+class WarmingPipeline(FakePipeline):
+    def zscore(self, key, member):
+        self.ops.append(lambda: self.redis.zsets.get(key, {}).get(member))
+
+    def zrem(self, key, member):
+        self.ops.append(lambda: int(self.redis.zsets.get(key, {}).pop(member, None) is not None))
+
+
+class WarmingRedis(FakeRedis):
+    """FakeRedis plus the set/zset/hash commands used by the warmer."""
+
+    def __init__(self):
+        super().__init__()
+        self.zsets = {}
+        self.hashes = {}
+
+    async def sadd(self, key, *members):
+        bucket = self.sets.setdefault(key, set())
+        added = len(set(members) - bucket)
+        bucket.update(members)
+        return added
+
+    async def srem(self, key, *members):
+        bucket = self.sets.get(key, set())
+        removed = len(bucket & set(members))
+        bucket.difference_update(members)
+        return removed
+
+    async def expire(self, key, ttl):
+        return 1
+
+    async def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+        return len(mapping)
+
+    async def zscore(self, key, member):
+        return self.zsets.get(key, {}).get(member)
+
+    async def zrem(self, key, member):
+        return int(self.zsets.get(key, {}).pop(member, None) is not None)
+
+    async def zremrangebyscore(self, key, low, high):
+        zset = self.zsets.get(key, {})
+        old = [m for m, score in zset.items() if score <= high]
+        for member in old:
+            del zset[member]
+        return len(old)
+
+    async def hincrby(self, key, field, amount):
+        bucket = self.hashes.setdefault(key, {})
+        bucket[field] = bucket.get(field, 0) + amount
+        return bucket[field]
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def pipeline(self, transaction=True):
+        return WarmingPipeline(self)
+
+
+NOW = datetime(2024, 11, 20, 6, 0, tzinfo=timezone.utc)  # 07:00 in Vienna
+
+
+def _candidate(user_id, login, tz="Europe/Vienna", active_hours_ago=1):
+    return WarmCandidate(user_id, tz, login, NOW - timedelta(hours=active_hours_ago))
+
+
+def test_expected_login_from_first_activity_per_local_day():
+    rows = []
+    for day in range(4):
+        start = datetime(2024, 11, 10 + day, 13, 0, tzinfo=timezone.utc)  # 08:00 New York
+        rows += [
+            {"user_id": "ny", "created_at": start.isoformat()},
+            {"user_id": "ny", "created_at": (start + timedelta(hours=3)).isoformat()},
+        ]
+    rows.append({"user_id": "new", "created_at": NOW.isoformat()})
+
+    candidates = {c.user_id: c for c in build_candidates(rows, {"ny": "America/New_York"})}
+
+    assert candidates["ny"].login == dtime(8, 0)
+    assert candidates["ny"].tz == "America/New_York"
+    # Too little history: daily briefing time in the default timezone
+    assert candidates["new"].login == CacheWarmingConfig.DEFAULT_LOGIN
+    assert candidates["new"].tz == "Europe/Vienna"
+
+
+def test_due_users_within_window_earliest_first():
+    warmer = CacheWarmer(db=None, cache=None, window_minutes=45)
+    candidates = [
+        _candidate("later", dtime(7, 40)),
+        _candidate("soon", dtime(7, 20), active_hours_ago=5),
+        _candidate("soon_recent", dtime(7, 20), active_hours_ago=1),
+        _candidate("too_late", dtime(9, 0)),
+        _candidate("already_in", dtime(6, 30)),
+    ]
+
+    due = [c.user_id for _, c in warmer.due(candidates, NOW)]
+    assert due == ["soon_recent", "soon", "later"]
+
+
+@pytest.mark.asyncio
+async def test_run_warms_once_and_counts_usage(monkeypatch):
+    redis = WarmingRedis()
+    cache = _service(redis)
+    builds = []
+    running = 0
+    peak = 0
+
+    async def build(db, user_id):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        builds.append(user_id)
+        return {"user": user_id}
+
+    view = WarmView("dashboard", build, 600)
+    monkeypatch.setitem(cache_warming.VIEWS, "dashboard", view)
+
+    warmer = CacheWarmer(db=None, cache=cache, concurrency=2, views=["dashboard"])
+    warmer._candidates = [_candidate(f"u{i}", dtime(7, 15)) for i in range(6)]
+    warmer._candidates_at = time.monotonic()
+
+    report = await warmer.run(now=NOW)
+    assert report.due == 6 and report.warmed_users == 6
+    assert report.views["dashboard"]["warmed"] == 6
+    assert sorted(builds) == [f"u{i}" for i in range(6)]
+    assert peak <= 2
+
+    # Second run the same day: nobody is warmed twice
+    again = await warmer.run(now=NOW + timedelta(minutes=10))
+    assert again.skipped_done == 6 and again.warmed_users == 0
+
+    # First read of a warmed key counts as used, later reads don't
+    async def not_called(db, user_id):
+        raise AssertionError("warmed value must be served")
+
+    monkeypatch.setitem(cache_warming.VIEWS, "dashboard", WarmView("dashboard", not_called, 600))
+    value, meta = await read_view("dashboard", "u0", db=None, cache=cache)
+    assert value == {"user": "u0"} and meta["status"] == "fresh"
+    await read_view("dashboard", "u0", db=None, cache=cache)
+    await asyncio.gather(*list(cache_warming._usage_tasks))
+
+    # Warm views don't share keys with the request handlers' caches
+    assert view.key("u0").startswith(f"{CacheWarmingConfig.KEY_PREFIX}:view:")
+    assert CacheKeyBuilder.dashboard_stats("u0") not in redis.data
+
+    stats = await warm_stats(cache, NOW.date())
+    assert stats["views"]["dashboard"]["warmed"] == 6
+    assert stats["views"]["dashboard"]["used"] == 1
+    assert stats["views"]["dashboard"]["used_ratio"] == round(1 / 6, 3)
+
+
+@pytest.mark.asyncio
+async def test_failed_users_are_retried_and_fresh_ttl_is_capped(monkeypatch):
+    redis = WarmingRedis()
+    cache = _service(redis)
+    failing = {"u1"}
+    stored = {}
+
+    async def build(db, user_id):
+        if user_id in failing:
+            raise RuntimeError("db timeout")
+        return {"user": user_id}
+
+    async def set_swr(key, value, ttl, grace=0, tags=None):
+        stored[key] = (ttl, grace)
+        return True
+
+    monkeypatch.setitem(cache_warming.VIEWS, "dashboard", WarmView("dashboard", build, 600))
+    monkeypatch.setattr(cache, "set_swr", set_swr)
+    warmer = CacheWarmer(db=None, cache=cache, views=["dashboard"])
+    warmer._candidates = [_candidate("u0", dtime(7, 40)), _candidate("u1", dtime(7, 40))]
+    warmer._candidates_at = time.monotonic()
+
+    report = await warmer.run(now=NOW)
+    assert report.warmed_users == 1 and report.failed_users == 1
+    # Frisch nur 600 s, die 40 min bis zum Login deckt die Grace ab
+    ttl, grace = stored[cache_warming.VIEWS["dashboard"].key("u0")]
+    assert ttl == 600 and grace == CacheConfig.SWR_GRACE_SECONDS + 40 * 60
+
+    failing.clear()
+    again = await warmer.run(now=NOW + timedelta(minutes=10))
+    assert again.skipped_done == 1 and again.warmed_users == 1
@@ -0,0 +1,132 @@
+"""
+Tests für das Read-Replica-Routing.
+
+Testet:
+- Routing nach HTTP-Methode
+- Read-your-writes Stickiness
+- Middleware inkl. Cookie
+- get_supabase_read: derselbe Replica-Client wie app.supabase_client, URL aus den Settings
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.db.routing import (
+    DbRole,
+    ReplicaRouter,
+    client_fingerprint,
+    current_role,
+    replica_job,
+    use_replica,
+)
+from app.middleware.db_routing import DbRoutingMiddleware
+
+
+def test_get_routes_to_replica_and_writes_to_primary():
+    router = ReplicaRouter(sticky_window_seconds=5)
+    assert router.route_for("GET", client="a") == DbRole.REPLICA
+    assert router.route_for("POST", client="a") == DbRole.PRIMARY
+
+
+def test_read_your_writes_stickiness():
+    router = ReplicaRouter(sticky_window_seconds=5)
+    router.mark_write("a")
+
+    assert router.route_for("GET", client="a") == DbRole.PRIMARY
+    assert router.route_for("GET", client="b") == DbRole.REPLICA
+    assert router.stats()["pools"]["primary"]["sticky_redirects"] == 1
+
+
+def test_stickiness_expires():
+    router = ReplicaRouter(sticky_window_seconds=0)
+    router.mark_write("a")
+    assert router.route_for("GET", client="a") == DbRole.REPLICA
+
+
+def test_tracked_clients_are_bounded():
+    router = ReplicaRouter(sticky_window_seconds=5, max_tracked_clients=3)
+    for i in range(10):
+        router.mark_write(f"client-{i}")
+    assert router.stats()["tracked_clients"] == 3
+    assert router.is_sticky("client-9")
+    assert not router.is_sticky("client-0")
+
+
+def test_fingerprint_prefers_token_and_hashes_it():
+    token_fp = client_fingerprint(authorization="Bearer secret", client_ip="1.2.3.4")
+    assert token_fp != client_fingerprint(client_ip="1.2.3.4")
+    assert "secret" not in token_fp
+    assert client_fingerprint() is None
+
+
+@pytest.mark.asyncio
+async def test_replica_job_sets_role():
+    @replica_job
+    async def job():
+        return current_role()
+
+    assert await job() == DbRole.REPLICA
+    assert current_role() == DbRole.PRIMARY
+    with use_replica():
+        assert current_role() == DbRole.REPLICA
+
+
+@pytest.mark.asyncio
+async def test_read_dependency_shares_the_replica_client(monkeypatch):
+    from app import supabase_client
+    from app.core import deps
+
+    created = []
+    settings = supabase_client.get_settings().model_copy(update={
+        "supabase_read_replica_url": "https://replica.example.co",
+        "supabase_service_role_key": "service-key",
+    })
+    monkeypatch.setattr(supabase_client, "get_settings", lambda: settings)
+    monkeypatch.setattr(supabase_client, "create_client", lambda url, key: created.append((url, key)) or object())
+    monkeypatch.setattr(supabase_client, "_supabase_read_client", None)
+
+    with use_replica():
+        client = await deps.get_supabase_read()
+        assert supabase_client.get_routed_supabase_client() is client
+
+    # Ein Replica-Client pro Prozess, aus der URL in den Settings
+    assert created == [("https://replica.example.co", "service-key")]
+    assert client is supabase_client._supabase_read_client
+    assert not hasattr(deps, "_supabase_read_client")
+
+
+def _app(router: ReplicaRouter) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(DbRoutingMiddleware, router=router)
+
+    @app.get("/items")
+    async def list_items():
+        return {"role": current_role().value}
+
+    @app.post("/items")
+    async def create_item():
+        return {"role": current_role().value}
+
+    return app
+
+
+def test_middleware_routes_and_sets_sticky_cookie():
+    router = ReplicaRouter(sticky_window_seconds=5)
+    client = TestClient(_app(router))
+    headers = {"Authorization": "Bearer user-a"}
+
+    assert client.get("/items", headers=headers).json()["role"] == "replica"
+
+    response = client.post("/items", headers=headers)
+    assert response.json()["role"] == "primary"
+    assert "sf_db_primary_until" in response.cookies
+
+    # Same client reads its own write from the primary
+    follow_up = client.get("/items", headers=headers)
+    assert follow_up.json()["role"] == "primary"
+    assert follow_up.headers["X-DB-Route"] == "primary"
+
+    # Another worker without in-process state still honours the cookie
+    other_worker = TestClient(_app(ReplicaRouter(sticky_window_seconds=5)))
+    other_worker.cookies.set("sf_db_primary_until", response.cookies["sf_db_primary_until"])
+    assert other_worker.get("/items", headers=headers).json()["role"] == "primary"
@@ -6,6 +6,8 @@ Testet:
 - FollowUpSuggestion
 - Sequenzen
 - Prioritätsberechnung
+- Due-Index (Range-Read für heutige Follow-ups, Rebuild, State-Wechsel)
+- Batch-Berechnung (get_next_follow_ups) mit gesammelten Repository-Calls
 """
 import pytest
 from uuid import uuid4
@@ -24,6 +26,7 @@ from app.models.followup import (
     AIMessage,
 )
 from app.services.followup_engine import FollowUpEngine
+from app.services.followup_due_index import DueEntry, InMemoryDueIndex
 from app.services.timezone_service import DefaultTimezoneService
 from app.repositories.followup_repository_mock import InMemoryFollowUpRepository
 from app.services.ai_router_dummy import DummyAIRouter
@@ -225,7 +228,7 @@ class TestTimezoneService:
     def test_next_best_contact_time_if_past(self, timezone_service):
         """Testet, dass morgen genommen wird wenn heute vorbei."""
         # Setze Basis auf 19:00
-        base = datetime.now(timezone_service._resolve_tz("Europe/Berlin"))
+        base = datetime.now(timezone_service.resolve_tz("Europe/Berlin"))
         base = base.replace(hour=19, minute=0, second=0)
         
         best_time = timezone_service.next_best_contact_time("Europe/Berlin", base)
@@ -380,6 +383,161 @@ class TestFollowUpIntegration:
         assert len(suggestions) >= 1
 
 
+# ============= Due-Index Tests =============
+
+def _aware_leads(repository, count=6):
+    """Ersetzt die Demo-Leads durch Leads mit timezone-aware Zeitstempeln."""
+    from datetime import timezone as tz
+
+    owner_id = uuid4()
+    repository._leads.clear()
+    for i in range(count):
+        repository.add_lead(LeadContext(
+            id=uuid4(),
+            workspace_id=uuid4(),
+            owner_id=owner_id,
+            full_name=f"Lead {i}",
+            first_name=f"Lead{i}",
+            timezone="Europe/Vienna",
+            primary_channel=FollowUpChannel.WHATSAPP,
+            language="de",
+            last_contacted_at=datetime.now(tz.utc) - timedelta(days=i * 3),
+            lead_score=20.0 * i,
+        ))
+    return owner_id
+
+
+class TestDueIndex:
+    """Tests für den Due-Index."""
+
+    @pytest.mark.asyncio
+    async def test_range_is_time_ordered_per_owner(self):
+        """Range-Read liefert nur fällige Einträge, zeitlich sortiert, optional pro Owner."""
+        index = InMemoryDueIndex()
+        now = datetime.now()
+        for i, hours in enumerate([5, -2, 30, 1]):
+            await index.upsert(DueEntry(
+                lead_id=f"lead-{i}",
+                owner_id="owner-a" if i % 2 else "owner-b",
+                recommended_time=now + timedelta(hours=hours),
+                priority=FollowUpPriority.HIGH,
+            ))
+        await index.upsert(DueEntry(lead_id="lead-0", owner_id="owner-b", recommended_time=now + timedelta(hours=40)))
+
+        due = await index.range(now + timedelta(hours=24))
+        assert [e.lead_id for e in due] == ["lead-1", "lead-3"]
+        assert [e.lead_id for e in await index.range(now + timedelta(hours=48), owner_id="owner-b")] == ["lead-2", "lead-0"]
+
+        await index.remove("lead-1")
+        assert [e.lead_id for e in await index.range(now + timedelta(hours=24))] == ["lead-3"]
+
+    @pytest.mark.asyncio
+    async def test_today_followups_range_read_matches_full_scan(self, repository, ai_router, timezone_service):
+        """Mit Index: gleiches Ergebnis wie der Scan, ohne Sequenz-Logik pro Lead."""
+        owner_id = _aware_leads(repository)
+        scan_engine = FollowUpEngine(repo=repository, ai_router=ai_router, tz_service=timezone_service)
+        expected = await scan_engine.get_today_followups()
+
+        engine = FollowUpEngine(
+            repo=repository, ai_router=ai_router, tz_service=timezone_service, due_index=InMemoryDueIndex()
+        )
+        assert await engine.rebuild_due_index() == len(await repository.list_all_leads())
+
+        calls = []
+        original = repository.get_active_sequence_state
+
+        async def counting(lead_id):
+            calls.append(lead_id)
+            return await original(lead_id)
+
+        repository.get_active_sequence_state = counting
+        today = await engine.get_today_followups()
+
+        assert {s.lead_id for s in today} == {s.lead_id for s in expected}
+        assert [s.priority for s in today] == [s.priority for s in expected]     # Nach Priorität sortiert
+        assert calls == []
+
+        assert len(await engine.get_today_followups(user_id=owner_id)) == len(today)
+        assert await engine.get_today_followups(user_id=uuid4()) == []
+
+    @pytest.mark.asyncio
+    async def test_rescheduled_entries_move_or_get_reevaluated(self, repository, ai_router, timezone_service):
+        """State-Wechsel verschieben den Eintrag; ohne Zeitpunkt wird beim Lesen neu bewertet."""
+        _aware_leads(repository)
+        engine = FollowUpEngine(
+            repo=repository, ai_router=ai_router, tz_service=timezone_service, due_index=InMemoryDueIndex()
+        )
+        await engine.rebuild_due_index()
+        lead = (await repository.list_all_leads())[0]
+
+        await engine.reschedule_due_entry(str(lead.owner_id), str(lead.id), datetime.now() + timedelta(days=3))
+        assert lead.id not in {s.lead_id for s in await engine.get_today_followups()}
+
+        await engine.reschedule_due_entry(str(lead.owner_id), str(lead.id), None)
+        entry = await engine.due_index.get(str(lead.id))
+        assert entry.suggestion is None
+        await engine.get_today_followups()
+        entry = await engine.due_index.get(str(lead.id))
+        assert entry.suggestion is not None                 # Neu bewertet und wieder indiziert
+
+
+    @pytest.mark.asyncio
+    async def test_rebuild_route_only_touches_callers_leads(self, repository, ai_router, timezone_service):
+        """POST /follow-ups/due-index/rebuild baut nur die Leads des Aufrufers neu auf."""
+        from app.routers.followups import rebuild_due_index
+
+        owner_id = _aware_leads(repository, count=4)
+        other = (await repository.list_all_leads())[0].model_copy(update={"id": uuid4(), "owner_id": uuid4()})
+        repository.add_lead(other)
+        engine = FollowUpEngine(
+            repo=repository, ai_router=ai_router, tz_service=timezone_service, due_index=InMemoryDueIndex()
+        )
+        foreign = DueEntry(lead_id="foreign", owner_id=str(other.owner_id), recommended_time=datetime.now())
+        await engine.due_index.upsert(foreign)
+
+        result = await rebuild_due_index(current_user={"id": str(owner_id)}, engine=engine)
+
+        assert result["indexed"] == 4
+        assert await engine.due_index.get("foreign") is foreign
+        assert await engine.due_index.get(str(other.id)) is None
+
+# ============= Batch Tests =============
+
+class TestBatchFollowUps:
+    """Tests für get_next_follow_ups."""
+
+    @pytest.mark.asyncio
+    async def test_batch_matches_single_with_bulk_calls(self, repository, engine):
+        """Gleiche Entscheidungen wie der Einzel-Pfad, aber gesammelte Repository-Calls."""
+        _aware_leads(repository, count=30)
+        lead_ids = [lead.id for lead in await repository.list_all_leads()]
+        repository.add_interaction(lead_ids[0], {"type": "reply_positive"})
+
+        first = await engine.get_next_follow_ups(lead_ids)       # Initialisiert die States
+        assert list(first) == lead_ids
+
+        calls = {}
+        for name in ("get_lead_context", "get_active_sequence_state", "get_sequence_by_id",
+                     "get_recent_interactions", "get_recent_interactions_bulk", "get_lead_contexts"):
+            original = getattr(repository, name)
+
+            def counting(*args, _name=name, _original=original, **kwargs):
+                calls[_name] = calls.get(_name, 0) + 1
+                return _original(*args, **kwargs)
+
+            setattr(repository, name, counting)
+
+        batch = await engine.get_next_follow_ups(lead_ids + [uuid4()])
+        # Sequenz kommt aus dem Definitions-Cache
+        assert calls == {"get_lead_contexts": 1, "get_recent_interactions_bulk": 1}
+
+        for lead_id in lead_ids[:5]:
+            single = await engine.get_next_follow_up(lead_id)
+            assert (batch[lead_id].step_id, batch[lead_id].priority) == (single.step_id, single.priority)
+        assert batch[lead_ids[-1]].recommended_channel == FollowUpChannel.WHATSAPP
+        assert list(batch.values())[-1] is None                 # Unbekannter Lead
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
 
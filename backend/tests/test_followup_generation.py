@@ -0,0 +1,82 @@
+"""
+Tests für die Batch-Generierung von Follow-up-Vorschlägen.
+
+Testet:
+- Set-basierte Pipeline: Queries unabhängig von der Lead-Anzahl
+- Anti-Join auf bestehende pending Suggestions
+- Personalisierung wie bisher
+"""
+from datetime import datetime, timedelta, timezone
+
+from app.services.followup_generation import generate_followup_suggestions
+
+NOW = datetime(2025, 1, 10, 9, 0, tzinfo=timezone.utc)
+
+
+def _leads(count, **overrides):
+    due = (NOW - timedelta(hours=1)).isoformat()
+    return [
+        {
+            "id": f"lead-{i:05d}",
+            "user_id": f"user-{i % 7}",
+            "name": f"Anna{i} Berg",
+            "company": "ACME",
+            "flow": "cold",
+            "follow_up_stage": 1,
+            "next_follow_up_at": due,
+            "last_outreach_at": (NOW - timedelta(days=3)).isoformat(),
+            "preferred_channel": None,
+            "do_not_contact": None,
+            **overrides,
+        }
+        for i in range(count)
+    ]
+
+
+def _db(fake_supabase, leads, suggestions=()):
+    return fake_supabase({
+        "leads": leads,
+        "followup_suggestions": list(suggestions),
+        "followup_rules": [{"flow": "cold", "stage": 1, "template_key": "cold_1"}],
+        "message_templates": [{"step_key": "cold_1", "template_text": "Hey {name} von {company}!"}],
+    })
+
+
+def test_query_count_independent_of_lead_count(fake_supabase):
+    db = _db(fake_supabase, _leads(2_500))
+
+    report = generate_followup_suggestions(db, now=NOW, page_size=1000)
+
+    assert report.created == 2_500
+    assert report.users == 7
+    assert report.pages == 3
+    # 2 lookups (rules, templates) + per page: leads, 5 pending chunks, 2-ish inserts
+    assert len(db.queries) <= 2 + 3 * (1 + 5 + 2)
+    assert report.rows_per_second > 0 and report.duration_ms > 0
+
+
+def test_existing_pending_suggestions_are_skipped(fake_supabase):
+    leads = _leads(10)
+    pending = [{"lead_id": "lead-00003", "status": "pending"}, {"lead_id": "lead-00004", "status": "sent"}]
+    db = _db(fake_supabase, leads, pending)
+
+    report = generate_followup_suggestions(db, now=NOW)
+
+    created = [s for s in db.tables["followup_suggestions"] if "suggested_message" in s]
+    assert report.skipped_pending == 1
+    assert {s["lead_id"] for s in created} == {l["id"] for l in leads} - {"lead-00003"}
+
+
+def test_personalization_and_filters(fake_supabase):
+    leads = _leads(1) + _leads(1, id="lead-dnc", do_not_contact=True) + _leads(1, id="lead-noflow", flow=None)
+    leads += _leads(1, id="lead-stage9", follow_up_stage=9)
+    db = _db(fake_supabase, leads)
+
+    report = generate_followup_suggestions(db, now=NOW)
+
+    assert report.created == 1 and report.skipped_no_rule == 1
+    suggestion = db.tables["followup_suggestions"][0]
+    assert suggestion["suggested_message"] == "Hey Anna0 von ACME!"
+    assert suggestion["reason"] == "Keine Antwort seit 3 Tagen"
+    assert suggestion["channel"] == "WHATSAPP"
+    assert suggestion["status"] == "pending" and suggestion["template_key"] == "cold_1"
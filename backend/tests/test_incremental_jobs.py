@@ -0,0 +1,218 @@
+"""
+Tests für die Watermark-basierten inkrementellen Jobs.
+
+Testet:
+- Erster Lauf voll, danach nur das Fenster seit dem Watermark, periodische Voll-Abgleiche
+- Überfällige Follow-ups / Churn-Risiken: nur betroffene User, deren Liste aber vollständig
+- Monatsumsatz aus dem Job-State, nur geänderte User neu gelesen
+- Follow-up-Generierung scannt nur neu fällige oder geänderte Leads
+- Jobs (check_follow_ups, detect_churn_risks, track_goals) auf einem sync Supabase-Client
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services.followup_generation import run_followup_generation
+from app.services.incremental_jobs import (
+    WatermarkStore,
+    churn_risks_by_user,
+    monthly_revenue_by_user,
+    overdue_followups_by_user,
+)
+
+NOW = datetime(2025, 3, 12, 9, 0, tzinfo=timezone.utc)
+
+
+def ts(dt):
+    return dt.isoformat()
+
+
+def test_watermark_window_full_then_incremental_then_reconcile(fake_supabase):
+    db = fake_supabase({})
+    store = WatermarkStore(db, enabled=True)
+
+    first = store.begin("job", NOW)
+    assert first.full
+    store.commit(first, state={"k": 1})
+
+    second = store.begin("job", NOW + timedelta(hours=4), reconcile_every=timedelta(days=1))
+    assert not second.full and second.since == NOW and second.state == {"k": 1}
+    assert second.changed_since < second.since          # Overlap for late commits
+    store.commit(second)
+
+    # Reconciliation due (last full run a day ago) and kill switch
+    assert store.begin("job", NOW + timedelta(days=1), reconcile_every=timedelta(days=1)).full
+    assert WatermarkStore(db, enabled=False).begin("job", NOW + timedelta(hours=5)).full
+
+    # A failed run does not commit: the next run gets the same window
+    third = store.begin("job", NOW + timedelta(hours=8), reconcile_every=timedelta(days=1))
+    assert third.since == second.until
+
+
+def _suggestion(i, user, due, status="pending", updated=None):
+    return {
+        "id": f"s-{i:04d}", "user_id": user, "lead_id": f"l-{i}", "title": f"Task {i}",
+        "due_at": ts(due), "status": status, "updated_at": ts(updated or due - timedelta(days=1)),
+        "leads": {"name": f"Lead {i}"},
+    }
+
+
+def test_overdue_followups_only_for_users_with_changes(fake_supabase):
+    old = NOW - timedelta(days=3)
+    rows = [_suggestion(i, f"user-{i % 50}", old - timedelta(minutes=i)) for i in range(500)]
+    rows.append(_suggestion(900, "user-1", NOW + timedelta(hours=2)))             # Due in the window
+    rows.append(_suggestion(901, "user-2", NOW + timedelta(hours=1), "sent"))     # Not pending
+    rows.append(_suggestion(902, "user-3", old, updated=NOW + timedelta(hours=1)))  # Snoozed back
+    db = fake_supabase({"followup_suggestions": rows})
+    store = WatermarkStore(db, enabled=True)
+
+    full = store.begin("check_follow_ups", NOW)
+    assert len(overdue_followups_by_user(db, full)) == 50
+    store.commit(full)
+
+    window = store.begin("check_follow_ups", NOW + timedelta(hours=4), reconcile_every=timedelta(days=1))
+    db.queries.clear()
+    by_user = overdue_followups_by_user(db, window)
+
+    assert set(by_user) == {"user-1", "user-3"}
+    assert len(by_user["user-1"]) == 11                  # Complete list, not only the new task
+    assert by_user["user-1"][0]["due_at"] < by_user["user-1"][-1]["due_at"]   # Oldest first
+    assert len(db.queries) == 2                          # Changed users + their tasks
+
+
+def test_churn_risks_report_newly_inactive_and_changed_customers(fake_supabase):
+    cutoff = NOW - timedelta(days=30)
+    leads = [
+        {"id": f"lead-{i:04d}", "user_id": f"user-{i % 20}", "name": f"C{i}", "company": None,
+         "status": "won", "last_contact": ts(cutoff - timedelta(days=10)), "updated_at": ts(cutoff)}
+        for i in range(400)
+    ]
+    leads += [
+        # Crosses the 30-day cutoff during the next day
+        {"id": "lead-new", "user_id": "user-a", "name": "New", "company": None, "status": "won",
+         "last_contact": ts(cutoff + timedelta(hours=12)), "updated_at": ts(cutoff)},
+        # Became a customer (updated) with an old last contact
+        {"id": "lead-won", "user_id": "user-b", "name": "Won", "company": None, "status": "won",
+         "last_contact": ts(cutoff - timedelta(days=5)), "updated_at": ts(NOW + timedelta(hours=2))},
+    ]
+    db = fake_supabase({"leads": leads})
+    store = WatermarkStore(db, enabled=True)
+
+    full = store.begin("detect_churn_risks", NOW)
+    assert sum(len(v) for v in churn_risks_by_user(db, full).values()) == 401
+    store.commit(full)
+
+    window = store.begin("detect_churn_risks", NOW + timedelta(days=1))
+    by_user = churn_risks_by_user(db, window)
+    assert set(by_user) == {"user-a", "user-b"}
+    assert [lead["id"] for lead in by_user["user-a"]] == ["lead-new"]
+
+
+def test_monthly_revenue_kept_in_state_and_recomputed_for_changed_users(fake_supabase):
+    month_start = NOW.replace(day=1)
+    deals = [
+        {"id": f"d-{i:04d}", "user_id": f"user-{i % 10}", "value": 100, "status": "won",
+         "closed_at": ts(month_start + timedelta(days=1)), "updated_at": ts(month_start + timedelta(days=1))}
+        for i in range(100)
+    ]
+    db = fake_supabase({"deals": deals})
+    store = WatermarkStore(db, enabled=True)
+
+    full = store.begin("track_goals", NOW)
+    assert monthly_revenue_by_user(db, full)["user-3"] == 1000
+    store.commit(full)
+
+    later = NOW + timedelta(days=1)
+    deals.append({"id": "d-new", "user_id": "user-3", "value": 500, "status": "won",
+                  "closed_at": ts(later - timedelta(hours=1)), "updated_at": ts(later - timedelta(hours=1))})
+    deals[4].update(status="lost", updated_at=ts(later - timedelta(hours=2)))   # user-4 loses one
+    window = store.begin("track_goals", later)
+    db.queries.clear()
+    revenue = monthly_revenue_by_user(db, window)
+
+    assert (revenue["user-3"], revenue["user-4"], revenue["user-5"]) == (1500, 900, 1000)
+    assert len(db.queries) == 2
+
+    # New month: full recompute instead of carrying last month's state
+    store.commit(window)
+    next_month = store.begin("track_goals", datetime(2025, 4, 1, 9, 0, tzinfo=timezone.utc))
+    assert monthly_revenue_by_user(db, next_month) == {}
+
+
+def test_followup_generation_scans_only_newly_due_leads(monkeypatch, fake_supabase):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "incremental_jobs_enabled", True)
+    leads = [
+        {"id": f"lead-{i:05d}", "user_id": f"user-{i % 7}", "name": f"Anna{i} Berg", "company": "ACME",
+         "flow": "cold", "follow_up_stage": 1, "next_follow_up_at": ts(NOW - timedelta(hours=1)),
+         "updated_at": ts(NOW - timedelta(days=2)), "last_outreach_at": ts(NOW - timedelta(days=3)),
+         "preferred_channel": None, "do_not_contact": None}
+        for i in range(300)
+    ]
+    db = fake_supabase({
+        "leads": leads,
+        "followup_suggestions": [],
+        "followup_rules": [{"flow": "cold", "stage": 1, "template_key": "cold_1"}],
+        "message_templates": [{"step_key": "cold_1", "template_text": "Hey {name}!"}],
+    })
+
+    assert run_followup_generation(db, now=NOW).leads_scanned == 300
+
+    leads.append({**leads[0], "id": "lead-late", "next_follow_up_at": ts(NOW + timedelta(minutes=10))})
+    report = run_followup_generation(db, now=NOW + timedelta(minutes=15))
+
+    assert report.leads_scanned == 1 and report.created == 1
+
+
+@pytest.mark.asyncio
+async def test_jobs_run_on_sync_client(monkeypatch, fake_supabase):
+    from app.services import firebase, jobs
+
+    now = datetime.now(timezone.utc)
+    users = [f"user-{i}" for i in range(3)]
+    db = fake_supabase({
+        # Quiet hours 00:00-00:00: never active, independent of the time of day
+        "user_notification_preferences": [
+            {"user_id": u, "quiet_hours_start": "00:00", "quiet_hours_end": "00:00"} for u in users
+        ],
+        "followup_suggestions": [
+            _suggestion(i, users[i % 3], now - timedelta(days=1, minutes=i)) for i in range(6)
+        ],
+        "leads": [
+            {"id": f"c-{i}", "user_id": users[i], "name": f"Kunde {i}", "status": "won",
+             "last_contact": ts(now - timedelta(days=40)), "updated_at": ts(now - timedelta(days=40))}
+            for i in range(2)
+        ],
+        "profiles": [{"id": u, "name": u, "monthly_revenue_goal": 1000} for u in users],
+        "deals": [{"id": "d-1", "user_id": "user-0", "value": 5000, "status": "won",
+                   "closed_at": ts(now.replace(day=1, hour=0, minute=0, second=1))}],
+        "push_subscriptions": [],
+    }, assign_ids=True)
+
+    async def get_db():
+        return db
+
+    monkeypatch.setattr(jobs, "get_supabase", get_db)
+    monkeypatch.setattr(jobs, "get_supabase_read", get_db)
+    monkeypatch.setattr(firebase, "get_firebase_app", lambda: None)
+
+    await jobs.check_follow_ups()
+    await jobs.detect_churn_risks()
+    await jobs.track_goals()
+
+    logs = {log["job_name"]: log for log in db.tables["background_job_logs"]}
+    assert {name: log["status"] for name, log in logs.items()} == {
+        "check_follow_ups": "completed", "detect_churn_risks": "completed", "track_goals": "completed",
+    }, [log.get("error") for log in logs.values()]
+    assert logs["check_follow_ups"]["records_processed"] == 6
+    assert logs["detect_churn_risks"]["records_processed"] == 2
+    by_type = {}
+    for notification in db.tables["notification_queue"]:
+        by_type.setdefault(notification["type"], set()).add(notification["user_id"])
+    assert by_type["overdue_followups"] == set(users)
+    assert by_type["churn_risk"] == {"user-0", "user-1"}
+    assert "user-0" in by_type["goal_ahead"]
+    assert {row["job"] for row in db.tables["job_watermarks"]} == {
+        "check_follow_ups", "detect_churn_risks", "track_goals",
+    }
@@ -0,0 +1,217 @@
+"""
+Tests für die Job-Koordination über mehrere Replicas.
+
+Testet:
+- Ein Job läuft pro Tick nur auf einer Replica
+- Intervall-Jobs: Lock hält über die Periode, unabhängig vom Trigger-Offset
+- Sharding: Replicas teilen die User über feste Slots lückenlos und ohne Überschneidung,
+  auch wenn sich die Mitgliedschaft während eines Ticks ändert
+- Lease-Verlängerung per Heartbeat, Lock-Ablauf, Betrieb ohne Redis
+- Heartbeats unter der Job-ID, auch für geshardete Jobs
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.services.job_coordinator import (
+    JobCoordinator,
+    JobCoordinatorConfig,
+    Shard,
+    current_shard,
+    shard_filter,
+)
+
+
+class LockRedis:
+    """Async Redis stand-in: strings with PX expiry, one zset, one hash."""
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.zset = {}
+        self.hash = {}
+
+    def _alive(self, key):
+        if key in self.expires and self.expires[key] <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    async def set(self, key, value, nx=False, px=None):
+        if nx and self._alive(key):
+            return None
+        self.data[key] = value
+        self.expires[key] = time.monotonic() + px / 1000
+        return True
+
+    async def eval(self, script, numkeys, key, token, ms):
+        if not self._alive(key) or self.data[key] != token:
+            return 0
+        if "DEL" in script and int(ms) <= 0:
+            del self.data[key]
+            return 1
+        self.expires[key] = time.monotonic() + int(ms) / 1000
+        return 1
+
+    async def zadd(self, key, mapping):
+        self.zset.update(mapping)
+
+    async def zremrangebyscore(self, key, low, high):
+        for member in [m for m, score in self.zset.items() if score <= high]:
+            del self.zset[member]
+
+    async def zrangebyscore(self, key, low, high):
+        return [m.encode() for m, score in self.zset.items() if score >= low]
+
+    async def zrem(self, key, member):
+        self.zset.pop(member, None)
+
+    async def hset(self, key, field, value):
+        self.hash[field] = value
+
+    async def hgetall(self, key):
+        return {k.encode(): v for k, v in self.hash.items()}
+
+
+@pytest.mark.asyncio
+async def test_job_runs_once_across_replicas():
+    redis = LockRedis()
+    replicas = [JobCoordinator(redis, instance_id=f"r{i}") for i in range(3)]
+    runs = []
+
+    async def job():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return "done"
+
+    results = await asyncio.gather(*(r.run("update_lead_scores", job) for r in replicas))
+
+    assert len(runs) == 1
+    assert results.count("done") == 1 and results.count(None) == 2
+    # A replica whose cron fires a little later still skips the run
+    assert await replicas[0].run("update_lead_scores", job) is None
+    assert len(runs) == 1
+
+    beats = await replicas[0].heartbeats()
+    assert beats["update_lead_scores"]["state"] == "succeeded"
+    assert beats["update_lead_scores"]["instance"] in {"r0", "r1", "r2"}
+
+
+@pytest.mark.asyncio
+async def test_interval_job_holds_lock_for_its_period():
+    redis = LockRedis()
+    a = JobCoordinator(redis, instance_id="a", min_hold_seconds=0, hold_slack_seconds=0.05)
+    b = JobCoordinator(redis, instance_id="b", min_hold_seconds=0, hold_slack_seconds=0.05)
+    runs = []
+
+    async def job():
+        runs.append(1)
+
+    await a.run("warm_caches", job, interval=0.2)
+    await asyncio.sleep(0.05)               # b's IntervalTrigger fires at another offset
+    assert await b.run("warm_caches", job, interval=0.2) is None
+    await asyncio.sleep(0.12)               # Next period
+    await b.run("warm_caches", job, interval=0.2)
+    assert len(runs) == 2
+    defaults = JobCoordinator(redis)
+    assert defaults.hold_seconds(15 * 60) == 15 * 60 - JobCoordinatorConfig.HOLD_SLACK_SECONDS
+    assert defaults.hold_seconds() == JobCoordinatorConfig.MIN_HOLD_SECONDS
+
+
+async def _run_sharded(replicas, users, handled):
+    def job_for(name):
+        async def job():
+            handled[name] = shard_filter(users)
+            return current_shard()
+        return job
+
+    return await asyncio.gather(*(r.run("autopilot", job_for(r.instance_id), sharded=True) for r in replicas))
+
+
+@pytest.mark.asyncio
+async def test_sharded_job_splits_users_across_replicas():
+    redis = LockRedis()
+    replicas = [JobCoordinator(redis, instance_id=f"r{i}", shard_slots=6) for i in range(3)]
+    for replica in replicas:
+        await replica.register()
+    users = [f"user-{i}" for i in range(300)]
+    handled = {}
+
+    shards = await _run_sharded(replicas, users, handled)
+
+    assert sorted(len(s.slots) for s in shards) == [2, 2, 2]
+    assert set().union(*(s.slots for s in shards)) == set(range(6))
+    assert sum(len(v) for v in handled.values()) == 300
+    assert set().union(*handled.values()) == set(users)
+    assert all(len(v) > 50 for v in handled.values())
+    assert current_shard() == Shard()       # Reset outside the job
+
+    # Heartbeat under the job id (what the ops view looks up), not per slot lock
+    beats = await replicas[0].heartbeats()
+    assert set(beats) == {"autopilot"}
+    assert beats["autopilot"]["state"] == "succeeded"
+    assert beats["autopilot"]["shard"] in {str(s) for s in shards}
+
+
+@pytest.mark.asyncio
+async def test_membership_change_mid_tick_never_overlaps():
+    redis = LockRedis()
+    users = [f"user-{i}" for i in range(300)]
+    first = JobCoordinator(redis, instance_id="r0", shard_slots=6)
+    await first.register()
+    handled = {}
+
+    # r0 alone claims every slot; a replica joining in the same tick finds them locked
+    await _run_sharded([first], users, handled)
+    late = JobCoordinator(redis, instance_id="r1", shard_slots=6)
+    assert await _run_sharded([late], users, handled) == [None]
+    assert handled == {"r0": users}
+
+    # Next tick with both live: disjoint halves
+    redis.data.clear()
+    handled.clear()
+    shards = await _run_sharded([first, late], users, handled)
+    assert not (shards[0].slots & shards[1].slots)
+    assert not set(handled["r0"]) & set(handled["r1"])
+    assert len(handled["r0"]) + len(handled["r1"]) == 300
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_renews_lease_of_long_job():
+    redis = LockRedis()
+    holder = JobCoordinator(redis, instance_id="a", lease_seconds=0.05, heartbeat_seconds=0.02, min_hold_seconds=0)
+    other = JobCoordinator(redis, instance_id="b", lease_seconds=0.05, min_hold_seconds=0)
+    seen = []
+
+    async def long_job():
+        await asyncio.sleep(0.15)           # 3x the lease
+        seen.append(await other.run("job", lambda: asyncio.sleep(0)))
+        return "ok"
+
+    assert await holder.run("job", long_job) == "ok"
+    assert seen == [None]                   # Still locked while running
+    assert holder.stats["lease_lost"] == 0
+    # Released after the run (no minimum hold configured)
+    assert await other.acquire("job") is not None
+
+
+@pytest.mark.asyncio
+async def test_crashed_holder_lock_expires_and_no_redis_runs_locally():
+    redis = LockRedis()
+    crashed = JobCoordinator(redis, instance_id="dead")
+    assert await crashed.acquire("job", ttl=0.02) is not None
+
+    other = JobCoordinator(redis, instance_id="b")
+    assert await other.acquire("job") is None
+    await asyncio.sleep(0.03)
+    assert await other.acquire("job") is not None
+
+    local = JobCoordinator(None)
+
+    async def job():
+        return current_shard()
+
+    assert await local.run("job", job, sharded=True) == Shard()
+    assert local.stats["ran_local"] == 1
+    assert JobCoordinatorConfig.MIN_HOLD_SECONDS < 10 * 60  # Below the shortest job interval
@@ -0,0 +1,140 @@
+"""
+Tests für die Job-Telemetrie der Background-Jobs.
+
+Testet:
+- Dauer, Items/s, DB-Queries und LLM-Calls pro Lauf (auch über to_thread)
+- Perzentile und Fehlerrate über die Lauf-Historie
+- Overrun-Alert (Lauf länger als Intervall) feuert und wird wieder aufgelöst
+"""
+import asyncio
+
+import pytest
+
+from app.analytics.monitoring.alerts import create_alert_manager
+from app.services.job_telemetry import (
+    JobTelemetry,
+    instrumented,
+    percentile,
+    record_db_query,
+    record_failure,
+    record_items,
+    record_llm_call,
+)
+from app.services.notifications import log_job_complete
+
+
+class FakeJobLogs:
+    """Stand-in for the sync Supabase client used by log_job_complete."""
+
+    def from_(self, table):
+        return self
+
+    def update(self, data):
+        return self
+
+    def eq(self, column, value):
+        return self
+
+    def execute(self):
+        return None
+
+
+@pytest.mark.asyncio
+async def test_run_counts_items_queries_and_llm_calls_across_threads():
+    telemetry = JobTelemetry(alert_manager=create_alert_manager())
+    telemetry.register("update_lead_scores", 60)
+
+    async def per_user():
+        record_db_query()
+
+    async def job():
+        def batch():
+            for _ in range(3):
+                record_db_query()
+            record_llm_call()
+        await asyncio.to_thread(batch)
+        await asyncio.to_thread(asyncio.run, per_user())    # Worker thread with own event loop
+        record_llm_call(2)
+        await asyncio.to_thread(log_job_complete, FakeJobLogs(), "log-1", records_processed=40)
+        return "ok"
+
+    assert await telemetry.track("update_lead_scores", job) == "ok"
+
+    run = (await telemetry.runs("update_lead_scores"))[0]
+    assert (run["items"], run["db_queries"], run["llm_calls"]) == (40, 4, 3)
+    assert run["status"] == "succeeded" and run["items_per_second"] > 0
+    record_items(5)                                     # Outside a run: ignored
+    assert len(await telemetry.runs("update_lead_scores")) == 1
+
+
+@pytest.mark.asyncio
+async def test_percentiles_and_error_rate():
+    telemetry = JobTelemetry(alert_manager=create_alert_manager())
+    telemetry.register("track_goals", None)
+    calls = 0
+
+    async def job():
+        nonlocal calls
+        calls += 1
+        if calls % 4 == 0:
+            raise RuntimeError("boom")
+        if calls % 4 == 3:
+            record_failure("caught inside the job")
+
+    for _ in range(8):
+        try:
+            await telemetry.track("track_goals", job)
+        except RuntimeError:
+            pass
+
+    summary = (await telemetry.snapshot())["jobs"]["track_goals"]
+    assert summary["runs"] == 8
+    assert summary["error_rate"] == 0.5
+    assert summary["last_run"]["error"] == "boom"
+    assert set(summary["duration_seconds"]) == {"p50", "p90", "p99"}
+    assert percentile(list(range(1, 101)), 90) == 90
+    assert percentile([], 50) is None
+
+
+@pytest.mark.asyncio
+async def test_overrun_fires_alert_and_next_run_resolves_it():
+    manager = create_alert_manager()
+    telemetry = JobTelemetry(alert_manager=manager)
+    telemetry.register("generate_all_suggestions", 0.01)
+    delay = 0.03
+
+    async def job():
+        await asyncio.sleep(delay)
+
+    await telemetry.track("generate_all_suggestions", job)
+    active = manager.get_active_alerts(tenant_id="job:generate_all_suggestions")
+    assert [a.rule_name for a in active] == ["job_overrun"]
+    assert (await telemetry.snapshot())["jobs"]["generate_all_suggestions"]["overruns"] == 1
+
+    delay = 0
+    await telemetry.track("generate_all_suggestions", job)
+    assert manager.get_active_alerts(tenant_id="job:generate_all_suggestions") == []
+
+
+@pytest.mark.asyncio
+async def test_instrumented_wrapper_registers_job_and_keeps_result(monkeypatch):
+    from app.services import job_telemetry
+
+    monkeypatch.setattr(job_telemetry, "_telemetry", JobTelemetry(alert_manager=create_alert_manager()))
+
+    async def no_shared_redis(telemetry):
+        return None
+
+    monkeypatch.setattr(job_telemetry, "_attach_shared_redis", no_shared_redis)
+
+    async def check_follow_ups():
+        record_items(7)
+        return 7
+
+    job = instrumented("check_follow_ups", check_follow_ups, 4 * 3600)
+    assert job.__name__ == "check_follow_ups"
+    assert await job() == 7
+
+    snapshot = await job_telemetry.get_job_telemetry().snapshot()
+    assert snapshot["jobs"]["check_follow_ups"]["interval_seconds"] == 4 * 3600
+    assert snapshot["jobs"]["check_follow_ups"]["last_run"]["items"] == 7
@@ -0,0 +1,122 @@
+"""
+Tests für das Set-basierte Lead-Scoring.
+
+Testet:
+- Scoring-Regeln unverändert (Recency, Interaktionen, Status, Clamping)
+- Queries pro Seite statt pro Lead (Laufzeit: scripts/benchmark_lead_scores.py)
+- Nur geänderte Scores werden geschrieben, Hot Leads pro User gebündelt
+"""
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.services.lead_scoring import (
+    compute_scores,
+    group_hot_leads,
+    hot_lead_notification,
+    recalculate_lead_scores,
+    score_lead,
+)
+
+NOW = datetime(2025, 1, 10, 9, 0, tzinfo=timezone.utc)
+
+
+def _interaction_counts(db, params):
+    wanted = set(params["p_lead_ids"])
+    counts = {}
+    for row in db.tables["lead_interactions"]:
+        if row["lead_id"] in wanted:
+            total, positive = counts.get(row["lead_id"], (0, 0))
+            counts[row["lead_id"]] = (total + 1, positive + (row["outcome"] == "positive"))
+    return [{"lead_id": lead_id, "interactions": t, "positive": p} for lead_id, (t, p) in counts.items()]
+
+
+def _apply_scores(db, params):
+    by_id = {lead["id"]: lead for lead in db.tables["leads"]}
+    for row in params["p_scores"]:
+        by_id[row["id"]]["score"] = row["score"]
+    db.score_writes += len(params["p_scores"])
+    return len(params["p_scores"])
+
+
+def _db(fake_supabase, leads, interactions=(), missing_rpc=False):
+    rpcs = {"apply_lead_scores": _apply_scores}
+    if not missing_rpc:
+        rpcs["lead_interaction_counts"] = _interaction_counts
+    db = fake_supabase({"leads": list(leads), "lead_interactions": list(interactions)}, rpcs=rpcs)
+    db.score_writes = 0
+    return db
+
+
+def _lead(i, days=None, status="new", score=0):
+    return {
+        "id": f"lead-{i:05d}",
+        "user_id": f"user-{i % 5}",
+        "name": f"Lead {i}",
+        "score": score,
+        "status": status,
+        "last_contact": (NOW - timedelta(days=days)).isoformat() if days is not None else None,
+    }
+
+
+def test_scoring_rules_unchanged():
+    assert score_lead(_lead(0), 0, 0, NOW) == 40                                  # never contacted
+    assert score_lead(_lead(0, days=2), 3, 1, NOW) == 50 + 20 + 6 + 5             # recent
+    assert score_lead(_lead(0, days=10, status="qualified"), 0, 0, NOW) == 65
+    assert score_lead(_lead(0, days=60), 0, 0, NOW) == 30
+    assert score_lead(_lead(0, days=1, status="negotiation"), 50, 9, NOW) == 100  # capped bonuses, clamped
+
+    scores = compute_scores(
+        np.array([np.nan, 5.0, 20.0]), np.array([1, 0, 0]), np.array([0, 0, 0]), np.array([0, 5, 25]),
+    )
+    assert scores.tolist() == [42, 65, 65]
+
+
+def test_bulk_run_is_set_based(fake_supabase):
+    leads = [_lead(i, days=i % 45, status=("new", "contacted", "proposal", "won")[i % 4]) for i in range(20_000)]
+    interactions = [
+        {"lead_id": f"lead-{i:05d}", "outcome": "positive" if i % 3 == 0 else "neutral"}
+        for i in range(0, 20_000, 2) for _ in range(2)
+    ]
+    db = _db(fake_supabase, leads, interactions)
+
+    report = recalculate_lead_scores(db, now=NOW, page_size=2000)
+
+    assert report.leads_scanned == 15_000                   # "won" excluded
+    assert report.pages == 8
+    assert db.queries.count("lead_interaction_counts") == 8
+    assert "lead_interactions" not in db.queries
+    assert report.updated == db.score_writes == 15_000      # all started at 0
+    assert report.aggregate_ms >= 0 and report.compute_ms > 0 and report.leads_per_second > 0
+
+    # Same result as the per-lead rules
+    lead = next(l for l in db.tables["leads"] if l["id"] == "lead-00002")
+    assert lead["score"] == score_lead(_lead(2, days=2, status="proposal"), 2, 0, NOW)
+
+    # Second run: nothing changed, nothing written
+    db.score_writes = 0
+    assert recalculate_lead_scores(db, now=NOW, page_size=2000).updated == 0
+    assert db.score_writes == 0
+
+
+def test_hot_leads_grouped_per_user_and_fallback_counts(fake_supabase):
+    leads = [
+        _lead(0, days=1, status="negotiation", score=60),   # -> hot
+        _lead(5, days=1, status="proposal", score=50),      # -> hot, same user
+        _lead(1, days=1, status="negotiation", score=90),   # already hot
+        _lead(2, days=40, status="new", score=30),
+    ]
+    db = _db(fake_supabase, leads, [{"lead_id": "lead-00005", "outcome": "positive"}], missing_rpc=True)
+
+    report = recalculate_lead_scores(db, now=NOW)
+
+    assert "lead_interactions" in db.queries
+    assert report.new_hot_leads == 2
+    by_user = group_hot_leads(report.hot_leads)
+    assert list(by_user) == ["user-0"]
+    message = hot_lead_notification(by_user["user-0"])
+    assert message["title"] == "🔥 2 neue Hot Leads!"
+    assert message["data"]["lead_ids"] == ["lead-00000", "lead-00005"]
+
+    single = hot_lead_notification(by_user["user-0"][:1])
+    assert single["body"] == "Lead 0 ist jetzt ein Hot Lead (Score: 100)"
@@ -0,0 +1,443 @@
+"""
+Tests für den zweistufigen Cache (L1 in-process, L2 Redis).
+
+Testet:
+- LRU-/LFU-Eviction nach Anzahl und Bytes
+- TTL pro Key und Hintergrund-Sweep
+- Prefix-Index
+- Legacy-Helper (get_cached/set_cached/clear_cache)
+- L1 vor Redis im CacheService, L1-Kopie nie länger gültig als der Redis-Key
+- Invalidierung über Pub/Sub zwischen Workern
+- Stale-while-revalidate für Dashboard/Analytics, Getter liefern den Wert ohne Envelope
+- Single-Flight in get_or_set (Coalescing, abgebrochener Leader, Lock-Warten, XFetch)
+- Tag-basierte Invalidierung ohne SCAN, Tag-Sets ohne abgelaufene Member
+"""
+import asyncio
+import json
+import time
+from fnmatch import fnmatchcase
+
+import pytest
+
+from app.core import cache as legacy
+from app.core.cache import CacheConfig, CacheKeyBuilder, CacheService, CacheTags, jittered_ttl
+from app.core.local_cache import LocalCache, _Sweeper
+from app.services.cache_service import DashboardCacheService
+
+
+class FakeRedis:
+    """Minimal async Redis stand-in with a call counter."""
+
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+        self.sets = {}
+        self.zsets = {}
+        self.calls = 0
+        self.scans = 0
+        self.published = []
+
+    async def get(self, key):
+        self.calls += 1
+        return self.data.get(key)
+
+    async def setex(self, key, ttl, value):
+        self.data[key] = value
+        self.ttls[key] = ttl
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        if ex is not None:
+            self.ttls[key] = ex
+        return True
+
+    def pttl(self, key):
+        if key not in self.data:
+            return -2
+        return int(self.ttls[key] * 1000) if key in self.ttls else -1
+
+    async def delete(self, *keys):
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    async def scan_iter(self, match):
+        self.scans += 1
+        for key in list(self.data):
+            if fnmatchcase(key, match):
+                yield key
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+    async def eval(self, script, numkeys, *args):
+        if "ZRANGE" in script:
+            return list(self.zsets.pop(args[0], {}))
+        key, token = args
+        if self.data.get(key) == token:
+            del self.data[key]
+            return 1
+        return 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def publish(self, channel, message):
+        self.published.append((channel, message))
+        return 1
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def get(self, key):
+        def read():
+            self.redis.calls += 1
+            return self.redis.data.get(key)
+        self.ops.append(read)
+
+    def pttl(self, key):
+        self.ops.append(lambda: self.redis.pttl(key))
+
+    def setex(self, key, ttl, value):
+        def write():
+            self.redis.data[key] = value
+            self.redis.ttls[key] = ttl
+        self.ops.append(write)
+
+    def zadd(self, tag, mapping):
+        self.ops.append(lambda: self.redis.zsets.setdefault(tag, {}).update(mapping))
+
+    def zremrangebyscore(self, tag, low, high):
+        def prune():
+            zset = self.redis.zsets.get(tag, {})
+            for member in [m for m, score in zset.items() if score <= high]:
+                del zset[member]
+        self.ops.append(prune)
+
+    def expire(self, key, ttl):
+        self.ops.append(lambda: None)
+
+    async def execute(self):
+        return [op() for op in self.ops]
+
+
+def _service(redis: FakeRedis) -> CacheService:
+    service = CacheService("redis://localhost:6379/0", l1=LocalCache(max_entries=100))
+    service.redis = redis
+    return service
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LocalCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_budget_and_ttl():
+    cache = LocalCache(max_entries=100, max_bytes=10)
+    cache.set("a", "x" * 6)
+    cache.set("b", "y" * 6)
+    assert "a" not in cache
+    assert cache.size_bytes == 6
+    assert cache.set("huge", "z" * 11) is False
+
+    cache.set("short", "v", ttl=0)
+    time.sleep(0.001)
+    assert cache.get("short") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_delete_pattern_matches_redis_globs():
+    cache = LocalCache()
+    cache.set("salesflow:leads:u1:abc", "1")
+    cache.set("salesflow:leads:u2:abc", "1")
+    cache.set("salesflow:user:u1", "1")
+
+    assert cache.delete_pattern("salesflow:leads:u1:*") == 1
+    assert cache.delete_pattern("salesflow:*u1*") == 1
+    assert len(cache) == 1
+
+
+def test_lfu_keeps_frequently_used_keys():
+    cache = LocalCache(max_entries=2, policy="lfu")
+    cache.set("hot", "1")
+    for _ in range(3):
+        cache.get("hot")
+    cache.set("cold", "2")
+    cache.set("new", "3")
+
+    assert "hot" in cache and "new" in cache
+    assert "cold" not in cache
+
+
+def test_prefix_index_and_sweeper():
+    cache = LocalCache(sweep_interval=3600)
+    cache.set("salesflow:leads:u1:a", "1")
+    cache.set("salesflow:leads:u1:b", "1")
+    cache.set("salesflow:leads:u10:a", "1")
+
+    assert cache.delete_prefix("salesflow:leads:u1:") == 2
+    assert cache._prefix_index["salesflow:leads:"] == {"salesflow:leads:u10:a"}
+
+    cache.set("gone", "x", ttl=0)
+    sweeper = _Sweeper()
+    sweeper._next_run[cache] = 0
+    assert sweeper.run_once() == 1
+    assert len(cache) == 1
+
+
+def test_legacy_helpers_use_bounded_cache():
+    legacy.clear_cache()
+    key = legacy.cache_key("objection_templates", "u1")
+    legacy.set_cached(key, [{"id": 1}], ttl_seconds=60)
+
+    assert legacy.get_cached(key) == [{"id": 1}]
+    assert legacy.cache_stats()["valid"] == 1
+    assert legacy.clear_cache("objection_templates:") == 1
+    assert legacy.get_cached(key) is None
+
+
+@pytest.mark.asyncio
+async def test_l1_serves_repeated_reads():
+    redis = FakeRedis()
+    service = _service(redis)
+    await service.cache_lead("l1", {"name": "Anna"})
+
+    for _ in range(5):
+        assert await service.get_cached_lead("l1") == {"name": "Anna"}
+
+    assert redis.calls == 0
+    stats = service.tier_stats()
+    assert stats["l1"]["hits"] == 5
+
+
+@pytest.mark.asyncio
+async def test_invalidate_lead_publishes_once_and_peers_drop_l1():
+    redis = FakeRedis()
+    writer, peer = _service(redis), _service(redis)
+
+    await writer.cache_lead("l1", {"v": 1})
+    await peer.get_cached_lead("l1")  # Peer warms its L1 from Redis
+    assert peer.tier_stats()["l2"]["hits"] == 1
+
+    await writer.invalidate_lead("l1", "u1")
+    assert len(redis.published) == 1
+    channel, message = redis.published[0]
+    assert channel == CacheConfig.INVALIDATION_CHANNEL
+
+    # Own messages are ignored, peer messages clear L1
+    assert writer.handle_invalidation_message(message) == 0
+    assert peer.handle_invalidation_message(message) == 1
+    assert CacheKeyBuilder.lead("l1") not in peer.l1
+    assert await peer.get_cached_lead("l1") is None
+    assert json.loads(message)["patterns"] == []  # Tags, no SCAN patterns
+
+
+@pytest.mark.asyncio
+async def test_l1_fill_never_outlives_l2_ttl():
+    redis = FakeRedis()
+    writer, reader = _service(redis), _service(redis)
+    reader.l1.default_ttl = 30
+
+    await writer.set("short", {"v": 1}, ttl=60)
+    redis.ttls["short"] = 2.5                     # Little L2 time left
+    await writer.set("long", {"v": 2}, ttl=600)
+    redis.data["forever"] = redis.data["long"]    # Without expiry in Redis
+
+    for key in ("short", "long", "forever"):
+        await reader.get(key)
+    remaining = {key: reader.l1._data[key].expires_at - time.monotonic() for key in ("short", "long", "forever")}
+    assert remaining["short"] <= 2.5
+    assert 2.5 < remaining["long"] <= 30 and 2.5 < remaining["forever"] <= 30
+
+
+def test_jittered_ttl_spreads_expiry():
+    ttls = {jittered_ttl(600, 0.15) for _ in range(50)}
+    assert len(ttls) > 1
+    assert all(510 <= ttl <= 690 for ttl in ttls)
+    assert jittered_ttl(600, 0) == 600
+
+
+@pytest.mark.asyncio
+async def test_dashboard_serves_stale_and_refreshes_once():
+    redis = FakeRedis()
+    service = DashboardCacheService(cache=_service(redis))
+    calls = []
+
+    async def fetch(user_id):
+        calls.append(user_id)
+        return {"leads": len(calls)}
+
+    first = await service.get_dashboard_with_cache("u1", fetch, ttl=60)
+    assert first["leads"] == 1
+    assert first["_cache"]["status"] == "miss"
+
+    # Age the envelope past its TTL (but within grace)
+    key = CacheKeyBuilder.dashboard_stats("u1")
+    codec = service.cache.codec
+    envelope = codec.decode(redis.data[key])
+    envelope["stored_at"] -= 120
+    redis.data[key] = codec.encode(envelope)
+    service.cache.l1.clear()
+
+    stale = await asyncio.gather(
+        service.get_dashboard_with_cache("u1", fetch, ttl=60),
+        service.get_dashboard_with_cache("u1", fetch, ttl=60),
+    )
+    assert all(r["leads"] == 1 and r["_cache"]["status"] == "stale" for r in stale)
+    assert stale[0]["_cache"]["stale_seconds"] > 0
+
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert calls == ["u1", "u1"]  # exactly one background refresh
+
+    fresh = await service.get_dashboard_with_cache("u1", fetch, ttl=60)
+    assert fresh["leads"] == 2
+    assert fresh["_cache"]["status"] == "fresh"
+
+
+@pytest.mark.asyncio
+async def test_cached_getters_unwrap_swr_envelopes():
+    cache = _service(FakeRedis())
+
+    await cache.set_swr(CacheKeyBuilder.hot_leads("u1"), [{"id": 1}], 60)
+    await cache.set_swr(CacheKeyBuilder.followups_scheduled("u1"), [{"id": 2}], 60)
+    assert await cache.get_cached_hot_leads("u1") == [{"id": 1}]
+    assert await cache.get_cached_scheduled_followups("u1") == [{"id": 2}]
+
+    # Plain values written by cache_hot_leads come back unchanged
+    await cache.cache_hot_leads("u2", [{"id": 3}])
+    assert await cache.get_cached_hot_leads("u2") == [{"id": 3}]
+
+
+@pytest.mark.asyncio
+async def test_get_or_set_coalesces_concurrent_callers():
+    service = _service(FakeRedis())
+    calls = 0
+
+    async def factory():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"v": 1}
+
+    results = await asyncio.gather(*[service.get_or_set("k", factory, ttl=60) for _ in range(20)])
+
+    assert all(r == {"v": 1} for r in results)
+    assert calls == 1
+    flight = service.tier_stats()["single_flight"]
+    assert flight["computed"] == 1 and flight["coalesced"] == 19
+    assert await service.get_or_set("k", factory, ttl=60) == {"v": 1}
+    assert "k:lock" not in service.redis.data
+
+
+@pytest.mark.asyncio
+async def test_get_or_set_cancelled_leader_does_not_fail_followers():
+    service = _service(FakeRedis())
+    calls = 0
+
+    async def factory():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"v": 1}
+
+    leader = asyncio.create_task(service.get_or_set("k", factory, ttl=60))
+    await asyncio.sleep(0.01)
+    followers = [asyncio.create_task(service.get_or_set("k", factory, ttl=60)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    assert await asyncio.gather(*followers) == [{"v": 1}] * 3
+    assert leader.cancelled() and calls == 1
+    assert "k" not in service._inflight and "k:lock" not in service.redis.data
+
+
+@pytest.mark.asyncio
+async def test_get_or_set_waits_for_other_worker():
+    redis = FakeRedis()
+    holder, waiter = _service(redis), _service(redis)
+    redis.data["k:lock"] = holder.instance_id
+
+    async def other_worker_finishes():
+        await asyncio.sleep(0.06)
+        await holder.set("k", {"__xf__": 1, "value": "computed", "delta": 0.1, "expiry": time.time() + 60}, 60)
+
+    async def factory():
+        raise AssertionError("waiter must not compute")
+
+    value, _ = await asyncio.gather(waiter.get_or_set("k", factory), other_worker_finishes())
+    assert value == "computed"
+    assert waiter.tier_stats()["single_flight"]["waited"] == 1
+
+
+@pytest.mark.asyncio
+async def test_xfetch_refreshes_hot_key_before_expiry():
+    service = _service(FakeRedis())
+    await service.set("k", {"__xf__": 1, "value": "old", "delta": 1000.0, "expiry": time.time() + 1}, 60)
+
+    assert await service.get_or_set("k", lambda: "new", ttl=60) == "new"
+    assert service.tier_stats()["single_flight"]["early_refreshes"] == 1
+    assert await service.get_or_set("k", lambda: "newer", ttl=60, beta=0) == "new"
+
+
+@pytest.mark.asyncio
+async def test_tag_invalidation_without_scan():
+    redis = FakeRedis()
+    writer, peer = _service(redis), _service(redis)
+
+    await writer.cache_lead_list("u1", [{"id": 1}], {"status": "hot"})
+    await writer.cache_lead_list("u1", [{"id": 2}], {"status": "cold"})
+    await writer.cache_lead_list("u2", [{"id": 3}])
+    await writer.cache_user_profile("u1", {"name": "Anna"})
+    await peer.get_cached_lead_list("u1", {"status": "hot"})
+
+    await writer.invalidate_lead("l1", "u1")
+
+    assert redis.scans == 0
+    assert await writer.get_cached_lead_list("u1", {"status": "hot"}) is None
+    assert await writer.get_cached_lead_list("u2") == [{"id": 3}]
+    assert await writer.get_cached_user_profile("u1") == {"name": "Anna"}
+
+    # Tag members are broadcast as plain keys to the other workers' L1
+    peer.handle_invalidation_message(redis.published[-1][1])
+    assert CacheKeyBuilder.lead_list("u1", CacheKeyBuilder.hash_filters({"status": "hot"})) not in peer.l1
+
+    await writer.invalidate_user("u1")
+    assert await writer.get_cached_user_profile("u1") is None
+    assert CacheTags.user("u1") not in redis.zsets
+    assert redis.scans == 0
+
+    # delete() reports whether Redis had the key
+    assert await writer.delete(CacheKeyBuilder.lead_list("u2", CacheKeyBuilder.hash_filters({})))
+    assert not await writer.delete(CacheKeyBuilder.lead_list("u2", CacheKeyBuilder.hash_filters({})))
+
+
+@pytest.mark.asyncio
+async def test_tag_sets_drop_expired_members(monkeypatch):
+    redis = FakeRedis()
+    cache = _service(redis)
+    clock = [1000.0]
+    monkeypatch.setattr(legacy.time, "time", lambda: clock[0])
+
+    for i in range(3):
+        await cache.set(f"k{i}", i, ttl=60, tags=["t"])
+    clock[0] += 61
+    await cache.set("k3", 3, ttl=60, tags=["t"])
+
+    assert list(redis.zsets["t"]) == ["k3"]
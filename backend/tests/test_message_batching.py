@@ -0,0 +1,286 @@
+"""
+Tests für die gebündelte Nachrichten-Generierung.
+
+Testet:
+- Gruppierung nach Template/Step/Sprache, ein Call pro Gruppe, begrenzte Parallelität
+- Validierung jeder Variante einzeln, Einzel-Call als Fallback
+- Bericht: Kosten/Latenz pro Nachricht gegenüber dem Einzel-Call-Pfad
+- Aufrufer: FollowUpEngine.generate_messages, generate_queue_messages (POST /api/chief/generate-queue-messages),
+  Autopilot mit Confidence
+"""
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+
+from app.models.followup import LeadContext
+from app.repositories.followup_repository_mock import InMemoryFollowUpRepository
+from app.services.ai_router_dummy import DummyAIRouter
+from app.services.followup_engine import FollowUpEngine
+from app.services.message_batching import (
+    BATCHED,
+    FAILED,
+    SINGLE,
+    BatchedMessageGenerator,
+    GeneratedMessage,
+    GenerationStats,
+    MessageRequest,
+)
+from app.services.timezone_service import DefaultTimezoneService
+
+NAMES = ["Anna", "Ben", "Clara", "David", "Emil", "Frida", "Greta"]
+
+
+def _requests():
+    requests = [
+        MessageRequest(key=f"lead-{i}", template="mlm_first_contact", step="1", language="de",
+                       lead={"name": name}, name=name)
+        for i, name in enumerate(NAMES[:5])
+    ]
+    requests.append(MessageRequest(key="lead-5", template="mlm_first_contact", step="1", language="en",
+                                   lead={"name": "Frida"}, name="Frida"))
+    requests.append(MessageRequest(key="lead-6", template="mlm_testimonial", step="2", language="de",
+                                   lead={"name": "Greta"}, name="Greta"))
+    return requests
+
+
+class FakeLLM:
+    """Antwortet pro Gruppe mit JSON; einzelne Varianten absichtlich kaputt."""
+
+    def __init__(self, broken=None):
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self.broken = broken or {}
+
+    async def complete(self, call):
+        self.calls.append(call)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        messages = []
+        for item in call.items:
+            text = self.broken.get(item["name"], f"Hey {item['name']}, kurze Frage zu deinem Business 😊")
+            if text is not None:
+                messages.append({"id": item["id"], "message": text, "confidence_score": 93})
+        return "```json\n" + json.dumps({"messages": messages}) + "\n```"
+
+
+def _generator(llm, singles, **kwargs):
+    async def single(request):
+        singles.append(request.key)
+        return GeneratedMessage(key=request.key, content=f"Einzeln für {request.name}", path=SINGLE)
+
+    return BatchedMessageGenerator(
+        "test",
+        complete=llm.complete,
+        single=single,
+        shared_prompt=lambda r: f"TEMPLATE {r.template} / STEP {r.step}\n" + "Regeln. " * 200,
+        system_prompt="Du bist CHIEF.",
+        stats=GenerationStats(),
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+async def test_groups_share_one_call_and_invalid_variants_fall_back():
+    llm = FakeLLM(broken={
+        "Ben": "Hey Ben, Anna hat mir von dir erzählt",     # Name eines anderen Leads der Gruppe
+        "Clara": "Hallo {vorname}!",                        # Offener Platzhalter
+        "David": None,                                      # Fehlt in der Antwort
+    })
+    singles = []
+    generator = _generator(llm, singles, group_size=4, concurrency=2)
+
+    results, report = await generator.generate(_requests())
+
+    # de/mlm_first_contact: 5 Leads -> 4 + 1; en und testimonial einzeln (Gruppen mit 1 Lead)
+    assert report.groups == 4 and len(llm.calls) == 1
+    assert llm.max_active <= 2
+    assert [r.path for r in results.values()] == [BATCHED, SINGLE, SINGLE, SINGLE, SINGLE, SINGLE, SINGLE]
+    assert sorted(singles) == ["lead-1", "lead-2", "lead-3", "lead-4", "lead-5", "lead-6"]
+    assert report.invalid == 3 and report.failed == 0
+    assert results["lead-0"].content.startswith("Hey Anna")
+
+    summary = report.to_dict()
+    assert summary["calls"] == 7 and summary["messages"] == 7
+    assert summary["fallback"]["messages"] == 6
+
+
+@pytest.mark.asyncio
+async def test_report_compares_cost_with_single_call_path():
+    llm = FakeLLM()
+    singles = []
+    generator = _generator(llm, singles, group_size=10, concurrency=4)
+    requests = [
+        MessageRequest(key=f"lead-{i}", template="mlm_first_contact", step="1", language="de",
+                       lead={"name": f"Lead{i}"}, name=f"Lead{i}")
+        for i in range(20)
+    ]
+
+    results, report = await generator.generate(requests)
+
+    assert singles == [] and len(llm.calls) == 2
+    assert all(r.path == BATCHED for r in results.values())
+    summary = report.to_dict()
+    batched, single = summary["batched"], summary["single_call_estimate"]
+    assert single["calls"] == 20 and batched["calls"] == 2
+    # Gemeinsamer Prompt-Teil nur einmal pro Gruppe statt einmal pro Lead
+    assert batched["input_tokens"] * 4 < single["input_tokens"]
+    assert summary["cost_per_message_usd"] < single["cost_per_message_usd"]
+    assert summary["latency_per_message_seconds"] is not None
+
+    # Kaputte Antwort: alle Leads über den Einzel-Call, fehlgeschlagene Einzel-Calls zählen als failed
+    async def broken(call):
+        return "Das ist kein JSON"
+
+    generator.complete = broken
+    failing = []
+
+    async def single(request):
+        failing.append(request.key)
+        if request.key == "lead-0":
+            raise RuntimeError("rate limit")
+        return GeneratedMessage(key=request.key, content="ok", path=SINGLE)
+
+    generator.single = single
+    results, report = await generator.generate(requests[:3])
+    assert sorted(failing) == ["lead-0", "lead-1", "lead-2"]
+    assert results["lead-0"].path == FAILED and report.failed == 1
+
+
+@pytest.mark.asyncio
+async def test_engine_generates_messages_per_group():
+    repository = InMemoryFollowUpRepository()
+    repository._leads.clear()
+    now = datetime.now(timezone.utc)
+    leads = []
+    for i, name in enumerate(NAMES[:4]):
+        lead = LeadContext(
+            id=uuid4(), workspace_id=uuid4(), owner_id=uuid4(), first_name=name, full_name=f"{name} Test",
+            timezone="Europe/Vienna", language="de", last_contacted_at=now - timedelta(days=i + 1),
+        )
+        repository.add_lead(lead)
+        leads.append(lead)
+
+    router = DummyAIRouter()
+    calls = []
+    original = router.generate
+
+    async def counting(task_type, user_payload, config=None):
+        calls.append(task_type)
+        return await original(task_type, user_payload, config)
+
+    router.generate = counting
+    engine = FollowUpEngine(repo=repository, ai_router=router, tz_service=DefaultTimezoneService())
+
+    messages, report = await engine.generate_messages([lead.id for lead in leads] + [uuid4()])
+
+    assert calls == ["FOLLOWUP_GENERATION_BATCH"]
+    assert report.groups == 1 and report.invalid == 0
+    for lead in leads:
+        assert messages[lead.id].content.startswith(("Hey " + lead.first_name, "Hi " + lead.first_name))
+        assert messages[lead.id].meta["batched"] is True
+    assert list(messages.values())[-1] is None
+    assert len(repository._messages_log) == 4
+
+
+@pytest.mark.asyncio
+async def test_queue_and_autopilot_batches(monkeypatch, fake_supabase):
+    from app.services import followup_autopilot
+    from app.services.queue_message_generator import generate_queue_messages
+
+    db = fake_supabase({
+        "contact_follow_up_queue": [
+            {"id": f"q-{i}", "user_id": "u-1", "contact_id": f"l-{i}", "current_state": "new",
+             "follow_up_cycles": {"template_key": "mlm_first_contact"}}
+            for i in range(6)
+        ],
+        "leads": [{"id": f"l-{i}", "user_id": "u-1", "name": f"{NAMES[i]} Muster"} for i in range(6)],
+        "lead_activities": [{"id": "a-0", "lead_id": "l-0", "type": "dm", "notes": "Hat auf Story reagiert"}] + [
+            {"id": f"a-{i}", "lead_id": "l-1", "type": "comment", "notes": f"Kommentar {i}"} for i in range(1, 9)
+        ],
+    })
+
+    class AIClient:
+        model = "gpt-4o-mini"
+        prompts = []
+
+        async def generate_async(self, system_prompt, messages, max_tokens=512, temperature=0.7):
+            self.prompts.append(messages[0]["content"])
+            items = json.loads(messages[0]["content"].split("LEADS:\n")[1].split("\n\nAntworte")[0])
+            return json.dumps({"messages": [
+                {"id": item["id"], "message": f"Hey {item['name'].split()[0]}, spannend was du machst!"}
+                for item in items
+            ]})
+
+    client = AIClient()
+    result = await generate_queue_messages(db, [f"q-{i}" for i in range(6)], "u-1", client)
+
+    assert result["success"] and len(client.prompts) == 1
+    assert "PSYCHOLOGIE" in client.prompts[0] and "Hat auf Story reagiert" in client.prompts[0]
+    assert all(r["batched"] for r in result["results"])
+    assert db.tables["contact_follow_up_queue"][2]["ai_generated_content"] == "Hey Clara, spannend was du machst!"
+    assert db.queries.count("contact_follow_up_queue") == 1 + 6      # 1 Load + Updates pro Item
+    assert db.queries.count("lead_activities") == 1
+    assert client.prompts[0].count("Kommentar") == 5                  # Letzte 5 pro Lead
+
+    # Autopilot: Score pro Variante bestimmt den Execution Mode
+    import app.ai_client
+
+    async def chat_completion(messages, model, max_tokens=512, temperature=0.7):
+        items = json.loads(messages[1]["content"].split("LEADS:\n")[1].split("\n\nAntworte")[0])
+        return json.dumps({"messages": [
+            {"id": item["id"], "message": "Hast du meine Nachricht gesehen?",
+             "confidence_score": 95 if item["id"] == "1" else 60, "confidence_reason": "Test"}
+            for item in items
+        ]})
+
+    monkeypatch.setattr(app.ai_client, "chat_completion", chat_completion)
+    items = [{"lead_id": f"l-{i}", "context": {"lead_name": NAMES[i]}, "template_key": "fu_1", "stage": 2,
+              "name": NAMES[i]} for i in range(3)]
+    results, report = await followup_autopilot.generate_followups_with_confidence("u-1", items)
+
+    assert [r["execution_mode"] for r in results.values()] == ["autopilot", "manual", "manual"]
+    assert report["calls"] == 1 and report["batched"]["messages"] == 3
+
+
+@pytest.mark.asyncio
+async def test_queue_batch_route(monkeypatch, fake_supabase):
+    from fastapi import HTTPException
+
+    from app.routers import chief
+
+    db = fake_supabase({
+        "contact_follow_up_queue": [
+            {"id": f"q-{i}", "user_id": "u-1", "contact_id": f"l-{i}", "current_state": "new",
+             "follow_up_cycles": {"template_key": "mlm_first_contact"}}
+            for i in range(3)
+        ],
+        "leads": [{"id": f"l-{i}", "user_id": "u-1", "name": NAMES[i]} for i in range(3)],
+    })
+
+    class AIClient:
+        model = "gpt-4o-mini"
+
+        def __init__(self, api_key, model):
+            pass
+
+        async def generate_async(self, system_prompt, messages, max_tokens=512, temperature=0.7):
+            items = json.loads(messages[0]["content"].split("LEADS:\n")[1].split("\n\nAntworte")[0])
+            return json.dumps({"messages": [{"id": item["id"], "message": f"Hey {item['name']}!"} for item in items]})
+
+    monkeypatch.setattr(chief, "AIClient", AIClient)
+    monkeypatch.setattr(chief.settings, "openai_api_key", "sk-test")
+    request = chief.GenerateQueueMessagesRequest(queue_ids=["q-0", "q-1", "q-2"])
+
+    result = await chief.generate_queue_messages_batch(request, current_user={"id": "u-1"}, db=db)
+    assert [r["message"] for r in result["results"]] == ["Hey Anna!", "Hey Ben!", "Hey Clara!"]
+
+    monkeypatch.setattr(chief.settings, "openai_api_key", None)
+    with pytest.raises(HTTPException) as error:
+        await chief.generate_queue_messages_batch(request, current_user={"id": "u-1"}, db=db)
+    assert error.value.status_code == 503
@@ -0,0 +1,122 @@
+"""
+Tests für den Batch-Recalc der P-Scores.
+
+Testet:
+- Events einmal pro Recalc geladen, pro Lead (contact_id) gezählt
+- Nur Leads des Users werden neu bewertet
+- Gleiche Heuristik wie calculate_p_score_for_lead
+- Gebündelte Writes, Fallback auf Einzel-Updates, Query-Anzahl bei 10k Leads
+  (Laufzeit: scripts/benchmark_p_scores.py)
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.predictive_scoring import calculate_p_score_for_lead, recalc_p_scores_for_user
+
+
+def _apply_p_scores(db, params):
+    by_id = {lead["id"]: lead for lead in db.tables["leads"]}
+    for row in params["p_scores"]:
+        by_id[row["id"]].update({k: v for k, v in row.items() if k != "id"})
+    return len(params["p_scores"])
+
+
+def _db(fake_supabase, leads, events, missing_rpc=False):
+    rpcs = {} if missing_rpc else {"apply_p_scores": _apply_p_scores}
+    return fake_supabase({"leads": leads, "message_events": events}, rpcs=rpcs)
+
+
+def _ago(days):
+    return (datetime.utcnow() - timedelta(days=days)).isoformat()
+
+
+def _event(i, lead_id, direction, days, user_id="u1"):
+    return {"id": f"ev-{i:07d}", "user_id": user_id, "contact_id": lead_id, "direction": direction, "created_at": _ago(days)}
+
+
+def _fixture():
+    leads = [
+        {"id": "lead-a", "user_id": "u1", "status": "qualified", "temperature": 85, "p_score": 40},
+        {"id": "lead-b", "user_id": "u1", "status": "new", "temperature": None, "p_score": None},
+        {"id": "lead-c", "user_id": "u1", "status": "ghosting", "temperature": 10, "p_score": 35},
+        {"id": "lead-d", "user_id": "u1", "status": None, "p_score": 20},
+    ]
+    events = [
+        _event(1, "lead-a", "inbound", 2),
+        _event(2, "lead-a", "inbound", 10),
+        _event(3, "lead-a", "inbound", 12),
+        _event(4, "lead-b", "outbound", 1),
+        _event(5, "lead-b", "outbound", 3),
+        _event(6, "lead-c", "inbound", 9),
+        _event(7, "lead-a", "inbound", 30),               # outside 14d
+        _event(8, "lead-a", "inbound", 1, user_id="u2"),  # other user
+        _event(9, None, "inbound", 1),                    # no contact
+    ]
+    return leads, events
+
+
+@pytest.mark.asyncio
+async def test_batch_matches_single_lead_scoring(fake_supabase):
+    leads, events = _fixture()
+    db = _db(fake_supabase, leads, events)
+    expected = {}
+    for lead in leads:
+        score, trend, _ = await calculate_p_score_for_lead(db, lead["id"], user_id="u1")
+        expected[lead["id"]] = (score, trend)
+
+    db.queries.clear()
+    summary = await recalc_p_scores_for_user(db, "u1", limit=100)
+
+    assert summary["leads_scored"] == 4 and not summary["errors"]
+    assert {l["id"]: (l["p_score"], l["p_score_trend"]) for l in db.tables["leads"]} == expected
+    assert expected["lead-a"] == (75.0, "up")      # 20 + 10 + 20 + 15 + 10
+    assert expected["lead-b"] == (20.0, "flat")    # outbound only
+    assert expected["lead-c"] == (0.0, "down")
+    assert db.queries == ["leads", "message_events", "apply_p_scores"]
+
+
+@pytest.mark.asyncio
+async def test_recalc_leaves_other_users_leads_alone(fake_supabase):
+    leads, events = _fixture()
+    others = [
+        {"id": "lead-0", "user_id": "u2", "status": "qualified", "p_score": 90, "p_score_trend": "up"},
+        {"id": "lead-z", "user_id": "u2", "status": "new", "p_score": 60, "p_score_trend": "flat"},
+    ]
+    db = _db(fake_supabase, others + leads, events)
+
+    summary = await recalc_p_scores_for_user(db, "u1", limit=3)
+
+    assert summary["leads_scored"] == 3
+    assert [l["p_score"] for l in db.tables["leads"][:2]] == [90, 60]
+    assert [l["p_score_trend"] for l in db.tables["leads"][:2]] == ["up", "flat"]
+
+
+@pytest.mark.asyncio
+async def test_fallback_to_row_updates_without_rpc(fake_supabase):
+    leads, events = _fixture()
+    db = _db(fake_supabase, leads, events, missing_rpc=True)
+
+    summary = await recalc_p_scores_for_user(db, "u1")
+
+    assert summary["leads_scored"] == 4
+    assert db.tables["leads"][0]["p_score"] == 75.0
+    assert db.queries.count("leads") == 1 + 4
+
+
+@pytest.mark.asyncio
+async def test_10k_leads_paged_query_counts(fake_supabase):
+    leads = [{"id": f"lead-{i:05d}", "user_id": "u1", "status": "interested" if i % 3 else "new", "p_score": 30} for i in range(10_000)]
+    events = [
+        _event(i, f"lead-{i % 10_000:05d}", "inbound" if i % 4 else "outbound", i % 14)
+        for i in range(60_000)
+    ]
+    db = _db(fake_supabase, leads, events)
+
+    summary = await recalc_p_scores_for_user(db, "u1", limit=10_000)
+
+    assert summary["total_leads"] == summary["leads_scored"] == 10_000
+    assert db.queries.count("leads") == 10                       # 1000 per page
+    assert db.queries.count("message_events") == 13              # 12 full pages of 5000 + end
+    assert db.queries.count("apply_p_scores") == 10
+    assert sum(summary["score_distribution"].values()) == 10_000
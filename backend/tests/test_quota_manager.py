@@ -0,0 +1,131 @@
+"""
+Tests für das Quota-Accounting.
+
+Testet:
+- Plan/Limits aus dem Cache (keine Round-Trips im Hot Path)
+- Invalidierung nach Billing-Änderungen
+- check_and_consume: alles-oder-nichts, Ablehnung aus dem Cache ohne RPC
+"""
+import time
+
+import pytest
+
+from app.core import quota_manager
+from app.core.quota_manager import (
+    check_and_consume,
+    check_quota,
+    increment_quota,
+    invalidate_user_plan,
+)
+
+
+def _quota_row(db, user_id, month_year):
+    for row in db.tables["user_quotas"]:
+        if row["user_id"] == user_id and row["month_year"] == month_year:
+            return row
+    row = quota_manager._empty_quota(user_id, month_year)
+    db.tables["user_quotas"].append(row)
+    return row
+
+
+def _increment(db, p):
+    row = _quota_row(db, p["p_user_id"], p["p_month_year"])
+    for key, amount in p["p_deltas"].items():
+        row[key] += amount
+    return [dict(row)]
+
+
+def _consume(db, p):
+    row = _quota_row(db, p["p_user_id"], p["p_month_year"])
+    denied = [
+        key for key, amount in p["p_deltas"].items()
+        if p["p_limits"].get(key, -1) != -1 and row[key] + amount > p["p_limits"][key]
+    ]
+    if not denied:
+        for key, amount in p["p_deltas"].items():
+            row[key] += amount
+    return {"allowed": not denied, "denied": denied, "usage": dict(row)}
+
+
+@pytest.fixture
+def db(monkeypatch, fake_supabase):
+    fake = fake_supabase(
+        {
+            "users": [{"id": "u1", "plan_tier": "starter"}],
+            "plan_limits": [
+                {"plan_name": name, **config}
+                for name, config in quota_manager.PLAN_CONFIGS.items()
+            ],
+            "user_quotas": [],
+        },
+        rpcs={"increment_user_quota": _increment, "consume_user_quota": _consume},
+    )
+    monkeypatch.setattr(quota_manager, "get_supabase_client", lambda: fake)
+    quota_manager._plan_cache.clear()
+    quota_manager._usage_cache.clear()
+    yield fake
+    quota_manager._plan_cache.clear()
+    quota_manager._usage_cache.clear()
+
+
+def test_checks_are_served_from_cache(db):
+    assert check_quota("u1", "voice_minutes_used")["limit"] == 30
+    round_trips = len(db.queries)
+
+    started = time.perf_counter()
+    for _ in range(1000):
+        check_quota("u1", "voice_minutes_used")
+    elapsed = time.perf_counter() - started
+
+    assert len(db.queries) == round_trips
+    assert elapsed / 1000 < 0.0005
+
+
+def test_plan_change_visible_after_invalidation(db):
+    assert check_quota("u1", "vision_credits_used")["allowed"] is False
+
+    db.tables["users"][0]["plan_tier"] = "builder"
+    assert check_quota("u1", "vision_credits_used")["allowed"] is False  # cached
+    invalidate_user_plan("u1")
+
+    assert check_quota("u1", "vision_credits_used") == {
+        "allowed": True, "current": 0, "limit": 50, "remaining": 50, "upgrade_required": False,
+    }
+
+
+def test_increment_is_one_round_trip_and_updates_cache(db):
+    assert increment_quota("u1", "ai_tokens_used", 120)
+    assert increment_quota("u1", "ai_tokens_used", 30)
+
+    assert db.queries == ["increment_user_quota", "increment_user_quota"]
+    assert quota_manager.get_user_quota("u1")["ai_tokens_used"] == 150
+    assert check_quota("u1", "ai_tokens_used", 10**6)["allowed"]  # Not capped by plans
+    with pytest.raises(ValueError):
+        increment_quota("u1", "plan_tier", 1)
+
+
+def test_check_and_consume_all_or_nothing(db):
+    result = check_and_consume("u1", {"voice_minutes_used": 20, "message_improvements_used": 5})
+    assert result["allowed"]
+    assert result["quotas"]["voice_minutes_used"] == {
+        "allowed": True, "current": 20, "limit": 30, "remaining": 10,
+    }
+
+    result = check_and_consume("u1", {"voice_minutes_used": 20, "message_improvements_used": 5})
+    assert result["allowed"] is False
+    assert result["denied"] == ["voice_minutes_used"]
+    row = db.tables["user_quotas"][0]
+    assert (row["voice_minutes_used"], row["message_improvements_used"]) == (20, 5)
+    # Denied from the cached usage, the RPC ran only once
+    assert db.queries.count("consume_user_quota") == 1
+
+
+def test_concurrent_workers_cannot_overshoot(db):
+    assert check_and_consume("u1", {"voice_minutes_used": 25})["allowed"]
+    # Another worker consumed meanwhile; this worker's cached usage is stale
+    db.tables["user_quotas"][0]["voice_minutes_used"] = 29
+
+    result = check_and_consume("u1", {"voice_minutes_used": 2})
+
+    assert result["allowed"] is False
+    assert result["quotas"]["voice_minutes_used"]["current"] == 29
@@ -0,0 +1,148 @@
+"""
+Tests für die Rate-Limit-Engine (GCRA).
+
+Testet:
+- GCRA-Semantik (Limit, Retry-After, Reset)
+- Lokale Lease: weniger Redis-Roundtrips, nie mehr Requests als erlaubt
+- In-Process-Fallback bei Redis-Fehlern (mit Back-off)
+- Middleware und Decorator auf derselben Engine
+"""
+import time
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.core.rate_limit import RateLimitEngineConfig, RateLimiter, gcra
+from app.middleware.rate_limiter import RateLimitMiddleware, SlidingWindowRateLimiter, rate_limit
+
+
+class ScriptRedis:
+    """Runs the GCRA script as its Python twin (same arguments/results)."""
+
+    def __init__(self, fail=False):
+        self.tats = {}
+        self.calls = 0
+        self.fail = fail
+
+    def register_script(self, script):
+        async def run(keys, args):
+            self.calls += 1
+            if self.fail:
+                raise RedisConnectionError("down")
+            emission, burst_offset, cost, lease, lease_min = args
+            allowed, reserved, remaining, retry_after, reset_after, new_tat = gcra(
+                self.tats.get(keys[0], 0.0), time.time(), emission, burst_offset, cost, lease, lease_min
+            )
+            if allowed and cost > 0:
+                self.tats[keys[0]] = new_tat
+            return [int(allowed), reserved, str(remaining), str(retry_after), str(reset_after)]
+        return run
+
+
+def test_gcra_allows_limit_then_denies():
+    emission = 60 / 5
+    tat, now = 0.0, 1000.0
+    for _ in range(5):
+        allowed, _, remaining, _, _, tat = gcra(tat, now, emission, emission * 5)
+        assert allowed
+    assert int(remaining) == 0
+
+    allowed, _, _, retry_after, reset_after, _ = gcra(tat, now, emission, emission * 5)
+    assert not allowed
+    assert retry_after == pytest.approx(12.0)
+    assert reset_after == pytest.approx(60.0)
+
+    # One emission interval later exactly one more request fits
+    assert gcra(tat, now + 12.0, emission, emission * 5)[0]
+
+
+@pytest.mark.asyncio
+async def test_lease_saves_round_trips_without_overadmitting():
+    redis = ScriptRedis()
+    limiter = RateLimiter(redis)
+
+    results = [await limiter.hit("k", limit=200, period=60) for _ in range(30)]
+
+    assert all(r.allowed for r in results)
+    assert redis.calls == 3  # 10 requests per round-trip (5% of 200)
+    assert limiter.stats()["local"] == 27
+    # Everything admitted locally was reserved in Redis first
+    consumed = (redis.tats["k"] - time.time()) / (60 / 200)
+    assert consumed >= 30 - 1
+
+
+@pytest.mark.asyncio
+async def test_strict_limits_never_lease():
+    redis = ScriptRedis()
+    limiter = RateLimiter(redis)
+
+    results = [await limiter.hit("login", limit=5, period=60) for _ in range(6)]
+
+    assert [r.allowed for r in results] == [True] * 5 + [False]
+    assert redis.calls == 6
+    assert results[-1].retry_after > 0
+
+
+@pytest.mark.asyncio
+async def test_falls_back_in_process_when_redis_down():
+    redis = ScriptRedis(fail=True)
+    limiter = RateLimiter(redis)
+
+    results = [await limiter.hit("k", limit=3, period=60) for _ in range(4)]
+
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert redis.calls == 1  # Back-off: Redis not retried on every request
+    stats = limiter.stats()
+    assert stats["redis_errors"] == 1 and stats["fallback"] == 4
+
+    limiter._redis_down_until = 0
+    redis.fail = False
+    assert (await limiter.hit("other", limit=3, period=60)).allowed
+    assert redis.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_local_decision_overhead_below_one_ms():
+    limiter = RateLimiter(None)
+    count = 5000
+    started = time.perf_counter()
+    for i in range(count):
+        await limiter.hit(f"client-{i % 50}", limit=100_000, period=60)
+    per_call_ms = (time.perf_counter() - started) / count * 1000
+    assert per_call_ms < 1.0
+
+
+@pytest.mark.asyncio
+async def test_sliding_window_wrapper_reports_usage():
+    limiter = SlidingWindowRateLimiter(engine=RateLimiter(ScriptRedis(), local_lease=False))
+    for _ in range(3):
+        await limiter.is_allowed("u1", "GET:/x", max_requests=10, window_seconds=60)
+
+    assert await limiter.get_usage("u1", "GET:/x", max_requests=10, window_seconds=60) == 3
+    assert await limiter.get_usage("u1", "GET:/x", 60, max_requests=10) == 3    # Bisherige Reihenfolge
+    allowed, remaining, reset = await limiter.is_allowed("u1", "GET:/x", 10, 60)
+    assert allowed and remaining == 6 and reset == 24
+
+
+def test_middleware_and_decorator_share_engine():
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware, redis=None)
+
+    @app.post("/auth/login")
+    async def login():
+        return {"ok": True}
+
+    @app.get("/expensive")
+    @rate_limit(max_requests=2, window_seconds=60)
+    async def expensive(request: Request):
+        return {"ok": True}
+
+    client = TestClient(app)
+    codes = [client.post("/auth/login").status_code for _ in range(6)]
+    assert codes == [200] * 5 + [429]
+    denied = client.post("/auth/login")
+    assert int(denied.headers["Retry-After"]) > 0
+
+    assert [client.get("/expensive").status_code for _ in range(3)] == [200, 200, 429]
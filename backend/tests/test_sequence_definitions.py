@@ -0,0 +1,140 @@
+"""
+Tests für kompilierte Sequenz-Definitionen.
+
+Testet:
+- Kompilierung (Step-Reihenfolge, Delays, Conditions als Prädikate wie die bisherige Auswertung)
+- Cache: Version, Invalidierung, TTL, gesammeltes Nachladen von DB-Sequenzen
+- SequenceEngine: kompilierter STATUS_FLOW, Templates pro Status mit einer Query statt einer pro Lead
+"""
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+
+from app.models.followup import (
+    FollowUpChannel,
+    FollowUpCondition,
+    FollowUpSequence,
+    FollowUpStep,
+)
+from app.services.sequence_definitions import (
+    SequenceDefinitionCache,
+    compile_followup_sequence,
+    compile_sequence_row,
+    condition_predicate,
+)
+from app.services.sequence_engine import COMPILED_STATUS_FLOW, STATUS_FLOW, SequenceEngine
+
+
+def _sequence(updated_at=None):
+    sequence_id = uuid4()
+    steps = [
+        FollowUpStep(id=uuid4(), sequence_id=sequence_id, order_index=i, day_offset=offset, action=f"step-{i}",
+                     template_key=f"tpl-{i}", channel=FollowUpChannel.WHATSAPP, condition=condition)
+        for i, (offset, condition) in enumerate([
+            (3, FollowUpCondition.NO_REPLY),
+            (0, FollowUpCondition.ALWAYS),
+            (3, FollowUpCondition.REPLIED_POSITIVE),
+        ])
+    ]
+    now = updated_at or datetime(2025, 1, 1, 12, 0)
+    return FollowUpSequence(id=sequence_id, workspace_id=uuid4(), name="Interessent → Partner", steps=steps,
+                            created_by=uuid4(), created_at=now, updated_at=now)
+
+
+def _legacy_condition(condition, interactions):
+    """Bisherige FollowUpEngine._condition_satisfied-Logik als Referenz."""
+    if condition == FollowUpCondition.ALWAYS:
+        return True
+    if not interactions:
+        return condition == FollowUpCondition.NO_REPLY
+    last_type = interactions[0].get("type", "")
+    if condition == FollowUpCondition.NO_REPLY:
+        return not last_type.startswith("reply_")
+    if condition == FollowUpCondition.REPLIED_POSITIVE:
+        return last_type == "reply_positive"
+    if condition == FollowUpCondition.REPLIED_NEGATIVE:
+        return last_type == "reply_negative"
+    return True
+
+
+def test_compiled_sequence_orders_steps_and_matches_conditions():
+    sequence = _sequence()
+    compiled = compile_followup_sequence(sequence)
+
+    assert [s.source.action for s in compiled.steps] == ["step-1", "step-0", "step-2"]
+    assert [s.delay for s in compiled.steps] == [timedelta(0), timedelta(days=3), timedelta(days=3)]
+    assert compiled.after(None).number == 1 and compiled.after(1).number == 3
+    assert compiled.after(2) is None
+    assert compiled.version == sequence.updated_at.isoformat()
+
+    histories = [[], [{"type": "message_sent"}], [{"type": "reply_positive"}], [{"type": "reply_negative"}]]
+    for condition in FollowUpCondition:
+        for interactions in histories:
+            assert condition_predicate(condition)(interactions) == _legacy_condition(condition, interactions)
+
+    row = compile_sequence_row({"id": "seq-1", "created_at": "2025-01-01", "sequence_steps": [
+        {"step_number": 2, "delay_days": 4, "message_template": "B", "channel": "email", "subject": "Hallo"},
+        {"step_number": 1, "delay_days": None, "message_template": "A", "channel": "whatsapp"},
+    ]})
+    assert [s.template for s in row.steps] == ["A", "B"]
+    assert row.step(1).delay == timedelta(0) and row.step(2).subject == "Hallo"
+    assert row.step(3) is None and row.version == "2025-01-01"
+
+
+def test_cache_versions_invalidation_and_batched_loads(monkeypatch, fake_supabase):
+    cache = SequenceDefinitionCache(ttl_seconds=60)
+    sequence = _sequence()
+
+    first = cache.compile(sequence)
+    assert cache.compile(sequence) is first                     # Gleiche Version: kein Neu-Kompilieren
+    edited = sequence.model_copy(update={"updated_at": sequence.updated_at + timedelta(minutes=1)})
+    assert cache.compile(edited) is not first                   # Neue Version
+    cache.invalidate(sequence.id)
+    assert cache.get(sequence.id) is None
+
+    db = fake_supabase({"follow_up_sequences": [
+        {"id": f"seq-{i}", "created_at": "2025-01-01",
+         "sequence_steps": [{"step_number": 1, "delay_days": i, "message_template": f"T{i}"}]}
+        for i in range(3)
+    ]})
+    loaded = cache.load(db, ["seq-0", "seq-1", "seq-0", "seq-x"])
+    assert sorted(loaded) == ["seq-0", "seq-1"] and db.queries == ["follow_up_sequences"]
+
+    cache.load(db, ["seq-0", "seq-1", "seq-2"])
+    assert db.queries == ["follow_up_sequences"] * 2            # Nur seq-2 (und seq-x) nachgeladen
+
+    # TTL als Sicherheitsnetz für Änderungen auf anderen Replicas
+    clock = [1000.0]
+    monkeypatch.setattr("app.services.sequence_definitions.time.monotonic", lambda: clock[0])
+    cache.put(compile_sequence_row(db.tables["follow_up_sequences"][0]))
+    clock[0] += 61
+    assert cache.get("seq-0") is None
+
+
+@pytest.mark.asyncio
+async def test_sequence_engine_uses_compiled_flow_and_cached_templates(fake_supabase):
+    assert {s: t.next for s, t in COMPILED_STATUS_FLOW.items()} == {s: r["next"] for s, r in STATUS_FLOW.items()}
+    assert COMPILED_STATUS_FLOW["no_response_3"].wait == timedelta(days=5)
+
+    leads = [{"id": f"lead-{i}", "user_id": "user-1", "name": f"Anna {i}", "sequence_status": "no_response_1",
+              "follow_up_count": 1} for i in range(5)]
+    db = fake_supabase({
+        "leads": leads,
+        "follow_up_sequence_steps": [
+            {"status": "no_response_1", "template_key": "fu_1", "template_message": "Hi {{name}}, kurz nachgehakt"},
+            {"status": "no_response_2", "template_key": "fu_2", "template_message": "Noch Interesse?"},
+        ],
+    })
+    engine = SequenceEngine(db, sequence_cache=SequenceDefinitionCache())
+
+    for lead in list(leads):
+        result = await engine.advance_sequence(lead["id"])
+        assert result["success"] and result["next_status"] == "no_response_2"
+
+    assert db.queries.count("follow_up_sequence_steps") == 1
+    suggestions = db.tables["followup_suggestions"]
+    assert len(suggestions) == 5
+    assert suggestions[0]["template_key"] == "fu_1"
+    assert suggestions[0]["suggested_message"] == "Hi Anna, kurz nachgehakt"
+    assert leads[0]["sequence_status"] == "no_response_2" and leads[0]["next_follow_up_at"]
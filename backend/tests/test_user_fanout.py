@@ -0,0 +1,170 @@
+"""
+Tests für den Per-User Fan-out (Autopilot-Job).
+
+Testet:
+- Parallelität begrenzt, Durchsatz statt sequentieller Laufzeit
+- Timeout/Fehler eines Users stoppt die anderen nicht; Nachzügler belegen ihren Slot bis zum Ende
+- Fairness (zuletzt verarbeitete User hinten), Deadline, Skip bei Überlappung
+- Autopilot: User-Lease in Redis, ein User nie parallel auf zwei Replicas
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.services import followup_autopilot
+from app.services.job_coordinator import JobCoordinator
+from app.services.user_fanout import UserFanout
+from tests.test_job_coordinator import LockRedis
+
+
+@pytest.mark.asyncio
+async def test_bounded_concurrency_and_throughput():
+    fanout = UserFanout("test", concurrency=4, user_timeout=5)
+    active, peak = 0, 0
+
+    async def work(user_id):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.02)
+        active -= 1
+        return {"sent": 1}
+
+    started = time.perf_counter()
+    report = await fanout.run([f"u{i}" for i in range(20)], work)
+
+    assert peak == 4
+    assert report.completed == 20 and len(report.results) == 20
+    assert time.perf_counter() - started < 0.02 * 20 / 2      # Far below sequential
+    assert report.users_per_second > 0 and report.max_lag_seconds is None
+
+
+@pytest.mark.asyncio
+async def test_slow_and_failing_users_are_isolated():
+    fanout = UserFanout("test", concurrency=2, user_timeout=0.05)
+    release = asyncio.Event()
+    calls = []
+
+    async def work(user_id):
+        calls.append(user_id)
+        if user_id == "slow":
+            await release.wait()
+        if user_id == "broken":
+            raise RuntimeError("boom")
+        return user_id
+
+    report = await fanout.run(["slow", "broken", "a", "b", "c"], work)
+    assert (report.completed, report.failed, report.timed_out) == (3, 1, 1)
+
+    # Still running in the background: skipped instead of started twice
+    report = await fanout.run(["slow", "a"], work)
+    assert report.skipped_in_flight == 1 and calls.count("slow") == 1
+
+    release.set()
+    await asyncio.sleep(0)
+    report = await fanout.run(["slow"], work)
+    assert report.completed == 1 and calls.count("slow") == 2
+
+
+@pytest.mark.asyncio
+async def test_timed_out_users_keep_their_slot():
+    fanout = UserFanout("test", concurrency=2, user_timeout=0.02)
+    release = asyncio.Event()
+    active, peak = 0, 0
+
+    async def work(user_id):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        if user_id.startswith("slow"):
+            await release.wait()
+        else:
+            await asyncio.sleep(0.01)
+        active -= 1
+
+    report = await fanout.run(["slow1", "a", "b", "c"], work)
+    assert report.timed_out == 1 and report.completed == 3 and peak == 2
+
+    # Nächster Lauf: der Nachzügler hält weiter einen der zwei Slots
+    report = await fanout.run(["slow2", "d"], work)
+    assert report.timed_out == 1 and report.completed == 1 and peak == 2
+
+    release.set()
+    await asyncio.sleep(0.01)
+    report = await fanout.run(["d", "e"], work)
+    assert report.completed == 2 and not fanout._in_flight
+
+
+@pytest.mark.asyncio
+async def test_fairness_deadline_and_overlap_guard():
+    fanout = UserFanout("test", concurrency=1, user_timeout=5)
+    order = []
+
+    async def work(user_id):
+        order.append(user_id)
+        await asyncio.sleep(0.02)
+
+    # Deadline hit after the first user: the rest are deferred...
+    report = await fanout.run(["c", "b", "a"], work, deadline_seconds=0.01)
+    assert order == ["a"] and report.deferred == 2
+
+    # ...and go first next time, the recently processed user last
+    order.clear()
+    report = await fanout.run(["a", "b", "c"], work)
+    assert order == ["b", "c", "a"]
+    assert report.max_lag_seconds is not None
+
+    slow = asyncio.ensure_future(fanout.run(["x"], lambda uid: asyncio.sleep(0.05)))
+    await asyncio.sleep(0.01)
+    assert (await fanout.run(["y"], work)).skipped_running
+    await slow
+
+
+@pytest.mark.asyncio
+async def test_autopilot_job_sums_user_results(monkeypatch):
+    monkeypatch.setattr(followup_autopilot, "_active_autopilot_user_ids", lambda db: ["u1", "u2", "u3"])
+    monkeypatch.setattr(followup_autopilot, "get_supabase_client", lambda: None)
+    monkeypatch.setattr(followup_autopilot, "_autopilot_fanout", UserFanout("autopilot", concurrency=3))
+
+    async def process(user_id):
+        return {"processed": 2, "sent": 1, "skipped": 1}
+
+    monkeypatch.setattr(followup_autopilot, "process_autopilot_sends", process)
+
+    report = await followup_autopilot.run_autopilot_for_all_users()
+
+    assert report.completed == 3
+    assert sum(r["sent"] for r in report.results.values()) == 3
+
+
+@pytest.mark.asyncio
+async def test_autopilot_user_lease_across_replicas(monkeypatch):
+    coordinator = JobCoordinator(LockRedis(), instance_id="r0")
+
+    async def get_job_coordinator():
+        return coordinator
+
+    monkeypatch.setattr(followup_autopilot, "get_job_coordinator", get_job_coordinator)
+    calls = []
+
+    async def process(user_id):
+        calls.append(user_id)
+        await asyncio.sleep(0.02)
+        return {"processed": 1, "sent": 1, "skipped": 0}
+
+    monkeypatch.setattr(followup_autopilot, "process_autopilot_sends", process)
+
+    # Two replicas with overlapping user lists (e.g. mid shard change)
+    replicas = [UserFanout("autopilot", concurrency=2), UserFanout("autopilot", concurrency=2)]
+    reports = await asyncio.gather(
+        *(replica.run(["u1", "u2"], followup_autopilot._process_user_isolated) for replica in replicas)
+    )
+
+    assert sorted(calls) == ["u1", "u2"]
+    leased = [r for report in reports for r in report.results.values() if r.get("leased_elsewhere")]
+    assert len(leased) == 2
+
+    # Leases are released when the user is done
+    await replicas[0].run(["u1"], followup_autopilot._process_user_isolated)
+    assert calls.count("u1") == 2
@@ -0,0 +1,81 @@
+"""
+Tests für das Webhook-Rate-Limit.
+
+Testet:
+- Limit pro IP + Endpoint, 429 mit Retry-After
+- LRU-Eviction inaktiver Keys bei max_keys
+- Stresstest: Speicher bleibt bei 100k verschiedenen IPs flach
+"""
+import gc
+import tracemalloc
+
+import pytest
+from fastapi import HTTPException
+
+from app.services import webhook_security
+from app.services.webhook_security import configure_webhook_rate_limiter, enforce_rate_limit
+
+
+@pytest.fixture
+def local_limiter(monkeypatch):
+    monkeypatch.setattr(webhook_security.settings, "webhook_rate_limit_shared", False)
+    yield lambda max_keys=1_000: configure_webhook_rate_limiter(None, max_keys=max_keys)
+    monkeypatch.setattr(webhook_security, "_webhook_limiter", None)
+
+
+@pytest.mark.asyncio
+async def test_limit_per_ip_and_endpoint(local_limiter):
+    local_limiter()
+
+    for _ in range(5):
+        await enforce_rate_limit("1.2.3.4", key_prefix="facebook_webhook", max_requests_per_minute=5)
+    with pytest.raises(HTTPException) as exc:
+        await enforce_rate_limit("1.2.3.4", key_prefix="facebook_webhook", max_requests_per_minute=5)
+
+    assert exc.value.status_code == 429
+    assert int(exc.value.headers["Retry-After"]) >= 1
+    # Andere IP und anderer Endpoint haben eigene Buckets
+    await enforce_rate_limit("5.6.7.8", key_prefix="facebook_webhook", max_requests_per_minute=5)
+    await enforce_rate_limit("1.2.3.4", key_prefix="linkedin_webhook", max_requests_per_minute=5)
+
+
+@pytest.mark.asyncio
+async def test_idle_keys_are_evicted_lru(local_limiter):
+    limiter = local_limiter(max_keys=1_000)
+
+    await enforce_rate_limit("10.0.0.1", key_prefix="facebook_webhook")
+    for i in range(2_000):
+        await enforce_rate_limit(f"10.1.{i // 256}.{i % 256}", key_prefix="facebook_webhook")
+        if i % 100 == 0:
+            await enforce_rate_limit("10.0.0.2", key_prefix="facebook_webhook")
+
+    keys = limiter._fallback
+    assert len(keys) <= 1_000
+    assert "webhook_ratelimit:facebook_webhook:10.0.0.1" not in keys
+    assert "webhook_ratelimit:facebook_webhook:10.0.0.2" in keys
+
+
+@pytest.mark.asyncio
+async def test_memory_flat_at_100k_distinct_ips(local_limiter):
+    limiter = local_limiter(max_keys=10_000)
+
+    async def flood(start, count):
+        for i in range(start, start + count):
+            await enforce_rate_limit(f"10.{i >> 16}.{(i >> 8) & 255}.{i & 255}", key_prefix="facebook_webhook")
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        await flood(0, 20_000)  # Limit erreicht, ab hier wird nur noch verdrängt
+        gc.collect()
+        at_limit, _ = tracemalloc.get_traced_memory()
+        await flood(20_000, 80_000)
+        gc.collect()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert len(limiter._fallback) <= 10_000
+    assert limiter.stats()["fallback"] == 100_000
+    # 80k neue IPs, aber praktisch kein zusätzlicher Speicher
+    assert current - at_limit < 256 * 1024
@@ -0,0 +1,107 @@
+-- ============================================================================
+-- ATOMIC QUOTA ACCOUNTING
+-- One round-trip per increment/consume, no read-modify-write races
+-- Used by backend/app/core/quota_manager.py
+-- ============================================================================
+
+-- Adds p_deltas ({"vision_credits_used": 1, ...}) to this month's row,
+-- creating it if needed. Unknown keys are ignored.
+CREATE OR REPLACE FUNCTION increment_user_quota(
+    p_user_id UUID,
+    p_month_year TEXT,
+    p_deltas JSONB
+)
+RETURNS user_quotas
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_row user_quotas;
+BEGIN
+    INSERT INTO user_quotas AS q (
+        user_id, month_year,
+        vision_credits_used, voice_minutes_used, message_improvements_used,
+        ai_requests_count, ai_tokens_used
+    )
+    VALUES (
+        p_user_id, p_month_year,
+        COALESCE((p_deltas->>'vision_credits_used')::INTEGER, 0),
+        COALESCE((p_deltas->>'voice_minutes_used')::INTEGER, 0),
+        COALESCE((p_deltas->>'message_improvements_used')::INTEGER, 0),
+        COALESCE((p_deltas->>'ai_requests_count')::INTEGER, 0),
+        COALESCE((p_deltas->>'ai_tokens_used')::INTEGER, 0)
+    )
+    ON CONFLICT (user_id, month_year) DO UPDATE SET
+        vision_credits_used = q.vision_credits_used + EXCLUDED.vision_credits_used,
+        voice_minutes_used = q.voice_minutes_used + EXCLUDED.voice_minutes_used,
+        message_improvements_used = q.message_improvements_used + EXCLUDED.message_improvements_used,
+        ai_requests_count = q.ai_requests_count + EXCLUDED.ai_requests_count,
+        ai_tokens_used = q.ai_tokens_used + EXCLUDED.ai_tokens_used,
+        updated_at = NOW()
+    RETURNING * INTO v_row;
+
+    RETURN v_row;
+END;
+$$;
+
+-- All-or-nothing check + consume. p_limits holds the plan limit per
+-- counter (-1 = unlimited). The row lock serializes concurrent consumes
+-- of the same user, so limits cannot be overshot across workers.
+-- Returns {"allowed": bool, "denied": [counter, ...], "usage": row}
+CREATE OR REPLACE FUNCTION consume_user_quota(
+    p_user_id UUID,
+    p_month_year TEXT,
+    p_deltas JSONB,
+    p_limits JSONB
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_row user_quotas;
+    v_usage JSONB;
+    v_denied TEXT[] := '{}';
+    v_key TEXT;
+    v_limit INTEGER;
+BEGIN
+    INSERT INTO user_quotas (user_id, month_year)
+    VALUES (p_user_id, p_month_year)
+    ON CONFLICT (user_id, month_year) DO NOTHING;
+
+    SELECT * INTO v_row
+    FROM user_quotas
+    WHERE user_id = p_user_id AND month_year = p_month_year
+    FOR UPDATE;
+
+    v_usage := to_jsonb(v_row);
+    FOR v_key IN SELECT jsonb_object_keys(p_deltas) LOOP
+        v_limit := COALESCE((p_limits->>v_key)::INTEGER, -1);
+        IF v_limit <> -1
+           AND COALESCE((v_usage->>v_key)::INTEGER, 0) + (p_deltas->>v_key)::INTEGER > v_limit THEN
+            v_denied := array_append(v_denied, v_key);
+        END IF;
+    END LOOP;
+
+    IF cardinality(v_denied) = 0 THEN
+        v_row := increment_user_quota(p_user_id, p_month_year, p_deltas);
+        v_usage := to_jsonb(v_row);
+    END IF;
+
+    RETURN jsonb_build_object(
+        'allowed', cardinality(v_denied) = 0,
+        'denied', to_jsonb(v_denied),
+        'usage', v_usage
+    );
+END;
+$$;
+
+REVOKE ALL ON FUNCTION increment_user_quota(UUID, TEXT, JSONB) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION consume_user_quota(UUID, TEXT, JSONB, JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION increment_user_quota(UUID, TEXT, JSONB) TO service_role;
+GRANT EXECUTE ON FUNCTION consume_user_quota(UUID, TEXT, JSONB, JSONB) TO service_role;
+
+COMMENT ON FUNCTION increment_user_quota IS 'Atomic upsert-increment of monthly quota counters';
+COMMENT ON FUNCTION consume_user_quota IS 'Atomic all-or-nothing quota check and consume';
@@ -0,0 +1,29 @@
+-- ============================================================================
+-- USER TOKEN VERSION
+-- Access tokens carry "ver"; the backend caches authenticated principals by
+-- user id + ver and rejects tokens older than users.token_version.
+-- Deactivation and role changes bump the version, whoever makes them.
+-- ============================================================================
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION bump_user_token_version()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF NEW.is_active IS DISTINCT FROM OLD.is_active
+       OR NEW.role IS DISTINCT FROM OLD.role THEN
+        NEW.token_version := OLD.token_version + 1;
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_users_token_version ON users;
+CREATE TRIGGER trg_users_token_version
+    BEFORE UPDATE OF is_active, role ON users
+    FOR EACH ROW
+    EXECUTE FUNCTION bump_user_token_version();
+
+COMMENT ON COLUMN users.token_version IS 'Incremented on deactivation/role change; access tokens with a lower "ver" claim are rejected';
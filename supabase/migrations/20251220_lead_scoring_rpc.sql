@@ -0,0 +1,53 @@
+-- ============================================================================
+-- SET-BASED LEAD SCORING
+-- Grouped interaction counts and bulk score updates for the daily scorer
+-- Used by backend/app/services/lead_scoring.py
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_li_lead_outcome ON lead_interactions(lead_id, outcome);
+
+-- Interaction + positive-outcome counts for a page of leads, one row per
+-- lead that has interactions.
+CREATE OR REPLACE FUNCTION lead_interaction_counts(p_lead_ids UUID[])
+RETURNS TABLE (lead_id UUID, interactions INTEGER, positive INTEGER)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    SELECT
+        li.lead_id,
+        COUNT(*)::INTEGER AS interactions,
+        COUNT(*) FILTER (WHERE li.outcome = 'positive')::INTEGER AS positive
+    FROM lead_interactions li
+    WHERE li.lead_id = ANY(p_lead_ids)
+    GROUP BY li.lead_id;
+$$;
+
+-- Applies [{"id": ..., "score": ...}, ...] in one UPDATE ... FROM.
+-- (An upsert would need every NOT NULL column of leads.)
+-- Returns the number of rows whose score actually changed.
+CREATE OR REPLACE FUNCTION apply_lead_scores(p_scores JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_updated INTEGER;
+BEGIN
+    UPDATE leads l
+    SET score = s.score
+    FROM jsonb_to_recordset(p_scores) AS s(id UUID, score INTEGER)
+    WHERE l.id = s.id
+      AND l.score IS DISTINCT FROM s.score;
+
+    GET DIAGNOSTICS v_updated = ROW_COUNT;
+    RETURN v_updated;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION lead_interaction_counts(UUID[]) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION apply_lead_scores(JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION lead_interaction_counts(UUID[]) TO service_role;
+GRANT EXECUTE ON FUNCTION apply_lead_scores(JSONB) TO service_role;
@@ -0,0 +1,37 @@
+-- ============================================================================
+-- P-SCORE BATCH WRITES
+-- Bulk update of p_score / p_score_trend / last_scored_at
+-- Used by backend/app/services/predictive_scoring.py (recalc_p_scores_for_user)
+-- ============================================================================
+
+-- Events are grouped per lead in the backend: contact_id + created_at window
+CREATE INDEX IF NOT EXISTS idx_message_events_user_created_contact
+    ON public.message_events (user_id, created_at, contact_id)
+    WHERE contact_id IS NOT NULL;
+
+-- Applies [{"id", "p_score", "p_score_trend", "last_scored_at"}, ...]
+-- in one UPDATE ... FROM. Returns the number of updated rows.
+CREATE OR REPLACE FUNCTION apply_p_scores(p_scores JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_updated INTEGER;
+BEGIN
+    UPDATE leads l
+    SET p_score = s.p_score,
+        p_score_trend = s.p_score_trend,
+        last_scored_at = s.last_scored_at
+    FROM jsonb_to_recordset(p_scores)
+        AS s(id UUID, p_score NUMERIC(5,2), p_score_trend TEXT, last_scored_at TIMESTAMPTZ)
+    WHERE l.id = s.id;
+
+    GET DIAGNOSTICS v_updated = ROW_COUNT;
+    RETURN v_updated;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION apply_p_scores(JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION apply_p_scores(JSONB) TO service_role;
@@ -0,0 +1,60 @@
+-- ============================================================================
+-- INCREMENTAL JOB WATERMARKS
+-- Progress of the watermark-based scheduler jobs + reliable updated_at
+-- Used by backend/app/services/incremental_jobs.py (check_follow_ups,
+-- detect_churn_risks, track_goals, followup generation)
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS public.job_watermarks (
+    job TEXT PRIMARY KEY,
+    watermark TIMESTAMPTZ,              -- End of the last processed window
+    last_full_at TIMESTAMPTZ,           -- Last full reconciliation
+    state JSONB NOT NULL DEFAULT '{}'::jsonb,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Backend only (service role bypasses RLS), no client policies
+ALTER TABLE public.job_watermarks ENABLE ROW LEVEL SECURITY;
+
+-- Incremental scans filter on updated_at: make sure it exists and is
+-- maintained on every UPDATE
+ALTER TABLE IF EXISTS public.leads ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW();
+ALTER TABLE IF EXISTS public.deals ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW();
+ALTER TABLE IF EXISTS public.followup_suggestions ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW();
+
+CREATE OR REPLACE FUNCTION update_updated_at_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['leads', 'deals', 'followup_suggestions'] LOOP
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_trigger
+            WHERE tgname = 'update_' || t || '_updated_at'
+              AND tgrelid = ('public.' || t)::regclass
+        ) THEN
+            EXECUTE format(
+                'CREATE TRIGGER %I BEFORE UPDATE ON public.%I '
+                'FOR EACH ROW EXECUTE FUNCTION update_updated_at_column()',
+                'update_' || t || '_updated_at', t
+            );
+        END IF;
+    END LOOP;
+END;
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_leads_updated_at ON public.leads (updated_at);
+CREATE INDEX IF NOT EXISTS idx_deals_updated_at ON public.deals (updated_at);
+CREATE INDEX IF NOT EXISTS idx_suggestions_pending_updated
+    ON public.followup_suggestions (updated_at) WHERE status = 'pending';
+
+-- Churn window scan: won customers by last_contact
+CREATE INDEX IF NOT EXISTS idx_leads_won_last_contact
+    ON public.leads (last_contact) WHERE status = 'won';